@@ -41,13 +41,15 @@ class CDSExecutor:
         # Get patient resource for context
         patient = self._extract_patient(request)
 
-        # Evaluate each configured definition
+        # Evaluate each configured definition, sharing retrieved data between them
+        context = evaluator.create_context(resource=patient)
         results: dict[str, Any] = {}
         for definition_name in service.evaluateDefinitions:
             try:
                 result = evaluator.evaluate_definition(
                     definition_name,
                     resource=patient,
+                    context=context,
                 )
                 results[definition_name] = self._serialize_result(result)
             except Exception as e:
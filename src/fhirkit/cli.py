@@ -1,5 +1,7 @@
 """Unified FHIR CLI - Command line interface for FHIRPath, CQL, ELM, CDS Hooks, Terminology, and FHIR Server."""
 
+from pathlib import Path
+
 import typer
 from rich import print as rprint
 
@@ -31,11 +33,18 @@ def serve(
     port: int = typer.Option(8080, "--port", "-p", help="Port to bind to"),
     patients: int = typer.Option(0, "--patients", "-n", help="Number of synthetic patients to generate"),
     seed: int = typer.Option(None, "--seed", "-s", help="Random seed for reproducible data"),
+    workers: int = typer.Option(1, "--workers", "-w", help="Worker processes for generating patients"),
     preload_cql: str = typer.Option(None, "--preload-cql", help="Directory of CQL files to preload"),
     preload_valuesets: str = typer.Option(
         None, "--preload-valuesets", help="Directory of ValueSet/CodeSystem JSON files"
     ),
     preload_data: str = typer.Option(None, "--preload-data", help="FHIR Bundle JSON file to preload"),
+    terminology_dir: str = typer.Option(
+        None, "--terminology-dir", help="Directory of compact CodeSystem files from 'fhir terminology import'"
+    ),
+    snapshot: str = typer.Option(
+        None, "--snapshot", help="Store snapshot: restored if it exists, otherwise written after startup"
+    ),
     reload: bool = typer.Option(False, "--reload", "-r", help="Enable auto-reload for development"),
     log_level: str = typer.Option("INFO", "--log-level", "-l", help="Logging level"),
 ) -> None:
@@ -48,11 +57,21 @@ def serve(
         # With reproducible data
         fhir serve --patients 50 --seed 42
 
+        # Generate a large population with 8 worker processes
+        fhir serve --patients 100000 --workers 8
+
         # Preload CQL libraries and ValueSets
         fhir serve --preload-cql ./cql --preload-valuesets ./valuesets
 
         # Load existing FHIR data
         fhir serve --preload-data ./patients.json
+
+        # Generate once, then restart from the snapshot in seconds
+        fhir serve --patients 10000 --snapshot ./store.snapshot
+
+        # Serve SNOMED CT from a compact file
+        fhir terminology import snomed.json ./terminology/snomed.fcs
+        fhir serve --terminology-dir ./terminology
     """
     import uvicorn
 
@@ -61,13 +80,21 @@ def serve(
     from fhirkit.server.preload import load_cql_directory, load_fhir_directory, load_single_file
     from fhirkit.server.storage.fhir_store import FHIRStore
 
+    # A snapshot already holds the preloaded data it was written with
+    if snapshot and Path(snapshot).exists():
+        rprint(f"[dim]Restoring store from {snapshot}; skipping preloads[/dim]")
+        preload_cql = preload_valuesets = preload_data = None
+
     settings = FHIRServerSettings(
         host=host,
         port=port,
         patients=patients,
         seed=seed,
+        generator_workers=workers,
+        store_snapshot=snapshot,
         preload_cql=preload_cql,
         preload_valuesets=preload_valuesets,
+        terminology_dir=terminology_dir,
         log_level=log_level.upper(),
     )
 
@@ -23,6 +23,7 @@ from cqlParser import cqlParser
 
 from fhirkit.engine.cql import CQLEvaluator
 from fhirkit.engine.exceptions import CQLError
+from fhirkit.engine.types import ValueType
 
 app = typer.Typer(
     name="cql",
@@ -436,8 +437,8 @@ def run(
             for name, value in results.items():
                 if isinstance(value, Exception):
                     json_results[name] = {"error": str(value)}
-                elif hasattr(value, "model_dump"):
-                    json_results[name] = value.model_dump()
+                elif isinstance(value, ValueType):
+                    json_results[name] = value.to_dict()
                 else:
                     json_results[name] = value
 
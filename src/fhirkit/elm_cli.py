@@ -1,6 +1,7 @@
 """ELM CLI - Command line interface for ELM (Expression Logical Model) operations."""
 
 import json
+import sys
 from pathlib import Path
 from typing import Annotated, Any, Optional
 
@@ -13,6 +14,7 @@ from rich.table import Table
 
 from fhirkit.engine.elm import ELMEvaluator, ELMSerializer
 from fhirkit.engine.elm.exceptions import ELMError, ELMExecutionError, ELMValidationError
+from fhirkit.engine.types import ValueType
 
 app = typer.Typer(
     name="elm",
@@ -285,8 +287,8 @@ def run(
         if output:
             json_results = {}
             for name, value in results.items():
-                if hasattr(value, "model_dump"):
-                    json_results[name] = value.model_dump()
+                if isinstance(value, ValueType):
+                    json_results[name] = value.to_dict()
                 else:
                     json_results[name] = value
 
@@ -301,6 +303,88 @@ def run(
         raise typer.Exit(1)
 
 
+@app.command()
+def population(
+    file: Annotated[Path, typer.Argument(help="ELM JSON file to run")],
+    data: Annotated[Path, typer.Argument(help="NDJSON/JSON file or directory of patient bundles")],
+    definition: Annotated[
+        Optional[list[str]], typer.Option("--definition", "-e", help="Definition to evaluate (repeatable)")
+    ] = None,
+    param: Annotated[Optional[list[str]], typer.Option("--param", "-p", help="Parameter in name=value format")] = None,
+    output: Annotated[Optional[Path], typer.Option("--output", "-o", help="Output file (default: stdout)")] = None,
+    output_format: Annotated[
+        Optional[str], typer.Option("--format", "-f", help="ndjson or csv (default: from output suffix)")
+    ] = None,
+    workers: Annotated[int, typer.Option("--workers", "-w", help="Worker processes (0 = one per CPU)")] = 1,
+    include_private: Annotated[bool, typer.Option("--private", help="Include private definitions")] = False,
+) -> None:
+    """Run an ELM library over a population of patient bundles.
+
+    Bundles are streamed from DATA and one row per patient is written as
+    soon as it is evaluated.
+
+    Examples:
+        fhir elm population library.elm.json extract.ndjson -o results.ndjson
+        fhir elm population library.elm.json ./bundles/ -e Numerator -o results.csv --workers 8
+    """
+    from fhirkit.engine.elm.population import (
+        PopulationRunner,
+        default_workers,
+        iter_patient_bundles,
+        write_csv,
+        write_ndjson,
+    )
+
+    if not file.exists():
+        rprint(f"[red]Error:[/red] File not found: {file}")
+        raise typer.Exit(1)
+    if not data.exists():
+        rprint(f"[red]Error:[/red] Data not found: {data}")
+        raise typer.Exit(1)
+
+    fmt = output_format or ("csv" if output and output.suffix == ".csv" else "ndjson")
+    if fmt not in ("ndjson", "csv"):
+        rprint(f"[red]Error:[/red] Unsupported format: {fmt} (expected ndjson or csv)")
+        raise typer.Exit(1)
+
+    parameters: dict[str, Any] = {}
+    for p in param or []:
+        if "=" not in p:
+            rprint(f"[red]Error:[/red] Invalid parameter format: {p} (expected name=value)")
+            raise typer.Exit(1)
+        name, value = p.split("=", 1)
+        try:
+            parameters[name] = json.loads(value)
+        except json.JSONDecodeError:
+            parameters[name] = value
+
+    try:
+        runner = PopulationRunner(
+            file,
+            definitions=definition or None,
+            parameters=parameters or None,
+            workers=workers if workers > 0 else default_workers(),
+            include_private=include_private,
+        )
+    except ELMError as e:
+        rprint(f"[red]Error loading ELM:[/red] {e}")
+        raise typer.Exit(1)
+
+    results = runner.run(iter_patient_bundles(data))
+    stream = output.open("w", newline="") if output else sys.stdout
+    try:
+        if fmt == "csv":
+            count = write_csv(results, stream, runner.definitions)
+        else:
+            count = write_ndjson(results, stream)
+    finally:
+        if output:
+            stream.close()
+
+    if output:
+        rprint(f"[dim]{count} patient(s) written to {output}[/dim]")
+
+
 @app.command()
 def show(
     file: Annotated[Path, typer.Argument(help="ELM JSON file to display")],
@@ -47,6 +47,7 @@ from .library import (
     UsingDefinition,
     ValueSetDefinition,
 )
+from .library_cache import CompiledLibraryCache, get_library_cache, library_cache_key, set_library_cache
 from .library_resolver import (
     CompositeLibraryResolver,
     FileLibraryResolver,
@@ -121,6 +122,11 @@ __all__ = [
     "ConceptDefinition",
     "ExpressionDefinition",
     "FunctionDefinition",
+    # Compiled library cache
+    "CompiledLibraryCache",
+    "get_library_cache",
+    "set_library_cache",
+    "library_cache_key",
     # Library resolvers
     "LibraryResolver",
     "FileLibraryResolver",
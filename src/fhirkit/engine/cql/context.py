@@ -5,14 +5,17 @@ Extends the base EvaluationContext with CQL-specific features:
 - Query alias resolution
 - Parameter values
 - Definition evaluation caching
+- Retrieve result caching
 """
 
+from collections.abc import Hashable, Sequence
 from datetime import datetime
 from typing import TYPE_CHECKING, Any, Callable, Protocol
 
 from ..context import EvaluationContext, ModelProvider
 
 if TYPE_CHECKING:
+    from .datasource import RetrieveRequest
     from .library import CQLLibrary, LibraryManager
     from .plugins import CQLPluginRegistry
 
@@ -47,7 +50,7 @@ class CQLContext(EvaluationContext):
     - Query alias scopes
     - Parameter binding
     - Definition result caching
-    - Data source integration
+    - Data source integration with retrieve result caching
     """
 
     def __init__(
@@ -100,6 +103,9 @@ class CQLContext(EvaluationContext):
         # Evaluation stack to detect recursion
         self._eval_stack: set[str] = set()
 
+        # Retrieve result cache, shared by all definitions evaluated in this context
+        self._retrieve_cache: dict[Hashable, list[dict[str, Any]]] = {}
+
     @property
     def library(self) -> "CQLLibrary | None":
         """Get the current library."""
@@ -166,6 +172,13 @@ class CQLContext(EvaluationContext):
                 return scope[name]
         return None
 
+    def find_alias(self, name: str) -> tuple[bool, Any]:
+        """Look up an alias in one pass. Returns (found, value)."""
+        for scope in reversed(self._alias_scopes):
+            if name in scope:
+                return (True, scope[name])
+        return (False, None)
+
     def has_alias(self, name: str) -> bool:
         """Check if an alias exists in any scope."""
         for scope in reversed(self._alias_scopes):
@@ -225,6 +238,58 @@ class CQLContext(EvaluationContext):
         """End evaluating a definition."""
         self._eval_stack.discard(name)
 
+    # Retrieves
+
+    def _retrieve_cache_key(self, request: "RetrieveRequest") -> Hashable | None:
+        patient_key = None
+        if isinstance(self.resource, dict):
+            patient_key = (self.resource.get("resourceType"), self.resource.get("id"))
+        try:
+            return request.cache_key(patient_key)
+        except TypeError:
+            return None
+
+    def retrieve(self, request: "RetrieveRequest") -> list[dict[str, Any]]:
+        """Run a retrieve against the data source, reusing earlier results.
+
+        Results are cached for the lifetime of the context (one evaluation
+        session), keyed by the retrieve parameters and the context resource.
+        """
+        if self._data_source is None:
+            return []
+
+        key = self._retrieve_cache_key(request)
+        if key is None:
+            return request.retrieve_from(self._data_source, self)
+
+        resources = self._retrieve_cache.get(key)
+        if resources is None:
+            resources = request.retrieve_from(self._data_source, self)
+            self._retrieve_cache[key] = resources
+        return list(resources)
+
+    def prefetch(self, requests: Sequence["RetrieveRequest"]) -> None:
+        """Fetch retrieves ahead of evaluation in a single data-source call.
+
+        Only data sources implementing ``retrieve_batch`` are prefetched from;
+        for others, retrieves run (and are cached) as they are evaluated.
+        """
+        retrieve_batch = getattr(self._data_source, "retrieve_batch", None)
+        if retrieve_batch is None:
+            return
+
+        pending: dict[Hashable, RetrieveRequest] = {}
+        for request in requests:
+            key = self._retrieve_cache_key(request)
+            if key is not None and key not in self._retrieve_cache:
+                pending.setdefault(key, request)
+        if not pending:
+            return
+
+        results = retrieve_batch(list(pending.values()), self)
+        for key, resources in zip(pending, results):
+            self._retrieve_cache[key] = resources
+
     # Library resolution
 
     def resolve_library(self, alias: str) -> "CQLLibrary | None":
@@ -266,6 +331,7 @@ class CQLContext(EvaluationContext):
         # Definition cache is shared
         child_ctx._definition_cache = self._definition_cache
         child_ctx._eval_stack = self._eval_stack
+        child_ctx._retrieve_cache = self._retrieve_cache
         return child_ctx
 
     def for_query_source(self, alias: str, value: Any) -> "CQLContext":
@@ -0,0 +1,137 @@
+"""Static data requirements of CQL libraries.
+
+Determines which retrieves (``[Condition: "Diabetes"]`` ...) a library performs
+so that ``CQLContext.prefetch`` can fetch them for a patient in one batched
+data-source call before any definition is evaluated.
+
+The same request-building code is used by the visitor at evaluation time, so
+prefetched results and runtime retrieves share retrieve-cache keys. Retrieves
+whose terminology is an arbitrary expression can only be resolved at runtime
+and are not part of the static requirements.
+"""
+
+import sys
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+# Add generated directory to path
+_gen_path = str(Path(__file__).parent.parent.parent.parent.parent / "generated" / "cql")
+if _gen_path not in sys.path:
+    sys.path.insert(0, _gen_path)
+
+from cqlParser import cqlParser  # noqa: E402
+
+from .datasource import RetrieveRequest  # noqa: E402
+from .library import CQLLibrary  # noqa: E402
+
+# Code paths used when a retrieve does not name one
+DEFAULT_CODE_PATHS = {
+    "Condition": "code",
+    "Observation": "code",
+    "Procedure": "code",
+    "MedicationRequest": "medication.concept",
+    "MedicationStatement": "medication.concept",
+    "AllergyIntolerance": "code",
+    "DiagnosticReport": "code",
+    "Immunization": "vaccineCode",
+    "CarePlan": "category",
+}
+
+
+def _identifier_text(ctx: Any) -> str:
+    text = ctx.getText()
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in '"`':
+        return text[1:-1]
+    return text
+
+
+def build_retrieve_request(
+    ctx: cqlParser.RetrieveContext,
+    library: CQLLibrary | None,
+    evaluate: Callable[[Any], Any] | None = None,
+) -> RetrieveRequest | None:
+    """Build the request for a retrieve expression.
+
+    Args:
+        ctx: Retrieve parse tree node
+        library: Library used to resolve valueset, code and concept names
+        evaluate: Evaluates terminology given as an expression. Without it,
+            such retrieves cannot be resolved statically and None is returned.
+
+    Returns:
+        The retrieve request, or None if it depends on runtime values
+    """
+    named_type = ctx.namedTypeSpecifier()
+    if named_type:
+        resource_type = _identifier_text(named_type)
+    else:
+        # Parse from text: [Condition] -> "Condition"
+        resource_type = ctx.getText().strip("[]").split(":")[0].strip()
+
+    code_path_ctx = ctx.codePath()
+    code_path = _identifier_text(code_path_ctx) if code_path_ctx else DEFAULT_CODE_PATHS.get(resource_type)
+
+    codes: list[Any] | None = None
+    valueset: str | None = None
+    terminology = ctx.terminology()
+    if terminology:
+        term_expr = terminology.qualifiedIdentifierExpression()
+        if term_expr:
+            term_name = _identifier_text(term_expr)
+            if library:
+                if term_name in library.valuesets:
+                    valueset = library.valuesets[term_name].id
+                elif term_name in library.codes:
+                    code = library.resolve_code(term_name)
+                    if code:
+                        codes = [code]
+                elif term_name in library.concepts:
+                    codes = list(library.concepts[term_name].codes)
+        elif terminology.expression():
+            if evaluate is None:
+                return None
+            code_value = evaluate(terminology.expression())
+            if code_value:
+                codes = code_value if isinstance(code_value, list) else [code_value]
+
+    return RetrieveRequest(
+        resource_type=resource_type,
+        code_path=code_path,
+        codes=tuple(codes) if codes is not None else None,
+        valueset=valueset,
+    )
+
+
+def collect_retrieve_requests(library: CQLLibrary) -> list[RetrieveRequest]:
+    """Collect the statically known retrieves of a library.
+
+    Walks every expression definition and function body. The result is
+    computed once and stored on the library.
+
+    Returns:
+        Distinct retrieve requests, in order of first appearance
+    """
+    if library.retrieve_requirements is not None:
+        return library.retrieve_requirements
+
+    trees = [d.expression_tree for d in library.definitions.values() if d.expression_tree is not None]
+    trees.extend(f.body_tree for overloads in library.functions.values() for f in overloads if f.body_tree is not None)
+
+    requests: dict[Any, RetrieveRequest] = {}
+    stack = list(reversed(trees))
+    while stack:
+        node = stack.pop()
+        if isinstance(node, cqlParser.RetrieveContext):
+            request = build_retrieve_request(node, library)
+            if request is not None:
+                try:
+                    requests.setdefault(request.cache_key(), request)
+                except TypeError:
+                    pass
+        children = getattr(node, "children", None)
+        if children:
+            stack.extend(reversed(children))
+
+    library.retrieve_requirements = list(requests.values())
+    return library.retrieve_requirements
@@ -4,19 +4,70 @@ This module provides concrete implementations of the DataSource protocol
 for retrieving FHIR resources during CQL evaluation.
 
 Classes:
+    RetrieveRequest: The parameters of a single retrieve
     FHIRDataSource: Abstract base class defining the data source interface
     InMemoryDataSource: In-memory storage for FHIR resources
     BundleDataSource: Data source backed by a FHIR Bundle
+
+Data sources may additionally implement ``retrieve_batch(requests, context)``,
+returning one result list per request. ``CQLContext`` uses it to fetch all
+retrieves a library needs for a patient in a single call.
 """
 
+from collections.abc import Hashable, Sequence
+from dataclasses import dataclass
 from typing import TYPE_CHECKING, Any
 
+from ..equality import equality_key
 from .types import CQLCode, CQLConcept, CQLInterval
 
 if TYPE_CHECKING:
     from .context import CQLContext
 
 
+@dataclass(frozen=True)
+class RetrieveRequest:
+    """The parameters of a retrieve such as ``[Condition: "Diabetes"]``."""
+
+    resource_type: str
+    code_path: str | None = None
+    codes: tuple[Any, ...] | None = None
+    valueset: str | None = None
+    date_path: str | None = None
+    date_range: CQLInterval | None = None
+
+    def cache_key(self, patient_key: Hashable = None) -> Hashable:
+        """Hashable key identifying this retrieve for a patient.
+
+        Raises:
+            TypeError: If the codes or date range cannot be keyed
+        """
+        return (
+            self.resource_type,
+            self.code_path,
+            equality_key(list(self.codes)) if self.codes is not None else None,
+            self.valueset,
+            self.date_path,
+            equality_key(self.date_range),
+            patient_key,
+        )
+
+    def retrieve_from(self, data_source: Any, context: "CQLContext | None" = None) -> list[dict[str, Any]]:
+        """Run this request against a data source's ``retrieve`` method."""
+        # Date filters are only passed when set, for data sources predating them
+        date_filters: dict[str, Any] = {}
+        if self.date_path is not None:
+            date_filters = {"date_path": self.date_path, "date_range": self.date_range}
+        return data_source.retrieve(
+            resource_type=self.resource_type,
+            context=context,
+            code_path=self.code_path,
+            codes=list(self.codes) if self.codes is not None else None,
+            valueset=self.valueset,
+            **date_filters,
+        )
+
+
 class FHIRDataSource:
     """Abstract base class for FHIR data sources.
 
@@ -379,17 +430,66 @@ class InMemoryDataSource(FHIRDataSource):
         if "code" in kwargs:
             codes = [kwargs["code"]] if kwargs["code"] else None
 
-        # Get all resources of the type
+        resources = self._scoped_resources(resource_type, context)
+        return self._filter_resources(resources, code_path, codes, valueset, date_path, date_range)
+
+    def retrieve_batch(
+        self,
+        requests: Sequence[RetrieveRequest],
+        context: "CQLContext | None" = None,
+    ) -> list[list[dict[str, Any]]]:
+        """Run several retrieves in one call.
+
+        Resources of each type are scoped to the context patient once and
+        shared by all requests for that type, instead of rescanning the
+        whole store per retrieve.
+
+        Args:
+            requests: Retrieves to run
+            context: CQL evaluation context
+
+        Returns:
+            One list of matching resources per request, in request order
+        """
+        scoped: dict[str, list[dict[str, Any]]] = {}
+        results = []
+        for request in requests:
+            if request.resource_type not in scoped:
+                scoped[request.resource_type] = self._scoped_resources(request.resource_type, context)
+            results.append(
+                self._filter_resources(
+                    scoped[request.resource_type],
+                    request.code_path,
+                    list(request.codes) if request.codes is not None else None,
+                    request.valueset,
+                    request.date_path,
+                    request.date_range,
+                )
+            )
+        return results
+
+    def _scoped_resources(self, resource_type: str, context: "CQLContext | None") -> list[dict[str, Any]]:
+        """Get resources of a type, restricted to the context patient if any."""
         resources = self._resources.get(resource_type, [])
 
-        # Apply context filtering (patient scope)
         if context and context.resource:
             patient_id = context.resource.get("id")
             if patient_id and resource_type != "Patient":
                 patient_ref = f"Patient/{patient_id}"
                 resources = [r for r in resources if self._get_patient_reference(r) == patient_ref]
 
-        # Apply code filtering
+        return resources
+
+    def _filter_resources(
+        self,
+        resources: list[dict[str, Any]],
+        code_path: str | None,
+        codes: list[Any] | None,
+        valueset: str | None,
+        date_path: str | None,
+        date_range: CQLInterval | None,
+    ) -> list[dict[str, Any]]:
+        """Apply code and date filters to resources."""
         if code_path and (codes or valueset):
             valueset_codes = None
             if valueset:
@@ -397,7 +497,6 @@ class InMemoryDataSource(FHIRDataSource):
 
             resources = [r for r in resources if self._matches_code(r, code_path, codes, valueset_codes)]
 
-        # Apply date filtering
         if date_path and date_range:
             resources = [r for r in resources if self._matches_date_range(r, date_path, date_range)]
 
@@ -510,6 +609,14 @@ class BundleDataSource(FHIRDataSource):
             **kwargs,
         )
 
+    def retrieve_batch(
+        self,
+        requests: Sequence[RetrieveRequest],
+        context: "CQLContext | None" = None,
+    ) -> list[list[dict[str, Any]]]:
+        """Run several retrieves against the bundle in one call."""
+        return self._in_memory.retrieve_batch(requests, context)
+
     def resolve_reference(self, reference: str) -> dict[str, Any] | None:
         """Resolve a FHIR reference.
 
@@ -551,6 +658,22 @@ class PatientBundleDataSource(BundleDataSource):
         """Get the patient resource."""
         return self._patient
 
+    def _patient_context(self, context: "CQLContext | None") -> "CQLContext | None":
+        """Create a context with the bundle's patient if none is provided."""
+        if context is None and self._patient:
+            from .context import PatientContext
+
+            return PatientContext(resource=self._patient)
+        return context
+
+    def retrieve_batch(
+        self,
+        requests: Sequence[RetrieveRequest],
+        context: "CQLContext | None" = None,
+    ) -> list[list[dict[str, Any]]]:
+        """Run several retrieves, filtered to the bundle's patient, in one call."""
+        return super().retrieve_batch(requests, self._patient_context(context))
+
     def retrieve(
         self,
         resource_type: str,
@@ -576,15 +699,9 @@ class PatientBundleDataSource(BundleDataSource):
         Returns:
             List of matching resources for the patient
         """
-        # Create a context with patient if not provided
-        if context is None and self._patient:
-            from .context import PatientContext
-
-            context = PatientContext(resource=self._patient)
-
         return super().retrieve(
             resource_type=resource_type,
-            context=context,
+            context=self._patient_context(context),
             code_path=code_path,
             codes=codes,
             valueset=valueset,
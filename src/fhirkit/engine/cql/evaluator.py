@@ -8,8 +8,6 @@ import sys
 from pathlib import Path
 from typing import Any
 
-from antlr4 import CommonTokenStream, InputStream
-
 # Add generated directory to path
 _gen_path = str(Path(__file__).parent.parent.parent.parent.parent / "generated" / "cql")
 if _gen_path not in sys.path:
@@ -19,13 +17,17 @@ from cqlLexer import cqlLexer  # noqa: E402
 from cqlParser import cqlParser  # noqa: E402
 
 from ..exceptions import CQLError  # noqa: E402
+from ..parsing import TwoStageParser  # noqa: E402
 from .context import CQLContext, DataSource  # noqa: E402
+from .data_requirements import collect_retrieve_requests  # noqa: E402
 from .library import CQLLibrary, LibraryManager  # noqa: E402
+from .library_cache import CompiledLibraryCache, get_library_cache, library_cache_key  # noqa: E402
 from .library_resolver import (  # noqa: E402
     CompositeLibraryResolver,
     FileLibraryResolver,
     LibraryResolver,
 )
+from .plan import PlanCompiler, compile_library_plans  # noqa: E402
 from .plugins import CQLPluginRegistry  # noqa: E402
 from .visitor import CQLEvaluatorVisitor  # noqa: E402
 
@@ -83,6 +85,37 @@ class CQLErrorListener:
         pass
 
 
+_parser = TwoStageParser(cqlLexer, cqlParser, CQLErrorListener)
+
+# Representative expressions used to warm up the parser, in addition to FHIRHelpers
+_WARM_UP_EXPRESSIONS = [
+    "1 + 2 * 3 - 4 div 2",
+    "AgeInYears() >= 18 and Patient.gender = 'female'",
+    'exists ([Condition: "Diabetes"] C where C.clinicalStatus ~ "Active")',
+    '[Observation] O where O.effective during "Measurement Period" sort by effective desc',
+    "Interval[@2024-01-01T00:00:00.0, @2024-12-31T23:59:59.999] overlaps Interval[Now() - 1 year, Now())",
+    "if Count([Encounter]) > 2 then 'frequent' else 'occasional'",
+    "Tuple { code: '123', value: 5 'mg' }.value.value",
+    "({1, 2, 3}) X return X * 2",
+]
+
+
+def warm_up_parser() -> None:
+    """Pre-populate the CQL parser's prediction cache.
+
+    Parses the FHIRHelpers library and a set of representative expressions so
+    that the first user library or expression does not pay the cost of
+    building the prediction DFA. Intended to be called once at startup.
+    """
+    from .builtins import get_builtin_resolver
+
+    samples = [(expression, "expression") for expression in _WARM_UP_EXPRESSIONS]
+    fhir_helpers = get_builtin_resolver().resolve("FHIRHelpers")
+    if fhir_helpers:
+        samples.append((fhir_helpers, "library"))
+    _parser.warm_up(samples)
+
+
 class CQLEvaluator:
     """Main CQL evaluation engine.
 
@@ -119,6 +152,8 @@ class CQLEvaluator:
         library_paths: list[Path | str] | None = None,
         plugin_registry: CQLPluginRegistry | None = None,
         include_builtins: bool = True,
+        compile_plans: bool = True,
+        library_cache: CompiledLibraryCache | None = None,
     ):
         """Initialize the CQL evaluator.
 
@@ -129,12 +164,19 @@ class CQLEvaluator:
             library_paths: Optional list of directories to search for libraries
             plugin_registry: Optional plugin registry for custom functions
             include_builtins: Whether to include built-in libraries like FHIRHelpers (default True)
+            compile_plans: Whether to lower definitions into execution plans at compile
+                time (default True). Disable to evaluate parse trees with the visitor only.
+            library_cache: Cache of compiled libraries keyed by source hash (defaults to
+                the process-wide cache; pass ``CompiledLibraryCache(max_size=0)`` to disable)
         """
         self._library_manager = library_manager or LibraryManager()
         self._data_source = data_source
         self._plugin_registry = plugin_registry
         self._current_library: CQLLibrary | None = None
         self._expression_cache: dict[str, cqlParser.ExpressionContext] = {}
+        self._compile_plans = compile_plans
+        self._expression_compiler: PlanCompiler | None = None
+        self._library_cache = library_cache
 
         # Build resolver chain: user resolver -> builtins -> file paths
         resolvers: list[LibraryResolver] = []
@@ -191,19 +233,7 @@ class CQLEvaluator:
         Raises:
             CQLError: If compilation fails
         """
-        tree = self._parse_library(source)
-        context = CQLContext(
-            library_manager=self._library_manager,
-            data_source=self._data_source,
-            plugin_registry=self._plugin_registry,
-        )
-        visitor = CQLEvaluatorVisitor(context)
-
-        library = visitor.visit(tree)
-        if not isinstance(library, CQLLibrary):
-            raise CQLError("Failed to compile library")
-
-        library.source = source
+        library = self._build_library(source)
         self._library_manager.add_library(library)
         self._current_library = library
 
@@ -222,23 +252,45 @@ class CQLEvaluator:
             Compiled CQLLibrary or None if compilation fails
         """
         try:
-            tree = self._parse_library(source)
-            context = CQLContext(
-                library_manager=self._library_manager,
-                data_source=self._data_source,
-                plugin_registry=self._plugin_registry,
-            )
-            visitor = CQLEvaluatorVisitor(context)
-
-            library = visitor.visit(tree)
-            if not isinstance(library, CQLLibrary):
-                return None
-
-            library.source = source
-            return library
+            return self._build_library(source)
         except Exception:
             return None
 
+    def _build_library(self, source: str) -> CQLLibrary:
+        """Compile source into a library, reusing a cached compilation if available.
+
+        Raises:
+            CQLError: If compilation fails
+        """
+        cache = self._library_cache if self._library_cache is not None else get_library_cache()
+        key = library_cache_key(source, self._compile_plans)
+        library = cache.get(key)
+        if library is not None:
+            # Libraries restored from disk are cached without plans
+            if self._compile_plans and any(
+                d.plan is None and d.expression_tree is not None for d in library.definitions.values()
+            ):
+                compile_library_plans(library)
+            return library
+
+        tree = self._parse_library(source)
+        context = CQLContext(
+            library_manager=self._library_manager,
+            data_source=self._data_source,
+            plugin_registry=self._plugin_registry,
+        )
+        visitor = CQLEvaluatorVisitor(context)
+
+        library = visitor.visit(tree)
+        if not isinstance(library, CQLLibrary):
+            raise CQLError("Failed to compile library")
+
+        library.source = source
+        if self._compile_plans:
+            compile_library_plans(library)
+        cache.put(key, library)
+        return library
+
     def load_library(self, name: str, version: str | None = None) -> CQLLibrary | None:
         """Load a library by name.
 
@@ -254,12 +306,55 @@ class CQLEvaluator:
             self._current_library = library
         return library
 
+    def create_context(
+        self,
+        resource: dict[str, Any] | None = None,
+        parameters: dict[str, Any] | None = None,
+        library: CQLLibrary | None = None,
+        prefetch: bool = True,
+    ) -> CQLContext:
+        """Create an evaluation context for one evaluation session.
+
+        Definitions evaluated with the same context share definition results
+        and retrieve results, so evaluating several definitions for the same
+        patient (e.g. the populations of a measure) only retrieves each
+        resource set once.
+
+        Args:
+            resource: Optional context resource (e.g., Patient)
+            parameters: Optional parameter values
+            library: Optional library (uses current library if not specified)
+            prefetch: Fetch the library's statically known retrieves up front
+                in one batched data-source call (if the data source supports it)
+
+        Returns:
+            A new CQLContext
+        """
+        lib = library or self._current_library
+        context = CQLContext(
+            resource=resource,
+            library=lib,
+            library_manager=self._library_manager,
+            data_source=self._data_source,
+            plugin_registry=self._plugin_registry,
+        )
+
+        if parameters:
+            for name, value in parameters.items():
+                context.set_parameter(name, value)
+
+        if prefetch and lib is not None and self._data_source is not None:
+            context.prefetch(collect_retrieve_requests(lib))
+
+        return context
+
     def evaluate_definition(
         self,
         definition_name: str,
         resource: dict[str, Any] | None = None,
         parameters: dict[str, Any] | None = None,
         library: CQLLibrary | None = None,
+        context: CQLContext | None = None,
     ) -> Any:
         """Evaluate a named definition within a library.
 
@@ -268,6 +363,9 @@ class CQLEvaluator:
             resource: Optional context resource (e.g., Patient)
             parameters: Optional parameter values
             library: Optional library (uses current library if not specified)
+            context: Optional context from ``create_context`` to share cached
+                definition and retrieve results with other evaluations
+                (``resource`` is then taken from the context)
 
         Returns:
             Evaluation result
@@ -275,7 +373,7 @@ class CQLEvaluator:
         Raises:
             CQLError: If definition not found or evaluation fails
         """
-        lib = library or self._current_library
+        lib = library or (context.library if context else None) or self._current_library
         if not lib:
             raise CQLError("No library loaded")
 
@@ -286,17 +384,10 @@ class CQLEvaluator:
         if not definition.expression_tree:
             raise CQLError(f"Definition has no expression: {definition_name}")
 
-        # Create context
-        context = CQLContext(
-            resource=resource,
-            library=lib,
-            library_manager=self._library_manager,
-            data_source=self._data_source,
-            plugin_registry=self._plugin_registry,
-        )
-
-        # Set parameters
-        if parameters:
+        if context is None:
+            # One-off evaluation: retrieves run on demand
+            context = self.create_context(resource, parameters, lib, prefetch=False)
+        elif parameters:
             for name, value in parameters.items():
                 context.set_parameter(name, value)
 
@@ -374,20 +465,7 @@ class CQLEvaluator:
 
         results: dict[str, Any] = {}
 
-        # Create context
-        context = CQLContext(
-            resource=resource,
-            library=lib,
-            library_manager=self._library_manager,
-            data_source=self._data_source,
-            plugin_registry=self._plugin_registry,
-        )
-
-        # Set parameters
-        if parameters:
-            for name, value in parameters.items():
-                context.set_parameter(name, value)
-
+        context = self.create_context(resource, parameters, lib)
         visitor = CQLEvaluatorVisitor(context)
         visitor._library = lib
 
@@ -541,15 +619,7 @@ class CQLEvaluator:
     def _parse_library(self, source: str) -> cqlParser.LibraryContext:
         """Parse CQL library source code."""
         try:
-            input_stream = InputStream(source)
-            lexer = cqlLexer(input_stream)
-            token_stream = CommonTokenStream(lexer)
-            parser = cqlParser(token_stream)
-
-            parser.removeErrorListeners()
-            parser.addErrorListener(CQLErrorListener())
-
-            return parser.library()
+            return _parser.parse(source, "library")
 
         except CQLError:
             raise
@@ -562,15 +632,13 @@ class CQLEvaluator:
             return self._expression_cache[expression]
 
         try:
-            input_stream = InputStream(expression)
-            lexer = cqlLexer(input_stream)
-            token_stream = CommonTokenStream(lexer)
-            parser = cqlParser(token_stream)
-
-            parser.removeErrorListeners()
-            parser.addErrorListener(CQLErrorListener())
-
-            tree = parser.expression()
+            tree = _parser.parse(expression, "expression")
+            if self._compile_plans:
+                # Ad-hoc expressions can run against any library, so their
+                # identifiers and functions stay dynamically resolved
+                if self._expression_compiler is None:
+                    self._expression_compiler = PlanCompiler()
+                self._expression_compiler.compile(tree)
             self._expression_cache[expression] = tree
             return tree
 
@@ -6,6 +6,8 @@ Sort, IndexOf, Singleton, SingletonFrom, Reverse, Slice, Combine, Union, Interse
 
 from typing import TYPE_CHECKING, Any
 
+from ...equality import EqualityIndex, distinct_values
+
 if TYPE_CHECKING:
     from .registry import FunctionRegistry
 
@@ -117,14 +119,8 @@ def _distinct(args: list[Any]) -> list[Any]:
     """
     if not args or not isinstance(args[0], list):
         return []
-    seen = []
-    for item in args[0]:
-        # Skip null values per CQL spec
-        if item is None:
-            continue
-        if item not in seen:
-            seen.append(item)
-    return seen
+    # Skip null values per CQL spec
+    return distinct_values(item for item in args[0] if item is not None)
 
 
 def _sort(args: list[Any]) -> list[Any]:
@@ -240,14 +236,16 @@ def _union(args: list[Any]) -> list[Any]:
 def _intersect(args: list[Any]) -> list[Any]:
     """Intersection of two lists."""
     if len(args) >= 2 and isinstance(args[0], list) and isinstance(args[1], list):
-        return [x for x in args[0] if x in args[1]]
+        right = EqualityIndex(args[1])
+        return [x for x in args[0] if x in right]
     return []
 
 
 def _except(args: list[Any]) -> list[Any]:
     """Difference of two lists (elements in first but not second)."""
     if len(args) >= 2 and isinstance(args[0], list) and isinstance(args[1], list):
-        return [x for x in args[0] if x not in args[1]]
+        right = EqualityIndex(args[1])
+        return [x for x in args[0] if x not in right]
     return []
 
 
@@ -92,6 +92,7 @@ class ExpressionDefinition(BaseModel):
     context: str | None = None  # Patient, Unfiltered, etc.
     access_modifier: str | None = None  # public, private
     expression_tree: Any = None  # The parsed expression AST
+    plan: Any = Field(default=None, exclude=True, repr=False)  # Compiled execution plan (see plan.py)
 
 
 class FunctionDefinition(BaseModel):
@@ -103,6 +104,7 @@ class FunctionDefinition(BaseModel):
     parameters: list[tuple[str, str]] = Field(default_factory=list)  # (name, type) pairs
     return_type: str | None = None
     body_tree: Any = None  # The parsed function body AST
+    plan: Any = Field(default=None, exclude=True, repr=False)  # Compiled execution plan (see plan.py)
     fluent: bool = False
     external: bool = False
 
@@ -148,6 +150,9 @@ class CQLLibrary(BaseModel):
     # Source tracking
     source: str | None = None
 
+    # Statically known retrieves (see data_requirements.py)
+    retrieve_requirements: Any = Field(default=None, exclude=True, repr=False)
+
     def add_definition(self, definition: ExpressionDefinition) -> None:
         """Add an expression definition."""
         self.definitions[definition.name] = definition
@@ -0,0 +1,298 @@
+"""Cache of compiled CQL libraries.
+
+Parsing CQL with the generated ANTLR parser dominates the cost of compiling a
+library. ``CompiledLibraryCache`` keeps compiled ``CQLLibrary`` objects keyed
+by the SHA-256 of their source (plus the engine version and compile options),
+so compiling the same source again, in the same process or, with a cache
+directory, in a later one, skips lexing and parsing entirely.
+
+Two layers are used:
+
+- an in-memory LRU of compiled libraries (shared between evaluators; libraries
+  are not modified after compilation)
+- an optional on-disk layer storing pickled libraries. Parse trees are stored
+  without their parser/lexer references or execution plans; plans are
+  recompiled when a library is loaded from disk. Entries are signed with the
+  installation's key (see ``fhirkit.signing``) and entries whose signature
+  does not match are recompiled instead of unpickled.
+
+``CQLEvaluator`` consults the process-wide cache returned by
+``get_library_cache`` unless it is given its own cache.
+
+Note that parameter default values are evaluated when a library is compiled,
+so a cached library keeps the defaults computed when it was first compiled.
+
+Example:
+    from fhirkit.engine.cql import CompiledLibraryCache, set_library_cache
+
+    set_library_cache(CompiledLibraryCache(max_size=64, directory=".cql-cache"))
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+from antlr4 import InputStream, Lexer, Parser, ParserRuleContext
+from antlr4.Token import CommonToken
+
+from ... import __version__
+from ...signing import DIGEST_SIZE, SigningKeyError, sign, verify
+from .library import CQLLibrary, ExpressionDefinition, FunctionDefinition
+from .query_plan import QUERY_PLAN_ATTRIBUTE
+from .visitor import PLAN_ATTRIBUTE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 128
+
+# Parse tree attributes that are recomputed rather than cached
+_UNPICKLED_ATTRIBUTES = frozenset({PLAN_ATTRIBUTE, QUERY_PLAN_ATTRIBUTE})
+
+
+def library_cache_key(source: str, compile_plans: bool = True) -> str:
+    """Compute the cache key for a library source.
+
+    Args:
+        source: CQL source code
+        compile_plans: Whether the library is compiled with execution plans
+
+    Returns:
+        Hex SHA-256 digest of the source, engine version and options
+    """
+    digest = hashlib.sha256()
+    digest.update(f"fhirkit-{__version__}|plans={int(compile_plans)}|".encode())
+    digest.update(source.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class CompiledLibraryCache:
+    """LRU cache of compiled CQL libraries with an optional on-disk layer.
+
+    Thread-safe: the in-memory layer is guarded by a lock, and disk entries are
+    written atomically (write to a temporary file, then rename).
+
+    Args:
+        max_size: Maximum number of libraries kept in memory (0 disables
+            the in-memory layer)
+        directory: Optional directory for the on-disk layer
+    """
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE, directory: str | Path | None = None) -> None:
+        self._max_size = max_size
+        self._directory = Path(directory) if directory else None
+        self._entries: OrderedDict[str, CQLLibrary] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def directory(self) -> Path | None:
+        """Directory of the on-disk layer, if enabled."""
+        return self._directory
+
+    def get(self, key: str) -> CQLLibrary | None:
+        """Look up a compiled library, checking memory first and then disk.
+
+        Libraries loaded from disk have no execution plans; callers that use
+        plans must compile them (see ``plan.compile_library_plans``).
+        """
+        with self._lock:
+            library = self._entries.get(key)
+            if library is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return library
+
+        library = self._load(key)
+        if library is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        self._remember(key, library)
+        return library
+
+    def put(self, key: str, library: CQLLibrary) -> None:
+        """Store a compiled library in memory and, if enabled, on disk."""
+        self._remember(key, library)
+        self._store(key, library)
+
+    def clear(self, disk: bool = False) -> None:
+        """Remove all in-memory entries, and on-disk entries if ``disk`` is set."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+        if disk and self._directory and self._directory.exists():
+            for path in self._directory.glob("*.pickle"):
+                path.unlink(missing_ok=True)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            if key in self._entries:
+                return True
+        path = self._path(key)
+        return path is not None and path.exists()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    # =========================================================================
+    # Internals
+    # =========================================================================
+
+    def _remember(self, key: str, library: CQLLibrary) -> None:
+        if self._max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = library
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def _path(self, key: str) -> Path | None:
+        if self._directory is None:
+            return None
+        return self._directory / f"{key}.pickle"
+
+    def _load(self, key: str) -> CQLLibrary | None:
+        path = self._path(key)
+        if path is None or not path.exists():
+            return None
+        try:
+            data = path.read_bytes()
+            if not verify(data[DIGEST_SIZE:], data[:DIGEST_SIZE]):
+                raise ValueError("signature does not match")
+            return load_library(data[DIGEST_SIZE:])
+        except SigningKeyError as e:
+            logger.warning(f"Not loading CQL library cache entry {path}: {e}")
+            return None
+        except Exception as e:
+            # Corrupt or incompatible entry: drop it and recompile
+            logger.warning(f"Discarding unreadable CQL library cache entry {path}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+
+    def _store(self, key: str, library: CQLLibrary) -> None:
+        path = self._path(key)
+        if path is None:
+            return
+        try:
+            data = dump_library(library)
+        except (pickle.PicklingError, RecursionError, TypeError, AttributeError) as e:
+            logger.warning(f"CQL library {library.name} cannot be cached on disk: {e}")
+            return
+        try:
+            data = sign(data) + data
+        except SigningKeyError as e:
+            logger.warning(f"CQL library {library.name} cannot be cached on disk: {e}")
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            temp_path.write_bytes(data)
+            temp_path.replace(path)
+        except OSError as e:
+            logger.warning(f"Failed to write CQL library cache entry {path}: {e}")
+
+
+# =============================================================================
+# Serialization
+# =============================================================================
+
+
+def _rebuild_token(token_class: type, state: tuple[Any, ...]) -> CommonToken:
+    token = token_class.__new__(token_class)
+    (
+        token.type,
+        token._text,
+        token.channel,
+        token.start,
+        token.stop,
+        token.tokenIndex,
+        token.line,
+        token.column,
+    ) = state
+    token.source = (None, None)
+    return token
+
+
+def _detached() -> None:
+    return None
+
+
+def _node_slots(node: ParserRuleContext) -> dict[str, Any]:
+    slots: dict[str, Any] = {}
+    for cls in type(node).__mro__:
+        names = cls.__dict__.get("__slots__", ())
+        for name in (names,) if isinstance(names, str) else names:
+            if name != "__dict__" and hasattr(node, name):
+                slots[name] = getattr(node, name)
+    return slots
+
+
+class _LibraryPickler(pickle.Pickler):
+    """Pickler that detaches parse trees from the parser and drops plans."""
+
+    def reducer_override(self, obj: Any) -> Any:
+        if isinstance(obj, ParserRuleContext):
+            state = {k: v for k, v in getattr(obj, "__dict__", {}).items() if k not in _UNPICKLED_ATTRIBUTES}
+            slots = _node_slots(obj)
+            slots.pop("parser", None)
+            return object.__new__, (type(obj),), (state or None, slots)
+        if isinstance(obj, CommonToken):
+            state = (obj.type, obj.text, obj.channel, obj.start, obj.stop, obj.tokenIndex, obj.line, obj.column)
+            return _rebuild_token, (type(obj), state)
+        if isinstance(obj, (ExpressionDefinition, FunctionDefinition)) and obj.plan is not None:
+            return obj.model_copy(update={"plan": None}).__reduce_ex__(pickle.DEFAULT_PROTOCOL)
+        if isinstance(obj, (Parser, Lexer, InputStream)):
+            return _detached, ()
+        return NotImplemented
+
+
+def dump_library(library: CQLLibrary) -> bytes:
+    """Serialize a compiled library, including its parse trees, to bytes.
+
+    Raises:
+        pickle.PicklingError: If the library holds values that cannot be pickled
+    """
+    buffer = io.BytesIO()
+    _LibraryPickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(library)
+    return buffer.getvalue()
+
+
+def load_library(data: bytes) -> CQLLibrary:
+    """Deserialize a library produced by ``dump_library`` (without plans)."""
+    library = pickle.loads(data)
+    if not isinstance(library, CQLLibrary):
+        raise TypeError(f"Expected CQLLibrary, got {type(library).__name__}")
+    return library
+
+
+# =============================================================================
+# Process-wide cache
+# =============================================================================
+
+_library_cache = CompiledLibraryCache()
+
+
+def get_library_cache() -> CompiledLibraryCache:
+    """Get the process-wide compiled library cache."""
+    return _library_cache
+
+
+def set_library_cache(cache: CompiledLibraryCache) -> None:
+    """Replace the process-wide compiled library cache."""
+    global _library_cache
+    _library_cache = cache
@@ -437,6 +437,9 @@ class MeasureEvaluator:
         if data_source:
             self._evaluator._data_source = data_source
 
+        # Share definition and retrieve results across populations and stratifiers
+        context = self._evaluator.create_context(resource=patient, library=self._library)
+
         # Evaluate each population
         for group in self._groups:
             for population in group.populations:
@@ -444,6 +447,7 @@ class MeasureEvaluator:
                     value = self._evaluator.evaluate_definition(
                         population.definition,
                         resource=patient,
+                        context=context,
                     )
                     # Convert to boolean
                     if value is None:
@@ -463,6 +467,7 @@ class MeasureEvaluator:
                     value = self._evaluator.evaluate_definition(
                         stratifier,
                         resource=patient,
+                        context=context,
                     )
                     result.stratifier_values[stratifier] = value
                 except Exception:
@@ -0,0 +1,467 @@
+"""CQL execution plans.
+
+Lowers CQL parse trees into closures ("plans") that can be executed without
+ANTLR visitor dispatch. Lowering happens once per library, after the library
+has been built, so that:
+
+- literals are decoded once (numbers, strings, dates, quantities, codes)
+- operators are chosen once instead of re-reading operator tokens
+- identifiers are resolved to definition, code or concept slots; only the
+  runtime-dependent lookups (query aliases, function operands, parameters)
+  remain dynamic
+- built-in functions are bound to their registry implementation
+
+A plan is a callable taking the running ``CQLEvaluatorVisitor``, which holds
+the evaluation state (context, current library, cached Now()).
+
+Node types that are not lowered (queries, retrieves, timing phrases, ...)
+fall back to the visitor for that node only. Their sub-expressions are still
+lowered, and the visitor runs an attached plan whenever it visits a node that
+has one, so plans and visitor code interleave freely.
+
+Example:
+    library = evaluator.compile(source)      # plans are attached here
+    evaluator.evaluate_definition("InDemographic", resource=patient)
+"""
+
+from __future__ import annotations
+
+import sys
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from antlr4 import ParserRuleContext
+
+# Add generated directory to path
+_gen_path = str(Path(__file__).parent.parent.parent.parent.parent / "generated" / "cql")
+if _gen_path not in sys.path:
+    sys.path.insert(0, _gen_path)
+
+from cqlParser import cqlParser  # noqa: E402
+
+from ..types import Quantity  # noqa: E402
+from .context import CQLContext  # noqa: E402
+from .functions import get_registry  # noqa: E402
+from .library import CQLLibrary  # noqa: E402
+from .types import CQLTuple  # noqa: E402
+from .visitor import PLAN_ATTRIBUTE, CQLEvaluatorVisitor  # noqa: E402
+
+Plan = Callable[[CQLEvaluatorVisitor], Any]
+
+# Built-ins that depend on evaluation state and must go through the visitor
+_STATEFUL_FUNCTIONS = frozenset({"today", "now", "timeofday"})
+
+_FunctionBinding = Callable[[CQLEvaluatorVisitor, list[Any]], Any]
+
+
+def get_plan(tree: Any) -> Plan | None:
+    """Return the plan attached to a parse tree node, if any."""
+    return getattr(tree, PLAN_ATTRIBUTE, None)
+
+
+class PlanCompiler:
+    """Lower CQL parse trees into executable plans.
+
+    Args:
+        library: Library the trees belong to. Identifiers and function calls
+            are pre-resolved against it. When None, resolution stays dynamic
+            so the plan can run against any library (used for ad-hoc
+            expressions).
+    """
+
+    def __init__(self, library: CQLLibrary | None = None) -> None:
+        self._library = library
+        self._registry = get_registry()
+        # Throwaway visitor used to decode literals at compile time
+        self._literal_visitor = CQLEvaluatorVisitor(CQLContext(library=library))
+        self._literal_visitor._library = library
+
+        self._lowerers: dict[type, Callable[[Any], Plan | None]] = {
+            cqlParser.TermExpressionContext: lambda n: self.compile(n.expressionTerm()),
+            cqlParser.TermExpressionTermContext: lambda n: self.compile(n.term()),
+            cqlParser.ParenthesizedTermContext: lambda n: self.compile(n.expression()),
+            cqlParser.LiteralTermContext: lambda n: self.compile(n.literal()),
+            cqlParser.InvocationTermContext: lambda n: self.compile(n.invocation()),
+            cqlParser.IntervalSelectorTermContext: lambda n: self.compile(n.intervalSelector()),
+            cqlParser.ListSelectorTermContext: lambda n: self.compile(n.listSelector()),
+            cqlParser.TupleSelectorTermContext: lambda n: self.compile(n.tupleSelector()),
+            cqlParser.CodeSelectorTermContext: self._lower_terminology_selector,
+            cqlParser.ConceptSelectorTermContext: self._lower_terminology_selector,
+            cqlParser.BooleanLiteralContext: self._lower_constant,
+            cqlParser.NullLiteralContext: self._lower_constant,
+            cqlParser.StringLiteralContext: self._lower_constant,
+            cqlParser.NumberLiteralContext: self._lower_constant,
+            cqlParser.LongNumberLiteralContext: self._lower_constant,
+            cqlParser.DateTimeLiteralContext: self._lower_constant,
+            cqlParser.DateLiteralContext: self._lower_constant,
+            cqlParser.TimeLiteralContext: self._lower_constant,
+            cqlParser.QuantityLiteralContext: self._lower_constant,
+            cqlParser.RatioLiteralContext: self._lower_constant,
+            cqlParser.MemberInvocationContext: self._lower_member_invocation,
+            cqlParser.FunctionInvocationContext: self._lower_function_invocation,
+            cqlParser.InvocationExpressionTermContext: self._lower_invocation_expression,
+            cqlParser.AdditionExpressionTermContext: self._lower_additive,
+            cqlParser.MultiplicationExpressionTermContext: self._lower_multiplicative,
+            cqlParser.PolarityExpressionTermContext: self._lower_polarity,
+            cqlParser.AndExpressionContext: self._lower_and,
+            cqlParser.OrExpressionContext: self._lower_or,
+            cqlParser.NotExpressionContext: self._lower_not,
+            cqlParser.ImpliesExpressionContext: self._lower_implies,
+            cqlParser.BooleanExpressionContext: self._lower_boolean_test,
+            cqlParser.EqualityExpressionContext: self._lower_equality,
+            cqlParser.InequalityExpressionContext: self._lower_inequality,
+            cqlParser.MembershipExpressionContext: self._lower_membership,
+            cqlParser.ExistenceExpressionContext: self._lower_exists,
+            cqlParser.IfThenElseExpressionTermContext: self._lower_if,
+            cqlParser.ListSelectorContext: self._lower_list,
+            cqlParser.IntervalSelectorContext: self._lower_interval,
+            cqlParser.TupleSelectorContext: self._lower_tuple,
+        }
+
+    # =========================================================================
+    # Entry points
+    # =========================================================================
+
+    def compile(self, tree: Any) -> Plan:
+        """Lower a parse tree node into a plan and attach it to the node.
+
+        Nodes that cannot be lowered get a plan that delegates to the visitor
+        for that node only; their sub-expressions are still lowered.
+        """
+        existing = get_plan(tree)
+        if existing is not None:
+            return existing
+
+        lowerer = self._lowerers.get(type(tree))
+        plan = lowerer(tree) if lowerer is not None else None
+        if plan is None:
+            self._compile_children(tree)
+            return _visitor_plan(tree)
+
+        setattr(tree, PLAN_ATTRIBUTE, plan)
+        return plan
+
+    def _compile_children(self, tree: Any) -> None:
+        """Lower every rule node below a node that is evaluated by the visitor."""
+        for child in getattr(tree, "children", None) or ():
+            if isinstance(child, ParserRuleContext):
+                self.compile(child)
+
+    # =========================================================================
+    # Literals
+    # =========================================================================
+
+    def _lower_constant(self, node: Any, negate: bool = False) -> Plan | None:
+        """Decode a literal once. Literals that fail to decode stay with the visitor."""
+        visitor = self._literal_visitor
+        visitor._in_negation = negate
+        try:
+            value = visitor.visit(node)
+        except Exception:
+            # Raise the same error at evaluation time instead
+            return None
+        finally:
+            visitor._in_negation = False
+
+        if negate:
+            if value is None:
+                return lambda v: None
+            value = Quantity(value=-value.value, unit=value.unit) if isinstance(value, Quantity) else -value
+        return lambda v: value
+
+    def _lower_terminology_selector(self, node: Any) -> Plan | None:
+        # Code systems are resolved against the library, so these are only
+        # constant when the library is known
+        if self._library is None:
+            return None
+        return self._lower_constant(node)
+
+    # =========================================================================
+    # Identifiers and invocations
+    # =========================================================================
+
+    def _lower_member_invocation(self, node: cqlParser.MemberInvocationContext) -> Plan | None:
+        name = _identifier_text(node.referentialIdentifier())
+        library = self._library
+        if library is None:
+            return lambda v: v.visitMemberInvocation(node)
+
+        is_context = name == library.current_context
+        is_definition = name in library.definitions
+        is_code = name in library.codes
+        is_concept = name in library.concepts
+        code = library.resolve_code(name) if is_code else None
+        concept = library.resolve_concept(name) if is_concept else None
+
+        def member(v: CQLEvaluatorVisitor) -> Any:
+            ctx = v.context
+            if is_context:
+                return ctx.resource
+            found, value = ctx.find_alias(name)
+            if found:
+                return value
+            if ctx.has_parameter(name):
+                return ctx.get_parameter(name)
+            if is_definition:
+                return v._evaluate_definition(name)
+            if is_code:
+                return code
+            if is_concept:
+                return concept
+            return ctx.resolve_library(name)
+
+        return member
+
+    def _bind_function(self, name: str, arity: int) -> _FunctionBinding:
+        """Resolve a function call once, keeping the visitor's resolution order."""
+        library = self._library
+        if library is None or library.get_function(name, arity) is not None:
+            # User-defined (or dynamically resolved) functions go through the visitor
+            return lambda v, args: v._call_function(name, args)
+
+        name_lower = name.lower()
+        builtin = None if name_lower in _STATEFUL_FUNCTIONS else self._registry.get(name_lower)
+
+        def call(v: CQLEvaluatorVisitor, args: list[Any]) -> Any:
+            plugin_registry = v.context.plugin_registry
+            if plugin_registry is not None and plugin_registry.has(name):
+                return plugin_registry.call(name, *args)
+            if builtin is not None:
+                return builtin(args)
+            return v._call_builtin_function(name, args)
+
+        return call
+
+    def _compile_arguments(self, param_list: Any) -> list[Plan]:
+        if not param_list:
+            return []
+        return [self.compile(expr) for expr in param_list.expression()]
+
+    def _lower_function_invocation(self, node: cqlParser.FunctionInvocationContext) -> Plan:
+        func_ctx = node.function()
+        name = _identifier_text(func_ctx.referentialIdentifier())
+        arg_plans = self._compile_arguments(func_ctx.paramList())
+        function = self._bind_function(name, len(arg_plans))
+
+        def invoke(v: CQLEvaluatorVisitor) -> Any:
+            return function(v, [plan(v) for plan in arg_plans])
+
+        return invoke
+
+    def _lower_invocation_expression(self, node: cqlParser.InvocationExpressionTermContext) -> Plan | None:
+        target_plan = self.compile(node.expressionTerm())
+        invocation = node.qualifiedInvocation()
+
+        if isinstance(invocation, cqlParser.QualifiedMemberInvocationContext):
+            name = _identifier_text(invocation.referentialIdentifier())
+
+            def member_access(v: CQLEvaluatorVisitor) -> Any:
+                target = target_plan(v)
+                if type(target) is dict:
+                    result = target.get(name)
+                    if result is not None or name != "value":
+                        return result
+                return v._member_access(target, name)
+
+            return member_access
+
+        if isinstance(invocation, cqlParser.QualifiedFunctionInvocationContext):
+            func_ctx = invocation.qualifiedFunction()
+            name = _identifier_text(func_ctx.identifierOrFunctionIdentifier())
+            arg_plans = self._compile_arguments(func_ctx.paramList())
+            # Fluent calls pass the target as the first argument
+            function = self._bind_function(name, len(arg_plans) + 1)
+
+            def method_call(v: CQLEvaluatorVisitor) -> Any:
+                target = target_plan(v)
+                args = [plan(v) for plan in arg_plans]
+                if isinstance(target, CQLLibrary):
+                    return v._call_library_function(target, name, args)
+                return function(v, [target, *args])
+
+            return method_call
+
+        return None
+
+    # =========================================================================
+    # Operators
+    # =========================================================================
+
+    def _binary(self, node: Any, child: Callable[[int], Any]) -> tuple[Plan, Plan, str]:
+        return self.compile(child(0)), self.compile(child(1)), node.getChild(1).getText()
+
+    def _lower_additive(self, node: cqlParser.AdditionExpressionTermContext) -> Plan:
+        left, right, op = self._binary(node, node.expressionTerm)
+        return lambda v: v._additive_operation(op, left(v), right(v))
+
+    def _lower_multiplicative(self, node: cqlParser.MultiplicationExpressionTermContext) -> Plan:
+        left, right, op = self._binary(node, node.expressionTerm)
+        return lambda v: v._multiplicative_operation(op, left(v), right(v))
+
+    def _lower_polarity(self, node: cqlParser.PolarityExpressionTermContext) -> Plan | None:
+        op = node.getChild(0).getText()
+        operand = node.expressionTerm()
+        if op == "-" and isinstance(operand, cqlParser.TermExpressionTermContext):
+            term = operand.term()
+            if isinstance(term, cqlParser.LiteralTermContext):
+                # Negative literals (including -2147483648) are decoded once
+                literal = term.literal()
+                if isinstance(literal, (cqlParser.NumberLiteralContext, cqlParser.QuantityLiteralContext)):
+                    return self._lower_constant(literal, negate=True)
+        operand_plan = self.compile(operand)
+
+        def polarity(v: CQLEvaluatorVisitor) -> Any:
+            # Operands left to the visitor may rely on the negation flag
+            old_in_negation = v._in_negation
+            if op == "-":
+                v._in_negation = True
+            try:
+                value = operand_plan(v)
+            finally:
+                v._in_negation = old_in_negation
+            if value is None:
+                return None
+            if op == "-":
+                if isinstance(value, Quantity):
+                    return Quantity(value=-value.value, unit=value.unit)
+                return -value
+            return value
+
+        return polarity
+
+    def _lower_and(self, node: cqlParser.AndExpressionContext) -> Plan:
+        left, right, _ = self._binary(node, node.expression)
+        return lambda v: v._three_valued_and(left(v), right(v))
+
+    def _lower_or(self, node: cqlParser.OrExpressionContext) -> Plan:
+        left, right, op = self._binary(node, node.expression)
+        if op.lower() == "xor":
+            return lambda v: v._three_valued_xor(left(v), right(v))
+        return lambda v: v._three_valued_or(left(v), right(v))
+
+    def _lower_not(self, node: cqlParser.NotExpressionContext) -> Plan:
+        operand = self.compile(node.expression())
+
+        def negate(v: CQLEvaluatorVisitor) -> Any:
+            value = operand(v)
+            if value is None:
+                return None
+            return not value
+
+        return negate
+
+    def _lower_implies(self, node: cqlParser.ImpliesExpressionContext) -> Plan:
+        left, right, _ = self._binary(node, node.expression)
+        return lambda v: v._three_valued_implies(left(v), right(v))
+
+    def _lower_boolean_test(self, node: cqlParser.BooleanExpressionContext) -> Plan | None:
+        operand = self.compile(node.expression())
+        text = node.getText().lower()
+        # Same precedence as the visitor: IS NOT patterns first
+        tests: list[tuple[str, Callable[[Any], bool]]] = [
+            ("isnotnull", lambda x: x is not None),
+            ("isnull", lambda x: x is None),
+            ("isnottrue", lambda x: x is not True),
+            ("istrue", lambda x: x is True),
+            ("isnotfalse", lambda x: x is not False),
+            ("isfalse", lambda x: x is False),
+        ]
+        for pattern, test in tests:
+            if pattern in text:
+                return lambda v: test(operand(v))
+        return None
+
+    def _lower_equality(self, node: cqlParser.EqualityExpressionContext) -> Plan:
+        left, right, op = self._binary(node, node.expression)
+        return lambda v: v._equality_operation(op, left(v), right(v))
+
+    def _lower_inequality(self, node: cqlParser.InequalityExpressionContext) -> Plan:
+        left, right, op = self._binary(node, node.expression)
+        return lambda v: v._inequality_operation(op, left(v), right(v))
+
+    def _lower_membership(self, node: cqlParser.MembershipExpressionContext) -> Plan:
+        left, right, op = self._binary(node, node.expression)
+        op = op.lower()
+        return lambda v: v._membership_operation(op, left(v), right(v))
+
+    def _lower_exists(self, node: cqlParser.ExistenceExpressionContext) -> Plan:
+        operand = self.compile(node.expression())
+
+        def exists(v: CQLEvaluatorVisitor) -> bool:
+            value = operand(v)
+            if isinstance(value, list):
+                return any(x is not None for x in value)
+            return value is not None
+
+        return exists
+
+    def _lower_if(self, node: cqlParser.IfThenElseExpressionTermContext) -> Plan:
+        condition = self.compile(node.expression(0))
+        then_plan = self.compile(node.expression(1))
+        else_plan = self.compile(node.expression(2))
+        return lambda v: then_plan(v) if condition(v) is True else else_plan(v)
+
+    # =========================================================================
+    # Selectors
+    # =========================================================================
+
+    def _lower_list(self, node: cqlParser.ListSelectorContext) -> Plan:
+        item_plans = [self.compile(expr) for expr in node.expression()]
+        return lambda v: [plan(v) for plan in item_plans]
+
+    def _lower_interval(self, node: cqlParser.IntervalSelectorContext) -> Plan:
+        text = node.getText()
+        low_closed = text.startswith("Interval[")
+        high_closed = text.endswith("]")
+        expressions = node.expression()
+        low = self.compile(expressions[0]) if len(expressions) > 0 else None
+        high = self.compile(expressions[1]) if len(expressions) > 1 else None
+
+        def interval(v: CQLEvaluatorVisitor) -> Any:
+            return v._make_interval(
+                low(v) if low is not None else None,
+                high(v) if high is not None else None,
+                low_closed,
+                high_closed,
+            )
+
+        return interval
+
+    def _lower_tuple(self, node: cqlParser.TupleSelectorContext) -> Plan:
+        elements = [
+            (_identifier_text(element.referentialIdentifier()), self.compile(element.expression()))
+            for element in node.tupleElementSelector()
+        ]
+        return lambda v: CQLTuple(elements={name: plan(v) for name, plan in elements})
+
+
+def _visitor_plan(tree: Any) -> Plan:
+    """Plan that evaluates a node with the visitor (bypassing any attached plan)."""
+    return lambda v: tree.accept(v)
+
+
+def _identifier_text(ctx: Any) -> str:
+    """Extract identifier text, removing surrounding quotes."""
+    if ctx is None:
+        return ""
+    text = ctx.getText()
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in ('"', "`"):
+        return text[1:-1]
+    return text
+
+
+def compile_library_plans(library: CQLLibrary) -> None:
+    """Lower every definition and function body of a library into plans.
+
+    Plans are stored on the definitions (``plan``) and attached to their
+    parse trees, so every evaluation path picks them up.
+    """
+    compiler = PlanCompiler(library)
+    for definition in library.definitions.values():
+        if definition.expression_tree is not None:
+            definition.plan = compiler.compile(definition.expression_tree)
+    for overloads in library.functions.values():
+        for function in overloads:
+            if function.body_tree is not None:
+                function.plan = compiler.compile(function.body_tree)
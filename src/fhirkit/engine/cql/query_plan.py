@@ -0,0 +1,160 @@
+"""Static planning of CQL queries.
+
+``plan_query`` analyses a query parse tree once (the plan is stored on the
+tree) so that ``CQLEvaluatorVisitor`` does not have to evaluate it as a plain
+nested loop:
+
+- with/without sources that do not depend on the query's own aliases are
+  evaluated once per query; sources that do (``with E.diagnosis D ...``)
+  are evaluated per row
+- an ``=`` in a ``such that`` condition between the related item and the row
+  is executed as a hash join (see ``fhirkit.engine.joins``)
+- ``where`` conjuncts that only reference one source alias are applied to
+  that source before the cross product of a multi-source query is built
+
+Alias references are detected syntactically, from the identifier tokens of
+an expression. Detection may over-approximate, which only disables an
+optimization.
+"""
+
+from __future__ import annotations
+
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from antlr4.tree.Tree import TerminalNode
+
+# Add generated directory to path
+_gen_path = str(Path(__file__).parent.parent.parent.parent.parent / "generated" / "cql")
+if _gen_path not in sys.path:
+    sys.path.insert(0, _gen_path)
+
+from cqlParser import cqlParser  # noqa: E402
+
+# Attribute under which the plan is stored on QueryContext nodes
+QUERY_PLAN_ATTRIBUTE = "_cql_query_plan"
+
+
+@dataclass(frozen=True, slots=True)
+class InclusionPlan:
+    """How to evaluate one with/without clause.
+
+    Attributes:
+        lifted: The source does not depend on the query's aliases and is
+            evaluated once per query
+        probe: Row side of the join equality, or None if there is no join
+        build: Related-item side of the join equality
+    """
+
+    lifted: bool
+    probe: Any = None
+    build: Any = None
+
+
+@dataclass(frozen=True, slots=True)
+class QueryPlan:
+    """Evaluation plan of a query.
+
+    Attributes:
+        inclusions: One plan per with/without clause, in order
+        source_filters: Conjuncts of the where clause applied to a single
+            source before the cross product, keyed by source alias
+        where: Remaining where conjuncts, applied per row. All conjuncts
+            (pushed down or not) must be true for a row to be kept.
+    """
+
+    inclusions: tuple[InclusionPlan, ...] = ()
+    source_filters: dict[str, list[Any]] = field(default_factory=dict)
+    where: tuple[Any, ...] = ()
+
+
+def _unquote(text: str) -> str:
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in '"`':
+        return text[1:-1]
+    return text
+
+
+def referenced_identifiers(tree: Any) -> set[str]:
+    """Collect the identifier tokens of an expression."""
+    names: set[str] = set()
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, TerminalNode):
+            names.add(_unquote(node.getText()))
+            continue
+        children = getattr(node, "children", None)
+        if children:
+            stack.extend(children)
+    return names
+
+
+def conjuncts(tree: Any) -> list[Any]:
+    """Split an expression into the operands of its top-level ``and``."""
+    if isinstance(tree, cqlParser.AndExpressionContext):
+        return conjuncts(tree.expression(0)) + conjuncts(tree.expression(1))
+    return [tree]
+
+
+def _join_sides(condition: Any, alias: str, query_aliases: set[str]) -> tuple[Any, Any]:
+    """Find an ``=`` between the related alias and the row.
+
+    Returns:
+        (probe, build) expressions, or (None, None) if there is no such equality
+    """
+    others = query_aliases - {alias}
+    for conjunct in conjuncts(condition):
+        if not isinstance(conjunct, cqlParser.EqualityExpressionContext) or conjunct.getChild(1).getText() != "=":
+            continue
+        operands = (conjunct.expression(0), conjunct.expression(1))
+        for probe, build in (operands, operands[::-1]):
+            build_refs = referenced_identifiers(build)
+            if alias in build_refs and not build_refs & others and alias not in referenced_identifiers(probe):
+                return probe, build
+    return None, None
+
+
+def _alias(aliased_source: cqlParser.AliasedQuerySourceContext) -> str:
+    return _unquote(aliased_source.alias().identifier().getText())
+
+
+def plan_query(ctx: cqlParser.QueryContext) -> QueryPlan:
+    """Return the plan of a query, computing it on first use."""
+    plan = getattr(ctx, QUERY_PLAN_ATTRIBUTE, None)
+    if plan is not None:
+        return plan
+
+    source_aliases = [_alias(source) for source in ctx.sourceClause().aliasedQuerySource()]
+    let_clause = ctx.letClause()
+    let_names = {_unquote(item.identifier().getText()) for item in let_clause.letClauseItem()} if let_clause else set()
+    clauses = [inclusion.withClause() or inclusion.withoutClause() for inclusion in ctx.queryInclusionClause()]
+    query_aliases = set(source_aliases) | let_names | {_alias(clause.aliasedQuerySource()) for clause in clauses}
+
+    inclusions = []
+    for clause in clauses:
+        alias = _alias(clause.aliasedQuerySource())
+        lifted = not referenced_identifiers(clause.aliasedQuerySource().querySource()) & query_aliases
+        probe = build = None
+        if lifted:
+            probe, build = _join_sides(clause.expression(), alias, query_aliases)
+        inclusions.append(InclusionPlan(lifted=lifted, probe=probe, build=build))
+
+    source_filters: dict[str, list[Any]] = {}
+    where: list[Any] = []
+    where_clause = ctx.whereClause()
+    if where_clause:
+        if len(source_aliases) > 1:
+            for conjunct in conjuncts(where_clause.expression()):
+                refs = referenced_identifiers(conjunct) & query_aliases
+                if len(refs) == 1 and next(iter(refs)) in source_aliases:
+                    source_filters.setdefault(next(iter(refs)), []).append(conjunct)
+                else:
+                    where.append(conjunct)
+        else:
+            where.append(where_clause.expression())
+
+    plan = QueryPlan(inclusions=tuple(inclusions), source_filters=source_filters, where=tuple(where))
+    setattr(ctx, QUERY_PLAN_ATTRIBUTE, plan)
+    return plan
@@ -6,19 +6,22 @@ This module defines the CQL type system including:
 - CQLInterval: An interval with low/high bounds (open or closed)
 - CQLTuple: A structured type with named elements
 - CQLRatio: A ratio of two quantities
+
+Like the values in ``fhirkit.engine.types``, these are immutable
+``ValueType`` classes (tuples only allow their elements to be set).
 """
 
 from decimal import Decimal
 from typing import Any, Generic, TypeVar
 
-from pydantic import BaseModel, ConfigDict, field_validator
+from ..types import FHIRDate, FHIRDateTime, Quantity, ValueType
 
-from ..types import FHIRDate, FHIRDateTime, Quantity
+_set = object.__setattr__
 
 T = TypeVar("T")
 
 
-class CQLCode(BaseModel):
+class CQLCode(ValueType):
     """CQL Code type representing a coded value.
 
     A Code consists of:
@@ -28,12 +31,20 @@ class CQLCode(BaseModel):
     - version: Optional code system version
     """
 
-    model_config = ConfigDict(frozen=True)
+    __slots__ = ("code", "system", "display", "version", "_hash")
+
+    _fields = ("code", "system", "display", "version")
 
     code: str
     system: str
-    display: str | None = None
-    version: str | None = None
+    display: str | None
+    version: str | None
+
+    def __init__(self, code: str, system: str, display: str | None = None, version: str | None = None) -> None:
+        _set(self, "code", code)
+        _set(self, "system", system)
+        _set(self, "display", display)
+        _set(self, "version", version)
 
     def __eq__(self, other: object) -> bool:
         if isinstance(other, CQLCode):
@@ -42,7 +53,11 @@ class CQLCode(BaseModel):
         return False
 
     def __hash__(self) -> int:
-        return hash((self.code, self.system))
+        try:
+            return self._hash
+        except AttributeError:
+            _set(self, "_hash", hash((self.code, self.system)))
+            return self._hash
 
     def __str__(self) -> str:
         if self.display:
@@ -54,7 +69,7 @@ class CQLCode(BaseModel):
         return self.code == other.code and self.system == other.system
 
 
-class CQLConcept(BaseModel):
+class CQLConcept(ValueType):
     """CQL Concept type representing a concept with multiple codes.
 
     A Concept consists of:
@@ -62,17 +77,16 @@ class CQLConcept(BaseModel):
     - display: Optional human-readable display name
     """
 
-    model_config = ConfigDict(frozen=True)
+    __slots__ = ("codes", "display")
+
+    _fields = ("codes", "display")
 
-    codes: tuple[CQLCode, ...] = ()
-    display: str | None = None
+    codes: tuple[CQLCode, ...]
+    display: str | None
 
-    @field_validator("codes", mode="before")
-    @classmethod
-    def convert_codes_to_tuple(cls, v: Any) -> tuple[CQLCode, ...]:
-        if isinstance(v, list):
-            return tuple(v)
-        return v
+    def __init__(self, codes: Any = (), display: str | None = None) -> None:
+        _set(self, "codes", codes if type(codes) is tuple else tuple(codes))
+        _set(self, "display", display)
 
     def __eq__(self, other: object) -> bool:
         if isinstance(other, CQLConcept):
@@ -80,7 +94,8 @@ class CQLConcept(BaseModel):
         return False
 
     def __hash__(self) -> int:
-        return hash(self.codes)
+        # Order-independent, as equality compares the sets of codes
+        return hash(frozenset(self.codes))
 
     def __str__(self) -> str:
         codes_str = ", ".join(str(c) for c in self.codes)
@@ -89,7 +104,7 @@ class CQLConcept(BaseModel):
         return f"Concept {{ {codes_str} }}"
 
 
-class CQLInterval(BaseModel, Generic[T]):
+class CQLInterval(ValueType, Generic[T]):
     """CQL Interval type representing a range of values.
 
     An Interval consists of:
@@ -101,12 +116,22 @@ class CQLInterval(BaseModel, Generic[T]):
     Supports intervals of Integer, Decimal, Date, DateTime, Time, and Quantity.
     """
 
-    model_config = ConfigDict(arbitrary_types_allowed=True)
+    __slots__ = ("low", "high", "low_closed", "high_closed")
+
+    _fields = ("low", "high", "low_closed", "high_closed")
 
-    low: Any | None = None
-    high: Any | None = None
-    low_closed: bool = True
-    high_closed: bool = True
+    low: Any | None
+    high: Any | None
+    low_closed: bool
+    high_closed: bool
+
+    def __init__(
+        self, low: Any | None = None, high: Any | None = None, low_closed: bool = True, high_closed: bool = True
+    ) -> None:
+        _set(self, "low", low)
+        _set(self, "high", high)
+        _set(self, "low_closed", low_closed)
+        _set(self, "high_closed", high_closed)
 
     def __contains__(self, value: Any) -> bool:
         """Check if value is in the interval (contains operator)."""
@@ -520,26 +545,30 @@ class CQLInterval(BaseModel, Generic[T]):
         return f"Interval{low_bracket}{low_str}, {high_str}{high_bracket}"
 
 
-class CQLTuple(BaseModel):
+class CQLTuple(ValueType):
     """CQL Tuple type representing a structured value with named elements.
 
     A Tuple is essentially a dictionary with string keys and any values.
     Used for query results and structured data.
     """
 
-    model_config = ConfigDict(extra="allow")
+    __slots__ = ("elements",)
+
+    _fields = ("elements",)
+
+    elements: dict[str, Any]
 
-    elements: dict[str, Any] = {}
+    def __init__(self, elements: dict[str, Any] | None = None) -> None:
+        _set(self, "elements", dict(elements) if elements else {})
 
     def __getattr__(self, name: str) -> Any:
-        if name in ("elements", "model_fields", "model_config", "__dict__", "__pydantic_fields_set__"):
-            return super().__getattribute__(name)
+        # Only called for names that are not slots or methods
         try:
-            elements = super().__getattribute__("elements")
-            if name in elements:
-                return elements[name]
+            elements = object.__getattribute__(self, "elements")
         except AttributeError:
-            pass
+            elements = {}
+        if not name.startswith("__") and name in elements:
+            return elements[name]
         raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
 
     def __getitem__(self, key: str) -> Any:
@@ -578,7 +607,7 @@ class CQLTuple(BaseModel):
         return list(self.elements.items())
 
 
-class CQLRatio(BaseModel):
+class CQLRatio(ValueType):
     """CQL Ratio type representing a ratio of two quantities.
 
     A Ratio consists of:
@@ -586,11 +615,17 @@ class CQLRatio(BaseModel):
     - denominator: The denominator quantity
     """
 
-    model_config = ConfigDict(frozen=True)
+    __slots__ = ("numerator", "denominator")
+
+    _fields = ("numerator", "denominator")
 
     numerator: Quantity
     denominator: Quantity
 
+    def __init__(self, numerator: Quantity, denominator: Quantity) -> None:
+        _set(self, "numerator", numerator)
+        _set(self, "denominator", denominator)
+
     def __eq__(self, other: object) -> bool:
         if isinstance(other, CQLRatio):
             # Ratios are equal if their decimal equivalents are equal
@@ -20,9 +20,12 @@ if _gen_path not in sys.path:
 from cqlParser import cqlParser  # noqa: E402
 from cqlVisitor import cqlVisitor  # noqa: E402
 
+from ..equality import EqualityIndex, distinct_values  # noqa: E402
 from ..exceptions import CQLError  # noqa: E402
+from ..joins import JoinIndex  # noqa: E402
 from ..types import FHIRDate, FHIRDateTime, FHIRTime, Quantity  # noqa: E402
 from .context import CQLContext  # noqa: E402
+from .data_requirements import build_retrieve_request  # noqa: E402
 from .functions import get_registry  # noqa: E402
 from .functions.intervals import (  # noqa: E402
     collapse_intervals,
@@ -42,8 +45,12 @@ from .library import (  # noqa: E402
     UsingDefinition,
     ValueSetDefinition,
 )
+from .query_plan import InclusionPlan, plan_query  # noqa: E402
 from .types import CQLCode, CQLConcept, CQLInterval, CQLRatio, CQLTuple  # noqa: E402
 
+# Attribute holding a compiled plan on a parse tree node (see plan.py)
+PLAN_ATTRIBUTE = "_cql_plan"
+
 
 class CQLEvaluatorVisitor(cqlVisitor):
     """Visitor that evaluates CQL expressions.
@@ -83,6 +90,13 @@ class CQLEvaluatorVisitor(cqlVisitor):
         """Get the current library."""
         return self._library
 
+    def visit(self, tree: Any) -> Any:
+        """Visit a parse tree node, running its compiled plan when one is attached."""
+        plan = getattr(tree, PLAN_ATTRIBUTE, None)
+        if plan is not None:
+            return plan(self)
+        return tree.accept(self)
+
     def evaluate(self, tree: Any) -> Any:
         """Evaluate a parse tree and return the result."""
         return self.visit(tree)
@@ -459,7 +473,10 @@ class CQLEvaluatorVisitor(cqlVisitor):
         expressions = ctx.expression()
         low = self.visit(expressions[0]) if len(expressions) > 0 else None
         high = self.visit(expressions[1]) if len(expressions) > 1 else None
+        return self._make_interval(low, high, low_closed, high_closed)
 
+    def _make_interval(self, low: Any, high: Any, low_closed: bool, high_closed: bool) -> CQLInterval[Any] | None:
+        """Build an interval from evaluated bounds, validating their order."""
         # In CQL, Interval[null, null] evaluates to null
         if low is None and high is None:
             return None
@@ -611,8 +628,10 @@ class CQLEvaluatorVisitor(cqlVisitor):
         """Visit addition/subtraction expression."""
         left = self.visit(ctx.expressionTerm(0))
         right = self.visit(ctx.expressionTerm(1))
-        op = ctx.getChild(1).getText()
+        return self._additive_operation(ctx.getChild(1).getText(), left, right)
 
+    def _additive_operation(self, op: str, left: Any, right: Any) -> Any:
+        """Apply +, - or & to evaluated operands."""
         # String concatenation handles null specially
         if op == "&":
             # In CQL, null is treated as empty string in string concatenation
@@ -634,8 +653,10 @@ class CQLEvaluatorVisitor(cqlVisitor):
         """Visit multiplication/division expression."""
         left = self.visit(ctx.expressionTerm(0))
         right = self.visit(ctx.expressionTerm(1))
-        op = ctx.getChild(1).getText()
+        return self._multiplicative_operation(ctx.getChild(1).getText(), left, right)
 
+    def _multiplicative_operation(self, op: str, left: Any, right: Any) -> Any:
+        """Apply *, /, div or mod to evaluated operands."""
         if left is None or right is None:
             return None
 
@@ -747,8 +768,10 @@ class CQLEvaluatorVisitor(cqlVisitor):
         """Visit equality expression (=, ~, !=, !~)."""
         left = self.visit(ctx.expression(0))
         right = self.visit(ctx.expression(1))
-        op = ctx.getChild(1).getText()
+        return self._equality_operation(ctx.getChild(1).getText(), left, right)
 
+    def _equality_operation(self, op: str, left: Any, right: Any) -> bool | None:
+        """Apply =, !=, ~ or !~ to evaluated operands."""
         # Equivalent operator (~) handles nulls specially
         if op == "~":
             # Use _equivalent which handles null ~ null = true in lists
@@ -773,8 +796,10 @@ class CQLEvaluatorVisitor(cqlVisitor):
         """Visit inequality expression (<, <=, >, >=)."""
         left = self.visit(ctx.expression(0))
         right = self.visit(ctx.expression(1))
-        op = ctx.getChild(1).getText()
+        return self._inequality_operation(ctx.getChild(1).getText(), left, right)
 
+    def _inequality_operation(self, op: str, left: Any, right: Any) -> bool | None:
+        """Apply <, <=, > or >= to evaluated operands."""
         if left is None or right is None:
             return None
 
@@ -972,87 +997,88 @@ class CQLEvaluatorVisitor(cqlVisitor):
         if isinstance(invocation, cqlParser.QualifiedMemberInvocationContext):
             # Property access on target
             name = self._get_identifier_text(invocation.referentialIdentifier())
-
-            # Handle included library expression references
-            if isinstance(target, CQLLibrary):
-                return self._evaluate_library_definition(target, name)
-
-            if isinstance(target, dict):
-                result = target.get(name)
-                # FHIR polymorphic type support: value[x]
-                # If accessing 'value' and not found, try valueQuantity, valueString, etc.
-                if result is None and name == "value":
-                    for suffix in [
-                        "Quantity",
-                        "String",
-                        "CodeableConcept",
-                        "Boolean",
-                        "Integer",
-                        "DateTime",
-                        "Period",
-                        "Range",
-                        "Ratio",
-                    ]:
-                        result = target.get(f"value{suffix}")
-                        if result is not None:
-                            break
-                return result
-            elif isinstance(target, CQLTuple):
-                return target.elements.get(name)
-            elif isinstance(target, CQLInterval):
-                # Handle interval property access: .low, .high, .lowClosed, .highClosed
-                if name == "low":
-                    return target.low
-                elif name == "high":
-                    return target.high
-                elif name == "lowClosed":
-                    return target.low_closed
-                elif name == "highClosed":
-                    return target.high_closed
-                return None
-            elif isinstance(target, list):
-                # Flatten property access on list, recursively handling nested lists
-                results = []
-                for item in target:
-                    if isinstance(item, dict):
-                        results.append(item.get(name))
-                    elif isinstance(item, list):
-                        # Recursively access property on nested list items
-                        for nested in item:
-                            if isinstance(nested, dict):
-                                results.append(nested.get(name))
-                            elif isinstance(nested, list):
-                                # Deep nesting - flatten further
-                                for deep in nested:
-                                    if isinstance(deep, dict):
-                                        results.append(deep.get(name))
-                    else:
-                        results.append(getattr(item, name, None))
-                return results
+            return self._member_access(target, name)
         elif isinstance(invocation, cqlParser.QualifiedFunctionInvocationContext):
             # Method call on target
             func_ctx = invocation.qualifiedFunction()
             name = self._get_identifier_text(func_ctx.identifierOrFunctionIdentifier())
 
-            # Handle included library function calls
-            if isinstance(target, CQLLibrary):
-                args = []
-                param_list = func_ctx.paramList()
-                if param_list:
-                    for expr in param_list.expression():
-                        args.append(self.visit(expr))
-                return self._call_library_function(target, name, args)
-
-            args = [target]
+            args = []
             param_list = func_ctx.paramList()
             if param_list:
                 for expr in param_list.expression():
                     args.append(self.visit(expr))
+            return self._method_call(target, name, args)
 
-            return self._call_function(name, args)
+        return target
 
+    def _member_access(self, target: Any, name: str) -> Any:
+        """Access a property (or included library definition) on an evaluated target."""
+        # Handle included library expression references
+        if isinstance(target, CQLLibrary):
+            return self._evaluate_library_definition(target, name)
+
+        if isinstance(target, dict):
+            result = target.get(name)
+            # FHIR polymorphic type support: value[x]
+            # If accessing 'value' and not found, try valueQuantity, valueString, etc.
+            if result is None and name == "value":
+                for suffix in [
+                    "Quantity",
+                    "String",
+                    "CodeableConcept",
+                    "Boolean",
+                    "Integer",
+                    "DateTime",
+                    "Period",
+                    "Range",
+                    "Ratio",
+                ]:
+                    result = target.get(f"value{suffix}")
+                    if result is not None:
+                        break
+            return result
+        elif isinstance(target, CQLTuple):
+            return target.elements.get(name)
+        elif isinstance(target, CQLInterval):
+            # Handle interval property access: .low, .high, .lowClosed, .highClosed
+            if name == "low":
+                return target.low
+            elif name == "high":
+                return target.high
+            elif name == "lowClosed":
+                return target.low_closed
+            elif name == "highClosed":
+                return target.high_closed
+            return None
+        elif isinstance(target, list):
+            # Flatten property access on list, recursively handling nested lists
+            results = []
+            for item in target:
+                if isinstance(item, dict):
+                    results.append(item.get(name))
+                elif isinstance(item, list):
+                    # Recursively access property on nested list items
+                    for nested in item:
+                        if isinstance(nested, dict):
+                            results.append(nested.get(name))
+                        elif isinstance(nested, list):
+                            # Deep nesting - flatten further
+                            for deep in nested:
+                                if isinstance(deep, dict):
+                                    results.append(deep.get(name))
+                else:
+                    results.append(getattr(item, name, None))
+            return results
         return target
 
+    def _method_call(self, target: Any, name: str, args: list[Any]) -> Any:
+        """Call a function on an evaluated target (fluent or library-qualified)."""
+        # Handle included library function calls
+        if isinstance(target, CQLLibrary):
+            return self._call_library_function(target, name, args)
+        return self._call_function(name, [target, *args])
+
     def visitThisInvocation(self, ctx: cqlParser.ThisInvocationContext) -> Any:
         """Visit $this invocation."""
         return self.context.this
@@ -1092,8 +1118,10 @@ class CQLEvaluatorVisitor(cqlVisitor):
         """
         left = self.visit(ctx.expression(0))
         right = self.visit(ctx.expression(1))
-        op = ctx.getChild(1).getText().lower()
+        return self._membership_operation(ctx.getChild(1).getText().lower(), left, right)
 
+    def _membership_operation(self, op: str, left: Any, right: Any) -> bool | None:
+        """Apply in or contains to evaluated operands."""
         if op == "in":
             # element in container
             element = left
@@ -1182,9 +1210,11 @@ class CQLEvaluatorVisitor(cqlVisitor):
 
     def visitQuery(self, ctx: cqlParser.QueryContext) -> list[Any]:
         """Visit a query and execute it."""
+        plan = plan_query(ctx)
+
         # Get source clause
         source_clause = ctx.sourceClause()
-        results = self._process_query_sources(source_clause)
+        results = self._process_query_sources(source_clause, plan.source_filters)
 
         # Apply let clauses
         let_clause = ctx.letClause()
@@ -1194,13 +1224,12 @@ class CQLEvaluatorVisitor(cqlVisitor):
         # Apply query inclusion clauses (with/without)
         inclusion_clauses = ctx.queryInclusionClause()
         if inclusion_clauses:
-            for inclusion in inclusion_clauses:
-                results = self._apply_inclusion_clause(results, inclusion)
+            for inclusion, inclusion_plan in zip(inclusion_clauses, plan.inclusions):
+                results = self._apply_inclusion_clause(results, inclusion, inclusion_plan)
 
-        # Apply where clause
-        where_clause = ctx.whereClause()
-        if where_clause:
-            results = self._apply_where_clause(results, where_clause)
+        # Apply where clause (conjuncts not already applied to a single source)
+        if plan.where:
+            results = self._apply_where_conditions(results, plan.where)
 
         # Apply aggregate clause OR return clause (mutually exclusive)
         aggregate_clause = ctx.aggregateClause()
@@ -1227,8 +1256,16 @@ class CQLEvaluatorVisitor(cqlVisitor):
 
         return results
 
-    def _process_query_sources(self, ctx: cqlParser.SourceClauseContext) -> list[Any]:
-        """Process query source clause and return initial result set."""
+    def _process_query_sources(
+        self, ctx: cqlParser.SourceClauseContext, source_filters: dict[str, list[Any]] | None = None
+    ) -> list[Any]:
+        """Process query source clause and return initial result set.
+
+        Args:
+            ctx: Source clause
+            source_filters: Where conjuncts to apply to a single source before
+                it is cross joined with the others, keyed by alias
+        """
         results: list[dict[str, Any]] | None = None
 
         for alias_def in ctx.aliasedQuerySource():
@@ -1242,6 +1279,14 @@ class CQLEvaluatorVisitor(cqlVisitor):
             if not isinstance(source_value, list):
                 source_value = [source_value] if source_value is not None else []
 
+            if source_filters and alias in source_filters:
+                source_value = [
+                    row[alias]
+                    for row in self._apply_where_conditions(
+                        [{alias: item} for item in source_value], source_filters[alias]
+                    )
+                ]
+
             # Initialize result set with first source
             if results is None:
                 results = [{alias: item} for item in source_value]
@@ -1308,7 +1353,10 @@ class CQLEvaluatorVisitor(cqlVisitor):
         self, results: list[dict[str, Any]], ctx: cqlParser.WhereClauseContext
     ) -> list[dict[str, Any]]:
         """Apply where clause filter."""
-        expr = ctx.expression()
+        return self._apply_where_conditions(results, [ctx.expression()])
+
+    def _apply_where_conditions(self, results: list[dict[str, Any]], conditions: Any) -> list[dict[str, Any]]:
+        """Keep the rows for which every condition is true."""
         filtered = []
 
         for row in results:
@@ -1318,8 +1366,7 @@ class CQLEvaluatorVisitor(cqlVisitor):
                 self.context.set_alias(alias, value)
 
             try:
-                condition = self.visit(expr)
-                if condition is True:
+                if all(self.visit(expr) is True for expr in conditions):
                     filtered.append(row)
             finally:
                 self.context.pop_scope()
@@ -1347,11 +1394,7 @@ class CQLEvaluatorVisitor(cqlVisitor):
 
         # Apply distinct if specified
         if distinct and not is_all:
-            seen: list[Any] = []
-            for item in returned:
-                if item not in seen:
-                    seen.append(item)
-            return seen
+            return distinct_values(returned)
 
         return returned
 
@@ -1408,7 +1451,10 @@ class CQLEvaluatorVisitor(cqlVisitor):
         return results
 
     def _apply_inclusion_clause(
-        self, results: list[dict[str, Any]], ctx: cqlParser.QueryInclusionClauseContext
+        self,
+        results: list[dict[str, Any]],
+        ctx: cqlParser.QueryInclusionClauseContext,
+        plan: InclusionPlan | None = None,
     ) -> list[dict[str, Any]]:
         """Apply with/without clause to filter results based on related data."""
         # Check if it's a with or without clause
@@ -1416,16 +1462,37 @@ class CQLEvaluatorVisitor(cqlVisitor):
         without_clause = ctx.withoutClause()
 
         if with_clause:
-            return self._apply_with_clause(results, with_clause)
+            return self._apply_with_clause(results, with_clause, plan)
         elif without_clause:
-            return self._apply_without_clause(results, without_clause)
+            return self._apply_without_clause(results, without_clause, plan)
 
         return results
 
     def _apply_with_clause(
-        self, results: list[dict[str, Any]], ctx: cqlParser.WithClauseContext
+        self, results: list[dict[str, Any]], ctx: cqlParser.WithClauseContext, plan: InclusionPlan | None = None
     ) -> list[dict[str, Any]]:
         """Apply with clause - include rows that have matching related data."""
+        return self._filter_related(results, ctx, plan, keep_matching=True)
+
+    def _apply_without_clause(
+        self, results: list[dict[str, Any]], ctx: cqlParser.WithoutClauseContext, plan: InclusionPlan | None = None
+    ) -> list[dict[str, Any]]:
+        """Apply without clause - include rows that have NO matching related data."""
+        return self._filter_related(results, ctx, plan, keep_matching=False)
+
+    def _filter_related(
+        self,
+        results: list[dict[str, Any]],
+        ctx: cqlParser.WithClauseContext | cqlParser.WithoutClauseContext,
+        plan: InclusionPlan | None,
+        keep_matching: bool,
+    ) -> list[dict[str, Any]]:
+        """Filter rows on whether some related item satisfies the 'such that' condition.
+
+        Sources that do not depend on the row are evaluated once. With a join
+        equality in the condition, each row is only checked against the
+        related items whose side of the equality hashes to the row's value.
+        """
         # Get the aliased query source
         aliased_source = ctx.aliasedQuerySource()
         source = aliased_source.querySource()
@@ -1434,75 +1501,61 @@ class CQLEvaluatorVisitor(cqlVisitor):
         # Get the 'such that' condition expression
         condition = ctx.expression()
 
-        # Evaluate the source
-        source_value = self._evaluate_query_source(source)
-        if not isinstance(source_value, list):
-            source_value = [source_value] if source_value is not None else []
+        lifted = plan is None or plan.lifted
+        source_value: list[Any] = []
+        index: JoinIndex | None = None
+        if lifted and results:
+            # Evaluate the source once for all rows
+            source_value = self._related_items(source)
+            if plan is not None and plan.build is not None:
+                index = JoinIndex(source_value, lambda item: self._evaluate_with_alias(plan.build, alias, item))
 
-        # Filter results based on whether any related item matches the condition
         filtered = []
         for row in results:
-            has_match = False
-            for related_item in source_value:
-                # Create context with current row aliases and the related item
-                self.context.push_scope()
-                for row_alias, value in row.items():
-                    self.context.set_alias(row_alias, value)
-                self.context.set_alias(alias, related_item)
+            # Create context with current row aliases
+            self.context.push_scope()
+            for row_alias, value in row.items():
+                self.context.set_alias(row_alias, value)
 
-                try:
-                    result = self.visit(condition)
-                    if result is True:
+            try:
+                candidates: Any = source_value
+                if not lifted:
+                    candidates = self._related_items(source)
+                elif index is not None:
+                    try:
+                        candidates = index.candidates(self.visit(plan.probe))
+                    except Exception:
+                        candidates = source_value
+
+                has_match = False
+                for related_item in candidates:
+                    self.context.set_alias(alias, related_item)
+                    if self.visit(condition) is True:
                         has_match = True
                         break
-                finally:
-                    self.context.pop_scope()
+            finally:
+                self.context.pop_scope()
 
-            if has_match:
+            if has_match == keep_matching:
                 filtered.append(row)
 
         return filtered
 
-    def _apply_without_clause(
-        self, results: list[dict[str, Any]], ctx: cqlParser.WithoutClauseContext
-    ) -> list[dict[str, Any]]:
-        """Apply without clause - include rows that have NO matching related data."""
-        # Get the aliased query source
-        aliased_source = ctx.aliasedQuerySource()
-        source = aliased_source.querySource()
-        alias = self._get_identifier_text(aliased_source.alias().identifier())
-
-        # Get the 'such that' condition expression
-        condition = ctx.expression()
-
-        # Evaluate the source
+    def _related_items(self, source: cqlParser.QuerySourceContext) -> list[Any]:
+        """Evaluate the source of a with/without clause as a list."""
         source_value = self._evaluate_query_source(source)
         if not isinstance(source_value, list):
             source_value = [source_value] if source_value is not None else []
+        return source_value
 
-        # Filter results based on whether NO related item matches the condition
-        filtered = []
-        for row in results:
-            has_match = False
-            for related_item in source_value:
-                # Create context with current row aliases and the related item
-                self.context.push_scope()
-                for row_alias, value in row.items():
-                    self.context.set_alias(row_alias, value)
-                self.context.set_alias(alias, related_item)
-
-                try:
-                    result = self.visit(condition)
-                    if result is True:
-                        has_match = True
-                        break
-                finally:
-                    self.context.pop_scope()
-
-            if not has_match:
-                filtered.append(row)
-
-        return filtered
+    def _evaluate_with_alias(self, expr: Any, alias: str, value: Any) -> Any:
+        """Evaluate an expression with a single alias bound."""
+        self.context.push_scope()
+        try:
+            self.context.set_alias(alias, value)
+            return self.visit(expr)
+        finally:
+            self.context.pop_scope()
 
     def _apply_aggregate_clause(self, results: list[dict[str, Any]], ctx: cqlParser.AggregateClauseContext) -> Any:
         """Apply aggregate clause to accumulate a value across results.
@@ -1575,78 +1628,8 @@ class CQLEvaluatorVisitor(cqlVisitor):
             [ResourceType: codePath in valueset]
             [ResourceType: codePath ~ code]
         """
-        # Get resource type
-        named_type = ctx.namedTypeSpecifier()
-        if named_type:
-            resource_type = self._get_identifier_text(named_type)
-        else:
-            # Parse from text: [Condition] -> "Condition"
-            text = ctx.getText()
-            resource_type = text.strip("[]").split(":")[0].strip()
-
-        # Initialize retrieve parameters
-        code_path: str | None = None
-        codes: list[Any] | None = None
-        valueset: str | None = None
-
-        # Get code path if present
-        code_path_ctx = ctx.codePath() if hasattr(ctx, "codePath") else None
-        if code_path_ctx:
-            code_path = self._get_identifier_text(code_path_ctx)
-        else:
-            # Use default code paths for common resource types
-            default_code_paths = {
-                "Condition": "code",
-                "Observation": "code",
-                "Procedure": "code",
-                "MedicationRequest": "medication.concept",
-                "MedicationStatement": "medication.concept",
-                "AllergyIntolerance": "code",
-                "DiagnosticReport": "code",
-                "Immunization": "vaccineCode",
-                "CarePlan": "category",
-            }
-            code_path = default_code_paths.get(resource_type)
-
-        # Get terminology filter if present
-        terminology = ctx.terminology() if hasattr(ctx, "terminology") else None
-        if terminology:
-            # Parse terminology reference (valueset or code)
-            term_expr = terminology.qualifiedIdentifierExpression()
-            if term_expr:
-                term_name = self._get_identifier_text(term_expr)
-                if self._library:
-                    if term_name in self._library.valuesets:
-                        valueset = self._library.valuesets[term_name].id
-                    elif term_name in self._library.codes:
-                        code = self._library.resolve_code(term_name)
-                        if code:
-                            codes = [code]
-                    elif term_name in self._library.concepts:
-                        concept = self._library.concepts[term_name]
-                        codes = list(concept.codes)
-            else:
-                # Direct code expression
-                code_expr = terminology.expression() if hasattr(terminology, "expression") else None
-                if code_expr:
-                    code_value = self.visit(code_expr)
-                    if code_value:
-                        if isinstance(code_value, list):
-                            codes = code_value
-                        else:
-                            codes = [code_value]
-
-        # Use data source if available
-        if self.context.data_source:
-            return self.context.data_source.retrieve(
-                resource_type=resource_type,
-                context=self.context,
-                code_path=code_path,
-                codes=codes,
-                valueset=valueset,
-            )
-
-        return []
+        request = build_retrieve_request(ctx, self._library, self.visit)
+        return self.context.retrieve(request)
 
     # =========================================================================
     # Set Operations
@@ -1698,9 +1681,11 @@ class CQLEvaluatorVisitor(cqlVisitor):
             # Union concatenates lists, preserving duplicates
             return list(left) + list(right)
         elif op == "intersect":
-            return [item for item in left if item in right]
+            right_index = EqualityIndex(right)
+            return [item for item in left if item in right_index]
         elif op == "except":
-            return [item for item in left if item not in right]
+            right_index = EqualityIndex(right)
+            return [item for item in left if item not in right_index]
 
         return left
 
@@ -4338,14 +4323,8 @@ class CQLEvaluatorVisitor(cqlVisitor):
 
         if op == "distinct":
             if isinstance(value, list):
-                seen: list[Any] = []
-                for item in value:
-                    # Skip null values per CQL spec
-                    if item is None:
-                        continue
-                    if item not in seen:
-                        seen.append(item)
-                return seen
+                # Skip null values per CQL spec
+                return distinct_values(item for item in value if item is not None)
             return value
 
         elif op == "flatten":
@@ -9,6 +9,7 @@ from fhirkit.engine.elm.evaluator import ELMEvaluator
 from fhirkit.engine.elm.exceptions import ELMError, ELMExecutionError, ELMValidationError
 from fhirkit.engine.elm.loader import ELMLoader
 from fhirkit.engine.elm.models import ELMLibrary
+from fhirkit.engine.elm.population import PopulationRunner, iter_patient_bundles
 from fhirkit.engine.elm.serializer import (
     ELMSerializer,
     serialize_to_elm,
@@ -31,6 +32,9 @@ __all__ = [
     "ELMLibrary",
     # Visitor
     "ELMExpressionVisitor",
+    # Population
+    "PopulationRunner",
+    "iter_patient_bundles",
     # Exceptions
     "ELMError",
     "ELMValidationError",
@@ -12,6 +12,7 @@ from typing import Any
 from fhirkit.engine.cql.context import CQLContext, DataSource
 from fhirkit.engine.cql.library import LibraryManager
 from fhirkit.engine.elm.exceptions import ELMExecutionError, ELMReferenceError, ELMValidationError
+from fhirkit.engine.elm.executable import get_executable
 from fhirkit.engine.elm.loader import ELMLoader
 from fhirkit.engine.elm.models.library import ELMDefinition, ELMFunctionDef, ELMLibrary
 from fhirkit.engine.elm.visitor import ELMExpressionVisitor
@@ -59,15 +60,20 @@ class ELMEvaluator:
         self,
         data_source: DataSource | None = None,
         library_manager: LibraryManager | None = None,
+        lower: bool = True,
     ):
         """Initialize the ELM evaluator.
 
         Args:
             data_source: Optional data source for retrieve operations.
             library_manager: Optional library manager for dependencies.
+            lower: Convert libraries into their executable form when they are
+                loaded (see ``fhirkit.engine.elm.executable``). Disable to
+                evaluate the expression dicts of the library models directly.
         """
         self._library_manager = library_manager or LibraryManager()
         self._data_source = data_source
+        self._lower = lower
         self._current_library: ELMLibrary | None = None
         self._elm_libraries: dict[str, ELMLibrary] = {}
 
@@ -121,6 +127,9 @@ class ELMEvaluator:
         else:
             raise ELMValidationError(f"Unsupported source type: {type(source)}")
 
+        if self._lower:
+            get_executable(library)
+
         # Register the library
         lib_id = library.identifier.id
         lib_version = library.identifier.version
@@ -225,39 +234,68 @@ class ELMEvaluator:
         Returns:
             Evaluation result.
         """
+        visitor = self._create_visitor(resource, parameters, library)
+        return self._evaluate_with_visitor(visitor, definition, library)
+
+    def _create_visitor(
+        self,
+        resource: dict[str, Any] | None,
+        parameters: dict[str, Any] | None,
+        library: ELMLibrary,
+        data_source: DataSource | None = None,
+    ) -> ELMExpressionVisitor:
+        """Create a visitor with a fresh context for one evaluation.
+
+        Args:
+            resource: Optional context resource.
+            parameters: Optional parameter values.
+            library: The library to evaluate.
+            data_source: Data source overriding the evaluator's.
+
+        Returns:
+            Visitor with library parameters set.
+        """
         # Create context
         context = CQLContext(
             resource=resource,
             library_manager=self._library_manager,
-            data_source=self._data_source,
+            data_source=data_source if data_source is not None else self._data_source,
         )
 
+        visitor = ELMExpressionVisitor(context, lower=self._lower)
+        visitor.set_library(library)
+        executable = get_executable(library) if self._lower else None
+
         # Set parameters from library defaults
         for param in library.parameters:
             if param.default is not None:
                 # Evaluate default value
-                visitor = ELMExpressionVisitor(context)
-                visitor.set_library(library)
-                default_value = visitor.evaluate(param.default)
-                context.set_parameter(param.name, default_value)
+                default = executable.parameters[param.name] if executable else param.default
+                context.set_parameter(param.name, visitor.evaluate(default))
 
         # Override with provided parameters
         if parameters:
             for name, value in parameters.items():
                 context.set_parameter(name, value)
 
-        # Evaluate
-        visitor = ELMExpressionVisitor(context)
-        visitor.set_library(library)
+        return visitor
 
-        # The expression is stored as a dict in the model
-        expression = definition.expression
-        if expression is None:
-            return None
+    def _evaluate_with_visitor(
+        self, visitor: ELMExpressionVisitor, definition: ELMDefinition, library: ELMLibrary
+    ) -> Any:
+        """Evaluate a definition with a visitor from ``_create_visitor``."""
+        executable = get_executable(library) if self._lower else None
+        if executable and executable.definitions.get(definition.name) is not None:
+            expression = executable.definitions[definition.name]
+        else:
+            # The expression is stored as a dict in the model
+            expression = definition.expression
+            if expression is None:
+                return None
 
-        # Convert to dict if it's a model
-        if hasattr(expression, "model_dump"):
-            expression = expression.model_dump(by_alias=True, exclude_none=True)
+            # Convert to dict if it's a model
+            if hasattr(expression, "model_dump"):
+                expression = expression.model_dump(by_alias=True, exclude_none=True)
 
         return visitor.evaluate(expression)
 
@@ -307,11 +345,13 @@ class ELMEvaluator:
 
         # Evaluate
         try:
-            visitor = ELMExpressionVisitor(context)
+            visitor = ELMExpressionVisitor(context, lower=self._lower)
             visitor.set_library(library)
 
             expression = func.expression
-            if hasattr(expression, "model_dump"):
+            if self._lower:
+                expression = get_executable(library).functions[func.name].expression
+            elif hasattr(expression, "model_dump"):
                 expression = expression.model_dump(by_alias=True, exclude_none=True)
 
             return visitor.evaluate(expression)
@@ -343,18 +383,67 @@ class ELMEvaluator:
         if not lib:
             raise ELMExecutionError("No ELM library loaded")
 
+        names = self.get_definition_names(lib, include_private=include_private)
+        return self.evaluate_definitions(names, resource=resource, parameters=parameters, library=lib)
+
+    def evaluate_definitions(
+        self,
+        names: list[str],
+        resource: dict[str, Any] | None = None,
+        parameters: dict[str, Any] | None = None,
+        library: ELMLibrary | None = None,
+        data_source: DataSource | None = None,
+    ) -> dict[str, Any]:
+        """Evaluate several definitions for one context resource.
+
+        The definitions share one evaluation context, so definitions they
+        reference and the data they retrieve are evaluated once.
+
+        Args:
+            names: Names of the definitions to evaluate.
+            resource: Optional context resource.
+            parameters: Optional parameter values.
+            library: Optional library (uses current library if not specified).
+            data_source: Data source overriding the evaluator's, e.g. the
+                bundle of the patient being evaluated.
+
+        Returns:
+            Dictionary mapping definition names to their results. Errors are
+            reported by name under ``_errors``.
+
+        Raises:
+            ELMExecutionError: If no library is loaded.
+            ELMReferenceError: If a definition is not found.
+        """
+        lib = library or self._current_library
+        if not lib:
+            raise ELMExecutionError("No ELM library loaded")
+
+        definitions = []
+        for name in names:
+            definition = lib.get_definition(name)
+            if not definition:
+                raise ELMReferenceError(f"Definition not found: {name}")
+            definitions.append(definition)
+
+        visitor = self._create_visitor(resource, parameters, lib, data_source)
+        context = visitor.context
+
         results: dict[str, Any] = {}
         errors: dict[str, str] = {}
 
-        for definition in lib.get_definitions():
-            # Skip private definitions unless requested
-            if not include_private and definition.accessLevel == "Private":
+        for definition in definitions:
+            found, cached = context.get_cached_definition(definition.name)
+            if found:
+                results[definition.name] = cached
                 continue
-
             try:
-                results[definition.name] = self._evaluate_definition_impl(definition, resource, parameters, lib)
+                result = self._evaluate_with_visitor(visitor, definition, lib)
             except Exception as e:
                 errors[definition.name] = str(e)
+                continue
+            context.cache_definition(definition.name, result)
+            results[definition.name] = result
 
         # If any errors occurred, include them in results
         if errors:
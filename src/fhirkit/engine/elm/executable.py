@@ -0,0 +1,229 @@
+"""Executable form of ELM libraries.
+
+``ELMExpressionVisitor`` evaluates ELM expression dicts by looking up a handler
+for each node's ``type`` string. ``lower_library`` converts a library once into
+an executable form in which:
+
+- Pydantic expression models are dumped to dicts once, not on every reference
+- every expression node is an immutable ``ELMNode`` with its handler bound
+- literals are decoded once
+- local ExpressionRef and FunctionRef nodes are linked to the lowered target
+  definition or function, and built-in FunctionRefs to their implementation
+
+``ELMNode`` is a read-only ``dict`` subclass, so handlers read lowered and
+plain nodes the same way. The executable form is cached on the library;
+``ELMEvaluator.load`` lowers libraries as they are loaded.
+
+Example:
+    library = ELMLoader.load_file("Measure.json")
+    executable = get_executable(library)
+    executable.definitions["Initial Population"]
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any
+
+from fhirkit.engine.elm.exceptions import ELMExecutionError
+from fhirkit.engine.elm.query_plan import plan_query
+from fhirkit.engine.types import FHIRDate, FHIRDateTime, Quantity
+
+if TYPE_CHECKING:
+    from fhirkit.engine.elm.models.library import ELMLibrary
+
+# Built-in functions callable through an unqualified FunctionRef
+BUILTIN_FUNCTIONS: dict[str, Callable[..., Any]] = {
+    "ToString": lambda x: str(x) if x is not None else None,
+    "ToInteger": lambda x: int(x) if x is not None else None,
+    "ToDecimal": lambda x: Decimal(str(x)) if x is not None else None,
+}
+
+
+def parse_quantity(value: str) -> Quantity:
+    """Parse a quantity string such as ``"5 mg"``."""
+    parts = value.split()
+    if len(parts) == 2:
+        return Quantity(value=Decimal(parts[0]), unit=parts[1])
+    return Quantity(value=Decimal(value), unit="1")
+
+
+def decode_literal(value_type: str, value: Any) -> Any:
+    """Decode the value of a Literal node according to its valueType."""
+    if value is None:
+        return None
+
+    # Parse value based on type
+    if "Boolean" in value_type:
+        return value.lower() == "true" if isinstance(value, str) else bool(value)
+    elif "Integer" in value_type:
+        return int(value)
+    elif "Long" in value_type:
+        return int(value)
+    elif "Decimal" in value_type:
+        return Decimal(str(value))
+    elif "String" in value_type:
+        return str(value)
+    elif "Date" in value_type and "DateTime" not in value_type:
+        return FHIRDate.parse(value)
+    elif "DateTime" in value_type:
+        return FHIRDateTime.parse(value)
+    elif "Time" in value_type:
+        return value  # Keep as string for now
+    elif "Quantity" in value_type:
+        return parse_quantity(value)
+
+    return value
+
+
+class ELMNode(dict):
+    """Lowered, read-only ELM expression node.
+
+    Attributes:
+        handler: Visitor handler, called as ``handler(visitor, node)``
+        constant: Decoded value of a Literal node
+        target: Lowered expression of the definition an ExpressionRef refers
+            to, or the ``ExecutableFunction``/built-in a FunctionRef calls.
+            None when the reference is resolved at runtime.
+        plan: ``QueryPlan`` of a Query node
+    """
+
+    __slots__ = ("handler", "constant", "target", "plan")
+
+    def _read_only(self, *args: Any, **kwargs: Any) -> Any:
+        raise TypeError("ELM nodes are immutable")
+
+    __setitem__ = __delitem__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only  # type: ignore[assignment]
+
+
+@dataclass(frozen=True, slots=True)
+class ExecutableFunction:
+    """Function definition with its body ready for evaluation."""
+
+    name: str
+    operands: tuple[str, ...]
+    expression: Any
+    external: bool = False
+
+
+@dataclass(slots=True)
+class ExecutableLibrary:
+    """Executable form of an ELM library.
+
+    Definitions and functions are keyed by name; as with
+    ``ELMLibrary.get_definition``/``get_function``, the first statement with a
+    name wins.
+    """
+
+    library: ELMLibrary
+    definitions: dict[str, Any] = field(default_factory=dict)
+    functions: dict[str, ExecutableFunction] = field(default_factory=dict)
+    parameters: dict[str, Any] = field(default_factory=dict)
+
+
+def _unsupported(visitor: Any, node: ELMNode) -> Any:
+    raise ELMExecutionError(f"Unsupported expression type: {node['type']}")
+
+
+def _untyped(visitor: Any, node: ELMNode) -> Any:
+    raise ELMExecutionError(f"Missing 'type' field in expression: {dict(node)}")
+
+
+def _constant(visitor: Any, node: ELMNode) -> Any:
+    return node.constant
+
+
+class _Lowerer:
+    """Converts expression dicts of one library into ELMNodes."""
+
+    def __init__(self, handlers: dict[str, Callable[[Any, Any], Any]]) -> None:
+        self._handlers = handlers
+        self.references: list[ELMNode] = []
+
+    def lower(self, value: Any) -> Any:
+        if hasattr(value, "model_dump"):
+            value = value.model_dump(by_alias=True, exclude_none=True)
+        if isinstance(value, list):
+            return [self.lower(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+
+        node = ELMNode({key: self.lower(item) for key, item in value.items()})
+        node.constant = None
+        node.target = None
+        node.plan = None
+        node_type = node.get("type")
+        if not node_type:
+            node.handler = _untyped
+        elif node_type == "Literal":
+            try:
+                node.constant = decode_literal(node.get("valueType", ""), node.get("value"))
+                node.handler = _constant
+            except Exception:
+                # Report invalid literals when evaluated, as the visitor does
+                node.handler = self._handlers["Literal"]
+        else:
+            node.handler = self._handlers.get(node_type, _unsupported)
+            if node_type in ("ExpressionRef", "FunctionRef") and not node.get("libraryName"):
+                self.references.append(node)
+            elif node_type == "Query":
+                node.plan = plan_query(node)
+        return node
+
+
+def lower_library(library: ELMLibrary, visitor_class: type | None = None) -> ExecutableLibrary:
+    """Convert an ELM library into its executable form.
+
+    Args:
+        library: The library to lower.
+        visitor_class: Visitor whose handlers are bound to the nodes.
+            Defaults to ``ELMExpressionVisitor``.
+
+    Returns:
+        The executable library. It is not cached; see ``get_executable``.
+    """
+    if visitor_class is None:
+        from fhirkit.engine.elm.visitor import ELMExpressionVisitor
+
+        visitor_class = ELMExpressionVisitor
+
+    lowerer = _Lowerer(visitor_class.handler_functions())
+    executable = ExecutableLibrary(library=library)
+
+    for definition in library.get_definitions():
+        if definition.name not in executable.definitions:
+            executable.definitions[definition.name] = lowerer.lower(definition.expression)
+    for func in library.get_functions():
+        if func.name not in executable.functions:
+            executable.functions[func.name] = ExecutableFunction(
+                name=func.name,
+                operands=tuple(operand.name for operand in func.operand),
+                expression=lowerer.lower(func.expression),
+                external=func.external,
+            )
+    for param in library.parameters:
+        if param.default is not None and param.name not in executable.parameters:
+            executable.parameters[param.name] = lowerer.lower(param.default)
+
+    # Link local references now that every target has been lowered
+    for node in lowerer.references:
+        name = node.get("name")
+        if node["type"] == "ExpressionRef":
+            node.target = executable.definitions.get(name)
+        elif name in BUILTIN_FUNCTIONS:
+            node.target = BUILTIN_FUNCTIONS[name]
+        else:
+            node.target = executable.functions.get(name)
+
+    return executable
+
+
+def get_executable(library: ELMLibrary) -> ExecutableLibrary:
+    """Return the cached executable form of a library, lowering it on first use."""
+    executable = library._executable
+    if executable is None:
+        executable = library._executable = lower_library(library)
+    return executable
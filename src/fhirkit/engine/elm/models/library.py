@@ -4,7 +4,7 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING, Any
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
 
 from fhirkit.engine.elm.models.types import ELMTypeSpecifier
 
@@ -199,6 +199,9 @@ class ELMLibrary(BaseModel):
     statements: ELMStatements | None = None
     annotation: list[ELMAnnotation] = Field(default_factory=list)
 
+    # Executable form built by fhirkit.engine.elm.executable.get_executable
+    _executable: Any = PrivateAttr(default=None)
+
     def get_definition(self, name: str) -> ELMDefinition | None:
         """Get a definition by name."""
         if not self.statements:
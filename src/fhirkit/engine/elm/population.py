@@ -0,0 +1,327 @@
+"""Population-scale evaluation of ELM libraries.
+
+Evaluates selected definitions of one ELM library for every patient of an
+extract, one patient bundle at a time:
+
+- ``iter_patient_bundles`` streams bundles from an NDJSON file (one Bundle or
+  resource per line), a JSON file, or a directory of such files
+- ``PopulationRunner`` evaluates each bundle with its own data source,
+  optionally in a pool of worker processes that each load the library once;
+  only a bounded number of bundles is in flight at a time and results come
+  back in input order
+- ``write_ndjson`` and ``write_csv`` write one row per patient as results
+  arrive
+
+Example:
+    runner = PopulationRunner("measure.elm.json", ["Initial Population", "Numerator"], workers=4)
+    with open("results.ndjson", "w") as out:
+        write_ndjson(runner.run(iter_patient_bundles(Path("extract.ndjson"))), out)
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import os
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, TextIO
+
+from fhirkit.engine.cql.datasource import BundleDataSource
+from fhirkit.engine.cql.types import CQLTuple
+from fhirkit.engine.elm.evaluator import ELMEvaluator
+from fhirkit.engine.elm.exceptions import ELMReferenceError
+from fhirkit.engine.types import FHIRDate, FHIRDateTime, FHIRTime, ValueType
+
+BUNDLE_SUFFIXES = (".json", ".ndjson")
+
+
+@dataclass(slots=True)
+class PatientBundle:
+    """One unit of input: the data of a single patient.
+
+    Attributes:
+        source: Where the bundle was read from (``file`` or ``file:line``)
+        bundle: Bundle, or single resource, with the patient's data. None if
+            the input could not be read.
+        error: Why the input could not be read
+    """
+
+    source: str
+    bundle: dict[str, Any] | None
+    error: str | None = None
+
+
+@dataclass(slots=True)
+class PatientResult:
+    """Results of the selected definitions for one patient."""
+
+    source: str
+    patient_id: str | None
+    results: dict[str, Any] = field(default_factory=dict)
+    errors: dict[str, str] = field(default_factory=dict)
+
+    def to_row(self) -> dict[str, Any]:
+        """Convert to a JSON-serializable output row."""
+        row: dict[str, Any] = {"source": self.source, "patient": self.patient_id}
+        row.update((name, result_to_json(value)) for name, value in self.results.items())
+        if self.errors:
+            row["_errors"] = self.errors
+        return row
+
+
+def _read_json(path: Path) -> Iterator[PatientBundle]:
+    try:
+        yield PatientBundle(str(path), json.loads(path.read_text()))
+    except (OSError, ValueError) as e:
+        yield PatientBundle(str(path), None, f"Invalid JSON: {e}")
+
+
+def _read_ndjson(path: Path) -> Iterator[PatientBundle]:
+    with path.open() as lines:
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            source = f"{path}:{number}"
+            try:
+                yield PatientBundle(source, json.loads(line))
+            except ValueError as e:
+                yield PatientBundle(source, None, f"Invalid JSON: {e}")
+
+
+def iter_patient_bundles(path: Path) -> Iterator[PatientBundle]:
+    """Stream patient bundles from a file or directory.
+
+    NDJSON files hold one Bundle (or single resource) per line; JSON files
+    hold one. Directories are read file by file, in name order, ignoring
+    files with other suffixes.
+
+    Args:
+        path: NDJSON/JSON file, or directory of such files
+
+    Raises:
+        FileNotFoundError: If the path does not exist
+    """
+    if not path.exists():
+        raise FileNotFoundError(f"Not found: {path}")
+    files = sorted(p for p in path.iterdir() if p.suffix in BUNDLE_SUFFIXES) if path.is_dir() else [path]
+    for file in files:
+        if file.suffix == ".ndjson":
+            yield from _read_ndjson(file)
+        else:
+            yield from _read_json(file)
+
+
+def find_patient(bundle: dict[str, Any]) -> dict[str, Any] | None:
+    """Return the Patient resource of a bundle, or the resource itself if it is a Patient."""
+    if bundle.get("resourceType") == "Patient":
+        return bundle
+    for entry in bundle.get("entry") or []:
+        resource = entry.get("resource") or {}
+        if resource.get("resourceType") == "Patient":
+            return resource
+    return None
+
+
+def result_to_json(value: Any) -> Any:
+    """Convert an ELM result value into JSON-serializable data."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (list, tuple)):
+        return [result_to_json(item) for item in value]
+    if isinstance(value, dict):
+        return {key: result_to_json(item) for key, item in value.items()}
+    if isinstance(value, (FHIRDate, FHIRDateTime, FHIRTime)):
+        return str(value)
+    if isinstance(value, CQLTuple):
+        return result_to_json(value.elements)
+    if isinstance(value, ValueType):
+        # Convert field by field, so that nested dates keep their string form
+        return {name: result_to_json(item) for name, item in value.to_dict().items() if item is not None}
+    return str(value)
+
+
+class _PatientEvaluator:
+    """Library loaded into an evaluator, ready to evaluate patient bundles."""
+
+    def __init__(
+        self,
+        library: str | dict[str, Any] | Path,
+        definitions: list[str] | None,
+        parameters: dict[str, Any] | None,
+        include_private: bool,
+    ) -> None:
+        self.evaluator = ELMEvaluator()
+        self.library = self.evaluator.load(library)
+        if definitions is None:
+            definitions = self.evaluator.get_definition_names(self.library, include_private=include_private)
+        for name in definitions:
+            if not self.library.get_definition(name):
+                raise ELMReferenceError(f"Definition not found: {name}")
+        self.definitions = list(definitions)
+        self.parameters = parameters
+
+    def evaluate(self, item: PatientBundle) -> PatientResult:
+        if item.bundle is None:
+            return PatientResult(item.source, None, errors={"_input": item.error or "No data"})
+
+        patient = find_patient(item.bundle)
+        result = PatientResult(item.source, patient.get("id") if patient else None)
+        try:
+            results = self.evaluator.evaluate_definitions(
+                self.definitions,
+                resource=patient,
+                parameters=self.parameters,
+                library=self.library,
+                data_source=BundleDataSource(item.bundle),
+            )
+        except Exception as e:
+            result.errors["_input"] = str(e)
+            return result
+        result.errors.update(results.pop("_errors", {}))
+        result.results = results
+        return result
+
+
+# Library loaded by each worker process
+_worker: _PatientEvaluator | None = None
+
+
+def _init_worker(
+    library: str | dict[str, Any] | Path,
+    definitions: list[str],
+    parameters: dict[str, Any] | None,
+) -> None:
+    global _worker
+    _worker = _PatientEvaluator(library, definitions, parameters, include_private=True)
+
+
+def _evaluate_in_worker(item: PatientBundle) -> PatientResult:
+    assert _worker is not None, "Worker not initialized"
+    return _worker.evaluate(item)
+
+
+class PopulationRunner:
+    """Evaluates ELM definitions for a stream of patient bundles.
+
+    The library is loaded (and checked) when the runner is created. With
+    more than one worker, each worker process loads the library once and
+    then evaluates bundles sent to it; at most ``max_pending`` bundles are
+    read ahead of the results, so memory stays bounded however large the
+    extract is.
+
+    Args:
+        library: ELM library (file path, JSON string or parsed dict)
+        definitions: Definitions to evaluate; defaults to all public ones
+        parameters: Library parameter values
+        workers: Number of worker processes; 1 evaluates in this process
+        max_pending: Bundles in flight at a time (default: 4 per worker)
+        include_private: Include private definitions in the default selection
+
+    Raises:
+        ELMValidationError: If the library cannot be loaded
+        ELMReferenceError: If a selected definition does not exist
+    """
+
+    def __init__(
+        self,
+        library: str | dict[str, Any] | Path,
+        definitions: list[str] | None = None,
+        parameters: dict[str, Any] | None = None,
+        workers: int = 1,
+        max_pending: int | None = None,
+        include_private: bool = False,
+    ) -> None:
+        self._library = library
+        self._local = _PatientEvaluator(library, definitions, parameters, include_private)
+        self._parameters = parameters
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending or self.workers * 4)
+
+    @property
+    def definitions(self) -> list[str]:
+        """Names of the evaluated definitions, in output order."""
+        return self._local.definitions
+
+    def run(self, bundles: Iterable[PatientBundle]) -> Iterator[PatientResult]:
+        """Evaluate the definitions for each bundle.
+
+        Yields:
+            One result per bundle, in input order
+        """
+        if self.workers == 1:
+            for item in bundles:
+                yield self._local.evaluate(item)
+            return
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self._library, self.definitions, self._parameters),
+        ) as pool:
+            pending: deque[Future[PatientResult]] = deque()
+            for item in bundles:
+                if len(pending) >= self.max_pending:
+                    yield pending.popleft().result()
+                pending.append(pool.submit(_evaluate_in_worker, item))
+            while pending:
+                yield pending.popleft().result()
+
+
+def default_workers() -> int:
+    """Number of worker processes to use by default."""
+    return os.cpu_count() or 1
+
+
+def write_ndjson(results: Iterable[PatientResult], stream: TextIO) -> int:
+    """Write one JSON row per patient.
+
+    Returns:
+        Number of rows written
+    """
+    count = 0
+    for result in results:
+        stream.write(json.dumps(result.to_row(), default=str))
+        stream.write("\n")
+        count += 1
+    return count
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=str)
+    return value
+
+
+def write_csv(results: Iterable[PatientResult], stream: TextIO, definitions: list[str]) -> int:
+    """Write one CSV row per patient, with a column per definition.
+
+    Non-scalar results are written as JSON; errors go to the ``errors``
+    column as a JSON object.
+
+    Returns:
+        Number of rows written
+    """
+    writer = csv.writer(stream)
+    writer.writerow(["source", "patient", *definitions, "errors"])
+    count = 0
+    for result in results:
+        row = result.to_row()
+        writer.writerow(
+            [
+                row["source"],
+                _csv_value(row["patient"]),
+                *(_csv_value(row.get(name)) for name in definitions),
+                _csv_value(row.get("_errors")),
+            ]
+        )
+        count += 1
+    return count
@@ -0,0 +1,135 @@
+"""Static planning of ELM queries.
+
+``plan_query`` analyses a Query node once so that ``ELMExpressionVisitor``
+does not have to evaluate it as a plain nested loop:
+
+- relationship (with/without) sources that do not depend on the query's own
+  aliases are evaluated once per query instead of once per row
+- an equality in a relationship's ``suchThat`` between the related item and
+  the row is executed as a hash join (see ``fhirkit.engine.joins``)
+- ``where`` conjuncts that only reference one source alias are applied to
+  that source before the cross product of a multi-source query is built
+
+Alias references are detected syntactically (AliasRef, QueryLetRef,
+IdentifierRef and scoped Property nodes). Detection may over-approximate,
+which only disables an optimization.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any
+
+
+@dataclass(frozen=True, slots=True)
+class RelationshipPlan:
+    """How to evaluate one with/without clause.
+
+    Attributes:
+        lifted: The source does not depend on the query's aliases and is
+            evaluated once per query
+        probe: Row side of the join equality, or None if there is no join
+        build: Related-item side of the join equality
+    """
+
+    lifted: bool
+    probe: Any = None
+    build: Any = None
+
+
+@dataclass(frozen=True, slots=True)
+class QueryPlan:
+    """Evaluation plan of a Query node.
+
+    Attributes:
+        relationships: One plan per relationship clause, in order
+        source_filters: Conjuncts of the where clause applied to a single
+            source before the cross product, keyed by source alias
+        where: Remaining where conjuncts, applied per row. All conjuncts
+            (pushed down or not) must be true for a row to be kept.
+    """
+
+    relationships: tuple[RelationshipPlan, ...] = ()
+    source_filters: dict[str, list[Any]] = field(default_factory=dict)
+    where: tuple[Any, ...] = ()
+
+
+def referenced_aliases(node: Any) -> set[str]:
+    """Collect the names of aliases an expression may reference."""
+    names: set[str] = set()
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, list):
+            stack.extend(current)
+            continue
+        if not isinstance(current, dict):
+            continue
+        node_type = current.get("type")
+        if node_type in ("AliasRef", "QueryLetRef", "IdentifierRef"):
+            names.add(current.get("name"))
+        elif node_type == "Property" and current.get("scope"):
+            names.add(current["scope"])
+        stack.extend(value for value in current.values() if isinstance(value, (dict, list)))
+    return names
+
+
+def conjuncts(node: Any) -> list[Any]:
+    """Split an expression into the operands of its top-level And nodes."""
+    if isinstance(node, dict) and node.get("type") == "And":
+        operands = node.get("operand") or []
+        if len(operands) == 2:
+            return conjuncts(operands[0]) + conjuncts(operands[1])
+    return [node]
+
+
+def _join_sides(such_that: Any, alias: str, query_aliases: set[str]) -> tuple[Any, Any]:
+    """Find an equality between the related alias and the row.
+
+    Returns:
+        (probe, build) operands, or (None, None) if there is no such equality
+    """
+    others = query_aliases - {alias}
+    for conjunct in conjuncts(such_that):
+        if not isinstance(conjunct, dict) or conjunct.get("type") != "Equal":
+            continue
+        operands = conjunct.get("operand") or []
+        if len(operands) != 2:
+            continue
+        for probe, build in (operands, operands[::-1]):
+            build_refs = referenced_aliases(build)
+            if alias in build_refs and not build_refs & others and alias not in referenced_aliases(probe):
+                return probe, build
+    return None, None
+
+
+def plan_query(node: dict[str, Any]) -> QueryPlan:
+    """Plan the evaluation of a Query node."""
+    sources = node.get("source") or []
+    source_aliases = [source.get("alias") for source in sources]
+    let_names = {let.get("identifier") for let in node.get("let") or []}
+    relationships = node.get("relationship") or []
+    query_aliases = set(source_aliases) | let_names | {rel.get("alias") for rel in relationships}
+
+    relationship_plans = []
+    for rel in relationships:
+        lifted = not referenced_aliases(rel.get("expression")) & query_aliases
+        probe = build = None
+        if lifted and rel.get("suchThat") is not None:
+            probe, build = _join_sides(rel["suchThat"], rel.get("alias"), query_aliases)
+        relationship_plans.append(RelationshipPlan(lifted=lifted, probe=probe, build=build))
+
+    source_filters: dict[str, list[Any]] = {}
+    where: list[Any] = []
+    if node.get("where") is not None:
+        if len(sources) > 1:
+            for conjunct in conjuncts(node["where"]):
+                refs = referenced_aliases(conjunct) & query_aliases
+                if len(refs) == 1 and next(iter(refs)) in source_aliases:
+                    source_filters.setdefault(next(iter(refs)), []).append(conjunct)
+                else:
+                    where.append(conjunct)
+        else:
+            where.append(node["where"])
+
+    return QueryPlan(relationships=tuple(relationship_plans), source_filters=source_filters, where=tuple(where))
@@ -1,7 +1,9 @@
 """ELM expression visitor for evaluation.
 
 This module implements a type-based dispatch pattern for evaluating ELM expressions.
-Each expression type is handled by a registered handler method.
+Each expression type is handled by a registered handler method. Nodes of
+lowered libraries (see ``fhirkit.engine.elm.executable``) carry their handler
+and skip the lookup.
 """
 
 from __future__ import annotations
@@ -9,11 +11,22 @@ from __future__ import annotations
 import logging
 from datetime import date, datetime, timedelta
 from decimal import Decimal
+from functools import cached_property
 from typing import TYPE_CHECKING, Any, Callable
 
 from fhirkit.engine.cql.context import CQLContext
 from fhirkit.engine.cql.types import CQLCode, CQLConcept, CQLInterval, CQLTuple
 from fhirkit.engine.elm.exceptions import ELMExecutionError, ELMReferenceError
+from fhirkit.engine.elm.executable import (
+    BUILTIN_FUNCTIONS,
+    ELMNode,
+    ExecutableFunction,
+    decode_literal,
+    get_executable,
+    parse_quantity,
+)
+from fhirkit.engine.elm.query_plan import plan_query
+from fhirkit.engine.joins import JoinIndex
 from fhirkit.engine.types import FHIRDate, FHIRDateTime, FHIRTime, Quantity
 
 if TYPE_CHECKING:
@@ -23,215 +36,235 @@ if TYPE_CHECKING:
 cql_logger = logging.getLogger("fhirkit.cql.message")
 
 
+# Handler method for each ELM expression type
+HANDLER_NAMES: dict[str, str] = {
+    # Literals
+    "Literal": "_eval_literal",
+    "Null": "_eval_null",
+    "Interval": "_eval_interval",
+    "List": "_eval_list",
+    "Tuple": "_eval_tuple",
+    "Instance": "_eval_instance",
+    "Quantity": "_eval_quantity",
+    "Ratio": "_eval_ratio",
+    "Code": "_eval_code",
+    "Concept": "_eval_concept",
+    # Arithmetic
+    "Add": "_eval_add",
+    "Subtract": "_eval_subtract",
+    "Multiply": "_eval_multiply",
+    "Divide": "_eval_divide",
+    "TruncatedDivide": "_eval_truncated_divide",
+    "Modulo": "_eval_modulo",
+    "Power": "_eval_power",
+    "Negate": "_eval_negate",
+    "Abs": "_eval_abs",
+    "Ceiling": "_eval_ceiling",
+    "Floor": "_eval_floor",
+    "Truncate": "_eval_truncate",
+    "Round": "_eval_round",
+    "Ln": "_eval_ln",
+    "Log": "_eval_log",
+    "Exp": "_eval_exp",
+    "Successor": "_eval_successor",
+    "Predecessor": "_eval_predecessor",
+    "MinValue": "_eval_min_value",
+    "MaxValue": "_eval_max_value",
+    # Comparison
+    "Equal": "_eval_equal",
+    "NotEqual": "_eval_not_equal",
+    "Equivalent": "_eval_equivalent",
+    "Less": "_eval_less",
+    "LessOrEqual": "_eval_less_or_equal",
+    "Greater": "_eval_greater",
+    "GreaterOrEqual": "_eval_greater_or_equal",
+    # Boolean
+    "And": "_eval_and",
+    "Or": "_eval_or",
+    "Xor": "_eval_xor",
+    "Not": "_eval_not",
+    "Implies": "_eval_implies",
+    "IsTrue": "_eval_is_true",
+    "IsFalse": "_eval_is_false",
+    "IsNull": "_eval_is_null",
+    # Conditional
+    "If": "_eval_if",
+    "Case": "_eval_case",
+    "Coalesce": "_eval_coalesce",
+    # String
+    "Concatenate": "_eval_concatenate",
+    "Combine": "_eval_combine",
+    "Split": "_eval_split",
+    "Length": "_eval_length",
+    "Upper": "_eval_upper",
+    "Lower": "_eval_lower",
+    "Substring": "_eval_substring",
+    "StartsWith": "_eval_starts_with",
+    "EndsWith": "_eval_ends_with",
+    "Matches": "_eval_matches",
+    "ReplaceMatches": "_eval_replace_matches",
+    "Indexer": "_eval_indexer",
+    "PositionOf": "_eval_position_of",
+    "LastPositionOf": "_eval_last_position_of",
+    # Collections
+    "First": "_eval_first",
+    "Last": "_eval_last",
+    "IndexOf": "_eval_index_of",
+    "Contains": "_eval_contains",
+    "In": "_eval_in",
+    "Includes": "_eval_includes",
+    "IncludedIn": "_eval_included_in",
+    "ProperIncludes": "_eval_proper_includes",
+    "ProperIncludedIn": "_eval_proper_included_in",
+    "Distinct": "_eval_distinct",
+    "Flatten": "_eval_flatten",
+    "Exists": "_eval_exists",
+    "SingletonFrom": "_eval_singleton_from",
+    "ToList": "_eval_to_list",
+    # Aggregates
+    "Count": "_eval_count",
+    "Sum": "_eval_sum",
+    "Avg": "_eval_avg",
+    "Min": "_eval_min",
+    "Max": "_eval_max",
+    "Median": "_eval_median",
+    "Mode": "_eval_mode",
+    "Variance": "_eval_variance",
+    "PopulationVariance": "_eval_population_variance",
+    "StdDev": "_eval_std_dev",
+    "PopulationStdDev": "_eval_population_std_dev",
+    "AllTrue": "_eval_all_true",
+    "AnyTrue": "_eval_any_true",
+    "Product": "_eval_product",
+    "GeometricMean": "_eval_geometric_mean",
+    # Set operations
+    "Union": "_eval_union",
+    "Intersect": "_eval_intersect",
+    "Except": "_eval_except",
+    # References
+    "ExpressionRef": "_eval_expression_ref",
+    "FunctionRef": "_eval_function_ref",
+    "ParameterRef": "_eval_parameter_ref",
+    "OperandRef": "_eval_operand_ref",
+    "Property": "_eval_property",
+    "AliasRef": "_eval_alias_ref",
+    "QueryLetRef": "_eval_query_let_ref",
+    "IdentifierRef": "_eval_identifier_ref",
+    # Query
+    "Query": "_eval_query",
+    "Retrieve": "_eval_retrieve",
+    "ForEach": "_eval_for_each",
+    "Repeat": "_eval_repeat",
+    "Filter": "_eval_filter",
+    "Times": "_eval_times",
+    # Type operations
+    "As": "_eval_as",
+    "Is": "_eval_is",
+    "ToBoolean": "_eval_to_boolean",
+    "ToInteger": "_eval_to_integer",
+    "ToLong": "_eval_to_long",
+    "ToDecimal": "_eval_to_decimal",
+    "ToString": "_eval_to_string",
+    "ToDateTime": "_eval_to_datetime",
+    "ToDate": "_eval_to_date",
+    "ToTime": "_eval_to_time",
+    "ToQuantity": "_eval_to_quantity",
+    "ToConcept": "_eval_to_concept",
+    "ConvertsToBoolean": "_eval_converts_to_boolean",
+    "ConvertsToInteger": "_eval_converts_to_integer",
+    "ConvertsToDecimal": "_eval_converts_to_decimal",
+    "ConvertsToString": "_eval_converts_to_string",
+    "ConvertsToDateTime": "_eval_converts_to_datetime",
+    "ConvertsToDate": "_eval_converts_to_date",
+    "ConvertsToTime": "_eval_converts_to_time",
+    "ConvertsToQuantity": "_eval_converts_to_quantity",
+    # Date/Time
+    "Today": "_eval_today",
+    "Now": "_eval_now",
+    "TimeOfDay": "_eval_time_of_day",
+    "Date": "_eval_date_constructor",
+    "DateTime": "_eval_datetime_constructor",
+    "Time": "_eval_time_constructor",
+    "DurationBetween": "_eval_duration_between",
+    "DifferenceBetween": "_eval_difference_between",
+    "DateFrom": "_eval_date_from",
+    "TimeFrom": "_eval_time_from",
+    "TimezoneOffsetFrom": "_eval_timezone_offset_from",
+    "DateTimeComponentFrom": "_eval_datetime_component_from",
+    "SameAs": "_eval_same_as",
+    "SameOrBefore": "_eval_same_or_before",
+    "SameOrAfter": "_eval_same_or_after",
+    # Interval operations
+    "Start": "_eval_start",
+    "End": "_eval_end",
+    "Width": "_eval_width",
+    "Size": "_eval_size",
+    "PointFrom": "_eval_point_from",
+    "Overlaps": "_eval_overlaps",
+    "OverlapsBefore": "_eval_overlaps_before",
+    "OverlapsAfter": "_eval_overlaps_after",
+    "Meets": "_eval_meets",
+    "MeetsBefore": "_eval_meets_before",
+    "MeetsAfter": "_eval_meets_after",
+    "Before": "_eval_before",
+    "After": "_eval_after",
+    "Starts": "_eval_starts",
+    "Ends": "_eval_ends",
+    "Collapse": "_eval_collapse",
+    "Expand": "_eval_expand",
+    # Clinical
+    "CodeRef": "_eval_code_ref",
+    "CodeSystemRef": "_eval_codesystem_ref",
+    "ValueSetRef": "_eval_valueset_ref",
+    "ConceptRef": "_eval_concept_ref",
+    "InValueSet": "_eval_in_valueset",
+    "InCodeSystem": "_eval_in_codesystem",
+    "CalculateAge": "_eval_calculate_age",
+    "CalculateAgeAt": "_eval_calculate_age_at",
+    # Message
+    "Message": "_eval_message",
+}
+
+
 class ELMExpressionVisitor:
     """Evaluates ELM expression nodes using type-based dispatch."""
 
-    def __init__(self, context: CQLContext):
+    def __init__(self, context: CQLContext, lower: bool = True):
         """Initialize the visitor.
 
         Args:
             context: CQL context for execution state.
+            lower: Resolve definitions, functions and parameter defaults
+                through the library's executable form (see
+                ``fhirkit.engine.elm.executable``) instead of dumping their
+                expressions on every reference.
         """
         self.context = context
         self._library: ELMLibrary | None = None
+        self._lower = lower
 
         # Storage for included libraries (alias -> ELMLibrary)
         self._included_libraries: dict[str, ELMLibrary] = {}
 
-        # Register type handlers
-        self._handlers: dict[str, Callable[[dict[str, Any]], Any]] = {
-            # Literals
-            "Literal": self._eval_literal,
-            "Null": self._eval_null,
-            "Interval": self._eval_interval,
-            "List": self._eval_list,
-            "Tuple": self._eval_tuple,
-            "Instance": self._eval_instance,
-            "Quantity": self._eval_quantity,
-            "Ratio": self._eval_ratio,
-            "Code": self._eval_code,
-            "Concept": self._eval_concept,
-            # Arithmetic
-            "Add": self._eval_add,
-            "Subtract": self._eval_subtract,
-            "Multiply": self._eval_multiply,
-            "Divide": self._eval_divide,
-            "TruncatedDivide": self._eval_truncated_divide,
-            "Modulo": self._eval_modulo,
-            "Power": self._eval_power,
-            "Negate": self._eval_negate,
-            "Abs": self._eval_abs,
-            "Ceiling": self._eval_ceiling,
-            "Floor": self._eval_floor,
-            "Truncate": self._eval_truncate,
-            "Round": self._eval_round,
-            "Ln": self._eval_ln,
-            "Log": self._eval_log,
-            "Exp": self._eval_exp,
-            "Successor": self._eval_successor,
-            "Predecessor": self._eval_predecessor,
-            "MinValue": self._eval_min_value,
-            "MaxValue": self._eval_max_value,
-            # Comparison
-            "Equal": self._eval_equal,
-            "NotEqual": self._eval_not_equal,
-            "Equivalent": self._eval_equivalent,
-            "Less": self._eval_less,
-            "LessOrEqual": self._eval_less_or_equal,
-            "Greater": self._eval_greater,
-            "GreaterOrEqual": self._eval_greater_or_equal,
-            # Boolean
-            "And": self._eval_and,
-            "Or": self._eval_or,
-            "Xor": self._eval_xor,
-            "Not": self._eval_not,
-            "Implies": self._eval_implies,
-            "IsTrue": self._eval_is_true,
-            "IsFalse": self._eval_is_false,
-            "IsNull": self._eval_is_null,
-            # Conditional
-            "If": self._eval_if,
-            "Case": self._eval_case,
-            "Coalesce": self._eval_coalesce,
-            # String
-            "Concatenate": self._eval_concatenate,
-            "Combine": self._eval_combine,
-            "Split": self._eval_split,
-            "Length": self._eval_length,
-            "Upper": self._eval_upper,
-            "Lower": self._eval_lower,
-            "Substring": self._eval_substring,
-            "StartsWith": self._eval_starts_with,
-            "EndsWith": self._eval_ends_with,
-            "Matches": self._eval_matches,
-            "ReplaceMatches": self._eval_replace_matches,
-            "Indexer": self._eval_indexer,
-            "PositionOf": self._eval_position_of,
-            "LastPositionOf": self._eval_last_position_of,
-            # Collections
-            "First": self._eval_first,
-            "Last": self._eval_last,
-            "IndexOf": self._eval_index_of,
-            "Contains": self._eval_contains,
-            "In": self._eval_in,
-            "Includes": self._eval_includes,
-            "IncludedIn": self._eval_included_in,
-            "ProperIncludes": self._eval_proper_includes,
-            "ProperIncludedIn": self._eval_proper_included_in,
-            "Distinct": self._eval_distinct,
-            "Flatten": self._eval_flatten,
-            "Exists": self._eval_exists,
-            "SingletonFrom": self._eval_singleton_from,
-            "ToList": self._eval_to_list,
-            # Aggregates
-            "Count": self._eval_count,
-            "Sum": self._eval_sum,
-            "Avg": self._eval_avg,
-            "Min": self._eval_min,
-            "Max": self._eval_max,
-            "Median": self._eval_median,
-            "Mode": self._eval_mode,
-            "Variance": self._eval_variance,
-            "PopulationVariance": self._eval_population_variance,
-            "StdDev": self._eval_std_dev,
-            "PopulationStdDev": self._eval_population_std_dev,
-            "AllTrue": self._eval_all_true,
-            "AnyTrue": self._eval_any_true,
-            "Product": self._eval_product,
-            "GeometricMean": self._eval_geometric_mean,
-            # Set operations
-            "Union": self._eval_union,
-            "Intersect": self._eval_intersect,
-            "Except": self._eval_except,
-            # References
-            "ExpressionRef": self._eval_expression_ref,
-            "FunctionRef": self._eval_function_ref,
-            "ParameterRef": self._eval_parameter_ref,
-            "OperandRef": self._eval_operand_ref,
-            "Property": self._eval_property,
-            "AliasRef": self._eval_alias_ref,
-            "QueryLetRef": self._eval_query_let_ref,
-            "IdentifierRef": self._eval_identifier_ref,
-            # Query
-            "Query": self._eval_query,
-            "Retrieve": self._eval_retrieve,
-            "ForEach": self._eval_for_each,
-            "Repeat": self._eval_repeat,
-            "Filter": self._eval_filter,
-            "Times": self._eval_times,
-            # Type operations
-            "As": self._eval_as,
-            "Is": self._eval_is,
-            "ToBoolean": self._eval_to_boolean,
-            "ToInteger": self._eval_to_integer,
-            "ToLong": self._eval_to_long,
-            "ToDecimal": self._eval_to_decimal,
-            "ToString": self._eval_to_string,
-            "ToDateTime": self._eval_to_datetime,
-            "ToDate": self._eval_to_date,
-            "ToTime": self._eval_to_time,
-            "ToQuantity": self._eval_to_quantity,
-            "ToConcept": self._eval_to_concept,
-            "ConvertsToBoolean": self._eval_converts_to_boolean,
-            "ConvertsToInteger": self._eval_converts_to_integer,
-            "ConvertsToDecimal": self._eval_converts_to_decimal,
-            "ConvertsToString": self._eval_converts_to_string,
-            "ConvertsToDateTime": self._eval_converts_to_datetime,
-            "ConvertsToDate": self._eval_converts_to_date,
-            "ConvertsToTime": self._eval_converts_to_time,
-            "ConvertsToQuantity": self._eval_converts_to_quantity,
-            # Date/Time
-            "Today": self._eval_today,
-            "Now": self._eval_now,
-            "TimeOfDay": self._eval_time_of_day,
-            "Date": self._eval_date_constructor,
-            "DateTime": self._eval_datetime_constructor,
-            "Time": self._eval_time_constructor,
-            "DurationBetween": self._eval_duration_between,
-            "DifferenceBetween": self._eval_difference_between,
-            "DateFrom": self._eval_date_from,
-            "TimeFrom": self._eval_time_from,
-            "TimezoneOffsetFrom": self._eval_timezone_offset_from,
-            "DateTimeComponentFrom": self._eval_datetime_component_from,
-            "SameAs": self._eval_same_as,
-            "SameOrBefore": self._eval_same_or_before,
-            "SameOrAfter": self._eval_same_or_after,
-            # Interval operations
-            "Start": self._eval_start,
-            "End": self._eval_end,
-            "Width": self._eval_width,
-            "Size": self._eval_size,
-            "PointFrom": self._eval_point_from,
-            "Overlaps": self._eval_overlaps,
-            "OverlapsBefore": self._eval_overlaps_before,
-            "OverlapsAfter": self._eval_overlaps_after,
-            "Meets": self._eval_meets,
-            "MeetsBefore": self._eval_meets_before,
-            "MeetsAfter": self._eval_meets_after,
-            "Before": self._eval_before,
-            "After": self._eval_after,
-            "Starts": self._eval_starts,
-            "Ends": self._eval_ends,
-            "Collapse": self._eval_collapse,
-            "Expand": self._eval_expand,
-            # Clinical
-            "CodeRef": self._eval_code_ref,
-            "CodeSystemRef": self._eval_codesystem_ref,
-            "ValueSetRef": self._eval_valueset_ref,
-            "ConceptRef": self._eval_concept_ref,
-            "InValueSet": self._eval_in_valueset,
-            "InCodeSystem": self._eval_in_codesystem,
-            "CalculateAge": self._eval_calculate_age,
-            "CalculateAgeAt": self._eval_calculate_age_at,
-            # Message
-            "Message": self._eval_message,
-        }
+    @classmethod
+    def handler_functions(cls) -> dict[str, Callable[[Any, Any], Any]]:
+        """Map each ELM expression type to its unbound handler function."""
+        functions = cls.__dict__.get("_handler_functions")
+        if functions is None:
+            functions = {node_type: getattr(cls, method) for node_type, method in HANDLER_NAMES.items()}
+            cls._handler_functions = functions
+        return functions
+
+    @cached_property
+    def _handlers(self) -> dict[str, Callable[[dict[str, Any]], Any]]:
+        """Handlers bound to this visitor, used for plain dict nodes."""
+        return {node_type: getattr(self, method) for node_type, method in HANDLER_NAMES.items()}
 
     def evaluate(self, node: dict[str, Any] | Any) -> Any:
         """Evaluate an ELM expression node.
 
         Args:
-            node: ELM expression node (dict or Pydantic model).
+            node: ELM expression node (ELMNode, dict or Pydantic model).
 
         Returns:
             Evaluation result.
@@ -242,6 +275,15 @@ class ELMExpressionVisitor:
         if node is None:
             return None
 
+        # Lowered nodes carry their handler
+        if type(node) is ELMNode:
+            try:
+                return node.handler(self, node)
+            except ELMExecutionError:
+                raise
+            except Exception as e:
+                raise ELMExecutionError(f"Error evaluating {node['type']}: {e}", node.get("locator")) from e
+
         # Convert Pydantic model to dict if needed
         if hasattr(node, "model_dump"):
             node = node.model_dump(by_alias=True, exclude_none=True)
@@ -303,33 +345,7 @@ class ELMExpressionVisitor:
 
     def _eval_literal(self, node: dict[str, Any]) -> Any:
         """Evaluate a literal expression."""
-        value_type = node.get("valueType", "")
-        value = node.get("value")
-
-        if value is None:
-            return None
-
-        # Parse value based on type
-        if "Boolean" in value_type:
-            return value.lower() == "true" if isinstance(value, str) else bool(value)
-        elif "Integer" in value_type:
-            return int(value)
-        elif "Long" in value_type:
-            return int(value)
-        elif "Decimal" in value_type:
-            return Decimal(str(value))
-        elif "String" in value_type:
-            return str(value)
-        elif "Date" in value_type and "DateTime" not in value_type:
-            return FHIRDate.parse(value)
-        elif "DateTime" in value_type:
-            return FHIRDateTime.parse(value)
-        elif "Time" in value_type:
-            return value  # Keep as string for now
-        elif "Quantity" in value_type:
-            return self._parse_quantity(value)
-
-        return value
+        return decode_literal(node.get("valueType", ""), node.get("value"))
 
     def _eval_null(self, node: dict[str, Any]) -> None:
         """Evaluate null literal."""
@@ -1497,27 +1513,15 @@ class ELMExpressionVisitor:
         if found:
             return cached
 
-        # Find definition in library
-        library = self._library
-        if library_name:
-            # Resolve included library
-            library = self.get_included_library(library_name)
-            if not library:
-                raise ELMReferenceError(
-                    f"Included library '{library_name}' not found. Make sure the library is loaded and registered."
-                )
-
-        if not library:
-            raise ELMReferenceError(f"No library context for expression reference: {name}")
-
-        definition = library.get_definition(name)
-        if not definition:
-            raise ELMReferenceError(f"Definition not found: {name}")
+        # Lowered local references are linked to their target
+        expression = node.target if type(node) is ELMNode else None
+        if expression is not None:
+            result = self.evaluate(expression)
+            self.context.cache_definition(cache_key, result)
+            return result
 
-        # Get expression and convert to dict if needed
-        expression = definition.expression
-        if hasattr(expression, "model_dump"):
-            expression = expression.model_dump(by_alias=True, exclude_none=True)
+        library = self._resolve_library(library_name, "expression", name)
+        expression = self._definition_expression(library, name)
 
         # For external library references, temporarily switch library context
         original_library = self._library
@@ -1551,30 +1555,24 @@ class ELMExpressionVisitor:
         # Evaluate operands
         args = [self.evaluate(op) for op in operands]
 
+        # Lowered local references are linked to a function or built-in
+        target = node.target if type(node) is ELMNode else None
+        if target is not None and not isinstance(target, ExecutableFunction):
+            return target(*args)
+
         # Check for built-in functions (only for non-qualified refs)
-        if not library_name:
+        if target is None and not library_name:
             builtin = self._get_builtin_function(name)
             if builtin:
                 return builtin(*args)
 
-        # Find function in library
         library = self._library
-        if library_name:
-            # Resolve included library
-            library = self.get_included_library(library_name)
-            if not library:
-                raise ELMReferenceError(
-                    f"Included library '{library_name}' not found. Make sure the library is loaded and registered."
-                )
-
-        if not library:
-            raise ELMReferenceError(f"No library context for function reference: {name}")
-
-        func_def = library.get_function(name)
-        if not func_def:
-            raise ELMReferenceError(f"Function not found: {name}")
+        func = target
+        if func is None:
+            library = self._resolve_library(library_name, "function", name)
+            func = self._function(library, name)
 
-        if func_def.external:
+        if func.external:
             raise ELMReferenceError(f"External function not implemented: {name}")
 
         # For external library references, temporarily switch library context
@@ -1586,18 +1584,69 @@ class ELMExpressionVisitor:
         self.context.push_alias_scope()
         try:
             # Bind parameters
-            for i, param in enumerate(func_def.operand):
+            for i, param_name in enumerate(func.operands):
                 if i < len(args):
-                    self.context.set_alias(param.name, args[i])
+                    self.context.set_alias(param_name, args[i])
 
             # Evaluate function body
-            return self.evaluate(func_def.expression)
+            return self.evaluate(func.expression)
         finally:
             self.context.pop_alias_scope()
             # Restore original library context
             if library_name:
                 self._library = original_library
 
+    def _resolve_library(self, library_name: str | None, kind: str, name: str) -> ELMLibrary:
+        """Resolve the library a reference points to."""
+        library = self._library
+        if library_name:
+            # Resolve included library
+            library = self.get_included_library(library_name)
+            if not library:
+                raise ELMReferenceError(
+                    f"Included library '{library_name}' not found. Make sure the library is loaded and registered."
+                )
+
+        if not library:
+            raise ELMReferenceError(f"No library context for {kind} reference: {name}")
+        return library
+
+    def _definition_expression(self, library: ELMLibrary, name: str) -> Any:
+        """Get the expression of a named definition, ready for evaluation."""
+        if self._lower:
+            definitions = get_executable(library).definitions
+            if name not in definitions:
+                raise ELMReferenceError(f"Definition not found: {name}")
+            return definitions[name]
+
+        definition = library.get_definition(name)
+        if not definition:
+            raise ELMReferenceError(f"Definition not found: {name}")
+
+        # Get expression and convert to dict if needed
+        expression = definition.expression
+        if hasattr(expression, "model_dump"):
+            expression = expression.model_dump(by_alias=True, exclude_none=True)
+        return expression
+
+    def _function(self, library: ELMLibrary, name: str) -> ExecutableFunction:
+        """Get a named function, ready for evaluation."""
+        if self._lower:
+            func = get_executable(library).functions.get(name)
+            if not func:
+                raise ELMReferenceError(f"Function not found: {name}")
+            return func
+
+        func_def = library.get_function(name)
+        if not func_def:
+            raise ELMReferenceError(f"Function not found: {name}")
+        return ExecutableFunction(
+            name=func_def.name,
+            operands=tuple(operand.name for operand in func_def.operand),
+            expression=func_def.expression,
+            external=func_def.external,
+        )
+
     def _eval_parameter_ref(self, node: dict[str, Any]) -> Any:
         """Evaluate parameter reference."""
         name = node.get("name")
@@ -1611,6 +1660,8 @@ class ELMExpressionVisitor:
 
         # Check library default
         if self._library:
+            if self._lower:
+                return self.evaluate(get_executable(self._library).parameters.get(name))
             param = self._library.get_parameter(name)
             if param and param.default is not None:
                 return self.evaluate(param.default)
@@ -1706,9 +1757,12 @@ class ELMExpressionVisitor:
 
         # Try definition
         if self._library:
-            definition = self._library.get_definition(name)
-            if definition:
-                return self.evaluate(definition.expression)
+            try:
+                expression = self._definition_expression(self._library, name)
+            except ELMReferenceError:
+                pass
+            else:
+                return self.evaluate(expression)
 
         raise ELMReferenceError(f"Identifier not found: {name}")
 
@@ -1717,11 +1771,16 @@ class ELMExpressionVisitor:
     # =========================================================================
 
     def _eval_query(self, node: dict[str, Any]) -> list[Any]:
-        """Evaluate query expression with support for multiple sources (cross join)."""
+        """Evaluate query expression with support for multiple sources (cross join).
+
+        Follows the query's ``QueryPlan``: single-source where conjuncts are
+        applied before the cross join, relationship sources that do not
+        depend on the row are evaluated once, and relationship equalities are
+        executed as hash joins.
+        """
         sources = node.get("source", [])
         let_clauses = node.get("let", [])
         relationships = node.get("relationship", [])
-        where = node.get("where")
         return_clause = node.get("return")
         aggregate = node.get("aggregate")
         sort = node.get("sort")
@@ -1730,17 +1789,16 @@ class ELMExpressionVisitor:
         if not sources:
             return []
 
+        plan = node.plan if type(node) is ELMNode else plan_query(node)
+
         # Evaluate all sources and get their data
         source_data_list: list[tuple[str, list[Any]]] = []
         for source in sources:
             alias = source.get("alias")
             source_expr = source.get("expression")
-            source_data = self.evaluate(source_expr)
-
-            if source_data is None:
-                source_data = []
-            if not isinstance(source_data, list):
-                source_data = [source_data]
+            source_data = self._as_list(self.evaluate(source_expr))
+            if alias in plan.source_filters:
+                source_data = self._filter_source(alias, source_data, plan.source_filters[alias])
 
             source_data_list.append((alias, source_data))
 
@@ -1752,6 +1810,17 @@ class ELMExpressionVisitor:
                 return self._apply_aggregate([], aggregate, first_alias)
             return []
 
+        # Evaluate relationship sources that do not depend on the row once
+        lifted: list[tuple[list[Any], JoinIndex | None]] = []
+        for rel, rel_plan in zip(relationships or [], plan.relationships):
+            rel_data: list[Any] = []
+            index = None
+            if rel_plan.lifted:
+                rel_data = self._as_list(self.evaluate(rel.get("expression")))
+                if rel_plan.build is not None:
+                    index = self._join_index(rel_data, rel_plan.build, rel.get("alias"))
+            lifted.append((rel_data, index))
+
         # Generate cross product of all sources
         source_combinations = self._generate_cross_product(source_data_list)
 
@@ -1774,20 +1843,22 @@ class ELMExpressionVisitor:
 
                 # Process relationships (with/without)
                 include = True
-                for rel in relationships or []:
-                    rel_type = "With" if "suchThat" in rel or rel.get("type") == "With" else "Without"
+                for rel, rel_plan, (rel_data, index) in zip(relationships or [], plan.relationships, lifted):
+                    rel_type = rel.get("type") or ("With" if "suchThat" in rel else "Without")
                     rel_alias = rel.get("alias")
-                    rel_expr = rel.get("expression")
                     such_that = rel.get("suchThat")
 
-                    rel_data = self.evaluate(rel_expr)
-                    if rel_data is None:
-                        rel_data = []
-                    if not isinstance(rel_data, list):
-                        rel_data = [rel_data]
+                    candidates: Any = rel_data
+                    if not rel_plan.lifted:
+                        candidates = self._as_list(self.evaluate(rel.get("expression")))
+                    elif index is not None:
+                        try:
+                            candidates = index.candidates(self.evaluate(rel_plan.probe))
+                        except Exception:
+                            candidates = rel_data
 
                     found = False
-                    for rel_item in rel_data:
+                    for rel_item in candidates:
                         self.context.set_alias(rel_alias, rel_item)
                         if such_that:
                             if self.evaluate(such_that) is True:
@@ -1808,10 +1879,8 @@ class ELMExpressionVisitor:
                     continue
 
                 # Process where clause
-                if where:
-                    where_result = self.evaluate(where)
-                    if where_result is not True:
-                        continue
+                if not all(self.evaluate(condition) is True for condition in plan.where):
+                    continue
 
                 # Process return clause
                 if return_clause:
@@ -1840,6 +1909,41 @@ class ELMExpressionVisitor:
 
         return results
 
+    @staticmethod
+    def _as_list(value: Any) -> list[Any]:
+        """Treat a query or relationship source value as a list."""
+        if value is None:
+            return []
+        if not isinstance(value, list):
+            return [value]
+        return value
+
+    def _evaluate_with_alias(self, expr: Any, alias: str, value: Any) -> Any:
+        """Evaluate an expression with a single alias bound."""
+        self.context.push_alias_scope()
+        try:
+            self.context.set_alias(alias, value)
+            return self.evaluate(expr)
+        finally:
+            self.context.pop_alias_scope()
+
+    def _join_index(self, items: list[Any], build: Any, alias: str) -> JoinIndex:
+        """Bucket relationship items by their side of the join equality."""
+        return JoinIndex(items, lambda item: self._evaluate_with_alias(build, alias, item))
+
+    def _filter_source(self, alias: str, items: list[Any], conditions: list[Any]) -> list[Any]:
+        """Keep the source items for which every condition is true."""
+        filtered = []
+        for item in items:
+            self.context.push_alias_scope()
+            try:
+                self.context.set_alias(alias, item)
+                if all(self.evaluate(condition) is True for condition in conditions):
+                    filtered.append(item)
+            finally:
+                self.context.pop_alias_scope()
+        return filtered
+
     def _generate_cross_product(self, source_data_list: list[tuple[str, list[Any]]]) -> list[list[tuple[str, Any]]]:
         """Generate cross product of multiple source lists.
 
@@ -3278,17 +3382,8 @@ class ELMExpressionVisitor:
 
     def _parse_quantity(self, value: str) -> Quantity:
         """Parse a quantity string."""
-        parts = value.split()
-        if len(parts) == 2:
-            return Quantity(value=Decimal(parts[0]), unit=parts[1])
-        return Quantity(value=Decimal(value), unit="1")
+        return parse_quantity(value)
 
     def _get_builtin_function(self, name: str) -> Callable[..., Any] | None:
         """Get a built-in function by name."""
-        # Map function names to implementations
-        builtins: dict[str, Callable[..., Any]] = {
-            "ToString": lambda x: str(x) if x is not None else None,
-            "ToInteger": lambda x: int(x) if x is not None else None,
-            "ToDecimal": lambda x: Decimal(str(x)) if x is not None else None,
-        }
-        return builtins.get(name)
+        return BUILTIN_FUNCTIONS.get(name)
@@ -0,0 +1,224 @@
+"""Hashable equality keys for FHIRPath and CQL values.
+
+Collection operators (distinct, union, intersect, except/exclude) compare every
+element of one collection against every element of another. With plain list
+membership that is quadratic, which becomes noticeable once collections hold a
+few thousand resources.
+
+``equality_key`` maps a value to a hashable key such that two values that are
+equal always produce the same key:
+
+- dicts (FHIR resources and elements) and lists are keyed structurally
+- Quantities are keyed by their UCUM-canonical value and dimension, so
+  ``1 'g'`` and ``1000 'mg'`` share a key
+- Concepts are keyed by their set of codes, Intervals and Ratios by their parts
+- Date/DateTime/Time and Codes use their own hashes, which already agree
+  with their equality (including precision)
+
+Keys may collide for values that are not equal, so ``EqualityIndex`` always
+confirms a bucket hit with the real equality function. Values for which no key
+can be derived are kept aside and compared linearly.
+
+Two equality flavours are supported:
+
+- ``strict=False`` follows Python ``==`` (used by CQL list operators)
+- ``strict=True`` follows FHIRPath collection equality, where values of
+  different types are never equal except across Integer/Decimal numbers
+"""
+
+from __future__ import annotations
+
+import operator
+from collections.abc import Callable, Hashable, Iterable, Iterator
+from decimal import Context, InvalidOperation
+from typing import Any
+
+from .types import Quantity
+
+# Canonical quantity values are rounded before hashing so that values which
+# compare equal through float-based unit conversion still share a key.
+_CANONICAL_CONTEXT = Context(prec=15)
+
+_KeyFunction = Callable[[Any, bool], Hashable]
+_key_functions: dict[type, _KeyFunction] | None = None
+
+
+def _quantity_key(value: Quantity, strict: bool) -> Hashable:
+    """Key a Quantity by its canonical (UCUM base unit) magnitude and dimension."""
+    from .units import parse_unit
+    from .units.ucum import UCUMError
+
+    try:
+        parsed = parse_unit(value.unit)
+        canonical = value.value * parsed.factor + parsed.offset
+        magnitude = _CANONICAL_CONTEXT.plus(canonical).normalize()
+    except (UCUMError, InvalidOperation, TypeError):
+        # Unknown units only compare equal to the exact same unit
+        return ("Quantity", value.unit, value.value)
+    return ("Quantity", parsed.dimension, magnitude)
+
+
+def _build_key_functions() -> dict[type, _KeyFunction]:
+    """Build the type dispatch table for values with custom equality."""
+    from .cql.types import CQLConcept, CQLInterval, CQLRatio, CQLTuple
+    from .fhirpath.visitor import _PrimitiveWithExtension
+
+    # Components of these types are compared with Python ==, so their
+    # children are always keyed non-strictly.
+    return {
+        Quantity: _quantity_key,
+        _PrimitiveWithExtension: lambda v, strict: equality_key(v.value, strict),
+        CQLConcept: lambda v, strict: ("Concept", frozenset(equality_key(c) for c in v.codes)),
+        CQLInterval: lambda v, strict: (
+            "Interval",
+            equality_key(v.low),
+            equality_key(v.high),
+            v.low_closed,
+            v.high_closed,
+        ),
+        CQLRatio: lambda v, strict: ("Ratio", equality_key(v.numerator), equality_key(v.denominator)),
+        # Tuples compare equal to dicts with the same elements
+        CQLTuple: lambda v, strict: ("Tuple", equality_key(v.elements)) if strict else equality_key(v.elements),
+    }
+
+
+def _get_key_function(value_type: type) -> _KeyFunction | None:
+    """Find the key function for a type, honouring subclasses."""
+    global _key_functions
+    if _key_functions is None:
+        _key_functions = _build_key_functions()
+    key_function = _key_functions.get(value_type)
+    if key_function is None:
+        for base in value_type.__mro__[1:]:
+            key_function = _key_functions.get(base)
+            if key_function is not None:
+                _key_functions[value_type] = key_function
+                break
+    return key_function
+
+
+def equality_key(value: Any, strict: bool = False) -> Hashable:
+    """Return a hashable key such that equal values have equal keys.
+
+    Args:
+        value: The value to key
+        strict: Use FHIRPath type-strict equality instead of Python ==
+
+    Returns:
+        A hashable key
+
+    Raises:
+        TypeError: If no key can be derived for the value
+    """
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        return ("dict", frozenset((k, equality_key(v, strict)) for k, v in value.items()))
+    if isinstance(value, list):
+        return ("list", tuple(equality_key(v, strict) for v in value))
+    if isinstance(value, (str, int, float)):
+        # bool, int and float compare equal across types in both modes
+        return value
+
+    key_function = _get_key_function(type(value))
+    if key_function is not None:
+        return key_function(value, strict)
+
+    hash(value)  # raises TypeError for unhashable values
+    if strict:
+        return (type(value), value)
+    return value
+
+
+class EqualityIndex:
+    """Set-like membership index over values with FHIRPath/CQL equality.
+
+    Values are bucketed by ``equality_key`` and a bucket hit is confirmed with
+    ``equals``, so lookups are O(1) on average while preserving the exact
+    equality semantics of ``equals``.
+
+    Example:
+        >>> index = EqualityIndex([1, 2, 3])
+        >>> 2 in index
+        True
+        >>> index.add(2)
+        False
+    """
+
+    __slots__ = ("_strict", "_equals", "_buckets", "_unkeyed", "_size")
+
+    def __init__(
+        self,
+        values: Iterable[Any] = (),
+        *,
+        strict: bool = False,
+        equals: Callable[[Any, Any], bool] = operator.eq,
+    ) -> None:
+        """Create an index.
+
+        Args:
+            values: Initial values to add
+            strict: Key values with FHIRPath type-strict equality
+            equals: Equality function used to confirm bucket hits
+        """
+        self._strict = strict
+        self._equals = equals
+        self._buckets: dict[Hashable, list[Any]] = {}
+        self._unkeyed: list[Any] = []
+        self._size = 0
+        for value in values:
+            self.add(value)
+
+    def _key(self, value: Any) -> tuple[bool, Hashable]:
+        try:
+            return True, equality_key(value, self._strict)
+        except TypeError:
+            return False, None
+
+    def _find(self, value: Any, has_key: bool, key: Hashable) -> bool:
+        equals = self._equals
+        if has_key:
+            bucket = self._buckets.get(key)
+            if bucket is not None and any(equals(value, item) for item in bucket):
+                return True
+        else:
+            # No key: fall back to comparing against everything
+            for bucket in self._buckets.values():
+                if any(equals(value, item) for item in bucket):
+                    return True
+        return any(equals(value, item) for item in self._unkeyed)
+
+    def add(self, value: Any) -> bool:
+        """Add a value, returning False if an equal value was already present."""
+        has_key, key = self._key(value)
+        if self._find(value, has_key, key):
+            return False
+        if has_key:
+            self._buckets.setdefault(key, []).append(value)
+        else:
+            self._unkeyed.append(value)
+        self._size += 1
+        return True
+
+    def __contains__(self, value: Any) -> bool:
+        has_key, key = self._key(value)
+        return self._find(value, has_key, key)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Any]:
+        for bucket in self._buckets.values():
+            yield from bucket
+        yield from self._unkeyed
+
+
+def distinct_values(
+    values: Iterable[Any],
+    *,
+    strict: bool = False,
+    equals: Callable[[Any, Any], bool] = operator.eq,
+) -> list[Any]:
+    """Return values with duplicates removed, keeping first occurrences in order."""
+    index = EqualityIndex(strict=strict, equals=equals)
+    return [value for value in values if index.add(value)]
@@ -4,8 +4,6 @@ import sys
 from pathlib import Path
 from typing import Any
 
-from antlr4 import CommonTokenStream, InputStream
-
 # Add generated directory to path
 _gen_path = str(Path(__file__).parent.parent.parent.parent.parent / "generated" / "fhirpath")
 if _gen_path not in sys.path:
@@ -16,6 +14,7 @@ from fhirpathParser import fhirpathParser  # noqa: E402
 
 from ..context import EvaluationContext  # noqa: E402
 from ..exceptions import FHIRPathError  # noqa: E402
+from ..parsing import TwoStageParser  # noqa: E402
 from .visitor import FHIRPathEvaluatorVisitor  # noqa: E402
 
 
@@ -170,22 +169,24 @@ class FHIRPathEvaluator:
         result = self.evaluate_boolean(expression, resource, context)
         return result is True
 
+    def compile(self, expression: str) -> None:
+        """
+        Parse an expression ahead of evaluation.
+
+        Later evaluations of the expression use the cached parse tree.
+
+        Raises:
+            FHIRPathError: If the expression cannot be parsed
+        """
+        self._parse(expression)
+
     def _parse(self, expression: str) -> fhirpathParser.ExpressionContext:
         """Parse a FHIRPath expression, using cache if available."""
         if expression in self._cache:
             return self._cache[expression]
 
         try:
-            input_stream = InputStream(expression)
-            lexer = fhirpathLexer(input_stream)
-            token_stream = CommonTokenStream(lexer)
-            parser = fhirpathParser(token_stream)
-
-            # Add error listener
-            parser.removeErrorListeners()
-            parser.addErrorListener(FHIRPathErrorListener())
-
-            tree = parser.expression()
+            tree = _parser.parse(expression, "expression")
 
             # Cache successful parse
             self._cache[expression] = tree
@@ -248,6 +249,31 @@ class FHIRPathErrorListener:
         pass
 
 
+_parser = TwoStageParser(fhirpathLexer, fhirpathParser, FHIRPathErrorListener)
+
+# Representative expressions used to warm up the parser
+_WARM_UP_EXPRESSIONS = [
+    "Patient.name.where(use = 'official').given.first()",
+    "Observation.value.ofType(Quantity).value > 5 and status = 'final'",
+    "Bundle.entry.resource.ofType(Patient).birthDate <= today() - 18 years",
+    "identifier.exists(system = %system and value.startsWith('MRN'))",
+    "(code.coding | category.coding).select(system + '|' + code).distinct()",
+    "iif(deceased is boolean, deceased, deceased.exists())",
+    "telecom.all(value.matches('^[0-9]+$')) implies period.start >= @2020-01-01T00:00:00Z",
+    "extension('http://example.org/ext').value as string",
+]
+
+
+def warm_up_parser() -> None:
+    """Pre-populate the FHIRPath parser's prediction cache.
+
+    Parses a set of representative expressions so that the first real
+    expression does not pay the cost of building the prediction DFA.
+    Intended to be called once at startup.
+    """
+    _parser.warm_up((expression, "expression") for expression in _WARM_UP_EXPRESSIONS)
+
+
 def evaluate(expression: str, resource: dict[str, Any] | list[Any] | None = None) -> list[Any]:
     """
     Convenience function to evaluate a FHIRPath expression.
@@ -3,23 +3,14 @@
 from typing import Any
 
 from ...context import EvaluationContext
+from ...equality import EqualityIndex, distinct_values
 from ...functions import FunctionRegistry
 
 
 @FunctionRegistry.register("distinct")
 def fn_distinct(ctx: EvaluationContext, collection: list[Any]) -> list[Any]:
     """Returns collection with duplicates removed."""
-    seen: list[Any] = []
-    for item in collection:
-        # Use custom equality check for complex types
-        found = False
-        for s in seen:
-            if _deep_equals(item, s):
-                found = True
-                break
-        if not found:
-            seen.append(item)
-    return seen
+    return distinct_values(collection, strict=True, equals=_deep_equals)
 
 
 @FunctionRegistry.register("isDistinct")
@@ -49,30 +40,15 @@ def fn_union(ctx: EvaluationContext, left: list[Any], right: Any) -> list[Any]:
 @FunctionRegistry.register("intersect")
 def fn_intersect(ctx: EvaluationContext, left: list[Any], right: Any) -> list[Any]:
     """Returns intersection of two collections."""
-    right_list = _ensure_list(right)
-    result = []
-    for item in left:
-        for r_item in right_list:
-            if _deep_equals(item, r_item):
-                result.append(item)
-                break
-    return fn_distinct(ctx, result)
+    right_index = _equality_index(_ensure_list(right))
+    return fn_distinct(ctx, [item for item in left if item in right_index])
 
 
 @FunctionRegistry.register("exclude")
 def fn_exclude(ctx: EvaluationContext, left: list[Any], right: Any) -> list[Any]:
     """Returns elements in left that are not in right."""
-    right_list = _ensure_list(right)
-    result = []
-    for item in left:
-        found = False
-        for r_item in right_list:
-            if _deep_equals(item, r_item):
-                found = True
-                break
-        if not found:
-            result.append(item)
-    return result
+    right_index = _equality_index(_ensure_list(right))
+    return [item for item in left if item not in right_index]
 
 
 @FunctionRegistry.register("combine")
@@ -97,16 +73,8 @@ def fn_flatten(ctx: EvaluationContext, collection: list[Any]) -> list[Any]:
 @FunctionRegistry.register("subsetOf")
 def fn_subset_of(ctx: EvaluationContext, left: list[Any], right: Any) -> list[bool]:
     """Returns true if left is a subset of right."""
-    right_list = _ensure_list(right)
-    for item in left:
-        found = False
-        for r_item in right_list:
-            if _deep_equals(item, r_item):
-                found = True
-                break
-        if not found:
-            return [False]
-    return [True]
+    right_index = _equality_index(_ensure_list(right))
+    return [all(item in right_index for item in left)]
 
 
 @FunctionRegistry.register("supersetOf")
@@ -151,6 +119,11 @@ def _unwrap_value(value: Any) -> Any:
     return value
 
 
+def _equality_index(values: list[Any]) -> EqualityIndex:
+    """Build a hash index over values using FHIRPath collection equality."""
+    return EqualityIndex(values, strict=True, equals=_deep_equals)
+
+
 def _deep_equals(a: Any, b: Any) -> bool:
     """Deep equality check for FHIRPath values."""
     # Unwrap primitive wrappers
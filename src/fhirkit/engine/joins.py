@@ -0,0 +1,86 @@
+"""Hash joins for CQL and ELM query relationships.
+
+A ``with``/``without`` clause keeps a row if some related item satisfies the
+``such that`` condition. Checked naively, that is every row against every
+related item. When the condition contains an equality between an expression
+of the row and an expression of the related item, e.g.
+
+    [Encounter] E
+      with [Condition] C such that C.encounter.reference = 'Encounter/' + E.id
+
+the related items can be bucketed by their side of the equality once, so that
+each row only has to be checked against the items in its bucket.
+
+``JoinIndex`` only pre-selects candidates: callers still evaluate the full
+condition for each candidate, so the result is exactly that of the naive
+scan. Only scalar values (strings, numbers, booleans) are hashed, as their
+equality is plain ``==`` in both engines; items and probes with other values
+fall back to the linear scan.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Hashable, Iterable, Iterator
+from decimal import Decimal
+from typing import Any
+
+_SCALAR_TYPES = (str, int, float, Decimal)
+
+
+def join_key(value: Any) -> Hashable:
+    """Return the hash key of a join value.
+
+    Raises:
+        TypeError: If the value is not a hashable scalar
+    """
+    if isinstance(value, _SCALAR_TYPES):
+        return value
+    raise TypeError(f"Cannot hash join on {type(value).__name__}")
+
+
+class JoinIndex:
+    """Related items bucketed by the value of their side of a join equality.
+
+    Args:
+        items: Related items
+        key_of: Evaluates an item's side of the equality. Items for which it
+            raises, or returns a value that cannot be hashed, are candidates
+            for every probe.
+
+    Example:
+        >>> index = JoinIndex(conditions, lambda c: c["encounter"]["reference"])
+        >>> list(index.candidates("Encounter/1"))
+    """
+
+    __slots__ = ("_buckets", "_unkeyed", "_items")
+
+    def __init__(self, items: Iterable[Any], key_of: Callable[[Any], Any]) -> None:
+        self._items = list(items)
+        self._buckets: dict[Hashable, list[Any]] = {}
+        self._unkeyed: list[Any] = []
+        for item in self._items:
+            try:
+                value = key_of(item)
+                if value is None:
+                    # null never equals anything
+                    continue
+                key = join_key(value)
+            except Exception:
+                self._unkeyed.append(item)
+                continue
+            self._buckets.setdefault(key, []).append(item)
+
+    def candidates(self, probe: Any) -> Iterator[Any]:
+        """Yield the items that may satisfy the equality for a probe value."""
+        if probe is None:
+            return
+        try:
+            key = join_key(probe)
+        except TypeError:
+            yield from self._items
+            return
+        yield from self._buckets.get(key, ())
+        yield from self._unkeyed
+
+    def __len__(self) -> int:
+        return len(self._items)
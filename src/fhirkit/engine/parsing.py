@@ -0,0 +1,114 @@
+"""Shared ANTLR parsing support for the FHIRPath and CQL evaluators.
+
+``TwoStageParser`` wraps a generated lexer/parser pair and parses in two stages:
+
+1. SLL prediction with a bail-out error strategy. SLL prediction does not
+   need full-context lookahead, so it is much faster than the default
+   ALL(*) mode, and for valid input it almost always succeeds.
+2. Full LL prediction with the regular error strategy and error listener,
+   used only when the first stage fails. Input that fails here has a real
+   syntax error, which is reported through the listener as before.
+
+Lexer and parser instances are reused per thread instead of being rebuilt
+for every parse. ANTLR keeps its prediction DFA in class-level caches shared
+by all parser instances, so ``warm_up`` parses representative input once
+(e.g. at server startup) so that later parses start from a populated DFA.
+
+Example:
+    parser = TwoStageParser(cqlLexer, cqlParser, CQLErrorListener)
+    tree = parser.parse("1 + 1", "expression")
+"""
+
+from __future__ import annotations
+
+import threading
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from antlr4 import CommonTokenStream, InputStream, Lexer, Parser
+from antlr4.atn.PredictionMode import PredictionMode
+from antlr4.error.Errors import ParseCancellationException
+from antlr4.error.ErrorStrategy import BailErrorStrategy, DefaultErrorStrategy
+
+
+class TwoStageParser:
+    """Reusable SLL-then-LL parser for a generated ANTLR grammar.
+
+    Args:
+        lexer_class: Generated lexer class
+        parser_class: Generated parser class
+        error_listener_factory: Creates the error listener used by the LL
+            stage; it is expected to raise on syntax errors
+    """
+
+    def __init__(
+        self,
+        lexer_class: type[Lexer],
+        parser_class: type[Parser],
+        error_listener_factory: Callable[[], Any],
+    ) -> None:
+        self._lexer_class = lexer_class
+        self._parser_class = parser_class
+        self._error_listener_factory = error_listener_factory
+        self._local = threading.local()
+        self.sll_parses = 0
+        self.ll_parses = 0
+
+    def _instances(self) -> tuple[Lexer, Parser]:
+        local = self._local
+        lexer = getattr(local, "lexer", None)
+        if lexer is None:
+            lexer = local.lexer = self._lexer_class(InputStream(""))
+            local.parser = self._parser_class(CommonTokenStream(lexer))
+            local.listener = self._error_listener_factory()
+        return lexer, local.parser
+
+    def parse(self, text: str, rule: str) -> Any:
+        """Parse text starting at the given grammar rule.
+
+        Args:
+            text: Source text
+            rule: Name of the parser rule method (e.g. "expression")
+
+        Returns:
+            The parse tree for the rule
+
+        Raises:
+            Whatever the error listener raises for syntax errors
+        """
+        lexer, parser = self._instances()
+        lexer.inputStream = InputStream(text)
+        token_stream = CommonTokenStream(lexer)
+
+        # Stage 1: SLL prediction, bail out on the first error
+        parser.setTokenStream(token_stream)
+        parser.removeErrorListeners()
+        parser._errHandler = BailErrorStrategy()
+        parser._interp.predictionMode = PredictionMode.SLL
+        try:
+            tree = getattr(parser, rule)()
+            self.sll_parses += 1
+            return tree
+        except ParseCancellationException:
+            pass
+
+        # Stage 2: full LL prediction with regular error reporting
+        lexer.inputStream = InputStream(text)
+        parser.setTokenStream(CommonTokenStream(lexer))
+        parser.addErrorListener(self._local.listener)
+        parser._errHandler = DefaultErrorStrategy()
+        parser._interp.predictionMode = PredictionMode.LL
+        tree = getattr(parser, rule)()
+        self.ll_parses += 1
+        return tree
+
+    def warm_up(self, samples: Iterable[tuple[str, str]]) -> None:
+        """Populate the shared prediction DFA by parsing (text, rule) samples.
+
+        Samples that fail to parse are ignored.
+        """
+        for text, rule in samples:
+            try:
+                self.parse(text, rule)
+            except Exception:
+                continue
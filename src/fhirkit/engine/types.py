@@ -1,12 +1,33 @@
-"""Type system shared between FHIRPath and CQL."""
+"""Type system shared between FHIRPath and CQL.
+
+The runtime values (quantities, dates, times, and the CQL types built on
+``ValueType`` in ``fhirkit.engine.cql.types``) are created in large numbers
+by literals, date parsing, interval construction and arithmetic, so they are
+plain immutable ``__slots__`` classes rather than Pydantic models: fields are
+assigned once in ``__init__`` without validation, and derived data such as
+hashes and comparison keys is computed on first use and cached.
+"""
 
 import re
 from datetime import date, datetime, time, timedelta, timezone
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 from enum import Enum
-from typing import Any
+from typing import Any, ClassVar
+
+from fhirkit.engine.units import canonicalize
 
-from pydantic import BaseModel, ConfigDict
+# Assigns fields of immutable values
+_set = object.__setattr__
+
+_DATE_PATTERN = re.compile(r"^(\d{4})(?:-(\d{2})(?:-(\d{2}))?)?$")
+_MALFORMED_DATETIME_PATTERN = re.compile(r"^\d{4}/")
+_PARTIAL_DATETIME_PATTERN = re.compile(r"^(\d{4})(?:-(\d{2})(?:-(\d{2}))?)?T$")
+_DATETIME_PATTERN = re.compile(
+    r"^(\d{4})(?:-(\d{2})(?:-(\d{2})"
+    r"(?:T(\d{2})(?::(\d{2})(?::(\d{2})(?:\.(\d+))?)?)?(Z|[+-]\d{2}:\d{2})?)?)?)?$"
+)
+_MALFORMED_TIME_PATTERN = re.compile(r"^\d{2}-\d{2}")
+_TIME_PATTERN = re.compile(r"^(\d{2})(?::(\d{2})(?::(\d{2})(?:\.(\d+))?)?)?(?:Z|[+-]\d{2}:\d{2})?$")
 
 
 class FHIRPathType(Enum):
@@ -29,30 +50,90 @@ class FHIRPathType(Enum):
     NULL = "Null"
 
 
-class Quantity(BaseModel):
-    """FHIRPath Quantity type with value and unit."""
+class ValueType:
+    """Base class of immutable runtime values.
+
+    Subclasses list their fields in ``_fields`` (in ``__init__`` argument
+    order) and assign them with ``object.__setattr__``; any later assignment
+    raises. Extra slots starting with an underscore hold cached derived data.
+    """
+
+    __slots__ = ()
+
+    _fields: ClassVar[tuple[str, ...]] = ()
 
-    model_config = ConfigDict(frozen=True)
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (type(self), tuple(getattr(self, name) for name in self._fields))
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._fields)
+        return f"{type(self).__name__}({fields})"
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the fields as a dict, for serialization."""
+        return {name: getattr(self, name) for name in self._fields}
+
+
+def _to_decimal(value: Any) -> Decimal:
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid decimal value: {value!r}")
+    if isinstance(value, int):
+        return Decimal(value)
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f"Invalid decimal value: {value!r}") from None
+
+
+def _to_int(value: Any) -> int:
+    return value if type(value) is int else int(value)
+
+
+def _to_optional_int(value: Any) -> int | None:
+    return value if value is None or type(value) is int else int(value)
+
+
+class Quantity(ValueType):
+    """FHIRPath Quantity type with value and unit.
+
+    Attributes:
+        value: Numeric value (ints, floats and numeric strings are converted)
+        unit: UCUM unit or calendar duration unit
+        original_unit: Original unit name for calendar durations (e.g.,
+            "week" instead of "wk")
+    """
+
+    __slots__ = ("value", "unit", "original_unit", "_hash")
+
+    _fields = ("value", "unit", "original_unit")
 
     value: Decimal
     unit: str
-    # Original unit name for calendar durations (e.g., "week" instead of "wk")
-    original_unit: str | None = None
+    original_unit: str | None
+
+    def __init__(self, value: Any, unit: str, original_unit: str | None = None) -> None:
+        _set(self, "value", value if type(value) is Decimal else _to_decimal(value))
+        _set(self, "unit", unit)
+        _set(self, "original_unit", original_unit)
 
     def _convert_for_comparison(self, other: "Quantity") -> tuple[Decimal, Decimal] | None:
         """Try to convert both quantities to comparable units."""
         if self.unit == other.unit:
             return (self.value, other.value)
-        # Try unit conversion
-        try:
-            from fhirkit.engine.units import convert_quantity
-
-            converted = convert_quantity(other.value, other.unit, self.unit)
-            if converted is not None:
-                return (self.value, Decimal(str(converted)))
-        except (ImportError, ValueError):
-            pass
-        return None
+        # Compare in UCUM base units
+        left = canonicalize(self.value, self.unit)
+        right = canonicalize(other.value, other.unit)
+        if left is None or right is None or left.dimension != right.dimension:
+            return None
+        return (left.value, right.value)
 
     def __eq__(self, other: object) -> bool:
         if isinstance(other, Quantity):
@@ -95,7 +176,11 @@ class Quantity(BaseModel):
         raise TypeError(f"Cannot compare quantities with incompatible units: {self.unit} and {other.unit}")
 
     def __hash__(self) -> int:
-        return hash((self.value, self.unit))
+        try:
+            return self._hash
+        except AttributeError:
+            _set(self, "_hash", hash((self.value, self.unit)))
+            return self._hash
 
     def __add__(self, other: "Quantity") -> "Quantity":
         """Add two quantities.
@@ -189,19 +274,26 @@ class Quantity(BaseModel):
         return f"{self.value} '{self.unit}'"
 
 
-class FHIRDate(BaseModel):
+class FHIRDate(ValueType):
     """FHIRPath Date type with partial precision support."""
 
-    model_config = ConfigDict(frozen=True)
+    __slots__ = ("year", "month", "day", "_hash")
+
+    _fields = ("year", "month", "day")
 
     year: int
-    month: int | None = None
-    day: int | None = None
+    month: int | None
+    day: int | None
+
+    def __init__(self, year: int, month: int | None = None, day: int | None = None) -> None:
+        _set(self, "year", _to_int(year))
+        _set(self, "month", _to_optional_int(month))
+        _set(self, "day", _to_optional_int(day))
 
     @classmethod
     def parse(cls, value: str) -> "FHIRDate | None":
         """Parse a date string (YYYY, YYYY-MM, or YYYY-MM-DD)."""
-        match = re.match(r"^(\d{4})(?:-(\d{2})(?:-(\d{2}))?)?$", value)
+        match = _DATE_PATTERN.match(value)
         if match:
             year = int(match.group(1))
             month = int(match.group(2)) if match.group(2) else None
@@ -228,7 +320,11 @@ class FHIRDate(BaseModel):
         return False
 
     def __hash__(self) -> int:
-        return hash((self.year, self.month, self.day))
+        try:
+            return self._hash
+        except AttributeError:
+            _set(self, "_hash", hash((self.year, self.month, self.day)))
+            return self._hash
 
     def __lt__(self, other: "FHIRDate") -> bool:
         if self.year != other.year:
@@ -259,19 +355,45 @@ class FHIRDate(BaseModel):
         return self == other or self > other
 
 
-class FHIRDateTime(BaseModel):
-    """FHIRPath DateTime type with timezone support."""
+class FHIRDateTime(ValueType):
+    """FHIRPath DateTime type with timezone support.
+
+    Comparisons use the UTC-normalized components, which are computed once
+    per value.
+    """
+
+    __slots__ = ("year", "month", "day", "hour", "minute", "second", "millisecond", "tz_offset", "_hash", "_utc")
 
-    model_config = ConfigDict(frozen=True)
+    _fields = ("year", "month", "day", "hour", "minute", "second", "millisecond", "tz_offset")
 
     year: int
-    month: int | None = None
-    day: int | None = None
-    hour: int | None = None
-    minute: int | None = None
-    second: int | None = None
-    millisecond: int | None = None
-    tz_offset: str | None = None  # e.g., "Z", "+05:00", "-08:00"
+    month: int | None
+    day: int | None
+    hour: int | None
+    minute: int | None
+    second: int | None
+    millisecond: int | None
+    tz_offset: str | None  # e.g., "Z", "+05:00", "-08:00"
+
+    def __init__(
+        self,
+        year: int,
+        month: int | None = None,
+        day: int | None = None,
+        hour: int | None = None,
+        minute: int | None = None,
+        second: int | None = None,
+        millisecond: int | None = None,
+        tz_offset: str | None = None,
+    ) -> None:
+        _set(self, "year", _to_int(year))
+        _set(self, "month", _to_optional_int(month))
+        _set(self, "day", _to_optional_int(day))
+        _set(self, "hour", _to_optional_int(hour))
+        _set(self, "minute", _to_optional_int(minute))
+        _set(self, "second", _to_optional_int(second))
+        _set(self, "millisecond", _to_optional_int(millisecond))
+        _set(self, "tz_offset", tz_offset)
 
     @classmethod
     def parse(cls, value: str, raise_on_malformed: bool = False) -> "FHIRDateTime | None":
@@ -283,14 +405,14 @@ class FHIRDateTime(BaseModel):
             value = value[1:]
 
         # Check for malformed date strings (e.g., slashes instead of dashes)
-        if re.match(r"^\d{4}/", value):
+        if _MALFORMED_DATETIME_PATTERN.match(value):
             if raise_on_malformed:
                 raise CQLError(f"Malformed datetime string: {value} (use dashes as separators, not slashes)")
             return None
 
         # Handle partial DateTime with T suffix but no time (e.g., "2015T", "2015-01T")
         # This indicates DateTime type (vs Date) even without time components
-        partial_match = re.match(r"^(\d{4})(?:-(\d{2})(?:-(\d{2}))?)?T$", value)
+        partial_match = _PARTIAL_DATETIME_PATTERN.match(value)
         if partial_match:
             groups = partial_match.groups()
             return cls(
@@ -300,11 +422,7 @@ class FHIRDateTime(BaseModel):
             )
 
         # Pattern: YYYY[-MM[-DD[Thh[:mm[:ss[.fff]]][tz]]]]
-        pattern = (
-            r"^(\d{4})(?:-(\d{2})(?:-(\d{2})"
-            r"(?:T(\d{2})(?::(\d{2})(?::(\d{2})(?:\.(\d+))?)?)?(Z|[+-]\d{2}:\d{2})?)?)?)?$"
-        )
-        match = re.match(pattern, value)
+        match = _DATETIME_PATTERN.match(value)
         if match:
             groups = match.groups()
             ms = None
@@ -390,9 +508,26 @@ class FHIRDateTime(BaseModel):
         return False
 
     def __hash__(self) -> int:
-        return hash(
-            (self.year, self.month, self.day, self.hour, self.minute, self.second, self.millisecond, self.tz_offset)
-        )
+        try:
+            return self._hash
+        except AttributeError:
+            _set(
+                self,
+                "_hash",
+                hash(
+                    (
+                        self.year,
+                        self.month,
+                        self.day,
+                        self.hour,
+                        self.minute,
+                        self.second,
+                        self.millisecond,
+                        self.tz_offset,
+                    )
+                ),
+            )
+            return self._hash
 
     def _to_tuple(self) -> tuple[int, int, int, int, int, int, int]:
         """Convert to tuple for comparison (with defaults for missing precision)."""
@@ -408,6 +543,13 @@ class FHIRDateTime(BaseModel):
 
     def _to_utc_tuple(self) -> tuple[int, int, int, int, int, int, int]:
         """Convert to UTC-normalized tuple for timezone-aware comparison."""
+        try:
+            return self._utc
+        except AttributeError:
+            _set(self, "_utc", self._compute_utc_tuple())
+            return self._utc
+
+    def _compute_utc_tuple(self) -> tuple[int, int, int, int, int, int, int]:
         if not self.tz_offset or self.hour is None:
             return self._to_tuple()
 
@@ -501,15 +643,29 @@ class FHIRDateTime(BaseModel):
             return Quantity(value=Decimal(str(total_ms)), unit="ms")
 
 
-class FHIRTime(BaseModel):
+class FHIRTime(ValueType):
     """FHIRPath Time type."""
 
-    model_config = ConfigDict(frozen=True)
+    __slots__ = ("hour", "minute", "second", "millisecond", "_hash", "_key")
+
+    _fields = ("hour", "minute", "second", "millisecond")
 
     hour: int
-    minute: int | None = None
-    second: int | None = None
-    millisecond: int | None = None
+    minute: int | None
+    second: int | None
+    millisecond: int | None
+
+    def __init__(
+        self,
+        hour: int,
+        minute: int | None = None,
+        second: int | None = None,
+        millisecond: int | None = None,
+    ) -> None:
+        _set(self, "hour", _to_int(hour))
+        _set(self, "minute", _to_optional_int(minute))
+        _set(self, "second", _to_optional_int(second))
+        _set(self, "millisecond", _to_optional_int(millisecond))
 
     @classmethod
     def parse(cls, value: str) -> "FHIRTime | None":
@@ -525,12 +681,11 @@ class FHIRTime(BaseModel):
 
         # Check for malformed time strings (e.g., dashes instead of colons)
         # Malformed pattern: digits separated by dashes that looks like a time
-        if re.match(r"^\d{2}-\d{2}", value):
+        if _MALFORMED_TIME_PATTERN.match(value):
             raise CQLError(f"Malformed time string: {value} (use colons as separators, not dashes)")
 
         # Pattern includes optional timezone offset (Z or +/-hh:mm)
-        pattern = r"^(\d{2})(?::(\d{2})(?::(\d{2})(?:\.(\d+))?)?)?(?:Z|[+-]\d{2}:\d{2})?$"
-        match = re.match(pattern, value)
+        match = _TIME_PATTERN.match(value)
         if match:
             groups = match.groups()
             hour = int(groups[0])
@@ -625,16 +780,19 @@ class FHIRTime(BaseModel):
         return True
 
     def __hash__(self) -> int:
-        return hash((self.hour, self.minute, self.second, self.millisecond))
+        try:
+            return self._hash
+        except AttributeError:
+            _set(self, "_hash", hash((self.hour, self.minute, self.second, self.millisecond)))
+            return self._hash
 
     def _to_tuple(self) -> tuple[int, int, int, int]:
         """Convert to tuple for comparison (with defaults for missing precision)."""
-        return (
-            self.hour,
-            self.minute or 0,
-            self.second or 0,
-            self.millisecond or 0,
-        )
+        try:
+            return self._key
+        except AttributeError:
+            _set(self, "_key", (self.hour, self.minute or 0, self.second or 0, self.millisecond or 0))
+            return self._key
 
     def __lt__(self, other: "FHIRTime") -> bool:
         if not isinstance(other, FHIRTime):
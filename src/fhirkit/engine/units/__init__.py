@@ -1,5 +1,5 @@
 """UCUM (Unified Code for Units of Measure) support for clinical calculations."""
 
-from .ucum import UCUMConverter, convert_quantity, parse_unit
+from .ucum import CanonicalQuantity, UCUMConverter, canonicalize, convert_quantity, parse_unit
 
-__all__ = ["UCUMConverter", "convert_quantity", "parse_unit"]
+__all__ = ["CanonicalQuantity", "UCUMConverter", "canonicalize", "convert_quantity", "parse_unit"]
@@ -9,13 +9,21 @@ Example usage:
     1000.0
     >>> convert_quantity(98.6, "[degF]", "Cel")
     37.0
+
+Values that are compared or indexed rather than converted to one target unit
+can be canonicalized instead: ``canonicalize`` expresses a value in base units
+together with its dimension, so that any two compatible quantities compare as
+plain Decimals:
+
+    >>> canonicalize(180, "mg/dL") == canonicalize("1.8", "g/L")
+    True
 """
 
 from __future__ import annotations
 
 import re
 from dataclasses import dataclass
-from decimal import Decimal, InvalidOperation
+from decimal import Context, Decimal, InvalidOperation
 from typing import Any
 
 from .definitions import (
@@ -54,6 +62,25 @@ class ParsedUnit:
         return self.dimension == other.dimension
 
 
+@dataclass(frozen=True, slots=True)
+class CanonicalQuantity:
+    """A quantity expressed in UCUM base units.
+
+    Two canonical quantities are comparable if their dimensions are equal.
+    """
+
+    value: Decimal
+    dimension: Dimension
+
+
+# Canonical values are rounded so that inexact factors (e.g. 1/60 for "/min")
+# do not make equal quantities compare unequal
+_CANONICAL_CONTEXT = Context(prec=20)
+
+# Curly-brace annotations ("{beats}/min") carry no meaning in UCUM
+_ANNOTATION_PATTERN = re.compile(r"\{[^}]*\}")
+
+
 class UCUMConverter:
     """Parser and converter for UCUM units."""
 
@@ -71,6 +98,8 @@ class UCUMConverter:
     def __init__(self) -> None:
         """Initialize the converter."""
         self._cache: dict[str, ParsedUnit] = {}
+        # Compiled (factor, offset, dimension) per unit string; None if the unit is unknown
+        self._canonical: dict[str, tuple[Decimal, Decimal, Dimension] | None] = {}
 
     def parse(self, unit_str: str) -> ParsedUnit:
         """Parse a UCUM unit string into its components.
@@ -309,6 +338,45 @@ class UCUMConverter:
         except UCUMError:
             return False
 
+    def canonical_form(self, unit_str: str) -> tuple[Decimal, Decimal, Dimension] | None:
+        """Compile a unit into the factor, offset and dimension of its base units.
+
+        Results, including failures, are memoized per unit string.
+
+        Returns:
+            (factor, offset, dimension) such that ``value * factor + offset`` is
+            the value in base units, or None if the unit cannot be parsed
+        """
+        try:
+            return self._canonical[unit_str]
+        except KeyError:
+            pass
+        code = _ANNOTATION_PATTERN.sub("", unit_str) or "1"
+        try:
+            parsed = self.parse(code)
+            compiled: tuple[Decimal, Decimal, Dimension] | None = (parsed.factor, parsed.offset, parsed.dimension)
+        except UCUMError:
+            compiled = None
+        self._canonical[unit_str] = compiled
+        return compiled
+
+    def canonicalize(self, value: Decimal | float | int | str, unit_str: str) -> CanonicalQuantity | None:
+        """Express a value in base units.
+
+        Returns:
+            The canonical quantity, or None if the unit or value is invalid
+        """
+        compiled = self.canonical_form(unit_str)
+        if compiled is None:
+            return None
+        factor, offset, dimension = compiled
+        try:
+            if not isinstance(value, Decimal):
+                value = Decimal(value) if isinstance(value, int) else Decimal(str(value))
+            return CanonicalQuantity(_CANONICAL_CONTEXT.plus(value * factor + offset), dimension)
+        except InvalidOperation:
+            return None
+
 
 # Module-level converter instance
 _converter = UCUMConverter()
@@ -373,3 +441,32 @@ def is_compatible(unit1: str, unit2: str) -> bool:
         True if units can be converted between each other
     """
     return _converter.is_compatible(unit1, unit2)
+
+
+def canonical_form(unit_str: str) -> tuple[Decimal, Decimal, Dimension] | None:
+    """Compile a unit into the factor, offset and dimension of its base units.
+
+    Args:
+        unit_str: UCUM unit string
+
+    Returns:
+        (factor, offset, dimension), or None if the unit cannot be parsed
+    """
+    return _converter.canonical_form(unit_str)
+
+
+def canonicalize(value: Decimal | float | int | str, unit_str: str) -> CanonicalQuantity | None:
+    """Express a quantity in UCUM base units.
+
+    Args:
+        value: Numeric value
+        unit_str: UCUM unit string
+
+    Returns:
+        CanonicalQuantity, or None if the unit cannot be parsed
+
+    Examples:
+        >>> canonicalize(5, "mg").value
+        Decimal('0.005')
+    """
+    return _converter.canonicalize(value, unit_str)
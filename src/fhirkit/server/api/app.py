@@ -10,10 +10,15 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
+from ...engine.cql.evaluator import warm_up_parser as warm_up_cql_parser
+from ...engine.cql.library_cache import CompiledLibraryCache, set_library_cache
+from ...engine.fhirpath.evaluator import warm_up_parser as warm_up_fhirpath_parser
 from ..config.settings import FHIRServerSettings
-from ..generator import PatientRecordGenerator
+from ..generator import PopulationGenerator
 from ..graphql import create_graphql_router
 from ..storage.fhir_store import FHIRStore
+from ..terminology import CompactTerminologyProvider
+from ..validation import ProfileValidator
 from .routes import create_router
 from .ui_routes import create_ui_router
 
@@ -43,22 +48,36 @@ def create_app(
     if store is None:
         store = FHIRStore()
 
+    # Compiled CQL libraries are shared by $cql, $evaluate-measure and CDS Hooks
+    set_library_cache(
+        CompiledLibraryCache(
+            max_size=settings.cql_library_cache_size,
+            directory=settings.cql_library_cache_dir,
+        )
+    )
+
     @asynccontextmanager
     async def lifespan(app: FastAPI):
         """Application lifespan handler."""
         # Startup
         logger.info("Starting FHIR server...")
+        if settings.warm_up_parsers:
+            warm_up_cql_parser()
+            warm_up_fhirpath_parser()
+
+        snapshot = Path(settings.store_snapshot) if settings.store_snapshot else None
+        restored = snapshot is not None and snapshot.exists()
+        if restored:
+            count = store.restore_snapshot(snapshot)
+            logger.info(f"Restored {count} resources from snapshot {snapshot}")
 
         # Generate synthetic data if requested
-        if settings.patients > 0:
+        elif settings.patients > 0:
             logger.info(f"Generating {settings.patients} synthetic patients...")
-            generator = PatientRecordGenerator(seed=settings.seed)
-            resources = generator.generate_population(settings.patients)
-
-            for resource in resources:
-                store.create(resource)
+            generator = PopulationGenerator(settings.patients, seed=settings.seed, workers=settings.generator_workers)
+            count = store.bulk_load(generator.iter_resources())
 
-            logger.info(f"Generated {len(resources)} resources for {settings.patients} patients")
+            logger.info(f"Generated {count} resources for {settings.patients} patients")
 
             # Generate standard questionnaire templates
             from ..generator import QuestionnaireGenerator
@@ -112,14 +131,27 @@ def create_app(
                     f"{len(loc_hierarchy)} location levels (managed by {org_hierarchy[0]['name']})"
                 )
 
+        if snapshot is not None and not restored:
+            count = store.save_snapshot(snapshot)
+            logger.info(f"Wrote snapshot of {count} resources to {snapshot}")
+
         # Store references in app state
         app.state.store = store
         app.state.settings = settings
 
+        audit_pipeline = audit_service.pipeline if audit_service else None
+        if audit_pipeline is not None and settings.audit_async:
+            await audit_pipeline.start()
+
         yield
 
         # Shutdown
         logger.info("Shutting down FHIR server...")
+        if audit_pipeline is not None:
+            await audit_pipeline.stop()
+        if terminology is not None:
+            store.terminology.use_compact(None)
+            terminology.close()
 
     # Determine docs URLs based on settings (docs at root, not under FHIR base path)
     api_base = settings.api_base_path.rstrip("/")
@@ -150,25 +182,59 @@ def create_app(
     # Create and include GraphQL router at /baseR4/$graphql
     # Per FHIR GraphQL spec, the endpoint should be at /$graphql
     # NOTE: Must be mounted BEFORE the FHIR router to avoid being caught by /{resource_type}
-    graphql_router = create_graphql_router(store=store)
+    graphql_router = create_graphql_router(store=store, max_cost=settings.graphql_max_cost)
     app.include_router(graphql_router, prefix=f"{api_base}/$graphql", tags=["GraphQL"])
     logger.info(f"GraphQL endpoint enabled at {api_base}/$graphql")
 
     # Create audit service if enabled
     audit_service = None
     if settings.enable_audit:
-        from ..audit import AuditService
-
+        from ..audit import AuditPipeline, AuditService, AuditSink, NDJSONAuditSink, StoreAuditSink
+
+        if settings.audit_sink not in ("store", "file", "both"):
+            raise ValueError(f"Unknown audit sink '{settings.audit_sink}', expected store, file or both")
+        sinks: list[AuditSink] = []
+        if settings.audit_sink in ("store", "both"):
+            sinks.append(StoreAuditSink(store, max_events=settings.audit_store_max_events))
+        if settings.audit_sink in ("file", "both"):
+            sinks.append(
+                NDJSONAuditSink(
+                    settings.audit_log_path,
+                    max_bytes=settings.audit_log_max_bytes,
+                    backup_count=settings.audit_log_backups,
+                )
+            )
         audit_service = AuditService(
             store=store,
             enabled=True,
             exclude_reads=settings.audit_exclude_reads,
+            pipeline=AuditPipeline(
+                sinks,
+                max_queue=settings.audit_queue_size,
+                batch_size=settings.audit_batch_size,
+                flush_interval=settings.audit_flush_interval,
+                overflow=settings.audit_overflow,
+            ),
         )
-        logger.info("Audit logging enabled")
+        logger.info(f"Audit logging enabled ({settings.audit_sink})")
 
     # Create and include FHIR API router at /baseR4
     base_url = f"http://{settings.host}:{settings.port}{api_base}"
-    fhir_router = create_router(store=store, base_url=base_url, audit_service=audit_service)
+    profile_validator = ProfileValidator(store) if settings.validate_profiles_on_write else None
+    # Large CodeSystems are served from compact files, everything else from the store
+    terminology = None
+    if settings.terminology_dir:
+        terminology = CompactTerminologyProvider.from_directory(settings.terminology_dir, fallback=store.terminology)
+        # Token modifiers and ValueSet expansion go through the store's provider
+        store.terminology.use_compact(terminology)
+        logger.info(f"Mapped compact CodeSystems from {settings.terminology_dir}")
+    fhir_router = create_router(
+        store=store,
+        base_url=base_url,
+        audit_service=audit_service,
+        profile_validator=profile_validator,
+        terminology=terminology,
+    )
     app.include_router(fhir_router, prefix=api_base)
 
     # CDS Hooks endpoints (per HL7 CDS Hooks specification)
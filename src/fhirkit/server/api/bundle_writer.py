@@ -0,0 +1,122 @@
+"""Bundle responses assembled from pre-serialized resources.
+
+Building ``Bundle``/``BundleEntry`` models copies every resource, and
+rendering them serializes every resource again on every request.
+``BundleWriter`` instead frames the JSON bytes the store keeps for each
+current resource version (see ``FHIRStore.resource_json``) with the few
+bytes of Bundle and entry structure around them. Large Bundles are streamed
+in chunks while they are assembled.
+
+The output is the same JSON that ``Bundle.model_dump(exclude_none=True)``
+rendered by ``JSONResponse`` gives.
+"""
+
+from __future__ import annotations
+
+import uuid
+from collections.abc import Iterator
+from typing import Any
+
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+
+from ..models.responses import BundleEntryRequest, BundleLink
+from ..storage.fhir_store import FHIRStore, encode_json
+
+# Bundles with more entries than this are streamed
+STREAMING_THRESHOLD = 200
+# Approximate size of the streamed chunks
+CHUNK_SIZE = 64 * 1024
+
+_SEARCH_MODES = {mode: b'"search":{"mode":"' + mode.encode() + b'"}' for mode in ("match", "include", "outcome")}
+
+
+class BundleWriter:
+    """Collects the entries of a Bundle and renders it from cached resource bytes.
+
+    Args:
+        store: Store that serializes (and caches) the resources
+        bundle_type: Bundle.type (searchset, history, ...)
+        total: Bundle.total, omitted if None
+        links: Bundle.link
+        bundle_id: Bundle.id (default: a new UUID)
+    """
+
+    def __init__(
+        self,
+        store: FHIRStore,
+        bundle_type: str,
+        total: int | None = None,
+        links: list[BundleLink] | None = None,
+        bundle_id: str | None = None,
+    ) -> None:
+        self.store = store
+        self.bundle_type = bundle_type
+        self.total = total
+        self.links = links or []
+        self.id = bundle_id or str(uuid.uuid4())
+        self._entries: list[tuple[dict[str, Any], str | None, str | None, BundleEntryRequest | None]] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(
+        self,
+        resource: dict[str, Any],
+        full_url: str | None = None,
+        search_mode: str | None = None,
+        request: BundleEntryRequest | None = None,
+    ) -> None:
+        """Add an entry for a resource."""
+        self._entries.append((resource, full_url, search_mode, request))
+
+    def _header(self) -> bytes:
+        header: dict[str, Any] = {"resourceType": "Bundle", "id": self.id, "type": self.bundle_type}
+        if self.total is not None:
+            header["total"] = self.total
+        header["link"] = [link.model_dump() for link in self.links]
+        # Drop the closing brace so that the entries can follow
+        return encode_json(header)[:-1] + b',"entry":['
+
+    def _entry(
+        self,
+        resource: dict[str, Any],
+        full_url: str | None,
+        search_mode: str | None,
+        request: BundleEntryRequest | None,
+    ) -> bytes:
+        parts = []
+        if full_url is not None:
+            parts.append(b'"fullUrl":' + encode_json(full_url))
+        parts.append(b'"resource":' + self.store.resource_json(resource))
+        if request is not None:
+            parts.append(b'"request":' + encode_json(request.model_dump()))
+        if search_mode is not None:
+            parts.append(_SEARCH_MODES.get(search_mode) or b'"search":' + encode_json({"mode": search_mode}))
+        return b"{" + b",".join(parts) + b"}"
+
+    def iter_bytes(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Render the Bundle in chunks of about ``chunk_size`` bytes."""
+        chunk = [self._header()]
+        size = len(chunk[0])
+        for index, entry in enumerate(self._entries):
+            data = self._entry(*entry)
+            if index:
+                data = b"," + data
+            chunk.append(data)
+            size += len(data)
+            if size >= chunk_size:
+                yield b"".join(chunk)
+                chunk, size = [], 0
+        chunk.append(b"]}")
+        yield b"".join(chunk)
+
+    def render(self) -> bytes:
+        """Render the whole Bundle."""
+        return b"".join(self.iter_bytes())
+
+    def response(self, media_type: str = "application/fhir+json", status_code: int = 200) -> Response:
+        """Render the Bundle as a response, streamed if it is large."""
+        if len(self._entries) > STREAMING_THRESHOLD:
+            return StreamingResponse(self.iter_bytes(), status_code=status_code, media_type=media_type)
+        return Response(content=self.render(), status_code=status_code, media_type=media_type)
@@ -8,9 +8,9 @@ from typing import TYPE_CHECKING, Any
 from fastapi import APIRouter, Query, Request, Response
 from fastapi.responses import JSONResponse
 
+from ...engine.types import ValueType
 from ..models.responses import (
     Bundle,
-    BundleEntry,
     BundleEntryRequest,
     BundleLink,
     CapabilityStatement,
@@ -18,9 +18,12 @@ from ..models.responses import (
     OperationOutcomeIssue,
 )
 from ..storage.fhir_store import FHIRStore
+from .bundle_writer import BundleWriter
 
 if TYPE_CHECKING:
     from ..audit import AuditService
+    from ..terminology import TerminologyProvider
+    from ..validation import ProfileValidator
 
 # FHIR content type
 FHIR_JSON = "application/fhir+json"
@@ -451,6 +454,8 @@ def create_router(
     store: FHIRStore,
     base_url: str = "",
     audit_service: AuditService | None = None,
+    profile_validator: ProfileValidator | None = None,
+    terminology: TerminologyProvider | None = None,
 ) -> APIRouter:
     """Create FHIR API router.
 
@@ -458,11 +463,16 @@ def create_router(
         store: The FHIR data store
         base_url: Base URL for the server
         audit_service: Optional audit service for logging operations
+        profile_validator: Optional validator that checks created and updated
+            resources against the profiles in their meta.profile
+        terminology: Provider of terminology operations, the store's own
+            provider if None
 
     Returns:
         Configured APIRouter
     """
     router = APIRouter()
+    terminology_provider = terminology if terminology is not None else store.terminology
 
     def get_base_url(request: Request) -> str:
         """Get base URL from request or config."""
@@ -470,6 +480,29 @@ def create_router(
             return base_url.rstrip("/")
         return str(request.base_url).rstrip("/")
 
+    def check_profiles(resource: dict[str, Any]) -> Response | None:
+        """Validate a resource against its declared profiles before it is written.
+
+        Returns:
+            A 422 response with the errors, or None if the resource conforms
+        """
+        if profile_validator is None:
+            return None
+        issues = []
+        for profile_url in resource.get("meta", {}).get("profile", []):
+            result = profile_validator.validate_against_profile(resource, profile_url)
+            if not result.valid:
+                issues.extend(result.issues)
+        if not issues:
+            return None
+        from ..validation import ValidationResult
+
+        return JSONResponse(
+            content=ValidationResult(valid=False, issues=issues).to_operation_outcome(),
+            status_code=422,
+            media_type=FHIR_JSON,
+        )
+
     # =========================================================================
     # Capability Statement (metadata)
     # =========================================================================
@@ -739,6 +772,7 @@ def create_router(
             # Determine which definitions to evaluate
             defs_to_eval = definitions if definitions else list(library.definitions.keys())
 
+            context = evaluator.create_context(resource=subject_resource, library=library)
             results = {}
             for def_name in defs_to_eval:
                 if def_name in library.definitions:
@@ -747,6 +781,7 @@ def create_router(
                             def_name,
                             resource=subject_resource,
                             library=library,
+                            context=context,
                         )
                         # Convert result to JSON-serializable format
                         results[def_name] = _serialize_cql_result(result)
@@ -784,6 +819,8 @@ def create_router(
             return [_serialize_cql_result(v) for v in value]
         if isinstance(value, dict):
             return {k: _serialize_cql_result(v) for k, v in value.items()}
+        if isinstance(value, ValueType):
+            return _serialize_cql_result(value.to_dict())
         # For custom types, try to get dict representation
         if hasattr(value, "__dict__"):
             return _serialize_cql_result(vars(value))
@@ -1313,21 +1350,6 @@ def create_router(
         if _summary and _summary != "false":
             paginated = [filter_summary(r, _summary) for r in paginated]
 
-        # Build bundle
-        entries = []
-        for i, r in enumerate(paginated):
-            rtype = r.get("resourceType", "Unknown")
-            rid = r.get("id", "")
-            # First entry (patient) is match, rest are include
-            mode = "match" if i == 0 and rtype == "Patient" else "include"
-            entries.append(
-                BundleEntry(
-                    fullUrl=f"{get_base_url(request)}/{rtype}/{rid}",
-                    resource=r,
-                    search={"mode": mode},
-                )
-            )
-
         base = get_base_url(request)
         links = [
             BundleLink(relation="self", url=f"{base}/Patient/{patient_id}/$everything"),
@@ -1351,19 +1373,15 @@ def create_router(
                 )
             )
 
-        bundle = Bundle(
-            resourceType="Bundle",
-            id=str(uuid.uuid4()),
-            type="searchset",
-            total=total,
-            entry=entries,
-            link=links,
-        )
+        # Build bundle
+        writer = BundleWriter(store, "searchset", total=total, links=links)
+        for i, r in enumerate(paginated):
+            rtype = r.get("resourceType", "Unknown")
+            # First entry (patient) is match, rest are include
+            mode = "match" if i == 0 and rtype == "Patient" else "include"
+            writer.add(r, full_url=f"{base}/{rtype}/{r.get('id', '')}", search_mode=mode)
 
-        return JSONResponse(
-            content=bundle.model_dump(exclude_none=True),
-            media_type=FHIR_JSON,
-        )
+        return writer.response(FHIR_JSON)
 
     @router.get("/Patient/{patient_id}/$summary", tags=["Operations"])
     async def patient_summary(
@@ -1726,28 +1744,18 @@ def create_router(
                 media_type=FHIR_JSON,
             )
 
-        bundle = Bundle(
-            resourceType="Bundle",
-            id=str(uuid.uuid4()),
-            type="history",
-            total=len(versions),
-            entry=[
-                BundleEntry(
-                    fullUrl=f"{get_base_url(request)}/Patient/{patient_id}",
-                    resource=v,
-                    request=BundleEntryRequest(
-                        method="GET",
-                        url=f"Patient/{patient_id}/_history/{v.get('meta', {}).get('versionId', '1')}",
-                    ),
-                )
-                for v in versions
-            ],
-        )
+        writer = BundleWriter(store, "history", total=len(versions))
+        for v in versions:
+            writer.add(
+                v,
+                full_url=f"{get_base_url(request)}/Patient/{patient_id}",
+                request=BundleEntryRequest(
+                    method="GET",
+                    url=f"Patient/{patient_id}/_history/{v.get('meta', {}).get('versionId', '1')}",
+                ),
+            )
 
-        return JSONResponse(
-            content=bundle.model_dump(exclude_none=True),
-            media_type=FHIR_JSON,
-        )
+        return writer.response(FHIR_JSON)
 
     @router.get("/Patient/{patient_id}/_history/{version_id}", tags=["History"])
     async def patient_vread(
@@ -2047,14 +2055,17 @@ def create_router(
     async def expand_valueset(
         request: Request,
         url: str | None = Query(default=None),
+        value_set_version: str | None = Query(default=None, alias="valueSetVersion"),
         filter: str | None = Query(default=None),
         count: int = Query(default=100, ge=1, le=1000),
         offset: int = Query(default=0, ge=0),
+        active_only: bool = Query(default=False, alias="activeOnly"),
     ) -> Response:
         """Expand a ValueSet.
 
         Expands the ValueSet to include all codes. Supports:
-        - Filtering by code/display text
+        - Filtering by code/display text (each filter word starts a word)
+        - Paging with count and offset, and activeOnly
         - CodeSystem expansion (when compose references entire CodeSystem)
         - Hierarchical code inclusion
         - ValueSet references within compose
@@ -2067,8 +2078,16 @@ def create_router(
                 for param in body.get("parameter", []):
                     if param.get("name") == "url":
                         url = param.get("valueUri")
+                    elif param.get("name") == "valueSetVersion":
+                        value_set_version = param.get("valueString")
                     elif param.get("name") == "filter":
                         filter = param.get("valueString")
+                    elif param.get("name") == "count":
+                        count = max(1, min(int(param.get("valueInteger", count)), 1000))
+                    elif param.get("name") == "offset":
+                        offset = max(0, int(param.get("valueInteger", offset)))
+                    elif param.get("name") == "activeOnly":
+                        active_only = bool(param.get("valueBoolean"))
             except Exception:
                 pass
 
@@ -2081,10 +2100,14 @@ def create_router(
             )
 
         # Use terminology provider for enhanced expansion
-        from ..terminology import FHIRStoreTerminologyProvider
-
-        provider = FHIRStoreTerminologyProvider(store)
-        expansion = provider.expand_valueset(url=url, filter_text=filter, count=count, offset=offset)
+        expansion = terminology_provider.expand_valueset(
+            url=url,
+            filter_text=filter,
+            count=count,
+            offset=offset,
+            version=value_set_version,
+            active_only=active_only,
+        )
 
         if not expansion:
             outcome = OperationOutcome.error(f"ValueSet not found: {url}", code="not-found")
@@ -2103,19 +2126,20 @@ def create_router(
         filter: str | None = Query(default=None),
         count: int = Query(default=100, ge=1, le=1000),
         offset: int = Query(default=0, ge=0),
+        active_only: bool = Query(default=False, alias="activeOnly"),
     ) -> Response:
         """Expand a specific ValueSet by ID.
 
         Supports:
-        - Filtering by code/display text
+        - Filtering by code/display text (each filter word starts a word)
+        - Paging with count and offset, and activeOnly
         - CodeSystem expansion (when compose references entire CodeSystem)
         - Hierarchical code inclusion
         """
         # Use terminology provider for enhanced expansion
-        from ..terminology import FHIRStoreTerminologyProvider
-
-        provider = FHIRStoreTerminologyProvider(store)
-        expansion = provider.expand_valueset(valueset_id=valueset_id, filter_text=filter, count=count, offset=offset)
+        expansion = terminology_provider.expand_valueset(
+            valueset_id=valueset_id, filter_text=filter, count=count, offset=offset, active_only=active_only
+        )
 
         if not expansion:
             outcome = OperationOutcome.not_found("ValueSet", valueset_id)
@@ -2182,10 +2206,7 @@ def create_router(
             )
 
         # Use terminology provider for validation
-        from ..terminology import FHIRStoreTerminologyProvider
-
-        provider = FHIRStoreTerminologyProvider(store)
-        result = provider.validate_code(
+        result = terminology_provider.validate_code(
             valueset_url=url,
             code=code,
             system=system,
@@ -2231,10 +2252,7 @@ def create_router(
             )
 
         # Use terminology provider for hierarchical lookup
-        from ..terminology import FHIRStoreTerminologyProvider
-
-        provider = FHIRStoreTerminologyProvider(store)
-        result = provider.lookup_code(system, code, version)
+        result = terminology_provider.lookup_code(system, code, version)
 
         if not result:
             outcome = OperationOutcome.error(f"Code '{code}' not found in CodeSystem", code="not-found")
@@ -2288,10 +2306,7 @@ def create_router(
             )
 
         # Use terminology provider
-        from ..terminology import FHIRStoreTerminologyProvider
-
-        provider = FHIRStoreTerminologyProvider(store)
-        result = provider.subsumes(system, codeA, codeB, version)
+        result = terminology_provider.subsumes(system, codeA, codeB, version)
 
         return JSONResponse(content=result, media_type=FHIR_JSON)
 
@@ -2321,10 +2336,7 @@ def create_router(
                 media_type=FHIR_JSON,
             )
 
-        from ..terminology import FHIRStoreTerminologyProvider
-
-        provider = FHIRStoreTerminologyProvider(store)
-        result = provider.subsumes(system, codeA, codeB)
+        result = terminology_provider.subsumes(system, codeA, codeB)
 
         return JSONResponse(content=result, media_type=FHIR_JSON)
 
@@ -2339,10 +2351,7 @@ def create_router(
 
         Convenience endpoint that returns a simple boolean result.
         """
-        from ..terminology import FHIRStoreTerminologyProvider
-
-        provider = FHIRStoreTerminologyProvider(store)
-        is_member = provider.member_of(valueSetUrl, code, system)
+        is_member = terminology_provider.member_of(valueSetUrl, code, system)
 
         result = {
             "resourceType": "Parameters",
@@ -2354,6 +2363,11 @@ def create_router(
     # ConceptMap $translate Operation
     # =========================================================================
 
+    from ..operations import ConceptMapTranslator
+
+    # Kept across requests so that ConceptMaps are indexed once
+    translator = ConceptMapTranslator(store)
+
     @router.get("/ConceptMap/$translate", tags=["Terminology"])
     @router.post("/ConceptMap/$translate", tags=["Terminology"])
     async def translate_code(
@@ -2374,8 +2388,11 @@ def create_router(
             target: Target code system URI (optional)
             url: ConceptMap URL to use (optional)
             reverse: Translate in reverse direction
+
+        A POST with several ``coding`` parameters translates them all,
+        returning a ``translation`` parameter per coding.
         """
-        from ..operations import ConceptMapTranslator
+        codings: list[dict[str, Any]] = []
 
         # For POST, get parameters from body
         if request.method == "POST":
@@ -2387,6 +2404,8 @@ def create_router(
                         code = param.get("valueCode")
                     elif name == "system":
                         system = param.get("valueUri")
+                    elif name == "coding":
+                        codings.append(param.get("valueCoding") or {})
                     elif name == "target":
                         target = param.get("valueUri")
                     elif name == "url":
@@ -2396,6 +2415,12 @@ def create_router(
             except Exception:
                 pass
 
+        if len(codings) > 1:
+            result = translator.translate_batch(codings, target=target, concept_map_url=url, reverse=reverse)
+            return JSONResponse(content=result, media_type=FHIR_JSON)
+        if codings and not code:
+            code, system = codings[0].get("code"), codings[0].get("system")
+
         if not code or not system:
             outcome = OperationOutcome.error("Both code and system are required", code="required")
             return JSONResponse(
@@ -2404,7 +2429,6 @@ def create_router(
                 media_type=FHIR_JSON,
             )
 
-        translator = ConceptMapTranslator(store)
         result = translator.translate(
             code=code,
             system=system,
@@ -2425,8 +2449,11 @@ def create_router(
         target: str | None = Query(default=None),
         reverse: bool = Query(default=False),
     ) -> Response:
-        """Translate a code using a specific ConceptMap by ID."""
-        from ..operations import ConceptMapTranslator
+        """Translate a code using a specific ConceptMap by ID.
+
+        A POST with several ``coding`` parameters translates them all.
+        """
+        codings: list[dict[str, Any]] = []
 
         # For POST, get parameters from body
         if request.method == "POST":
@@ -2438,6 +2465,8 @@ def create_router(
                         code = param.get("valueCode")
                     elif name == "system":
                         system = param.get("valueUri")
+                    elif name == "coding":
+                        codings.append(param.get("valueCoding") or {})
                     elif name == "target":
                         target = param.get("valueUri")
                     elif name == "reverse":
@@ -2445,6 +2474,9 @@ def create_router(
             except Exception:
                 pass
 
+        if codings and not code:
+            code, system = codings[0].get("code"), codings[0].get("system")
+
         if not code or not system:
             outcome = OperationOutcome.error("Both code and system are required", code="required")
             return JSONResponse(
@@ -2463,7 +2495,10 @@ def create_router(
                 media_type=FHIR_JSON,
             )
 
-        translator = ConceptMapTranslator(store)
+        if len(codings) > 1:
+            result = translator.translate_batch(codings, target=target, concept_map_id=conceptmap_id, reverse=reverse)
+            return JSONResponse(content=result, media_type=FHIR_JSON)
+
         result = translator.translate(
             code=code,
             system=system,
@@ -3043,8 +3078,12 @@ def create_router(
         params: dict[str, Any] = {}
         chained_params: dict[str, Any] = {}
         for key, value in request.query_params.multi_items():
-            # Skip special params except _id, _lastUpdated, and _has
-            if key.startswith("_") and key not in ("_id", "_lastUpdated") and not key.startswith("_has:"):
+            # Skip special params except _id, _lastUpdated, text search and _has
+            if (
+                key.startswith("_")
+                and key not in ("_id", "_lastUpdated", "_content", "_text")
+                and not key.startswith("_has:")
+            ):
                 continue
 
             # Separate chained/has params from regular params
@@ -3167,35 +3206,6 @@ def create_router(
             if _summary and _summary != "false":
                 included_resources = [filter_summary(r, _summary) for r in included_resources]
 
-        # Build bundle with both match and include entries
-        entries = []
-
-        # Add primary search results with mode="match"
-        for resource in resources:
-            rid = resource.get("id", "")
-            rtype = resource.get("resourceType", resource_type)
-            entries.append(
-                BundleEntry(
-                    fullUrl=f"{get_base_url(request)}/{rtype}/{rid}",
-                    resource=resource,
-                    search={"mode": "match"},
-                )
-            )
-
-        # Add included resources with mode="include" (deduplicated)
-        seen_refs: set[str] = {f"{r.get('resourceType')}/{r.get('id')}" for r in resources}
-        for resource in included_resources:
-            ref = f"{resource.get('resourceType')}/{resource.get('id')}"
-            if ref not in seen_refs:
-                entries.append(
-                    BundleEntry(
-                        fullUrl=f"{get_base_url(request)}/{resource.get('resourceType')}/{resource.get('id')}",
-                        resource=resource,
-                        search={"mode": "include"},
-                    )
-                )
-                seen_refs.add(ref)
-
         # Build pagination links
         links = [
             BundleLink(relation="self", url=f"{get_base_url(request)}/{resource_type}"),
@@ -3216,7 +3226,6 @@ def create_router(
                 )
             )
 
-        # Build bundle
         # Handle _total parameter (accurate, estimate, none)
         # Default is accurate (include total), none means exclude total
         bundle_total: int | None = total
@@ -3224,19 +3233,28 @@ def create_router(
             bundle_total = None
         # For "estimate" we currently return accurate count (future: optimize for large datasets)
 
-        bundle = Bundle(
-            resourceType="Bundle",
-            id=str(uuid.uuid4()),
-            type="searchset",
-            total=bundle_total,
-            entry=entries,
-            link=links,
-        )
+        # Build bundle with both match and include entries
+        writer = BundleWriter(store, "searchset", total=bundle_total, links=links)
 
-        return JSONResponse(
-            content=bundle.model_dump(exclude_none=True),
-            media_type=FHIR_JSON,
-        )
+        # Add primary search results with mode="match"
+        for resource in resources:
+            rid = resource.get("id", "")
+            rtype = resource.get("resourceType", resource_type)
+            writer.add(resource, full_url=f"{get_base_url(request)}/{rtype}/{rid}", search_mode="match")
+
+        # Add included resources with mode="include" (deduplicated)
+        seen_refs: set[str] = {f"{r.get('resourceType')}/{r.get('id')}" for r in resources}
+        for resource in included_resources:
+            ref = f"{resource.get('resourceType')}/{resource.get('id')}"
+            if ref not in seen_refs:
+                writer.add(
+                    resource,
+                    full_url=f"{get_base_url(request)}/{resource.get('resourceType')}/{resource.get('id')}",
+                    search_mode="include",
+                )
+                seen_refs.add(ref)
+
+        return writer.response(FHIR_JSON)
 
     @router.get("/{resource_type}/{resource_id}", tags=["Read"])
     async def read(
@@ -3350,28 +3368,18 @@ def create_router(
             )
 
         # Build history bundle
-        bundle = Bundle(
-            resourceType="Bundle",
-            id=str(uuid.uuid4()),
-            type="history",
-            total=len(versions),
-            entry=[
-                BundleEntry(
-                    fullUrl=f"{get_base_url(request)}/{resource_type}/{resource_id}",
-                    resource=v,
-                    request=BundleEntryRequest(
-                        method="GET",
-                        url=f"{resource_type}/{resource_id}/_history/{v.get('meta', {}).get('versionId', '1')}",
-                    ),
-                )
-                for v in versions
-            ],
-        )
+        writer = BundleWriter(store, "history", total=len(versions))
+        for v in versions:
+            writer.add(
+                v,
+                full_url=f"{get_base_url(request)}/{resource_type}/{resource_id}",
+                request=BundleEntryRequest(
+                    method="GET",
+                    url=f"{resource_type}/{resource_id}/_history/{v.get('meta', {}).get('versionId', '1')}",
+                ),
+            )
 
-        return JSONResponse(
-            content=bundle.model_dump(exclude_none=True),
-            media_type=FHIR_JSON,
-        )
+        return writer.response(FHIR_JSON)
 
     @router.get("/{resource_type}/{resource_id}/_history/{version_id}", tags=["History"])
     async def vread(
@@ -3516,6 +3524,10 @@ def create_router(
                 )
             # else: no matches, proceed with create
 
+        rejection = check_profiles(body)
+        if rejection is not None:
+            return rejection
+
         # Create resource
         created = store.create(body)
         resource_id = created["id"]
@@ -3605,6 +3617,10 @@ def create_router(
                 media_type=FHIR_JSON,
             )
 
+        rejection = check_profiles(body)
+        if rejection is not None:
+            return rejection
+
         # Search for matching resources
         matches, total = store.search(resource_type, search_params, _count=2, _offset=0)
 
@@ -3736,6 +3752,10 @@ def create_router(
             # Normalize contained IDs
             body = normalize_contained_ids(body)
 
+        rejection = check_profiles(body)
+        if rejection is not None:
+            return rejection
+
         # Check if creating or updating
         existing = store.read(resource_type, resource_id)
         is_create = existing is None
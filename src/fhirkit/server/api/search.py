@@ -5,6 +5,9 @@ from datetime import date, datetime
 from typing import TYPE_CHECKING, Any
 from urllib.parse import parse_qs
 
+from ..storage.quantity_index import QuantitySearch, match_quantity, quantity_elements
+from ..storage.text_index import STRING_MODIFIERS, normalize, string_values
+
 if TYPE_CHECKING:
     from ..storage.fhir_store import FHIRStore
 
@@ -45,6 +48,7 @@ SEARCH_PARAMS: dict[str, dict[str, dict[str, Any]]] = {
         "status": {"path": "status", "type": "token"},
         "date": {"path": "effectiveDateTime", "type": "date"},
         "value-quantity": {"path": "valueQuantity.value", "type": "quantity"},
+        "component-value-quantity": {"path": "component.valueQuantity.value", "type": "quantity"},
         "encounter": {"path": "encounter.reference", "type": "reference"},
     },
     "MedicationRequest": {
@@ -1641,6 +1645,28 @@ def match_string(resource_value: Any, search_value: str) -> bool:
     return False
 
 
+def match_string_modifier(resource: dict[str, Any], path: str, search_value: str, modifier: str) -> bool:
+    """Match a string search parameter with the :contains or :exact modifier.
+
+    :contains matches anywhere in a value, ignoring case and accents;
+    :exact matches whole values as written.
+
+    Args:
+        resource: The FHIR resource
+        path: Path of the string parameter
+        search_value: Search parameter value
+        modifier: "contains" or "exact"
+
+    Returns:
+        True if matches
+    """
+    values = string_values(resource, path)
+    if modifier == "exact":
+        return search_value in values
+    query = normalize(search_value)
+    return any(query in normalize(value) for value in values)
+
+
 def match_reference(resource_value: Any, search_value: str) -> bool:
     """Match a reference search parameter.
 
@@ -1796,6 +1822,14 @@ def matches_search_param(
                 return True
         return False
 
+    if param_type == "quantity":
+        search = QuantitySearch.parse(param_value)
+        if search is None:
+            return False
+        # Match against the whole Quantity so that units can be compared
+        quantities = quantity_elements(resource, path.removesuffix(".value"))
+        return any(match_quantity(quantity, search) for quantity in quantities)
+
     # Get value from resource
     value = get_nested_value(resource, path)
 
@@ -1810,14 +1844,6 @@ def matches_search_param(
         return match_date(value, param_value)
     if param_type == "uri":
         return match_uri(value, param_value)
-    if param_type == "quantity":
-        # Simple quantity comparison
-        try:
-            search_val = float(param_value)
-            return value is not None and float(value) == search_val
-        except (ValueError, TypeError):
-            return False
-
     return False
 
 
@@ -1857,7 +1883,8 @@ def filter_resources(
             continue
 
         # Get param definition
-        param_def = type_params.get(param_name)
+        name, _, modifier = param_name.partition(":")
+        param_def = type_params.get(name)
         if param_def is None:
             # Unknown parameter - skip (could also raise error)
             continue
@@ -1866,6 +1893,14 @@ def filter_resources(
         if isinstance(param_values, str):
             param_values = [param_values]
 
+        if modifier in STRING_MODIFIERS and param_def["type"] == "string":
+            path = param_def["path"]
+            filtered = [r for r in filtered if any(match_string_modifier(r, path, v, modifier) for v in param_values)]
+            continue
+        if modifier:
+            # Unsupported modifier - skip
+            continue
+
         # Filter: resource must match at least one value (OR within param)
         filtered = [r for r in filtered if any(matches_search_param(r, param_name, v, param_def) for v in param_values)]
 
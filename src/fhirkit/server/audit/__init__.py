@@ -10,10 +10,15 @@ Usage:
     audit_service.log_create(request, resource, outcome="0")
 """
 
+from .pipeline import AuditPipeline, AuditSink, NDJSONAuditSink, StoreAuditSink
 from .service import AuditAction, AuditOutcome, AuditService
 
 __all__ = [
     "AuditService",
     "AuditAction",
     "AuditOutcome",
+    "AuditPipeline",
+    "AuditSink",
+    "NDJSONAuditSink",
+    "StoreAuditSink",
 ]
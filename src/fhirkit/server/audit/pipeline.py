@@ -0,0 +1,248 @@
+"""Batched, asynchronous writing of audit events.
+
+``AuditService`` builds an AuditEvent for each operation; with a pipeline,
+writing it is taken out of the request:
+
+- events go to a bounded in-memory queue
+- a background task on the server's event loop writes them in batches to
+  one or more sinks: the store (``StoreAuditSink``) and/or a rotating NDJSON
+  file (``NDJSONAuditSink``)
+- when the queue is full, the overflow policy decides what gives: the
+  oldest queued event (``drop-oldest``), the new event (``drop-newest``), or
+  the request, which then writes the queued batch itself (``write``)
+
+Until the background task is started (or after it is stopped), events are
+written immediately.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections import deque
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any, Protocol
+
+if TYPE_CHECKING:
+    from ..storage.fhir_store import FHIRStore
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("drop-oldest", "drop-newest", "write")
+
+
+class AuditSink(Protocol):
+    """Destination of audit events."""
+
+    def write(self, events: list[dict[str, Any]]) -> None:
+        """Write a batch of AuditEvent resources."""
+        ...
+
+    def close(self) -> None:
+        """Release any resources held by the sink."""
+        ...
+
+
+class StoreAuditSink:
+    """Writes audit events to the FHIR store.
+
+    Args:
+        store: Store to write to
+        max_events: Maximum number of events written by this sink that are
+            kept in the store; the oldest are removed first. 0 keeps all.
+    """
+
+    def __init__(self, store: FHIRStore, max_events: int = 0) -> None:
+        self.store = store
+        self.max_events = max(0, max_events)
+        self._written: deque[str] = deque()
+
+    def write(self, events: list[dict[str, Any]]) -> None:
+        self.store.bulk_load(events)
+        if not self.max_events:
+            return
+        self._written.extend(f"AuditEvent/{event['id']}" for event in events)
+        excess = len(self._written) - self.max_events
+        if excess > 0:
+            self.store.expunge(self._written.popleft() for _ in range(excess))
+
+    def close(self) -> None:
+        pass
+
+
+class NDJSONAuditSink:
+    """Appends audit events to an NDJSON file, rotating it by size.
+
+    Rotation works like ``logging.handlers.RotatingFileHandler``:
+    ``audit.ndjson`` becomes ``audit.ndjson.1``, which becomes
+    ``audit.ndjson.2``, and so on up to ``backup_count``.
+
+    Args:
+        path: Log file
+        max_bytes: Size at which the file is rotated; 0 never rotates
+        backup_count: Number of rotated files kept
+    """
+
+    def __init__(self, path: str | Path, max_bytes: int = 0, backup_count: int = 5) -> None:
+        self.path = Path(path)
+        self.max_bytes = max(0, max_bytes)
+        self.backup_count = max(0, backup_count)
+        self._file: IO[bytes] | None = None
+
+    def _open(self) -> IO[bytes]:
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "ab")
+        return self._file
+
+    def _rotate(self) -> None:
+        self.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            source = self.path.with_name(f"{self.path.name}.{index}")
+            if source.exists():
+                source.replace(self.path.with_name(f"{self.path.name}.{index + 1}"))
+        if self.backup_count:
+            self.path.replace(self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+
+    def write(self, events: list[dict[str, Any]]) -> None:
+        stream = self._open()
+        for event in events:
+            line = json.dumps(event, separators=(",", ":")).encode() + b"\n"
+            if self.max_bytes and stream.tell() and stream.tell() + len(line) > self.max_bytes:
+                self._rotate()
+                stream = self._open()
+            stream.write(line)
+        stream.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class AuditPipeline:
+    """Bounded queue of audit events, drained in batches by a background task.
+
+    Args:
+        sinks: Where events are written
+        max_queue: Maximum number of queued events
+        batch_size: Events written at a time; a full batch wakes the writer
+        flush_interval: Seconds after which queued events are written anyway
+        overflow: What to do when the queue is full (see ``OVERFLOW_POLICIES``)
+
+    Raises:
+        ValueError: If the overflow policy is unknown
+    """
+
+    def __init__(
+        self,
+        sinks: list[AuditSink],
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        overflow: str = "drop-oldest",
+    ) -> None:
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown audit overflow policy '{overflow}', expected one of {OVERFLOW_POLICIES}")
+        self.sinks = sinks
+        self.max_queue = max(1, max_queue)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.dropped = 0
+        self._queue: deque[dict[str, Any]] = deque()
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    @property
+    def running(self) -> bool:
+        """Whether the background writer is running."""
+        return self._task is not None and not self._task.done()
+
+    def submit(self, event: dict[str, Any]) -> bool:
+        """Queue an event for writing.
+
+        Returns:
+            False if the event was dropped
+        """
+        if not self.running:
+            self._write([event])
+            return True
+
+        if len(self._queue) >= self.max_queue:
+            if self.overflow == "drop-newest":
+                self.dropped += 1
+                return False
+            if self.overflow == "drop-oldest":
+                self._queue.popleft()
+                self.dropped += 1
+            else:
+                self._write_batch()
+
+        self._queue.append(event)
+        if len(self._queue) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def _write(self, events: list[dict[str, Any]]) -> None:
+        for sink in self.sinks:
+            try:
+                sink.write(events)
+            except Exception as e:
+                # Audit failures should not break the server
+                logger.warning(f"Failed to write {len(events)} audit event(s) to {type(sink).__name__}: {e}")
+
+    def _write_batch(self) -> int:
+        count = min(self.batch_size, len(self._queue))
+        if count:
+            self._write([self._queue.popleft() for _ in range(count)])
+        return count
+
+    def flush(self) -> int:
+        """Write all queued events.
+
+        Returns:
+            Number of events written
+        """
+        written = 0
+        while self._queue:
+            written += self._write_batch()
+        return written
+
+    async def start(self) -> None:
+        """Start the background writer on the running event loop."""
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            # Write batch by batch, letting requests run in between
+            while self._write_batch():
+                await asyncio.sleep(0)
+
+    async def stop(self) -> None:
+        """Stop the background writer, write the queued events and close the sinks."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.flush()
+        for sink in self.sinks:
+            sink.close()
@@ -16,6 +16,7 @@ if TYPE_CHECKING:
     from fastapi import Request
 
     from ..storage.fhir_store import FHIRStore
+    from .pipeline import AuditPipeline
 
 logger = logging.getLogger(__name__)
 
@@ -101,6 +102,7 @@ class AuditService:
         store: FHIRStore,
         enabled: bool = True,
         exclude_reads: bool = True,
+        pipeline: AuditPipeline | None = None,
     ):
         """Initialize the audit service.
 
@@ -108,10 +110,13 @@ class AuditService:
             store: FHIR store for persisting AuditEvent resources
             enabled: Whether audit logging is enabled
             exclude_reads: Whether to exclude read operations from audit log
+            pipeline: Queue that writes the events in the background; without
+                one, each event is created in the store during the request
         """
         self.store = store
         self.enabled = enabled
         self.exclude_reads = exclude_reads
+        self.pipeline = pipeline
 
     def log_operation(
         self,
@@ -139,7 +144,8 @@ class AuditService:
             patient_ref: Explicit patient reference (overrides extraction)
 
         Returns:
-            Created AuditEvent resource, or None if logging is disabled
+            Created (or, with a pipeline, queued) AuditEvent resource, or
+            None if logging is disabled or the event was dropped
         """
         if not self.enabled:
             return None
@@ -164,6 +170,9 @@ class AuditService:
                 patient_ref=patient_ref,
             )
 
+            if self.pipeline is not None:
+                return audit_event if self.pipeline.submit(audit_event) else None
+
             # Create the AuditEvent (without triggering another audit)
             created = self.store.create(audit_event)
             logger.debug(f"Audit: {subtype} {resource_type}/{resource_id} -> {outcome}")
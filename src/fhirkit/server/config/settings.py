@@ -25,6 +25,19 @@ class FHIRServerSettings(BaseSettings):
         default=None,
         description="Random seed for reproducible data generation",
     )
+    generator_workers: int = Field(
+        default=1,
+        description="Worker processes generating synthetic patients on startup",
+    )
+    store_snapshot: str | None = Field(
+        default=None,
+        description=(
+            "Store snapshot file: restored on startup instead of generating data if it exists, "
+            "otherwise written once the startup data is generated. Snapshots are pickles signed with the key in "
+            "~/.fhirkit/signing.key and are only restored by the installation that wrote them; keep the file where "
+            "only the server's user can write"
+        ),
+    )
 
     # Preload paths
     preload_cql: str | None = Field(
@@ -45,6 +58,31 @@ class FHIRServerSettings(BaseSettings):
         default=True,
         description="Enable terminology operations ($validate-code, $expand, etc.)",
     )
+    terminology_dir: str | None = Field(
+        default=None,
+        description=(
+            "Directory of compact CodeSystem files (.fcs) to serve terminology operations, token :below/:above/:in "
+            "searches and ValueSet expansion from"
+        ),
+    )
+
+    # CQL
+    cql_library_cache_size: int = Field(
+        default=128,
+        description="Number of compiled CQL libraries kept in memory ($cql, $evaluate-measure, CDS Hooks)",
+    )
+    cql_library_cache_dir: str | None = Field(
+        default=None,
+        description=(
+            "Directory for persisting compiled CQL libraries across restarts. Entries are pickles signed with the "
+            "key in ~/.fhirkit/signing.key; use a directory only the server's user can write"
+        ),
+    )
+
+    warm_up_parsers: bool = Field(
+        default=True,
+        description="Pre-populate the CQL and FHIRPath parser caches at startup",
+    )
 
     # API documentation
     enable_docs: bool = Field(
@@ -75,6 +113,52 @@ class FHIRServerSettings(BaseSettings):
         default=True,
         description="Exclude read operations from audit log (reduce noise)",
     )
+    audit_async: bool = Field(
+        default=True,
+        description="Write audit events in batches from a background task instead of during the request",
+    )
+    audit_queue_size: int = Field(
+        default=10000,
+        description="Maximum number of audit events waiting to be written",
+    )
+    audit_batch_size: int = Field(
+        default=500,
+        description="Number of audit events written at a time",
+    )
+    audit_flush_interval: float = Field(
+        default=1.0,
+        description="Seconds after which queued audit events are written even if the batch is not full",
+    )
+    audit_overflow: str = Field(
+        default="drop-oldest",
+        description="When the audit queue is full: drop-oldest | drop-newest | write (the request writes a batch)",
+    )
+    audit_sink: str = Field(
+        default="store",
+        description="Where audit events are written: store | file | both",
+    )
+    audit_store_max_events: int = Field(
+        default=0,
+        description="Maximum number of audit events kept in the store, oldest removed first (0 keeps all)",
+    )
+    audit_log_path: str = Field(
+        default="audit.ndjson",
+        description="NDJSON audit log file, for the file sink",
+    )
+    audit_log_max_bytes: int = Field(
+        default=10_000_000,
+        description="Size at which the audit log file is rotated (0 never rotates)",
+    )
+    audit_log_backups: int = Field(
+        default=5,
+        description="Number of rotated audit log files kept",
+    )
+
+    # GraphQL
+    graphql_max_cost: int = Field(
+        default=20000,
+        description="Maximum estimated number of fields a GraphQL query may resolve (0 for no limit)",
+    )
 
     # Profile Validation
     validate_profiles_on_write: bool = Field(
@@ -107,6 +107,7 @@ from .payment_notice import PaymentNoticeGenerator
 from .payment_reconciliation import PaymentReconciliationGenerator
 from .person import PersonGenerator
 from .plan_definition import PlanDefinitionGenerator
+from .population import PopulationGenerator, write_ndjson_by_type
 from .practitioner import PractitionerGenerator
 from .practitioner_role import PractitionerRoleGenerator
 from .procedure import ProcedureGenerator
@@ -150,6 +151,8 @@ __all__ = [
     # Base
     "FHIRResourceGenerator",
     "PatientRecordGenerator",
+    "PopulationGenerator",
+    "write_ndjson_by_type",
     # Administrative
     "PatientGenerator",
     "PractitionerGenerator",
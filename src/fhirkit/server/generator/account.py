@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 
 
 class AccountGenerator(FHIRResourceGenerator):
@@ -75,7 +75,7 @@ class AccountGenerator(FHIRResourceGenerator):
 
         # Generate service period
         if service_period_start is None:
-            start_date = self.faker.date_between(start_date="-1y", end_date="today")
+            start_date = self.faker.date_between(start_date=relative_time("-1y"), end_date=relative_time("today"))
             service_period_start = start_date.isoformat()
         else:
             start_date = datetime.fromisoformat(service_period_start).date()
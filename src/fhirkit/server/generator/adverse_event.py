@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 from .clinical_codes import make_codeable_concept
 
 
@@ -201,22 +201,22 @@ class AdverseEventGenerator(FHIRResourceGenerator):
 
         # Generate event date
         event_date = self.faker.date_time_between(
-            start_date="-30d",
-            end_date="now",
+            start_date=relative_time("-30d"),
+            end_date=relative_time("now"),
             tzinfo=timezone.utc,
         )
 
         # Generate detected date (same or after event date)
         detected_date = self.faker.date_time_between(
             start_date=event_date,
-            end_date="now",
+            end_date=relative_time("now"),
             tzinfo=timezone.utc,
         )
 
         # Generate recorded date (same or after detected date)
         recorded_date = self.faker.date_time_between(
             start_date=detected_date,
-            end_date="now",
+            end_date=relative_time("now"),
             tzinfo=timezone.utc,
         )
 
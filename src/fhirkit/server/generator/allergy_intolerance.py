@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 from .clinical_codes import (
     ALLERGENS_ENVIRONMENT,
     ALLERGENS_FOOD,
@@ -89,16 +89,16 @@ class AllergyIntoleranceGenerator(FHIRResourceGenerator):
         # Generate onset date if not provided
         if onset_date is None:
             onset_dt = self.faker.date_time_between(
-                start_date="-10y",
-                end_date="-1m",
+                start_date=relative_time("-10y"),
+                end_date=relative_time("-1m"),
                 tzinfo=timezone.utc,
             )
             onset_date = onset_dt.date().isoformat()
 
         # Generate recorded date (typically after onset)
         recorded_dt = self.faker.date_time_between(
-            start_date="-1y",
-            end_date="now",
+            start_date=relative_time("-1y"),
+            end_date=relative_time("now"),
             tzinfo=timezone.utc,
         )
 
@@ -1,11 +1,11 @@
 """Appointment resource generator."""
 
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timedelta
 from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, generation_time
 
 
 class AppointmentGenerator(FHIRResourceGenerator):
@@ -111,7 +111,7 @@ class AppointmentGenerator(FHIRResourceGenerator):
             future_days = self.faker.random_int(min=1, max=30)
             hour = self.faker.random_int(min=8, max=16)
             minute = self.faker.random_element([0, 15, 30, 45])
-            start = datetime.now(timezone.utc) + timedelta(days=future_days)
+            start = generation_time() + timedelta(days=future_days)
             start = start.replace(hour=hour, minute=minute, second=0, microsecond=0)
 
         end = start + timedelta(minutes=duration_minutes)
@@ -138,7 +138,7 @@ class AppointmentGenerator(FHIRResourceGenerator):
             "start": start.isoformat(),
             "end": end.isoformat(),
             "minutesDuration": duration_minutes,
-            "created": datetime.now(timezone.utc).isoformat(),
+            "created": generation_time().isoformat(),
             "comment": self.faker.sentence(nb_words=8),
             "participant": [],
         }
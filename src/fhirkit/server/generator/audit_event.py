@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 from .clinical_codes import make_codeable_concept
 
 
@@ -175,8 +175,8 @@ class AuditEventGenerator(FHIRResourceGenerator):
 
         # Generate recorded time
         recorded = self.faker.date_time_between(
-            start_date="-7d",
-            end_date="now",
+            start_date=relative_time("-7d"),
+            end_date=relative_time("now"),
             tzinfo=timezone.utc,
         )
 
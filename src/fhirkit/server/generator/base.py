@@ -1,12 +1,70 @@
 """Base class for FHIR resource generators."""
 
+import re
 import uuid
 from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from contextlib import contextmanager
 from datetime import date, datetime, timedelta, timezone
 from typing import Any
 
 from faker import Faker
 
+# Time that relative dates are generated against; None means now
+_generation_time: datetime | None = None
+
+
+def generation_time() -> datetime:
+    """Return the (UTC) time that generated dates are relative to."""
+    return _generation_time if _generation_time is not None else datetime.now(timezone.utc)
+
+
+def generation_date() -> date:
+    """Return the date that generated dates are relative to."""
+    return _generation_time.date() if _generation_time is not None else date.today()
+
+
+# Faker's relative date syntax, e.g. "-1y", "+30d", "-6m" (months are "M", minutes "m")
+_RELATIVE_TIME = re.compile(
+    r"^(?:([-+]?\d+)y)?(?:([-+]?\d+)M)?(?:([-+]?\d+)w)?(?:([-+]?\d+)d)?"
+    r"(?:([-+]?\d+)h)?(?:([-+]?\d+)m)?(?:([-+]?\d+)s)?$"
+)
+
+
+def relative_time(offset: str) -> datetime:
+    """Resolve a Faker-style relative date ("now", "today", "-1y", "+30d") against the generation time.
+
+    Faker resolves such strings against the current time, which makes
+    seeded output depend on when it was generated.
+    """
+    if offset in ("now", "today"):
+        return generation_time()
+    match = _RELATIVE_TIME.match(offset)
+    if not match or not offset:
+        raise ValueError(f"Invalid relative date: {offset}")
+    years, months, weeks, days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    return generation_time() + timedelta(
+        days=years * 365.24 + months * 30.42 + weeks * 7 + days,
+        hours=hours,
+        minutes=minutes,
+        seconds=seconds,
+    )
+
+
+@contextmanager
+def fixed_generation_time(when: datetime) -> Iterator[None]:
+    """Generate dates relative to a fixed time instead of the current time.
+
+    Together with a seed, this makes generated resources reproducible.
+    """
+    global _generation_time
+    previous = _generation_time
+    _generation_time = when
+    try:
+        yield
+    finally:
+        _generation_time = previous
+
 
 class FHIRResourceGenerator(ABC):
     """Abstract base class for FHIR resource generators using Faker."""
@@ -19,6 +77,7 @@ class FHIRResourceGenerator(ABC):
             seed: Random seed for reproducibility
         """
         self.faker = faker or Faker()
+        self._seeded = seed is not None
         if seed is not None:
             Faker.seed(seed)
             self.faker.seed_instance(seed)
@@ -45,7 +104,9 @@ class FHIRResourceGenerator(ABC):
         return [self.generate(**kwargs) for _ in range(count)]
 
     def _generate_id(self) -> str:
-        """Generate a unique resource ID."""
+        """Generate a unique resource ID (reproducible if the generator is seeded)."""
+        if self._seeded:
+            return self.faker.uuid4()
         return str(uuid.uuid4())
 
     def _generate_reference(self, resource_type: str, resource_id: str) -> dict[str, str]:
@@ -91,7 +152,7 @@ class FHIRResourceGenerator(ABC):
             Date string in FHIR format
         """
         if end_date is None:
-            end_date = date.today()
+            end_date = generation_date()
         if start_date is None:
             start_date = end_date - timedelta(days=365 * 5)
 
@@ -113,7 +174,7 @@ class FHIRResourceGenerator(ABC):
             DateTime string in FHIR format with timezone
         """
         if end_date is None:
-            end_date = datetime.now(timezone.utc)
+            end_date = generation_time()
         if start_date is None:
             start_date = end_date - timedelta(days=365)
 
@@ -138,8 +199,8 @@ class FHIRResourceGenerator(ABC):
             start_dt = datetime.fromisoformat(start.replace("Z", "+00:00"))
         elif start is None:
             start_dt = self.faker.date_time_between(
-                start_date="-1y",
-                end_date="now",
+                start_date=relative_time("-1y"),
+                end_date=relative_time("now"),
                 tzinfo=timezone.utc,
             )
         else:
@@ -290,5 +351,5 @@ class FHIRResourceGenerator(ABC):
         """
         return {
             "versionId": version_id,
-            "lastUpdated": datetime.now(timezone.utc).isoformat(),
+            "lastUpdated": generation_time().isoformat(),
         }
@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 from .clinical_codes import (
     CAREPLAN_ACTIVITIES,
     CAREPLAN_CATEGORIES,
@@ -66,8 +66,8 @@ class CarePlanGenerator(FHIRResourceGenerator):
         # Generate period
         if period_start is None:
             start_dt = self.faker.date_time_between(
-                start_date="-1y",
-                end_date="now",
+                start_date=relative_time("-1y"),
+                end_date=relative_time("now"),
                 tzinfo=timezone.utc,
             )
             period_start = start_dt.isoformat()
@@ -100,8 +100,8 @@ class CarePlanGenerator(FHIRResourceGenerator):
             "description": self._generate_careplan_description(),
             "period": {"start": period_start},
             "created": self.faker.date_time_between(
-                start_date="-1y",
-                end_date="now",
+                start_date=relative_time("-1y"),
+                end_date=relative_time("now"),
                 tzinfo=timezone.utc,
             ).isoformat(),
         }
@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 from .clinical_codes import CONDITIONS_SNOMED, make_codeable_concept
 
 
@@ -81,8 +81,8 @@ class ClinicalImpressionGenerator(FHIRResourceGenerator):
 
         # Generate effective time
         effective_time = self.faker.date_time_between(
-            start_date="-30d",
-            end_date="now",
+            start_date=relative_time("-30d"),
+            end_date=relative_time("now"),
             tzinfo=timezone.utc,
         )
 
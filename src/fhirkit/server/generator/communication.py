@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 from .clinical_codes import make_codeable_concept
 
 
@@ -141,8 +141,8 @@ class CommunicationGenerator(FHIRResourceGenerator):
 
         # Generate sent time
         sent_time = self.faker.date_time_between(
-            start_date="-7d",
-            end_date="now",
+            start_date=relative_time("-7d"),
+            end_date=relative_time("now"),
             tzinfo=timezone.utc,
         )
 
@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 
 
 class CompositionGenerator(FHIRResourceGenerator):
@@ -94,7 +94,9 @@ class CompositionGenerator(FHIRResourceGenerator):
             doc_type = self.faker.random_element(self.DOCUMENT_TYPES)
 
         # Generate composition timestamp
-        comp_date = self.faker.date_time_between(start_date="-1y", end_date="now", tzinfo=timezone.utc)
+        comp_date = self.faker.date_time_between(
+            start_date=relative_time("-1y"), end_date=relative_time("now"), tzinfo=timezone.utc
+        )
 
         composition: dict[str, Any] = {
             "resourceType": "Composition",
@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 
 
 class ConceptMapGenerator(FHIRResourceGenerator):
@@ -210,8 +210,8 @@ class ConceptMapGenerator(FHIRResourceGenerator):
 
         # Build date
         published = self.faker.date_time_between(
-            start_date="-2y",
-            end_date="now",
+            start_date=relative_time("-2y"),
+            end_date=relative_time("now"),
             tzinfo=timezone.utc,
         )
 
@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, generation_date
 from .clinical_codes import (
     CONDITION_CLINICAL_STATUS,
     CONDITION_VERIFICATION_STATUS,
@@ -51,7 +51,7 @@ class ConditionGenerator(FHIRResourceGenerator):
 
         # Generate onset date (within past 10 years)
         if onset_date is None:
-            today = date.today()
+            today = generation_date()
             onset_date = self._generate_date(
                 start_date=today - timedelta(days=365 * 10),
                 end_date=today,
@@ -121,7 +121,7 @@ class ConditionGenerator(FHIRResourceGenerator):
         if clinical_status_code in ("resolved", "inactive", "remission"):
             onset = date.fromisoformat(onset_date)
             min_abatement = onset + timedelta(days=30)
-            today = date.today()
+            today = generation_date()
             # Only add abatement if enough time has passed
             if min_abatement <= today:
                 abatement_date = self._generate_date(
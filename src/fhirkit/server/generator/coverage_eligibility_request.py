@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 
 
 class CoverageEligibilityRequestGenerator(FHIRResourceGenerator):
@@ -106,7 +106,9 @@ class CoverageEligibilityRequestGenerator(FHIRResourceGenerator):
             created = datetime.now().isoformat()
 
         if serviced_date is None:
-            serviced_date = self.faker.date_between(start_date="today", end_date="+30d").isoformat()
+            serviced_date = self.faker.date_between(
+                start_date=relative_time("today"), end_date=relative_time("+30d")
+            ).isoformat()
 
         request: dict[str, Any] = {
             "resourceType": "CoverageEligibilityRequest",
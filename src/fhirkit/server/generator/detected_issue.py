@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 from .clinical_codes import make_codeable_concept
 
 
@@ -149,8 +149,8 @@ class DetectedIssueGenerator(FHIRResourceGenerator):
 
         # Generate identified time
         identified_datetime = self.faker.date_time_between(
-            start_date="-7d",
-            end_date="now",
+            start_date=relative_time("-7d"),
+            end_date=relative_time("now"),
             tzinfo=timezone.utc,
         )
 
@@ -193,7 +193,7 @@ class DetectedIssueGenerator(FHIRResourceGenerator):
             mitigation_action = self.faker.random_element(self.MITIGATION_ACTIONS)
             mitigation_time = self.faker.date_time_between(
                 start_date=identified_datetime,
-                end_date="now",
+                end_date=relative_time("now"),
                 tzinfo=timezone.utc,
             )
             issue["mitigation"] = [
@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 
 
 class DeviceRequestGenerator(FHIRResourceGenerator):
@@ -182,7 +182,9 @@ class DeviceRequestGenerator(FHIRResourceGenerator):
 
         # Add occurrence timing
         if self.faker.boolean(chance_of_getting_true=50):
-            future_date = self.faker.date_between(start_date="today", end_date="+30d").isoformat()
+            future_date = self.faker.date_between(
+                start_date=relative_time("today"), end_date=relative_time("+30d")
+            ).isoformat()
             request["occurrenceDateTime"] = future_date
 
         return request
@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 from .clinical_codes import (
     DIAGNOSTIC_REPORT_CATEGORIES,
     DIAGNOSTIC_REPORT_CONCLUSION_CODES,
@@ -57,8 +57,8 @@ class DiagnosticReportGenerator(FHIRResourceGenerator):
 
         if effective_date is None:
             effective_dt = self.faker.date_time_between(
-                start_date="-1y",
-                end_date="now",
+                start_date=relative_time("-1y"),
+                end_date=relative_time("now"),
                 tzinfo=timezone.utc,
             )
             effective_date = effective_dt.isoformat()
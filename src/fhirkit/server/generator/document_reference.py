@@ -6,7 +6,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, generation_time, relative_time
 from .clinical_codes import (
     DOCUMENT_CATEGORIES,
     DOCUMENT_CONTENT_TYPES,
@@ -82,8 +82,8 @@ class DocumentReferenceGenerator(FHIRResourceGenerator):
         # Date
         if date is None:
             date_dt = self.faker.date_time_between(
-                start_date="-1y",
-                end_date="now",
+                start_date=relative_time("-1y"),
+                end_date=relative_time("now"),
                 tzinfo=timezone.utc,
             )
             date = date_dt.isoformat()
@@ -136,7 +136,7 @@ class DocumentReferenceGenerator(FHIRResourceGenerator):
                         "contentType": content_type,
                         "language": "en-US",
                         "data": content_data,
-                        "title": f"{doc_type['display']} - {self.faker.date()}",
+                        "title": f"{doc_type['display']} - {self.faker.date(end_datetime=generation_time())}",
                         "creation": date,
                     }
                 }
@@ -172,7 +172,7 @@ class DocumentReferenceGenerator(FHIRResourceGenerator):
 {doc_display}
 {"=" * len(doc_display)}
 
-Date: {self.faker.date()}
+Date: {self.faker.date(end_datetime=generation_time())}
 Author: Dr. {self.faker.name()}
 
 {self.faker.paragraph(nb_sentences=5)}
@@ -1,11 +1,11 @@
 """Encounter resource generator."""
 
-from datetime import datetime, timedelta, timezone
+from datetime import timedelta, timezone
 from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, generation_time, relative_time
 from .clinical_codes import ENCOUNTER_CLASSES, ENCOUNTER_TYPES, make_codeable_concept
 
 
@@ -65,10 +65,10 @@ class EncounterGenerator(FHIRResourceGenerator):
         encounter_type = self.faker.random_element(ENCOUNTER_TYPES)
 
         # Generate period based on class
-        now = datetime.now(timezone.utc)
+        now = generation_time()
         start = self.faker.date_time_between(
-            start_date="-1y",
-            end_date="now",
+            start_date=relative_time("-1y"),
+            end_date=relative_time("now"),
             tzinfo=timezone.utc,
         )
 
@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 from .clinical_codes import make_codeable_concept
 
 
@@ -128,8 +128,8 @@ class FlagGenerator(FHIRResourceGenerator):
 
         # Generate period
         start_date = self.faker.date_time_between(
-            start_date="-1y",
-            end_date="-7d",
+            start_date=relative_time("-1y"),
+            end_date=relative_time("-7d"),
             tzinfo=timezone.utc,
         )
 
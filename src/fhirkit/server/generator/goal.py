@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 from .clinical_codes import (
     GOAL_ACHIEVEMENT_STATUS,
     GOAL_DESCRIPTIONS,
@@ -59,8 +59,8 @@ class GoalGenerator(FHIRResourceGenerator):
         # Generate start date
         if start_date is None:
             start_dt = self.faker.date_time_between(
-                start_date="-6m",
-                end_date="now",
+                start_date=relative_time("-6m"),
+                end_date=relative_time("now"),
                 tzinfo=timezone.utc,
             )
             start_date = start_dt.date().isoformat()
@@ -141,7 +141,7 @@ class GoalGenerator(FHIRResourceGenerator):
         measure = self.faker.random_element(GOAL_TARGET_MEASURES)
 
         # Due date 1-6 months from start
-        start_dt = self.faker.date_between(start_date="-6m", end_date="now")
+        start_dt = self.faker.date_between(start_date=relative_time("-6m"), end_date=relative_time("now"))
         due_date = (start_dt + timedelta(days=self.faker.random_int(30, 180))).isoformat()
 
         # Target value within the target range
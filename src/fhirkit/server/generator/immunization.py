@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 from .clinical_codes import (
     IMMUNIZATION_ROUTES,
     IMMUNIZATION_SITES,
@@ -56,8 +56,8 @@ class ImmunizationGenerator(FHIRResourceGenerator):
         # Generate occurrence date if not provided
         if occurrence_date is None:
             occurrence_dt = self.faker.date_time_between(
-                start_date="-5y",
-                end_date="now",
+                start_date=relative_time("-5y"),
+                end_date=relative_time("now"),
                 tzinfo=timezone.utc,
             )
             occurrence_date = occurrence_dt.isoformat()
@@ -77,8 +77,8 @@ class ImmunizationGenerator(FHIRResourceGenerator):
 
         # Generate expiration date (1-3 years from occurrence)
         exp_date = self.faker.date_between(
-            start_date="+6m",
-            end_date="+3y",
+            start_date=relative_time("+6m"),
+            end_date=relative_time("+3y"),
         ).isoformat()
 
         immunization: dict[str, Any] = {
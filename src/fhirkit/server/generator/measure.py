@@ -1,11 +1,11 @@
 """Measure resource generator."""
 
-from datetime import date, timedelta
+from datetime import timedelta
 from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, generation_date
 from .clinical_codes import (
     MEASURE_EXAMPLES,
     MEASURE_IMPROVEMENT_NOTATION,
@@ -138,7 +138,7 @@ class MeasureGenerator(FHIRResourceGenerator):
             resource["library"] = [library_ref]
 
         # Add effective period
-        today = date.today()
+        today = generation_date()
         start_date = today - timedelta(days=self.faker.random_int(30, 365))
         resource["effectivePeriod"] = {
             "start": start_date.isoformat(),
@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, generation_date
 from .clinical_codes import (
     MEASURE_POPULATION_CODES,
     MEASURE_REPORT_STATUS_CODES,
@@ -69,7 +69,7 @@ class MeasureReportGenerator(FHIRResourceGenerator):
             type_info = self.faker.random_element(MEASURE_REPORT_TYPE_CODES)
 
         # Generate measurement period
-        today = date.today()
+        today = generation_date()
         if period_end:
             end_date = date.fromisoformat(period_end)
         else:
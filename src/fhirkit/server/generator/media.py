@@ -6,7 +6,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 from .clinical_codes import make_codeable_concept
 
 
@@ -160,8 +160,8 @@ class MediaGenerator(FHIRResourceGenerator):
 
         # Generate creation time
         created_datetime = self.faker.date_time_between(
-            start_date="-30d",
-            end_date="now",
+            start_date=relative_time("-30d"),
+            end_date=relative_time("now"),
             tzinfo=timezone.utc,
         )
 
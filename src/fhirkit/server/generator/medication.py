@@ -4,7 +4,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 from .clinical_codes import (
     MEDICATION_DOSE_FORMS,
     MEDICATION_INGREDIENT_STRENGTHS,
@@ -132,7 +132,7 @@ class MedicationGenerator(FHIRResourceGenerator):
         lot_number = self.faker.bothify("??####-##").upper()
 
         # Expiration date 6-36 months from now
-        exp_date = (self.faker.date_between(start_date="+6m", end_date="+3y")).isoformat()
+        exp_date = (self.faker.date_between(start_date=relative_time("+6m"), end_date=relative_time("+3y"))).isoformat()
 
         return {
             "lotNumber": lot_number,
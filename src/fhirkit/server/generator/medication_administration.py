@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 from .clinical_codes import MEDICATIONS_RXNORM, CodingTemplate, make_codeable_concept
 
 
@@ -98,8 +98,8 @@ class MedicationAdministrationGenerator(FHIRResourceGenerator):
 
         # Generate effective time
         effective_time = self.faker.date_time_between(
-            start_date="-30d",
-            end_date="now",
+            start_date=relative_time("-30d"),
+            end_date=relative_time("now"),
             tzinfo=timezone.utc,
         )
 
@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 from .clinical_codes import MEDICATIONS_RXNORM, make_codeable_concept
 
 
@@ -78,15 +78,15 @@ class MedicationDispenseGenerator(FHIRResourceGenerator):
 
         # Generate times
         when_prepared = self.faker.date_time_between(
-            start_date="-7d",
-            end_date="now",
+            start_date=relative_time("-7d"),
+            end_date=relative_time("now"),
             tzinfo=timezone.utc,
         )
 
         when_handed_over = (
             self.faker.date_time_between(
                 start_date=when_prepared,
-                end_date="now",
+                end_date=relative_time("now"),
                 tzinfo=timezone.utc,
             )
             if status == "completed"
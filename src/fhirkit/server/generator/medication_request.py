@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 from .clinical_codes import MEDICATIONS_RXNORM, CodingTemplate, make_codeable_concept
 
 
@@ -67,8 +67,8 @@ class MedicationRequestGenerator(FHIRResourceGenerator):
 
         # Generate authored date
         authored_on = self.faker.date_time_between(
-            start_date="-1y",
-            end_date="now",
+            start_date=relative_time("-1y"),
+            end_date=relative_time("now"),
             tzinfo=timezone.utc,
         )
 
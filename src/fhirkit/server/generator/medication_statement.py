@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 from .clinical_codes import MEDICATIONS_RXNORM, CodingTemplate, make_codeable_concept
 
 
@@ -113,8 +113,8 @@ class MedicationStatementGenerator(FHIRResourceGenerator):
 
         # Generate effective period
         start_date = self.faker.date_time_between(
-            start_date="-2y",
-            end_date="-30d",
+            start_date=relative_time("-2y"),
+            end_date=relative_time("-30d"),
             tzinfo=timezone.utc,
         )
 
@@ -157,7 +157,7 @@ class MedicationStatementGenerator(FHIRResourceGenerator):
         if status in ["completed", "stopped"]:
             end_date = self.faker.date_time_between(
                 start_date=start_date,
-                end_date="now",
+                end_date=relative_time("now"),
                 tzinfo=timezone.utc,
             )
             statement["effectivePeriod"]["end"] = end_date.isoformat()
@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 from .clinical_codes import make_codeable_concept
 
 
@@ -150,8 +150,8 @@ class NutritionOrderGenerator(FHIRResourceGenerator):
 
         # Generate order datetime
         order_datetime = self.faker.date_time_between(
-            start_date="-7d",
-            end_date="now",
+            start_date=relative_time("-7d"),
+            end_date=relative_time("now"),
             tzinfo=timezone.utc,
         )
 
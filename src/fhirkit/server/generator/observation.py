@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 from .clinical_codes import LAB_TESTS, LOINC_SYSTEM, VITAL_SIGNS
 
 
@@ -41,8 +41,8 @@ class ObservationGenerator(FHIRResourceGenerator):
 
         if effective_date is None:
             effective_dt = self.faker.date_time_between(
-                start_date="-1y",
-                end_date="now",
+                start_date=relative_time("-1y"),
+                end_date=relative_time("now"),
                 tzinfo=timezone.utc,
             )
             effective_date = effective_dt.isoformat()
@@ -242,8 +242,8 @@ class ObservationGenerator(FHIRResourceGenerator):
 
         if effective_date is None:
             effective_dt = self.faker.date_time_between(
-                start_date="-1y",
-                end_date="now",
+                start_date=relative_time("-1y"),
+                end_date=relative_time("now"),
                 tzinfo=timezone.utc,
             )
             effective_date = effective_dt.isoformat()
@@ -337,8 +337,8 @@ class ObservationGenerator(FHIRResourceGenerator):
 
         if effective_date is None:
             effective_dt = self.faker.date_time_between(
-                start_date="-1y",
-                end_date="now",
+                start_date=relative_time("-1y"),
+                end_date=relative_time("now"),
                 tzinfo=timezone.utc,
             )
             effective_date = effective_dt.isoformat()
@@ -423,8 +423,8 @@ class ObservationGenerator(FHIRResourceGenerator):
 
         if effective_date is None:
             effective_dt = self.faker.date_time_between(
-                start_date="-1y",
-                end_date="now",
+                start_date=relative_time("-1y"),
+                end_date=relative_time("now"),
                 tzinfo=timezone.utc,
             )
             effective_date = effective_dt.isoformat()
@@ -494,8 +494,8 @@ class ObservationGenerator(FHIRResourceGenerator):
         """
         if effective_date is None:
             effective_dt = self.faker.date_time_between(
-                start_date="-1y",
-                end_date="now",
+                start_date=relative_time("-1y"),
+                end_date=relative_time("now"),
                 tzinfo=timezone.utc,
             )
             effective_date = effective_dt.isoformat()
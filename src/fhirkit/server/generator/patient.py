@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, generation_date
 from .clinical_codes import (
     BIRTH_SEX_EXTENSION_URL,
     GENDER_IDENTITY_CODES,
@@ -154,14 +154,14 @@ class PatientGenerator(FHIRResourceGenerator):
                 min_age, max_age = age_min, age_max
                 break
 
-        today = date.today()
+        today = generation_date()
         start_date = today - timedelta(days=max_age * 365)
         end_date = today - timedelta(days=min_age * 365)
         return self._generate_date(start_date, end_date)
 
     def _calculate_age(self, birth_date: date) -> int:
         """Calculate age from birth date."""
-        today = date.today()
+        today = generation_date()
         age = today.year - birth_date.year
         if (today.month, today.day) < (birth_date.month, birth_date.day):
             age -= 1
@@ -309,8 +309,8 @@ class PatientGenerator(FHIRResourceGenerator):
         # Add period
         official_name["period"] = {
             "start": self._generate_date(
-                date.today() - timedelta(days=365 * 50),
-                date.today() - timedelta(days=365 * 5),
+                generation_date() - timedelta(days=365 * 50),
+                generation_date() - timedelta(days=365 * 5),
             )
         }
 
@@ -326,8 +326,8 @@ class PatientGenerator(FHIRResourceGenerator):
                     "given": [first_name],
                     "period": {
                         "end": self._generate_date(
-                            date.today() - timedelta(days=365 * 20),
-                            date.today() - timedelta(days=365),
+                            generation_date() - timedelta(days=365 * 20),
+                            generation_date() - timedelta(days=365),
                         )
                     },
                 }
@@ -415,8 +415,8 @@ class PatientGenerator(FHIRResourceGenerator):
         address["district"] = self.faker.city() + " County"
         address["period"] = {
             "start": self._generate_date(
-                date.today() - timedelta(days=365 * 20),
-                date.today() - timedelta(days=30),
+                generation_date() - timedelta(days=365 * 20),
+                generation_date() - timedelta(days=30),
             )
         }
         return address
@@ -599,7 +599,7 @@ class PatientGenerator(FHIRResourceGenerator):
     def _generate_deceased_datetime(self, birth_date: date) -> str:
         """Generate deceased datetime."""
         # 70% recent (last 5 years), 30% older
-        today = date.today()
+        today = generation_date()
         age_at_today = self._calculate_age(birth_date)
 
         if self.faker.random.random() < 0.70:
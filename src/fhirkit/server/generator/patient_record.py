@@ -4,6 +4,7 @@ This module provides the PatientRecordGenerator class that orchestrates
 the generation of complete patient records with all related FHIR resources.
 """
 
+import copy
 from typing import Any
 
 from faker import Faker
@@ -207,6 +208,69 @@ class PatientRecordGenerator:
 
         return resources
 
+    def generate_shared_resources(self, include_terminology: bool = True) -> list[dict[str, Any]]:
+        """Generate the resources shared by all patient records.
+
+        These are the terminology and measure resources (optional), the
+        practitioner and organization, and the infrastructure (locations,
+        schedule, slots). Patient records generated afterwards reference them
+        instead of creating their own.
+
+        Args:
+            include_terminology: Generate CodeSystem, ValueSet, ConceptMap, Library and Measure resources
+
+        Returns:
+            List of the newly generated shared resources
+        """
+        resources = self._generate_shared_resources() if include_terminology else []
+        if self._practitioner is None:
+            self._practitioner = self.practitioner_gen.generate()
+            resources.append(self._practitioner)
+        if self._organization is None:
+            self._organization = self.organization_gen.generate()
+            resources.append(self._organization)
+        resources.extend(
+            self._generate_infrastructure(
+                f"Organization/{self._organization['id']}",
+                f"Practitioner/{self._practitioner['id']}",
+            )
+        )
+        return resources
+
+    def use_shared_resources(self, resources: list[dict[str, Any]], book_slots: bool = True) -> None:
+        """Reference shared resources generated elsewhere in new patient records.
+
+        Used to generate parts of one population with separate generators.
+
+        Args:
+            resources: Resources returned by generate_shared_resources
+            book_slots: Let appointments book the free slots. The slots are
+                copied, see ``slots`` for their booking status.
+        """
+        self._shared_resources = []
+        for resource in resources:
+            resource_type = resource.get("resourceType")
+            if resource_type == "Practitioner" and self._practitioner is None:
+                self._practitioner = resource
+            elif resource_type == "Organization" and self._organization is None:
+                self._organization = resource
+            elif resource_type == "Location":
+                self._locations.append(resource)
+            elif resource_type == "Schedule":
+                self._schedules.append(resource)
+            elif resource_type == "Slot":
+                if book_slots:
+                    self._slots.append(copy.deepcopy(resource))
+            else:
+                if resource_type == "Measure":
+                    self._measures.append(resource)
+                self._shared_resources.append(resource)
+
+    @property
+    def slots(self) -> list[dict[str, Any]]:
+        """Slots of the shared schedule, with their current booking status."""
+        return self._slots
+
     def generate_patient_record(
         self,
         # Existing parameters
@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 
 
 class PaymentNoticeGenerator(FHIRResourceGenerator):
@@ -67,7 +67,9 @@ class PaymentNoticeGenerator(FHIRResourceGenerator):
             created = datetime.now().isoformat()
 
         if payment_date is None:
-            payment_date = self.faker.date_between(start_date="-30d", end_date="today").isoformat()
+            payment_date = self.faker.date_between(
+                start_date=relative_time("-30d"), end_date=relative_time("today")
+            ).isoformat()
 
         if amount is None:
             amount = float(self.faker.random_int(100, 10000))
@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 
 
 class PaymentReconciliationGenerator(FHIRResourceGenerator):
@@ -78,10 +78,14 @@ class PaymentReconciliationGenerator(FHIRResourceGenerator):
             created = datetime.now().isoformat()
 
         if payment_date is None:
-            payment_date = self.faker.date_between(start_date="-30d", end_date="today").isoformat()
+            payment_date = self.faker.date_between(
+                start_date=relative_time("-30d"), end_date=relative_time("today")
+            ).isoformat()
 
         if period_start is None:
-            period_start = self.faker.date_between(start_date="-60d", end_date="-30d").isoformat()
+            period_start = self.faker.date_between(
+                start_date=relative_time("-60d"), end_date=relative_time("-30d")
+            ).isoformat()
 
         if period_end is None:
             period_end = payment_date
@@ -0,0 +1,209 @@
+"""Sharded, streaming generation of synthetic populations.
+
+``PatientRecordGenerator.generate_population`` builds a whole population in
+one list. ``PopulationGenerator`` produces the same kind of data as a stream
+instead, so populations of any size can be written or loaded with bounded
+memory:
+
+- the shared resources (terminology, practitioner, organization, locations,
+  schedule) are generated once
+- patients are generated in fixed-size shards, each with its own seed
+  derived from the population seed, optionally in worker processes; at most
+  ``max_pending`` shards are in flight and results come back in shard order
+- all dates are generated relative to one reference time
+
+For the same seed, reference time and shard size the output is identical
+whatever the number of workers.
+
+Example:
+    generator = PopulationGenerator(100_000, seed=42, workers=8)
+    counts = write_ndjson_by_type(generator.iter_resources(), Path("population"))
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import random
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Any
+
+from .base import fixed_generation_time, generation_time
+from .patient_record import PatientRecordGenerator
+
+DEFAULT_SHARD_SIZE = 100
+
+
+def shard_seed(seed: int, shard: int) -> int:
+    """Derive the seed of one shard from the population seed."""
+    digest = hashlib.blake2b(f"{seed}:{shard}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+@dataclass(frozen=True, slots=True)
+class Shard:
+    """A range of patients generated with one seed."""
+
+    index: int
+    count: int
+    seed: int
+
+
+def _generate_shard(
+    shard: Shard,
+    shared: list[dict[str, Any]],
+    reference_time: datetime,
+    record_options: dict[str, Any],
+) -> list[dict[str, Any]]:
+    """Generate the patient records of one shard."""
+    with fixed_generation_time(reference_time):
+        generator = PatientRecordGenerator(seed=shard.seed)
+        # Only the first shard books the shared slots, so appointments never
+        # double-book a slot; it also returns the slots with their status
+        generator.use_shared_resources(shared, book_slots=shard.index == 0)
+        resources: list[dict[str, Any]] = []
+        for _ in range(shard.count):
+            resources.extend(generator.generate_patient_record(**record_options))
+        if shard.index == 0:
+            resources.extend(generator.slots)
+        return resources
+
+
+# Shared resources and options of each worker process
+_worker_state: tuple[list[dict[str, Any]], datetime, dict[str, Any]] | None = None
+
+
+def _init_worker(shared: list[dict[str, Any]], reference_time: datetime, record_options: dict[str, Any]) -> None:
+    global _worker_state
+    _worker_state = (shared, reference_time, record_options)
+
+
+def _generate_in_worker(shard: Shard) -> list[dict[str, Any]]:
+    assert _worker_state is not None, "Worker not initialized"
+    return _generate_shard(shard, *_worker_state)
+
+
+class PopulationGenerator:
+    """Generates a synthetic population as a stream of resources.
+
+    Args:
+        num_patients: Number of patients to generate
+        seed: Population seed; a random one is chosen if None
+        workers: Number of worker processes; 1 generates in this process
+        shard_size: Patients per shard. Part of the output's identity: the
+            same seed with another shard size gives other patients.
+        include_terminology: Generate CodeSystem, ValueSet, ConceptMap, Library and Measure resources
+        include_group: Generate a Group of all patients at the end
+        reference_time: Time that generated dates are relative to (default: now)
+        max_pending: Shards in flight at a time (default: 2 per worker)
+        **record_options: Arguments passed to generate_patient_record
+    """
+
+    def __init__(
+        self,
+        num_patients: int,
+        seed: int | None = None,
+        workers: int = 1,
+        shard_size: int = DEFAULT_SHARD_SIZE,
+        include_terminology: bool = True,
+        include_group: bool = True,
+        reference_time: datetime | None = None,
+        max_pending: int | None = None,
+        **record_options: Any,
+    ) -> None:
+        self.num_patients = max(0, num_patients)
+        self.seed = seed if seed is not None else random.SystemRandom().getrandbits(63)
+        self.workers = max(1, workers)
+        self.shard_size = max(1, shard_size)
+        self.include_terminology = include_terminology
+        self.include_group = include_group
+        self.reference_time = reference_time or generation_time()
+        self.max_pending = max(1, max_pending or self.workers * 2)
+        self.record_options = record_options
+
+    def shards(self) -> list[Shard]:
+        """The shards of the population, in output order."""
+        return [
+            Shard(index, min(self.shard_size, self.num_patients - start), shard_seed(self.seed, index))
+            for index, start in enumerate(range(0, self.num_patients, self.shard_size))
+        ]
+
+    def _shard_results(self, shared: list[dict[str, Any]]) -> Iterator[list[dict[str, Any]]]:
+        if self.workers == 1:
+            for shard in self.shards():
+                yield _generate_shard(shard, shared, self.reference_time, self.record_options)
+            return
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(shared, self.reference_time, self.record_options),
+        ) as pool:
+            pending: deque[Future[list[dict[str, Any]]]] = deque()
+            for shard in self.shards():
+                if len(pending) >= self.max_pending:
+                    yield pending.popleft().result()
+                pending.append(pool.submit(_generate_in_worker, shard))
+            while pending:
+                yield pending.popleft().result()
+
+    def iter_resources(self) -> Iterator[dict[str, Any]]:
+        """Generate the population.
+
+        Yields:
+            The shared resources, then the patient records shard by shard,
+            then the Group of all patients
+        """
+        generator = PatientRecordGenerator(seed=self.seed)
+        with fixed_generation_time(self.reference_time):
+            shared = generator.generate_shared_resources(self.include_terminology)
+        # Slots are returned by the shard that books them
+        yield from (resource for resource in shared if resource["resourceType"] != "Slot")
+
+        patient_refs: list[str] = []
+        for resources in self._shard_results(shared):
+            for resource in resources:
+                if resource["resourceType"] == "Patient":
+                    patient_refs.append(f"Patient/{resource['id']}")
+                yield resource
+
+        if self.include_group and patient_refs:
+            organization = next((r for r in shared if r["resourceType"] == "Organization"), None)
+            with fixed_generation_time(self.reference_time):
+                yield generator.group_gen.generate(
+                    member_refs=patient_refs,
+                    managing_entity_ref=f"Organization/{organization['id']}" if organization else None,
+                )
+
+
+def default_workers() -> int:
+    """Number of worker processes to use by default."""
+    return os.cpu_count() or 1
+
+
+def write_ndjson_by_type(resources: Iterable[dict[str, Any]], directory: Path) -> dict[str, int]:
+    """Write resources to one NDJSON file per resource type (``Patient.ndjson``, ...).
+
+    Returns:
+        Number of resources written per resource type
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    counts: dict[str, int] = {}
+    with ExitStack() as stack:
+        files: dict[str, IO[str]] = {}
+        for resource in resources:
+            resource_type = resource["resourceType"]
+            stream = files.get(resource_type)
+            if stream is None:
+                stream = files[resource_type] = stack.enter_context(open(directory / f"{resource_type}.ndjson", "w"))
+            stream.write(json.dumps(resource))
+            stream.write("\n")
+            counts[resource_type] = counts.get(resource_type, 0) + 1
+    return counts
@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 from .clinical_codes import PROCEDURES_SNOMED, CodingTemplate, make_codeable_concept
 
 
@@ -48,8 +48,8 @@ class ProcedureGenerator(FHIRResourceGenerator):
         # Generate performed date
         if performed_date is None:
             performed_dt = self.faker.date_time_between(
-                start_date="-1y",
-                end_date="now",
+                start_date=relative_time("-1y"),
+                end_date=relative_time("now"),
                 tzinfo=timezone.utc,
             )
             performed_date = performed_dt.isoformat()
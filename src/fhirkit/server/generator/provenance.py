@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 from .clinical_codes import make_codeable_concept
 
 
@@ -141,14 +141,14 @@ class ProvenanceGenerator(FHIRResourceGenerator):
 
         # Generate times
         occurred_datetime = self.faker.date_time_between(
-            start_date="-30d",
-            end_date="now",
+            start_date=relative_time("-30d"),
+            end_date=relative_time("now"),
             tzinfo=timezone.utc,
         )
 
         recorded = self.faker.date_time_between(
             start_date=occurred_datetime,
-            end_date="now",
+            end_date=relative_time("now"),
             tzinfo=timezone.utc,
         )
 
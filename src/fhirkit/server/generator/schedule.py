@@ -1,11 +1,11 @@
 """Schedule resource generator."""
 
-from datetime import datetime, timedelta, timezone
+from datetime import timedelta
 from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, generation_time
 
 
 class ScheduleGenerator(FHIRResourceGenerator):
@@ -72,7 +72,7 @@ class ScheduleGenerator(FHIRResourceGenerator):
         service_type = self.faker.random_element(self.SERVICE_TYPES)
         specialty = self.faker.random_element(self.SPECIALTIES)
 
-        now = datetime.now(timezone.utc)
+        now = generation_time()
         planning_end = now + timedelta(days=planning_horizon_days)
 
         schedule: dict[str, Any] = {
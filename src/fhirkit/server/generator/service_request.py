@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 from .clinical_codes import (
     SERVICE_REQUEST_CATEGORIES,
     SERVICE_REQUEST_ORDER_CODES,
@@ -94,8 +94,8 @@ class ServiceRequestGenerator(FHIRResourceGenerator):
         # Authored on
         if authored_on is None:
             authored_dt = self.faker.date_time_between(
-                start_date="-6m",
-                end_date="now",
+                start_date=relative_time("-6m"),
+                end_date=relative_time("now"),
                 tzinfo=timezone.utc,
             )
             authored_on = authored_dt.isoformat()
@@ -1,11 +1,11 @@
 """Slot resource generator."""
 
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timedelta
 from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, generation_time
 
 
 class SlotGenerator(FHIRResourceGenerator):
@@ -81,7 +81,7 @@ class SlotGenerator(FHIRResourceGenerator):
             future_days = self.faker.random_int(min=1, max=14)
             hour = self.faker.random_int(min=8, max=16)
             minute = self.faker.random_element([0, 15, 30, 45])
-            start = datetime.now(timezone.utc) + timedelta(days=future_days)
+            start = generation_time() + timedelta(days=future_days)
             start = start.replace(hour=hour, minute=minute, second=0, microsecond=0)
 
         end = start + timedelta(minutes=duration_minutes)
@@ -138,7 +138,7 @@ class SlotGenerator(FHIRResourceGenerator):
             List of Slot resources for the day
         """
         if date is None:
-            date = datetime.now(timezone.utc) + timedelta(days=1)
+            date = generation_time() + timedelta(days=1)
             date = date.replace(hour=0, minute=0, second=0, microsecond=0)
 
         slots = []
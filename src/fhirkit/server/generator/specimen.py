@@ -5,7 +5,7 @@ from typing import Any
 
 from faker import Faker
 
-from .base import FHIRResourceGenerator
+from .base import FHIRResourceGenerator, relative_time
 from .clinical_codes import make_codeable_concept
 
 
@@ -133,15 +133,15 @@ class SpecimenGenerator(FHIRResourceGenerator):
 
         # Generate collection time
         collection_time = self.faker.date_time_between(
-            start_date="-7d",
-            end_date="now",
+            start_date=relative_time("-7d"),
+            end_date=relative_time("now"),
             tzinfo=timezone.utc,
         )
 
         # Generate received time (slightly after collection)
         received_time = self.faker.date_time_between(
             start_date=collection_time,
-            end_date="now",
+            end_date=relative_time("now"),
             tzinfo=timezone.utc,
         )
 
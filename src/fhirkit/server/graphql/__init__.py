@@ -7,7 +7,8 @@ Features:
 - Query any FHIR resource by ID
 - Search resources with FHIR search parameters
 - Cursor-based pagination via GraphQL Connections
-- Inline reference resolution
+- Inline reference resolution, batched and cached per request
+- Query cost limit on the estimated fan-out of a query
 - Create, Update, Delete mutations
 
 Usage:
@@ -21,6 +22,8 @@ Usage:
     app.include_router(graphql_router, prefix="/baseR4/$graphql")
 """
 
+from .cost import QueryCostLimiter, estimate_cost
+from .loaders import create_reference_loader, reference_key
 from .resolvers import (
     ConnectionResolver,
     ListResolver,
@@ -83,6 +86,11 @@ __all__ = [
     "ListResolver",
     "ConnectionResolver",
     "MutationResolver",
+    # Reference loading and query cost
+    "create_reference_loader",
+    "reference_key",
+    "QueryCostLimiter",
+    "estimate_cost",
     # Utilities
     "fhir_param_to_graphql",
     "graphql_param_to_fhir",
@@ -0,0 +1,197 @@
+"""Query cost analysis for the GraphQL endpoint.
+
+A small query can fan out into a large amount of work: every field under a
+list is resolved once per item, and lists nest. The cost of a query is an
+estimate of the number of fields resolved:
+
+- a field costs one per time it is resolved
+- the fields under a list are resolved once per item. The number of items
+  is the page size argument of the list (``_count``, or its default), the
+  ``first`` or ``last`` of the connection the list is the ``edges`` of, or
+  one for lists without a page size (``references``).
+
+So ``observations(_count: 1000) { id reference(path: "subject") { resource } }``
+costs 1 + 1000 * 3, and ``patientConnection(first: 50) { edges { node { id } } }``
+costs 1 + 1 + 50 * 2. Queries costing more than the limit are rejected before
+any resolver runs.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from typing import Any
+
+from graphql import (
+    DocumentNode,
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLField,
+    GraphQLList,
+    GraphQLObjectType,
+    GraphQLSchema,
+    InlineFragmentNode,
+    IntValueNode,
+    OperationDefinitionNode,
+    SelectionSetNode,
+    ValidationContext,
+    ValidationRule,
+    VariableNode,
+    get_named_type,
+    get_nullable_type,
+)
+from strawberry.extensions import SchemaExtension
+
+# Arguments that set the number of items of a page
+_PAGE_SIZE_ARGS = ("_count", "first", "last")
+# Page size of connections without first or last (see ConnectionResolver)
+DEFAULT_CONNECTION_SIZE = 10
+
+
+def estimate_cost(
+    schema: GraphQLSchema,
+    document: DocumentNode,
+    variables: dict[str, Any] | None = None,
+    operation_name: str | None = None,
+) -> int:
+    """Estimate the number of fields a query resolves.
+
+    Args:
+        schema: GraphQL schema the document is valid for
+        document: Parsed query document
+        variables: Variable values of the request
+        operation_name: Operation to estimate, for documents with several
+
+    Returns:
+        Estimated cost, 0 if the operation is not found
+    """
+    fragments = {
+        definition.name.value: definition
+        for definition in document.definitions
+        if isinstance(definition, FragmentDefinitionNode)
+    }
+    for definition in document.definitions:
+        if not isinstance(definition, OperationDefinitionNode):
+            continue
+        if operation_name and (definition.name is None or definition.name.value != operation_name):
+            continue
+        root = schema.get_root_type(definition.operation)
+        if root is None:
+            return 0
+        return _CostWalker(fragments, variables or {}).selection_set_cost(definition.selection_set, root, 1)
+    return 0
+
+
+class _CostWalker:
+    """Sums the cost of the fields of a selection set."""
+
+    def __init__(self, fragments: dict[str, FragmentDefinitionNode], variables: dict[str, Any]) -> None:
+        self.fragments = fragments
+        self.variables = variables
+
+    def selection_set_cost(
+        self, selection_set: SelectionSetNode, parent: GraphQLObjectType, times: int, page_size: int = 1
+    ) -> int:
+        """Get the cost of a selection set resolved ``times`` times.
+
+        ``page_size`` is the page size of an enclosing connection, which
+        applies to the first list below it (its ``edges``).
+        """
+        cost = 0
+        for field_node, parent_type in self._fields(selection_set, parent, set()):
+            cost += times
+            field = parent_type.fields.get(field_node.name.value)
+            if field is None or field_node.selection_set is None:
+                # Introspection and leaf fields
+                continue
+            field_type = get_named_type(field.type)
+            if not isinstance(field_type, GraphQLObjectType):
+                continue
+            size = self._page_size(field_node, field) or page_size
+            if isinstance(get_nullable_type(field.type), GraphQLList):
+                cost += self.selection_set_cost(field_node.selection_set, field_type, times * size)
+            else:
+                cost += self.selection_set_cost(field_node.selection_set, field_type, times, size)
+        return cost
+
+    def _fields(
+        self, selection_set: SelectionSetNode, parent: GraphQLObjectType, spread: set[str]
+    ) -> Iterator[tuple[FieldNode, GraphQLObjectType]]:
+        """Flatten the fields of a selection set, with the type they are selected on."""
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                yield selection, parent
+            elif isinstance(selection, InlineFragmentNode):
+                yield from self._fields(selection.selection_set, parent, spread)
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                fragment = self.fragments.get(name)
+                # A fragment spread in itself is invalid; count it once
+                if fragment is not None and name not in spread:
+                    yield from self._fields(fragment.selection_set, parent, spread | {name})
+
+    def _page_size(self, field_node: FieldNode, field: GraphQLField) -> int | None:
+        """Get the page size a field is queried with, or None if it has no page size argument."""
+        if not any(name in field.args for name in _PAGE_SIZE_ARGS):
+            return None
+        arguments = {argument.name.value: argument.value for argument in field_node.arguments or ()}
+        for name in _PAGE_SIZE_ARGS:
+            if name not in field.args:
+                continue
+            default = field.args[name].default_value
+            node = arguments.get(name)
+            if isinstance(node, IntValueNode):
+                value = int(node.value)
+            elif isinstance(node, VariableNode):
+                value = self.variables.get(node.name.value, default)
+            else:
+                value = default
+            if isinstance(value, int) and value > 0:
+                return value
+        return DEFAULT_CONNECTION_SIZE
+
+
+class QueryCostLimiter(SchemaExtension):
+    """Rejects queries whose estimated cost exceeds a limit.
+
+    The estimate uses the variables of the request, so the extension is
+    created per request.
+
+    Example:
+        schema = strawberry.Schema(query=Query, extensions=[partial(QueryCostLimiter, max_cost=20000)])
+    """
+
+    def __init__(self, max_cost: int) -> None:
+        """Initialize the limiter.
+
+        Args:
+            max_cost: Highest estimated cost of an accepted query
+        """
+        self.max_cost = max_cost
+
+    def on_operation(self) -> Iterator[None]:
+        context = self.execution_context
+        context.validation_rules = (
+            *context.validation_rules,
+            _cost_rule(self.max_cost, context.variables, context.operation_name),
+        )
+        yield
+
+
+def _cost_rule(max_cost: int, variables: dict[str, Any] | None, operation_name: str | None) -> type[ValidationRule]:
+    """Create a validation rule rejecting documents costing more than a limit."""
+
+    class QueryCostRule(ValidationRule):
+        def __init__(self, context: ValidationContext) -> None:
+            super().__init__(context)
+            cost = estimate_cost(context.schema, context.document, variables, operation_name)
+            if cost > max_cost:
+                context.report_error(
+                    GraphQLError(
+                        f"Query cost {cost} exceeds the limit of {max_cost}; "
+                        "request smaller pages (_count, first) or fewer nested fields"
+                    )
+                )
+
+    return QueryCostRule
@@ -0,0 +1,61 @@
+"""Batched reference resolution for GraphQL queries.
+
+A query such as ``observations { reference(path: "subject") { resource } }``
+resolves one reference per Observation. Instead of reading each target from
+the store as its field is resolved, every request gets a ``DataLoader``:
+
+- references resolved in the same pass over the response are collected and
+  read from the store in one batch
+- each target is read once per request, however many resources refer to it
+  (``Patient/1`` and ``http://server/fhir/Patient/1`` are the same target).
+  Versioned references (``Patient/1/_history/2``) are read from the version
+  history, so they resolve to the version they name.
+
+The loader lives in the request context, so nothing is cached across requests
+and writes are seen by the next query.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Optional
+
+from strawberry.dataloader import DataLoader
+
+
+def reference_key(reference: str, reference_type: str | None = None) -> str | None:
+    """Get the ``{type}/{id}`` key of a reference, ``{type}/{id}/_history/{vid}`` for a version.
+
+    Args:
+        reference: Relative (``Patient/1``) or absolute reference, or a bare ID
+        reference_type: Type of the target, for references without one
+
+    Returns:
+        The key, or None if the reference has no type or is to a contained resource
+    """
+    if reference.startswith("#"):
+        return None
+    parts = reference.rstrip("/").split("/")
+    if len(parts) >= 4 and parts[-2] == "_history":
+        return f"{parts[-4]}/{parts[-3]}/_history/{parts[-1]}"
+    if len(parts) >= 2:
+        return f"{parts[-2]}/{parts[-1]}"
+    if reference_type:
+        return f"{reference_type}/{reference}"
+    return None
+
+
+def create_reference_loader(store: Any) -> DataLoader[str, Optional[dict[str, Any]]]:
+    """Create the reference loader of a request.
+
+    Args:
+        store: FHIRStore to read the targets from
+
+    Returns:
+        DataLoader of resources by reference key (see reference_key), None
+        for missing resources
+    """
+
+    async def load(keys: list[str]) -> list[Optional[dict[str, Any]]]:
+        return store.read_many(keys)
+
+    return DataLoader(load_fn=load)
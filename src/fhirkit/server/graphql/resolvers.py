@@ -4,6 +4,7 @@ This module contains resolver functions that bridge GraphQL queries/mutations
 to the underlying FHIR store operations.
 """
 
+import sys
 from typing import Any, Optional
 
 from .types import (
@@ -18,6 +19,35 @@ from .types import (
 from .utils import graphql_param_to_fhir
 
 
+def search_resources(store: Any, resource_type: str, params: dict[str, Any]) -> list[dict[str, Any]]:
+    """Find the resources of a type matching search parameters.
+
+    Parameters the store keeps an index for (such as string parameters like
+    name) are looked up in the store; the others are applied as filters.
+
+    Args:
+        store: FHIRStore instance
+        resource_type: The FHIR resource type
+        params: FHIR search parameters
+
+    Returns:
+        Matching resources
+    """
+    # Import here to avoid circular imports
+    from ..api.search import filter_resources_advanced
+
+    indexed = {name: value for name, value in params.items() if store.is_indexed(resource_type, name)}
+    if indexed:
+        resources, _ = store.search(resource_type, indexed, _count=sys.maxsize)
+    else:
+        resources = store.get_all_resources(resource_type)
+
+    remaining = {name: value for name, value in params.items() if name not in indexed}
+    if remaining:
+        return filter_resources_advanced(resources, resource_type, remaining, store)
+    return resources
+
+
 class ResourceResolver:
     """Resolver for single resource queries.
 
@@ -85,7 +115,7 @@ class ListResolver:
             List of matching resources
         """
         # Import here to avoid circular imports
-        from ..api.search import filter_resources_advanced, sort_resources
+        from ..api.search import sort_resources
 
         # Convert GraphQL param names to FHIR param names
         fhir_params = {}
@@ -94,14 +124,8 @@ class ListResolver:
                 fhir_key = graphql_param_to_fhir(key)
                 fhir_params[fhir_key] = value
 
-        # Get all resources of type
-        resources = self.store.get_all_resources(resource_type)
-
-        # Apply filters
-        if fhir_params:
-            filtered = filter_resources_advanced(resources, resource_type, fhir_params, self.store)
-        else:
-            filtered = resources
+        # Look up indexed params in the store, then filter by the rest
+        filtered = search_resources(self.store, resource_type, fhir_params)
 
         # Apply sorting
         if _sort:
@@ -156,7 +180,7 @@ class ConnectionResolver:
             ResourceConnection with edges and page info
         """
         # Import here to avoid circular imports
-        from ..api.search import filter_resources_advanced, sort_resources
+        from ..api.search import sort_resources
 
         # Convert GraphQL param names to FHIR param names
         fhir_params = {}
@@ -165,14 +189,8 @@ class ConnectionResolver:
                 fhir_key = graphql_param_to_fhir(key)
                 fhir_params[fhir_key] = value
 
-        # Get all resources of type
-        resources = self.store.get_all_resources(resource_type)
-
-        # Apply filters
-        if fhir_params:
-            filtered = filter_resources_advanced(resources, resource_type, fhir_params, self.store)
-        else:
-            filtered = resources
+        # Look up indexed params in the store, then filter by the rest
+        filtered = search_resources(self.store, resource_type, fhir_params)
 
         # Apply sorting
         if _sort:
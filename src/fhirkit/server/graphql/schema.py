@@ -13,6 +13,7 @@ without manually defining each one.
 """
 
 import logging
+from functools import partial
 from typing import Annotated, Any, Optional
 
 import strawberry
@@ -21,6 +22,8 @@ from strawberry.scalars import JSON
 
 from ..api.routes import SUPPORTED_TYPES
 from ..storage.fhir_store import FHIRStore
+from .cost import QueryCostLimiter
+from .loaders import create_reference_loader
 from .resolvers import ConnectionResolver, ListResolver, MutationResolver, ResourceResolver
 from .types import Resource, ResourceConnection
 
@@ -34,7 +37,7 @@ FhirOffset = Annotated[int, strawberry.argument(name="_offset")]
 FhirSort = Annotated[Optional[str], strawberry.argument(name="_sort")]
 
 
-def create_schema(store: FHIRStore) -> strawberry.Schema:
+def create_schema(store: FHIRStore, max_cost: int = 0) -> strawberry.Schema:
     """Create the GraphQL schema with all FHIR resource queries and mutations.
 
     This function dynamically generates:
@@ -43,6 +46,7 @@ def create_schema(store: FHIRStore) -> strawberry.Schema:
 
     Args:
         store: FHIRStore instance for data access
+        max_cost: Highest estimated query cost accepted (0 for no limit)
 
     Returns:
         Configured Strawberry GraphQL schema
@@ -2249,10 +2253,11 @@ def create_schema(store: FHIRStore) -> strawberry.Schema:
             return mutation_resolver.delete("StructureDefinition", _id)
 
     # Create and return schema
-    return strawberry.Schema(query=Query, mutation=Mutation)
+    extensions = [partial(QueryCostLimiter, max_cost=max_cost)] if max_cost > 0 else []
+    return strawberry.Schema(query=Query, mutation=Mutation, extensions=extensions)
 
 
-def create_graphql_router(store: FHIRStore) -> GraphQLRouter:
+def create_graphql_router(store: FHIRStore, max_cost: int = 0) -> GraphQLRouter:
     """Create a FastAPI router for the GraphQL endpoint.
 
     This creates a GraphQL router that can be mounted in the FastAPI app
@@ -2260,15 +2265,16 @@ def create_graphql_router(store: FHIRStore) -> GraphQLRouter:
 
     Args:
         store: FHIRStore instance for data access
+        max_cost: Highest estimated query cost accepted (0 for no limit)
 
     Returns:
         Configured GraphQLRouter ready to be mounted
     """
-    schema = create_schema(store)
+    schema = create_schema(store, max_cost=max_cost)
 
     def get_context():
-        """Provide context to resolvers."""
-        return {"store": store}
+        """Provide context to resolvers, with a reference loader per request."""
+        return {"store": store, "reference_loader": create_reference_loader(store)}
 
     import json
 
@@ -11,6 +11,8 @@ from typing import TYPE_CHECKING, Any, Optional
 import strawberry
 from strawberry.scalars import JSON
 
+from .loaders import reference_key
+
 if TYPE_CHECKING:
     from ..storage.fhir_store import FHIRStore
 
@@ -81,7 +83,7 @@ class Reference:
     _store: strawberry.Private[Optional["FHIRStore"]] = None
 
     @strawberry.field(description="Resolve this reference to its target resource")
-    def resource(
+    async def resource(
         self,
         info: strawberry.Info,
         optional: bool = False,
@@ -89,7 +91,9 @@ class Reference:
         """Resolve reference to the actual resource.
 
         This implements the FHIR GraphQL reference resolution pattern where
-        clients can request inline resolution of references.
+        clients can request inline resolution of references. Targets are read
+        through the request's reference loader, so the references of a
+        response are read in batches and each target once.
 
         Args:
             info: Strawberry info context
@@ -107,20 +111,17 @@ class Reference:
                 return None
             raise ValueError("Store not available in context")
 
-        # Parse reference string (e.g., "Patient/123" or just "123")
-        if "/" in self.reference:
-            ref_type, ref_id = self.reference.split("/", 1)
-        else:
-            # If no type in reference, use the type field
-            ref_type = self.type  # type: ignore[assignment]
-            ref_id = self.reference
-
-        if not ref_type:
+        key = reference_key(self.reference, self.type)
+        if key is None:
             if optional:
                 return None
             raise ValueError(f"Cannot determine resource type for reference: {self.reference}")
 
-        resource = store.read(ref_type, ref_id)
+        loader = info.context.get("reference_loader")
+        if loader is not None:
+            resource = await loader.load(key)
+        else:
+            resource = store.read_many([key])[0]
 
         if resource is None and not optional:
             raise ValueError(f"Reference not found: {self.reference}")
@@ -248,6 +249,17 @@ class Resource:
         """Return the full resource as JSON."""
         return self._raw_data
 
+    @strawberry.field(description="The first reference at a path of the resource (e.g. 'subject')")
+    def reference(self, path: str) -> Optional[Reference]:
+        """Return the first reference at a dotted element path."""
+        found = references_at(self._raw_data, path)
+        return dict_to_reference(found[0]) if found else None
+
+    @strawberry.field(description="All references at a path of the resource (e.g. 'performer')")
+    def references(self, path: str) -> list[Reference]:
+        """Return the references at a dotted element path, in document order."""
+        return [dict_to_reference(data) for data in references_at(self._raw_data, path)]  # type: ignore[misc]
+
     @classmethod
     def from_dict(cls, data: dict[str, Any]) -> "Resource":
         """Create a Resource from a dictionary.
@@ -407,6 +419,32 @@ def dict_to_reference(data: dict[str, Any] | None) -> Reference | None:
     )
 
 
+def references_at(data: dict[str, Any], path: str) -> list[dict[str, Any]]:
+    """Get the references at a dotted element path of a resource.
+
+    Repeating elements along the path are followed into each repetition, so
+    ``participant.individual`` gives the individual of every participant.
+
+    Args:
+        data: Resource as dictionary
+        path: Element names separated by dots
+
+    Returns:
+        The Reference elements found, in document order
+    """
+    values: list[Any] = [data]
+    for name in path.split("."):
+        found: list[Any] = []
+        for value in values:
+            element = value.get(name) if isinstance(value, dict) else None
+            if isinstance(element, list):
+                found.extend(element)
+            elif element is not None:
+                found.append(element)
+        values = found
+    return [value for value in values if isinstance(value, dict) and value.get("reference")]
+
+
 def dict_to_codeable_concept(data: dict[str, Any] | None) -> CodeableConcept | None:
     """Convert a dictionary to a CodeableConcept type.
 
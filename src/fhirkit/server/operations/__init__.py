@@ -1,8 +1,10 @@
 """FHIR operations module.
 
-This module provides implementations for FHIR operations like $translate, $match, $document, and $summary.
+This module provides implementations for FHIR operations like $translate, $match, $document, and $summary,
+and population-wide duplicate detection.
 """
 
+from .dedup import DuplicateFinder, DuplicatePair
 from .document import DocumentGenerator
 from .ips_summary import IPSSummaryGenerator
 from .match import PatientMatcher
@@ -11,6 +13,8 @@ from .translate import ConceptMapTranslator
 __all__ = [
     "ConceptMapTranslator",
     "DocumentGenerator",
+    "DuplicateFinder",
+    "DuplicatePair",
     "IPSSummaryGenerator",
     "PatientMatcher",
 ]
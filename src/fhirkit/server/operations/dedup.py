@@ -0,0 +1,218 @@
+"""Population-wide detection of duplicate Patients.
+
+``Patient/$match`` finds the matches of one patient. ``DuplicateFinder``
+finds the likely duplicates within a whole population, without comparing
+every pair of patients:
+
+- patients are grouped into blocks by their blocking keys (identifier,
+  phonetic name with birth year, phone, email, postal code; see
+  ``match_index``), and only patients in the same block are compared
+- blocks larger than ``max_block_size`` are left out, so that a common key
+  (a postal code of a large town) does not cost a quadratic number of
+  comparisons
+- a pair sharing several keys is compared once, in the block of the
+  smallest key they share
+- blocks are compared in chunks, optionally in worker processes; at most
+  ``max_pending`` chunks are in flight and results come back in chunk order
+
+Pairs are scored with the field weights of ``PatientMatcher``.
+
+Example:
+    finder = DuplicateFinder(threshold=0.8, workers=8)
+    with open("duplicates.ndjson", "w") as out:
+        write_ndjson(finder.run(iter_patients(Path("Patient.ndjson"))), out)
+"""
+
+from __future__ import annotations
+
+import json
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, TextIO
+
+from fhirkit.engine.elm.population import find_patient, iter_patient_bundles
+
+from ..storage.match_index import blocking_keys
+from .match import PatientMatcher
+
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_MAX_BLOCK_SIZE = 1000
+# Pair comparisons per chunk of blocks sent to a worker
+CHUNK_COMPARISONS = 20000
+
+# Patient elements used for scoring; the rest is not kept or sent to workers
+_MATCH_FIELDS = ("id", "identifier", "name", "birthDate", "gender", "telecom", "address")
+
+# A block: its key and its patients, each with the keys it shares with other patients
+Block = tuple[str, list[tuple[dict[str, Any], frozenset[str]]]]
+
+
+@dataclass(frozen=True, slots=True)
+class DuplicatePair:
+    """Two patients that are likely the same person.
+
+    Attributes:
+        patient_a: ID of the patient that comes first in the input
+        patient_b: ID of the other patient
+        score: Match score of the pair (0.0 - 1.0)
+        grade: Match grade (certain, probable, possible)
+        key: Blocking key the pair was compared under
+    """
+
+    patient_a: str
+    patient_b: str
+    score: float
+    grade: str
+    key: str
+
+    def to_row(self) -> dict[str, Any]:
+        """Convert to a JSON-serializable output row."""
+        return {
+            "patientA": f"Patient/{self.patient_a}",
+            "patientB": f"Patient/{self.patient_b}",
+            "score": round(self.score, 4),
+            "grade": self.grade,
+            "key": self.key,
+        }
+
+
+def _compare_blocks(blocks: list[Block], threshold: float) -> list[DuplicatePair]:
+    """Score the pairs of patients of each block, for the pairs whose smallest shared key is the block's."""
+    matcher = PatientMatcher()
+    pairs: list[DuplicatePair] = []
+    for key, members in blocks:
+        for i, (patient_a, keys_a) in enumerate(members):
+            for patient_b, keys_b in members[i + 1 :]:
+                if min(keys_a & keys_b) != key:
+                    continue
+                score = matcher.score(patient_a, patient_b)
+                if score >= threshold:
+                    pairs.append(DuplicatePair(patient_a["id"], patient_b["id"], score, matcher.grade(score), key))
+    return pairs
+
+
+# Threshold of each worker process
+_worker_threshold: float | None = None
+
+
+def _init_worker(threshold: float) -> None:
+    global _worker_threshold
+    _worker_threshold = threshold
+
+
+def _compare_in_worker(blocks: list[Block]) -> list[DuplicatePair]:
+    assert _worker_threshold is not None, "Worker not initialized"
+    return _compare_blocks(blocks, _worker_threshold)
+
+
+class DuplicateFinder:
+    """Finds likely duplicate patients in a population by blocked pair comparison.
+
+    Args:
+        threshold: Minimum match score of a reported pair
+        workers: Number of worker processes; 1 compares in this process
+        max_block_size: Blocks with more patients are not compared
+        max_pending: Chunks in flight at a time (default: 2 per worker)
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_THRESHOLD,
+        workers: int = 1,
+        max_block_size: int = DEFAULT_MAX_BLOCK_SIZE,
+        max_pending: int | None = None,
+    ) -> None:
+        self.threshold = threshold
+        self.workers = max(1, workers)
+        self.max_block_size = max(2, max_block_size)
+        self.max_pending = max(1, max_pending or self.workers * 2)
+        # Blocks left out for their size in the last run
+        self.skipped_blocks = 0
+
+    def run(self, patients: Iterable[dict[str, Any]]) -> Iterator[DuplicatePair]:
+        """Find the likely duplicate pairs of a population.
+
+        Args:
+            patients: Patient resources; patients without an ID are ignored
+
+        Yields:
+            Pairs scoring at least the threshold, block by block
+        """
+        chunks = self._chunks(patients)
+        if self.workers == 1:
+            for chunk in chunks:
+                yield from _compare_blocks(chunk, self.threshold)
+            return
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker, initargs=(self.threshold,)
+        ) as pool:
+            pending: deque[Future[list[DuplicatePair]]] = deque()
+            for chunk in chunks:
+                if len(pending) >= self.max_pending:
+                    yield from pending.popleft().result()
+                pending.append(pool.submit(_compare_in_worker, chunk))
+            while pending:
+                yield from pending.popleft().result()
+
+    def _chunks(self, patients: Iterable[dict[str, Any]]) -> Iterator[list[Block]]:
+        """Group patients into blocks, and blocks into chunks of about CHUNK_COMPARISONS comparisons."""
+        kept: list[dict[str, Any]] = []
+        patient_keys: list[set[str]] = []
+        blocks: dict[str, list[int]] = {}
+        for patient in patients:
+            if not patient.get("id"):
+                continue
+            keys = blocking_keys(patient, broad=False)
+            if not keys:
+                continue
+            for key in keys:
+                blocks.setdefault(key, []).append(len(kept))
+            kept.append({field: patient[field] for field in _MATCH_FIELDS if field in patient})
+            patient_keys.append(keys)
+
+        # Only keys of blocks that are compared count as shared keys
+        compared = {key for key, members in blocks.items() if 2 <= len(members) <= self.max_block_size}
+        self.skipped_blocks = sum(1 for members in blocks.values() if len(members) > self.max_block_size)
+        shared = [frozenset(keys & compared) for keys in patient_keys]
+
+        chunk: list[Block] = []
+        comparisons = 0
+        for key in sorted(compared):
+            members = blocks[key]
+            chunk.append((key, [(kept[i], shared[i]) for i in members]))
+            comparisons += len(members) * (len(members) - 1) // 2
+            if comparisons >= CHUNK_COMPARISONS:
+                yield chunk
+                chunk, comparisons = [], 0
+        if chunk:
+            yield chunk
+
+
+def iter_patients(path: Path) -> Iterator[dict[str, Any]]:
+    """Stream Patient resources from an NDJSON/JSON file or directory.
+
+    Lines holding a Bundle contribute its Patient; other resources and
+    unreadable lines are skipped.
+    """
+    for item in iter_patient_bundles(path):
+        patient = find_patient(item.bundle) if item.bundle else None
+        if patient is not None:
+            yield patient
+
+
+def write_ndjson(pairs: Iterable[DuplicatePair], stream: TextIO) -> int:
+    """Write one JSON row per duplicate pair.
+
+    Returns:
+        Number of rows written
+    """
+    count = 0
+    for pair in pairs:
+        stream.write(json.dumps(pair.to_row()))
+        stream.write("\n")
+        count += 1
+    return count
@@ -35,11 +35,12 @@ class PatientMatcher:
         "possible": 0.60,
     }
 
-    def __init__(self, store: FHIRStore):
+    def __init__(self, store: FHIRStore | None = None):
         """Initialize the matcher.
 
         Args:
-            store: FHIR store containing Patient resources
+            store: FHIR store containing Patient resources; only needed by
+                ``match``, not for scoring pairs of patients
         """
         self.store = store
 
@@ -61,21 +62,20 @@ class PatientMatcher:
         Returns:
             Bundle with matching patients and scores
         """
-        # Get all patients from store
-        all_patients, _ = self.store.search("Patient", {})
+        candidates = self._candidates(input_patient)
 
-        if not all_patients:
+        if not candidates:
             return self._build_bundle([])
 
-        # Score each patient
+        # Score each candidate
         scored_matches: list[tuple[dict[str, Any], float]] = []
 
-        for candidate in all_patients:
+        for candidate in candidates:
             # Skip self-matching (same ID)
             if candidate.get("id") == input_patient.get("id"):
                 continue
 
-            score = self._calculate_score(input_patient, candidate)
+            score = self.score(input_patient, candidate)
 
             if score >= threshold:
                 scored_matches.append((candidate, score))
@@ -92,7 +92,25 @@ class PatientMatcher:
 
         return self._build_bundle(scored_matches)
 
-    def _calculate_score(self, input_patient: dict[str, Any], candidate: dict[str, Any]) -> float:
+    def _candidates(self, input_patient: dict[str, Any]) -> list[dict[str, Any]]:
+        """Retrieve the patients worth scoring.
+
+        These are the patients sharing a blocking key with the input patient
+        (an identifier, a phonetic name with birth year, a phone number,
+        email address or postal code), found in the store's match index. If
+        the input patient has none of these, all patients are scored.
+
+        Args:
+            input_patient: Input patient to match
+
+        Returns:
+            Candidate patients
+        """
+        if self.store is None:
+            raise ValueError("Matching needs a store")
+        return self.store.match_candidates(input_patient)
+
+    def score(self, input_patient: dict[str, Any], candidate: dict[str, Any]) -> float:
         """Calculate match score between two patients.
 
         Args:
@@ -346,7 +364,7 @@ class PatientMatcher:
 
         return overlap / total >= threshold if total > 0 else False
 
-    def _get_match_grade(self, score: float) -> str:
+    def grade(self, score: float) -> str:
         """Get match grade based on score.
 
         Args:
@@ -364,6 +382,10 @@ class PatientMatcher:
         else:
             return "certainly-not"
 
+    # Former private names of score and grade
+    _calculate_score = score
+    _get_match_grade = grade
+
     def _build_bundle(self, matches: list[tuple[dict[str, Any], float]]) -> dict[str, Any]:
         """Build response Bundle with matches.
 
@@ -376,7 +398,7 @@ class PatientMatcher:
         entries = []
 
         for patient, score in matches:
-            grade = self._get_match_grade(score)
+            grade = self.grade(score)
 
             entry: dict[str, Any] = {
                 "fullUrl": f"Patient/{patient['id']}",
@@ -3,16 +3,101 @@
 Provides code translation between different code systems using ConceptMap resources.
 """
 
+from collections.abc import Iterable
 from typing import Any
 
 from ..storage.fhir_store import FHIRStore
 
+# Translations of a coding: [(system of the translation, match)]
+Translations = list[tuple[str, dict[str, Any]]]
+
+
+class ConceptMapIndex:
+    """Translations of one ConceptMap, keyed by coding in both directions.
+
+    ``forward`` maps a source ``(system, code)`` to its targets and
+    ``reverse`` maps a target ``(system, code)`` back to its sources, so a
+    translation is a dictionary lookup instead of a walk over the groups
+    and elements of the map.
+    """
+
+    def __init__(self, concept_map: dict[str, Any]):
+        """Index a ConceptMap resource.
+
+        Args:
+            concept_map: ConceptMap resource
+        """
+        self.concept_map = concept_map
+        self.url: str | None = concept_map.get("url")
+        self.source_uri: str = concept_map.get("sourceUri", "")
+        self.target_uri: str = concept_map.get("targetUri", "")
+        groups = concept_map.get("group", [])
+        self.sources = frozenset(g.get("source") for g in groups if g.get("source"))
+        self.targets = frozenset(g.get("target") for g in groups if g.get("target"))
+        self.forward: dict[tuple[str, str], Translations] = {}
+        self.reverse: dict[tuple[str, str], Translations] = {}
+
+        for group in groups:
+            group_source = group.get("source", "")
+            group_target = group.get("target", "")
+            for element in group.get("element", []):
+                for target in element.get("target", []):
+                    equivalence = target.get("equivalence", "equivalent")
+                    self.forward.setdefault((group_source, element.get("code")), []).append(
+                        (
+                            group_target,
+                            {
+                                "equivalence": equivalence,
+                                "concept": {
+                                    "system": group_target,
+                                    "code": target.get("code"),
+                                    "display": target.get("display"),
+                                },
+                                "source": self.url,
+                            },
+                        )
+                    )
+                    self.reverse.setdefault((group_target, target.get("code")), []).append(
+                        (
+                            group_source,
+                            {
+                                "equivalence": equivalence,
+                                "concept": {
+                                    "system": group_source,
+                                    "code": element.get("code"),
+                                    "display": element.get("display"),
+                                },
+                                "source": self.url,
+                            },
+                        )
+                    )
+
+    def applies(self, system: str, target_system: str | None, reverse: bool = False) -> bool:
+        """Check whether the map translates from a system (and to a target system, if given)."""
+        if reverse:
+            source_uri, sources, target_uri, targets = self.target_uri, self.targets, self.source_uri, self.sources
+        else:
+            source_uri, sources, target_uri, targets = self.source_uri, self.sources, self.target_uri, self.targets
+        if source_uri and source_uri != system and system not in sources:
+            return False
+        if target_system and target_uri and target_uri != target_system and target_system not in targets:
+            return False
+        return True
+
+    def translations(self, system: str, code: str, reverse: bool = False) -> Translations:
+        """Get the translations of a coding."""
+        return (self.reverse if reverse else self.forward).get((system, code), [])
+
 
 class ConceptMapTranslator:
     """Translator for codes using ConceptMap resources.
 
     Implements the FHIR $translate operation per:
     https://hl7.org/fhir/R4/conceptmap-operation-translate.html
+
+    ConceptMaps are indexed once (see ConceptMapIndex) and re-indexed when
+    they are written, so a translator should be kept rather than created
+    per request.
     """
 
     def __init__(self, store: FHIRStore):
@@ -22,6 +107,10 @@ class ConceptMapTranslator:
             store: FHIR store containing ConceptMap resources
         """
         self.store = store
+        # Index per ConceptMap ID, reused while the stored resource is the same object
+        self._indexes: dict[str, ConceptMapIndex] = {}
+        self._all: list[ConceptMapIndex] = []
+        self._generation: int | None = None
 
     def translate(
         self,
@@ -45,18 +134,70 @@ class ConceptMapTranslator:
         Returns:
             Parameters resource with translation results
         """
-        # Get relevant ConceptMaps
-        concept_maps = self._get_concept_maps(system, target, concept_map_url, concept_map_id)
+        concept_maps = self._get_concept_maps(system, target, concept_map_url, concept_map_id, reverse)
+        return self._translate(concept_maps, code, system, target, reverse)
+
+    def translate_batch(
+        self,
+        codings: Iterable[dict[str, Any]],
+        target: str | None = None,
+        concept_map_url: str | None = None,
+        concept_map_id: str | None = None,
+        reverse: bool = False,
+    ) -> dict[str, Any]:
+        """Translate many codings in one call.
+
+        The ConceptMaps that apply are looked up once per source system.
+
+        Args:
+            codings: FHIR Codings to translate
+            target: The target code system URI (optional)
+            concept_map_url: Specific ConceptMap URL to use
+            concept_map_id: Specific ConceptMap ID to use
+            reverse: If True, translate in reverse direction
+
+        Returns:
+            Parameters resource with a ``translation`` parameter per coding,
+            in order, whose parts are the ``coding`` and the parameters of
+            its single $translate result
+        """
+        concept_maps_by_system: dict[str, list[ConceptMapIndex]] = {}
+        translations = []
+        for coding in codings:
+            code = coding.get("code")
+            system = coding.get("system")
+            if not code or not system:
+                result = self._build_parameters(result=False, message="Both code and system are required")
+            else:
+                concept_maps = concept_maps_by_system.get(system)
+                if concept_maps is None:
+                    concept_maps = self._get_concept_maps(system, target, concept_map_url, concept_map_id, reverse)
+                    concept_maps_by_system[system] = concept_maps
+                result = self._translate(concept_maps, code, system, target, reverse)
+            translations.append(
+                {"name": "translation", "part": [{"name": "coding", "valueCoding": coding}, *result["parameter"]]}
+            )
+        return {"resourceType": "Parameters", "parameter": translations}
 
+    def _translate(
+        self,
+        concept_maps: list[ConceptMapIndex],
+        code: str,
+        system: str,
+        target: str | None,
+        reverse: bool,
+    ) -> dict[str, Any]:
+        """Translate a code with the indexes of the applicable ConceptMaps."""
         if not concept_maps:
             return self._build_parameters(result=False, message="No suitable ConceptMap found")
 
         # Find all matches across concept maps
-        matches: list[dict[str, Any]] = []
-
-        for concept_map in concept_maps:
-            map_matches = self._find_translations(concept_map, code, system, target, reverse)
-            matches.extend(map_matches)
+        matches = [
+            match
+            for concept_map in concept_maps
+            for other_system, match in concept_map.translations(system, code, reverse)
+            if not target or other_system == target
+        ]
 
         if not matches:
             return self._build_parameters(
@@ -72,128 +213,49 @@ class ConceptMapTranslator:
         target_system: str | None,
         concept_map_url: str | None,
         concept_map_id: str | None,
-    ) -> list[dict[str, Any]]:
-        """Get ConceptMaps matching the criteria.
+        reverse: bool = False,
+    ) -> list[ConceptMapIndex]:
+        """Get the indexes of the ConceptMaps matching the criteria.
 
         Args:
             source_system: Source code system URI
             target_system: Target code system URI
             concept_map_url: Specific URL to match
             concept_map_id: Specific ID to match
+            reverse: Whether the systems are those of the reverse direction
 
         Returns:
-            List of matching ConceptMap resources
+            Indexes of the matching ConceptMap resources
         """
         # If specific ID provided, get that ConceptMap
         if concept_map_id:
             cm = self.store.read("ConceptMap", concept_map_id)
             if cm:
-                return [cm]
+                return [self._index(cm)]
             return []
 
-        # Get all ConceptMaps
-        all_maps, _ = self.store.search("ConceptMap", {})
-
-        # Filter by criteria
-        matches = []
-        for cm in all_maps:
-            # Check URL match
-            if concept_map_url and cm.get("url") != concept_map_url:
-                continue
-
-            # Check source system match
-            source_uri = cm.get("sourceUri", "")
-            if source_uri and source_uri != source_system:
-                # Also check groups
-                groups = cm.get("group", [])
-                source_match = any(g.get("source") == source_system for g in groups)
-                if not source_match:
-                    continue
-
-            # Check target system match if specified
-            if target_system:
-                target_uri = cm.get("targetUri", "")
-                if target_uri and target_uri != target_system:
-                    groups = cm.get("group", [])
-                    target_match = any(g.get("target") == target_system for g in groups)
-                    if not target_match:
-                        continue
-
-            matches.append(cm)
-
-        return matches
-
-    def _find_translations(
-        self,
-        concept_map: dict[str, Any],
-        code: str,
-        system: str,
-        target_system: str | None,
-        reverse: bool,
-    ) -> list[dict[str, Any]]:
-        """Find translations for a code in a ConceptMap.
-
-        Args:
-            concept_map: ConceptMap resource
-            code: Code to translate
-            system: Source system
-            target_system: Target system (optional)
-            reverse: Whether to translate in reverse
-
-        Returns:
-            List of match dictionaries
-        """
-        matches = []
-
-        for group in concept_map.get("group", []):
-            group_source = group.get("source", "")
-            group_target = group.get("target", "")
-
-            # Handle reverse translation
-            if reverse:
-                if group_target != system:
-                    continue
-                if target_system and group_source != target_system:
-                    continue
-            else:
-                if group_source != system:
-                    continue
-                if target_system and group_target != target_system:
-                    continue
-
-            # Search elements for the code
-            for element in group.get("element", []):
-                if reverse:
-                    # Look in targets for the code
-                    for target in element.get("target", []):
-                        if target.get("code") == code:
-                            matches.append(
-                                {
-                                    "equivalence": target.get("equivalence", "equivalent"),
-                                    "concept": {
-                                        "system": group_source,
-                                        "code": element.get("code"),
-                                        "display": element.get("display"),
-                                    },
-                                    "source": concept_map.get("url"),
-                                }
-                            )
-                else:
-                    if element.get("code") == code:
-                        for target in element.get("target", []):
-                            matches.append(
-                                {
-                                    "equivalence": target.get("equivalence", "equivalent"),
-                                    "concept": {
-                                        "system": group_target,
-                                        "code": target.get("code"),
-                                        "display": target.get("display"),
-                                    },
-                                    "source": concept_map.get("url"),
-                                }
-                            )
-
-        return matches
+        return [
+            index
+            for index in self._all_indexes()
+            if (not concept_map_url or index.url == concept_map_url)
+            and index.applies(source_system, target_system, reverse)
+        ]
+
+    def _index(self, concept_map: dict[str, Any]) -> ConceptMapIndex:
+        """Get the index of a stored ConceptMap, indexing it if it is new or was replaced."""
+        index = self._indexes.get(concept_map.get("id", ""))
+        if index is None or index.concept_map is not concept_map:
+            index = self._indexes[concept_map.get("id", "")] = ConceptMapIndex(concept_map)
+        return index
+
+    def _all_indexes(self) -> list[ConceptMapIndex]:
+        """Get the indexes of all ConceptMaps, refreshed after ConceptMaps are written."""
+        generation = self.store.generation("ConceptMap")
+        if generation != self._generation:
+            self._all = [self._index(cm) for cm in self.store.get_all_resources("ConceptMap")]
+            self._indexes = {index.concept_map.get("id", ""): index for index in self._all}
+            self._generation = generation
+        return self._all
 
     def _build_parameters(
         self,
@@ -229,7 +291,7 @@ class ConceptMapTranslator:
                         {"name": "equivalence", "valueCode": match["equivalence"]},
                         {
                             "name": "concept",
-                            "valueCoding": match["concept"],
+                            "valueCoding": dict(match["concept"]),
                         },
                     ],
                 }
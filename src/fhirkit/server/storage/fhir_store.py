@@ -4,12 +4,27 @@ Extends InMemoryDataSource with full CRUD operations, versioning, and search.
 """
 
 import copy
+import json
+import mmap
+import os
+import pickle
 import uuid
 from contextlib import contextmanager
 from datetime import datetime, timezone
-from typing import Any, Generator
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Generator, Iterable
 
 from fhirkit.engine.cql.datasource import InMemoryDataSource
+from fhirkit.signing import DIGEST_SIZE, SignedWriter, SigningKeyError, verify_stream
+
+from .match_index import MatchIndex
+from .quantity_index import QuantityIndex
+from .string_index import StringIndex
+from .text_index import TextIndex
+from .token_index import TokenIndex
+
+if TYPE_CHECKING:
+    from ..terminology import FHIRStoreTerminologyProvider
 
 
 class TransactionError(Exception):
@@ -22,6 +37,21 @@ class TransactionError(Exception):
         super().__init__(message)
 
 
+class SnapshotError(Exception):
+    """Exception raised when a store snapshot cannot be read."""
+
+
+def encode_json(value: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON, as JSONResponse renders content."""
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+# Snapshot files start with a magic number and a format version, and end with
+# the signature of what precedes it
+SNAPSHOT_MAGIC = b"FHIRKIT-STORE"
+SNAPSHOT_VERSION = 7
+
+
 class FHIRStore(InMemoryDataSource):
     """Extended in-memory FHIR store with CRUD operations and versioning."""
 
@@ -34,6 +64,99 @@ class FHIRStore(InMemoryDataSource):
         self._deleted: set[str] = set()
         # Transaction snapshot for rollback
         self._transaction_snapshot: dict[str, Any] | None = None
+        # Canonical-unit index of quantity search parameters
+        self._quantity_index = QuantityIndex()
+        # Trigram and word index of string parameters and resource text
+        self._text_index = TextIndex()
+        # Sorted prefix index of string parameters
+        self._string_index = StringIndex()
+        # Code postings of token parameters, for terminology modifiers
+        self._token_index = TokenIndex()
+        # Blocking keys of Patients, for $match candidates
+        self._match_index = MatchIndex()
+        # Terminology over the stored CodeSystems and ValueSets, created when first needed
+        self._terminology: FHIRStoreTerminologyProvider | None = None
+        # Order in which resources were added, for listing index search results
+        self._position: dict[str, int] = {}
+        self._next_position = 0
+        # Serialized JSON of current resources: {"Patient/123": (resource, bytes)}
+        self._serialized: dict[str, tuple[dict[str, Any], bytes]] = {}
+        # Write counters, for caches of data derived from stored resources
+        self._write_count = 0
+        self._type_write_count: dict[str, int] = {}
+        self._reset_count = 0
+
+    def generation(self, resource_type: str) -> int:
+        """Return a counter that changes whenever resources of a type are written.
+
+        Caches derived from stored resources (such as compiled profiles)
+        compare it with the value they were built at to detect changes.
+        """
+        return max(self._type_write_count.get(resource_type, 0), self._reset_count)
+
+    def _written(self, resource_type: str | None) -> None:
+        self._write_count += 1
+        if resource_type:
+            self._type_write_count[resource_type] = self._write_count
+
+    def _reset(self) -> None:
+        self._write_count += 1
+        self._reset_count = self._write_count
+        self._serialized.clear()
+
+    def _index(self, resource: dict[str, Any]) -> None:
+        """Index the search values of a resource, replacing those of its previous version."""
+        self._quantity_index.add(resource)
+        self._text_index.add(resource)
+        self._string_index.add(resource)
+        self._token_index.add(resource)
+        self._match_index.add(resource)
+
+    def _unindex(self, ref: str) -> None:
+        """Remove the search values of a resource from the indexes."""
+        self._quantity_index.remove(ref)
+        self._text_index.remove(ref)
+        self._string_index.remove(ref)
+        self._token_index.remove(ref)
+        self._match_index.remove(ref)
+
+    def add_resource(self, resource: dict[str, Any]) -> None:
+        """Add a resource and index its search values."""
+        super().add_resource(resource)
+        ref = f"{resource.get('resourceType')}/{resource.get('id')}"
+        self._index(resource)
+        self._position[ref] = self._next_position
+        self._next_position += 1
+        self._serialized.pop(ref, None)
+        self._written(resource.get("resourceType"))
+
+    def clear(self) -> None:
+        """Clear all data."""
+        super().clear()
+        self._quantity_index.clear()
+        self._text_index.clear()
+        self._string_index.clear()
+        self._token_index.clear()
+        self._match_index.clear()
+        self._position.clear()
+        self._reset()
+
+    def resource_json(self, resource: dict[str, Any]) -> bytes:
+        """Serialize a resource to compact JSON.
+
+        The bytes of current resource versions, as returned by read and
+        search, are cached until the resource is written again. Other
+        dicts (older versions, filtered copies) are serialized each time.
+        Stored resources must only be changed through the store.
+        """
+        ref = f"{resource.get('resourceType')}/{resource.get('id')}"
+        cached = self._serialized.get(ref)
+        if cached is not None and cached[0] is resource:
+            return cached[1]
+        data = encode_json(resource)
+        if self._by_id.get(ref) is resource:
+            self._serialized[ref] = (resource, data)
+        return data
 
     def begin_transaction(self) -> None:
         """Begin a transaction by creating a snapshot of current state.
@@ -45,6 +168,12 @@ class FHIRStore(InMemoryDataSource):
             "by_id": copy.deepcopy(self._by_id),
             "version_history": copy.deepcopy(self._version_history),
             "deleted": copy.copy(self._deleted),
+            "quantity_index": copy.deepcopy(self._quantity_index),
+            "text_index": copy.deepcopy(self._text_index),
+            "string_index": copy.deepcopy(self._string_index),
+            "token_index": copy.deepcopy(self._token_index),
+            "match_index": copy.deepcopy(self._match_index),
+            "position": copy.copy(self._position),
         }
 
     def commit_transaction(self) -> None:
@@ -66,7 +195,118 @@ class FHIRStore(InMemoryDataSource):
         self._by_id = self._transaction_snapshot["by_id"]
         self._version_history = self._transaction_snapshot["version_history"]
         self._deleted = self._transaction_snapshot["deleted"]
+        self._quantity_index = self._transaction_snapshot["quantity_index"]
+        self._text_index = self._transaction_snapshot["text_index"]
+        self._string_index = self._transaction_snapshot["string_index"]
+        self._token_index = self._transaction_snapshot["token_index"]
+        self._match_index = self._transaction_snapshot["match_index"]
+        self._position = self._transaction_snapshot["position"]
+        self._reset()
+        self._transaction_snapshot = None
+
+    def _state(self) -> dict[str, Any]:
+        return {
+            "resources": self._resources,
+            "by_id": self._by_id,
+            "version_history": self._version_history,
+            "deleted": self._deleted,
+            "quantity_index": self._quantity_index,
+            "text_index": self._text_index,
+            "string_index": self._string_index,
+            "token_index": self._token_index,
+            "match_index": self._match_index,
+            "position": self._position,
+            "next_position": self._next_position,
+            "valuesets": self._valuesets,
+        }
+
+    def save_snapshot(self, path: str | Path) -> int:
+        """Write the whole store to a snapshot file.
+
+        Resources, version history, deleted markers and search indexes are
+        written as one pickle, so startup can restore them instead of
+        generating or loading data again. The file is signed with the
+        installation's key (see ``fhirkit.signing``) and replaced atomically.
+
+        Args:
+            path: Snapshot file
+
+        Returns:
+            Number of resources written
+        """
+        path = Path(path)
+        temporary = path.with_name(path.name + ".tmp")
+        with open(temporary, "wb") as f:
+            writer = SignedWriter(f)
+            writer.write(SNAPSHOT_MAGIC + bytes([SNAPSHOT_VERSION]))
+            pickle.dump(self._state(), writer, protocol=5)
+            f.write(writer.signature())
+        os.replace(temporary, path)
+        return len(self._by_id)
+
+    def restore_snapshot(self, path: str | Path, use_mmap: bool = True) -> int:
+        """Replace the contents of the store with a snapshot.
+
+        Snapshots are pickles, so the file is only unpickled if its signature
+        matches the installation's key: snapshots written by another
+        installation are refused.
+
+        Args:
+            path: Snapshot file written by save_snapshot
+            use_mmap: Read the file through a memory map instead of into a buffer
+
+        Returns:
+            Number of resources restored
+
+        Raises:
+            SnapshotError: If the file is not a snapshot of a supported version,
+                or its signature does not match
+        """
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                raise SnapshotError("Not a store snapshot")
+            if use_mmap:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    state = self._read_snapshot(data, size)
+            else:
+                state = self._read_snapshot(f, size)
+
+        self._resources = state["resources"]
+        self._by_id = state["by_id"]
+        self._version_history = state["version_history"]
+        self._deleted = state["deleted"]
+        self._quantity_index = state["quantity_index"]
+        self._text_index = state["text_index"]
+        self._string_index = state["string_index"]
+        self._token_index = state["token_index"]
+        self._match_index = state["match_index"]
+        self._position = state["position"]
+        self._next_position = state["next_position"]
+        self._valuesets = state["valuesets"]
+        self._reset()
         self._transaction_snapshot = None
+        return len(self._by_id)
+
+    @staticmethod
+    def _read_snapshot(stream: Any, size: int) -> dict[str, Any]:
+        header = stream.read(len(SNAPSHOT_MAGIC) + 1)
+        if header[:-1] != SNAPSHOT_MAGIC:
+            raise SnapshotError("Not a store snapshot")
+        if header[-1] != SNAPSHOT_VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {header[-1]}")
+        stream.seek(0)
+        try:
+            signed = verify_stream(stream, size - DIGEST_SIZE)
+        except SigningKeyError as e:
+            raise SnapshotError(str(e)) from e
+        if not signed:
+            raise SnapshotError("Snapshot signature does not match; it was not written by this installation")
+        stream.seek(len(header))
+        try:
+            return pickle.load(stream)
+        except (pickle.UnpicklingError, EOFError) as e:
+            raise SnapshotError(f"Corrupt snapshot: {e}") from e
 
     @contextmanager
     def transaction(self) -> Generator[None, None, None]:
@@ -131,6 +371,61 @@ class FHIRStore(InMemoryDataSource):
 
         return resource
 
+    def bulk_load(self, resources: Iterable[dict[str, Any]]) -> int:
+        """Create resources from a stream, e.g. generated or imported data.
+
+        Like ``create``, but the resources must have new IDs: they are not
+        checked against the stored resources. All resources get the same
+        ``lastUpdated``.
+
+        Args:
+            resources: FHIR resources with resourceType and id
+
+        Returns:
+            Number of resources loaded
+        """
+        last_updated = datetime.now(timezone.utc).isoformat()
+        count = 0
+        for resource in resources:
+            ref = f"{resource['resourceType']}/{resource['id']}"
+            meta = resource.setdefault("meta", {})
+            meta["versionId"] = "1"
+            meta["lastUpdated"] = last_updated
+            self.add_resource(resource)
+            self._version_history[ref] = [resource.copy()]
+            count += 1
+        return count
+
+    def expunge(self, refs: Iterable[str]) -> int:
+        """Remove resources for good, with their version history.
+
+        Unlike ``delete``, which keeps the deleted resource as a version,
+        nothing of the resources is kept.
+
+        Args:
+            refs: References of the resources (``Type/id``)
+
+        Returns:
+            Number of resources removed
+        """
+        removed: dict[str, set[str]] = {}
+        for ref in refs:
+            if self._by_id.pop(ref, None) is None:
+                continue
+            resource_type = ref.split("/", 1)[0]
+            removed.setdefault(resource_type, set()).add(ref)
+            self._version_history.pop(ref, None)
+            self._deleted.discard(ref)
+            self._unindex(ref)
+            self._position.pop(ref, None)
+            self._serialized.pop(ref, None)
+        for resource_type, type_refs in removed.items():
+            self._written(resource_type)
+            self._resources[resource_type] = [
+                r for r in self._resources.get(resource_type, []) if f"{resource_type}/{r.get('id')}" not in type_refs
+            ]
+        return sum(len(type_refs) for type_refs in removed.values())
+
     def read(self, resource_type: str, resource_id: str) -> dict[str, Any] | None:
         """Read a resource by type and ID.
 
@@ -148,6 +443,35 @@ class FHIRStore(InMemoryDataSource):
 
         return self._by_id.get(ref)
 
+    def read_many(self, refs: Iterable[str]) -> list[dict[str, Any] | None]:
+        """Read resources by reference.
+
+        Args:
+            refs: References of the form ``{type}/{id}``, or
+                ``{type}/{id}/_history/{vid}`` for a version
+
+        Returns:
+            The resource (version) of each reference, or None if not
+            found/deleted
+        """
+        deleted = self._deleted
+        by_id = self._by_id
+        resources: list[dict[str, Any] | None] = []
+        for ref in refs:
+            current, separator, version_id = ref.partition("/_history/")
+            if separator:
+                resources.append(self._read_version(current, version_id))
+            else:
+                resources.append(None if ref in deleted else by_id.get(ref))
+        return resources
+
+    def _read_version(self, ref: str, version_id: str) -> dict[str, Any] | None:
+        """Get a version of a resource from its history, or None if there is no such version."""
+        for version in self._version_history.get(ref, ()):
+            if version.get("meta", {}).get("versionId") == version_id:
+                return version
+        return None
+
     def update(self, resource_type: str, resource_id: str, resource: dict[str, Any]) -> dict[str, Any]:
         """Update an existing resource.
 
@@ -181,6 +505,9 @@ class FHIRStore(InMemoryDataSource):
 
         # Update in storage
         self._by_id[ref] = resource
+        self._index(resource)
+        self._serialized.pop(ref, None)
+        self._written(resource_type)
 
         # Update in type list
         if resource_type in self._resources:
@@ -212,6 +539,9 @@ class FHIRStore(InMemoryDataSource):
 
         # Mark as deleted
         self._deleted.add(ref)
+        self._unindex(ref)
+        self._serialized.pop(ref, None)
+        self._written(resource_type)
 
         return True
 
@@ -247,18 +577,32 @@ class FHIRStore(InMemoryDataSource):
         Returns:
             Tuple of (matching resources, total count)
         """
-        # Get all resources of type
-        resources = self._resources.get(resource_type, [])
-
-        # Filter out deleted
-        resources = [r for r in resources if f"{resource_type}/{r.get('id')}" not in self._deleted]
-
-        # Apply search filters
+        # Parameters served by an index narrow down the candidates first
+        candidates: set[str] | None = None
+        filters: list[tuple[str, str | list[str]]] = []
         for param, value in params.items():
-            # Skip special params except _id and _lastUpdated
-            if param.startswith("_") and param not in ("_id", "_lastUpdated"):
+            # Skip special params except _id, _lastUpdated and text search
+            if param.startswith("_") and param not in ("_id", "_lastUpdated", "_content", "_text"):
                 continue
 
+            refs = self._index_search(resource_type, param, value)
+            if refs is None:
+                filters.append((param, value))
+            else:
+                candidates = refs if candidates is None else candidates & refs
+
+        if candidates is None:
+            # Filter out deleted
+            resources = self._resources.get(resource_type, [])
+            resources = [r for r in resources if f"{resource_type}/{r.get('id')}" not in self._deleted]
+        else:
+            # Current resources in the order they were added, like the type list
+            found = [ref for ref in candidates if ref in self._by_id and ref not in self._deleted]
+            found.sort(key=lambda ref: self._position.get(ref, -1))
+            resources = [self._by_id[ref] for ref in found]
+
+        # Apply search filters
+        for param, value in filters:
             resources = self._filter_by_param(resources, resource_type, param, value)
 
         total = len(resources)
@@ -268,6 +612,72 @@ class FHIRStore(InMemoryDataSource):
 
         return resources, total
 
+    def is_indexed(self, resource_type: str, param: str) -> bool:
+        """Check whether a search parameter is looked up in an index instead of filtered."""
+        return any(
+            index.is_indexed(resource_type, param)
+            for index in (self._quantity_index, self._text_index, self._string_index, self._token_index)
+        )
+
+    def _index_search(self, resource_type: str, param: str, value: str | list[str]) -> set[str] | None:
+        """Search a parameter in the quantity, text, string or token index.
+
+        Returns:
+            References of the matching resources, or None if the parameter
+            is not indexed (or has no values) and must be filtered instead
+        """
+        search_values = self._split_search_values(value)
+        if not search_values:
+            return None
+        if self._quantity_index.is_indexed(resource_type, param):
+            # Range scan of the quantity index instead of comparing each resource
+            return self._quantity_index.search(resource_type, param, search_values)
+        for index in (self._text_index, self._string_index):
+            if index.is_indexed(resource_type, param):
+                # Postings or prefix range of the index instead of scanning each resource's text
+                if not index.covers(resource_type):
+                    index.index_type(resource_type, self.get_all_resources(resource_type))
+                return index.search(resource_type, param, search_values)
+        if self._token_index.is_indexed(resource_type, param):
+            # Codes related by the terminology, looked up in the code postings
+            if not self._token_index.covers(resource_type):
+                self._token_index.index_type(resource_type, self.get_all_resources(resource_type))
+            return self._token_index.search(resource_type, param, search_values, self.terminology)
+        return None
+
+    def match_candidates(self, patient: dict[str, Any]) -> list[dict[str, Any]]:
+        """Get the stored Patients sharing a blocking key with a patient.
+
+        Args:
+            patient: Patient resource to find candidates for
+
+        Returns:
+            Candidate patients in the order they were added; all patients
+            if the patient has no blocking keys
+        """
+        if not self._match_index.covers("Patient"):
+            self._match_index.index_type("Patient", self.get_all_resources("Patient"))
+        refs = self._match_index.candidates(patient)
+        if refs is None:
+            return self.get_all_resources("Patient")
+        found = [ref for ref in refs if ref in self._by_id and ref not in self._deleted]
+        found.sort(key=lambda ref: self._position.get(ref, -1))
+        return [self._by_id[ref] for ref in found]
+
+    @property
+    def terminology(self) -> "FHIRStoreTerminologyProvider":
+        """Terminology provider over the stored CodeSystems and ValueSets.
+
+        One provider is kept per store, so that its cached expansions and
+        hierarchy closures are shared by all searches.
+        """
+        if self._terminology is None:
+            # Imported here: the terminology package imports the store for type checking
+            from ..terminology import FHIRStoreTerminologyProvider
+
+            self._terminology = FHIRStoreTerminologyProvider(self)
+        return self._terminology
+
     def _get_nested_value(self, resource: dict[str, Any], path: str) -> Any:
         """Get a nested value from a resource using dot notation.
 
@@ -321,22 +731,7 @@ class FHIRStore(InMemoryDataSource):
         Returns:
             Filtered resources
         """
-        # Build list of all search values (FHIR OR semantics)
-        # Values can come from:
-        # 1. Multiple params: ?_id=a&_id=b (value is list)
-        # 2. Comma-separated: ?_id=a,b,c (value contains commas)
-        search_values: list[str] = []
-        if isinstance(value, list):
-            for v in value:
-                # Split each value by comma
-                search_values.extend(v.split(","))
-        else:
-            # Single value, may contain commas
-            search_values.extend(value.split(","))
-
-        # Strip whitespace from values
-        search_values = [v.strip() for v in search_values if v.strip()]
-
+        search_values = self._split_search_values(value)
         if not search_values:
             return resources
 
@@ -356,6 +751,20 @@ class FHIRStore(InMemoryDataSource):
 
         return result
 
+    def _split_search_values(self, value: str | list[str]) -> list[str]:
+        """Build the list of all search values of a parameter (FHIR OR semantics).
+
+        Values can come from:
+        1. Multiple params: ?_id=a&_id=b (value is list)
+        2. Comma-separated: ?_id=a,b,c (value contains commas)
+        """
+        search_values: list[str] = []
+        for v in value if isinstance(value, list) else [value]:
+            search_values.extend(v.split(","))
+
+        # Strip whitespace from values
+        return [v.strip() for v in search_values if v.strip()]
+
     def _get_search_param_paths(self, resource_type: str, param: str) -> list[str]:
         """Get the resource paths for a search parameter.
 
@@ -400,7 +809,6 @@ class FHIRStore(InMemoryDataSource):
                 "date": ["effectiveDateTime", "effectivePeriod.start"],
                 "category": ["category.coding.code"],
                 "status": ["status"],
-                "value-quantity": ["valueQuantity.value"],
             },
             "MedicationRequest": {
                 "patient": ["subject.reference"],
@@ -0,0 +1,197 @@
+"""Blocking-key index of Patients for record matching.
+
+``Patient/$match`` compares the input patient field by field, with fuzzy
+name matching, against candidate patients. Instead of comparing against the
+whole population, candidates are the patients sharing a blocking key with
+the input:
+
+- ``identifier:{system}|{value}``: an identifier, with the value reduced to
+  lowercase letters and digits
+- ``family:{soundex}:{birth year}`` and ``given:{soundex}:{birth year}``:
+  the phonetic code of a family or given name with the year of birth, so
+  that Smith and Smyth born in 1980 share a block
+- ``family:{soundex}:-``: the phonetic code of the family name of a
+  patient without a birth date. Inputs with a birth date are matched
+  against these too, so patients whose birth date was never recorded are
+  not missed. (Patients born in another year are: the birth year is what
+  keeps the blocks small.)
+- ``family:{soundex}``: the phonetic code of a family name alone, for
+  inputs without a birth date. These blocks are broad and are not used when
+  the birth year is known.
+- ``phone:{digits}`` (the last ten digits), ``email:{address}`` and
+  ``postal:{code}``
+
+The index maps each key to the references of the patients that have it and
+is kept up to date on write. Like the string index, Patients are indexed
+when they are first matched.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from typing import Any
+
+from .text_index import normalize
+
+# Soundex digit per letter; vowels, h, w and y have none
+_SOUNDEX = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+
+
+# Birth year of the family name keys of patients without a birth date
+UNDATED = "-"
+
+
+def soundex(name: str) -> str:
+    """American Soundex code of a name (``Robert`` and ``Rupert`` are ``R163``).
+
+    Returns:
+        Four-character code, or an empty string if the name has no letters
+    """
+    letters = [c for c in normalize(name) if "a" <= c <= "z"]
+    if not letters:
+        return ""
+    code = letters[0].upper()
+    previous = _SOUNDEX.get(letters[0], "")
+    for letter in letters[1:]:
+        digit = _SOUNDEX.get(letter, "")
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # H and W do not separate letters with the same digit; vowels do
+        if letter not in "hw":
+            previous = digit
+    return code.ljust(4, "0")
+
+
+def _alphanumeric(value: str) -> str:
+    return "".join(c for c in normalize(value) if c.isalnum())
+
+
+def blocking_keys(patient: dict[str, Any], broad: bool = True) -> set[str]:
+    """Get the blocking keys of a patient.
+
+    Args:
+        patient: Patient resource
+        broad: Include the keys of family names without a birth year
+
+    Returns:
+        Blocking keys, empty if the patient has no identifying data
+    """
+    keys: set[str] = set()
+    for identifier in patient.get("identifier", ()):
+        value = _alphanumeric(identifier.get("value") or "")
+        if value:
+            keys.add(f"identifier:{identifier.get('system', '')}|{value}")
+
+    birth_date = patient.get("birthDate")
+    year = birth_date[:4] if isinstance(birth_date, str) and len(birth_date) >= 4 else ""
+    for name in patient.get("name", ()):
+        family = name.get("family")
+        family_code = soundex(family) if isinstance(family, str) else ""
+        if family_code:
+            if broad:
+                keys.add(f"family:{family_code}")
+            keys.add(f"family:{family_code}:{year or UNDATED}")
+        if year:
+            for given in name.get("given", ()):
+                given_code = soundex(given) if isinstance(given, str) else ""
+                if given_code:
+                    keys.add(f"given:{given_code}:{year}")
+
+    for telecom in patient.get("telecom", ()):
+        value = telecom.get("value")
+        if not isinstance(value, str):
+            continue
+        if telecom.get("system") == "phone":
+            digits = "".join(c for c in value if c.isdigit())[-10:]
+            if digits:
+                keys.add(f"phone:{digits}")
+        elif telecom.get("system") == "email" and value.strip():
+            keys.add(f"email:{value.strip().lower()}")
+
+    for address in patient.get("address", ()):
+        postal_code = _alphanumeric(address.get("postalCode") or "")
+        if postal_code:
+            keys.add(f"postal:{postal_code}")
+    return keys
+
+
+class MatchIndex:
+    """Patients by blocking key, kept up to date on write."""
+
+    def __init__(self) -> None:
+        # Resource types whose resources are indexed
+        self._types: set[str] = set()
+        # References of the patients with each key
+        self._blocks: dict[str, set[str]] = {}
+        # Keys per patient reference, for removal on update and delete
+        self._keys: dict[str, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def covers(self, resource_type: str) -> bool:
+        """Check whether the resources of a type are indexed."""
+        return resource_type in self._types
+
+    def index_type(self, resource_type: str, resources: Iterable[dict[str, Any]]) -> None:
+        """Index the current resources of a type, and its resources written from now on."""
+        self._types.add(resource_type)
+        for resource in resources:
+            self.add(resource)
+
+    def add(self, resource: dict[str, Any]) -> None:
+        """Index a patient, replacing the keys of its previous version."""
+        if resource.get("resourceType") != "Patient" or "Patient" not in self._types:
+            return
+        ref = f"Patient/{resource.get('id')}"
+        self.remove(ref)
+        keys = blocking_keys(resource)
+        if keys:
+            self._keys[ref] = keys
+            for key in keys:
+                self._blocks.setdefault(key, set()).add(ref)
+
+    def remove(self, ref: str) -> None:
+        """Remove the keys of a patient."""
+        for key in self._keys.pop(ref, ()):
+            block = self._blocks[key]
+            block.discard(ref)
+            if not block:
+                del self._blocks[key]
+
+    def clear(self) -> None:
+        """Remove all keys."""
+        self._types.clear()
+        self._blocks.clear()
+        self._keys.clear()
+
+    def candidates(self, patient: dict[str, Any]) -> set[str] | None:
+        """Find the patients sharing a blocking key with a patient.
+
+        Family name keys without a birth year are only used when the
+        patient has no birth date. When it has one, the patients without a
+        birth date sharing its family name are candidates too.
+
+        Returns:
+            References of the candidate patients, or None if the patient has
+            no blocking keys (and every patient is a candidate)
+        """
+        keys = blocking_keys(patient, broad=not patient.get("birthDate"))
+        if not keys:
+            return None
+        keys |= {
+            f"{key.rsplit(':', 1)[0]}:{UNDATED}" for key in keys if key.startswith("family:") and key.count(":") == 2
+        }
+        refs: set[str] = set()
+        for key in keys:
+            refs.update(self._blocks.get(key, ()))
+        return refs
@@ -0,0 +1,280 @@
+"""Canonical-unit index for quantity search parameters.
+
+Quantity values are indexed when a resource is written, in two sorted lists
+per search parameter:
+
+- by UCUM canonical value, one list per dimension, so that
+  ``value-quantity=gt5.4|http://unitsofmeasure.org|mmol/L`` is a range scan
+  that also finds data recorded in any compatible unit
+- by the value as recorded, for searches without units and for units that
+  are not UCUM
+
+Search values follow the FHIR quantity syntax ``[prefix]number[|system|code]``.
+Without a prefix (``eq``) a number matches the range implied by its precision:
+``5.4`` matches values from 5.35 up to, but excluding, 5.45.
+"""
+
+from __future__ import annotations
+
+import re
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass, replace
+from decimal import Decimal, InvalidOperation
+from operator import itemgetter
+from typing import Any
+
+from fhirkit.engine.units import canonicalize
+from fhirkit.engine.units.definitions import Dimension
+from fhirkit.engine.units.ucum import canonical_form
+
+UCUM_SYSTEM = "http://unitsofmeasure.org"
+
+# Quantity search parameters, and the path of the Quantity element they search
+QUANTITY_PARAMS: dict[str, dict[str, str]] = {
+    "Observation": {
+        "value-quantity": "valueQuantity",
+        "component-value-quantity": "component.valueQuantity",
+    },
+}
+
+_SEARCH_PATTERN = re.compile(
+    r"^(eq|ne|gt|lt|ge|le|sa|eb|ap)?([-+]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?)(?:\|([^|]*)\|(.*))?$"
+)
+
+_value = itemgetter(0)
+
+
+@dataclass(frozen=True, slots=True)
+class QuantityRange:
+    """Values matched by a search prefix and number.
+
+    Attributes:
+        low: Lower bound, or None if unbounded
+        high: Upper bound, or None if unbounded
+        low_closed: Whether the lower bound itself matches
+        high_closed: Whether the upper bound itself matches
+        negate: Match values outside the range instead (``ne``)
+    """
+
+    low: Decimal | None
+    high: Decimal | None
+    low_closed: bool = True
+    high_closed: bool = True
+    negate: bool = False
+
+    def contains(self, value: Decimal) -> bool:
+        """Check whether a value matches."""
+        inside = (self.low is None or value > self.low or (self.low_closed and value == self.low)) and (
+            self.high is None or value < self.high or (self.high_closed and value == self.high)
+        )
+        return inside != self.negate
+
+    def scan(self, entries: list[Any]) -> list[Any]:
+        """Select the matching entries of a list sorted by value."""
+        start = 0
+        if self.low is not None:
+            start = (bisect_left if self.low_closed else bisect_right)(entries, self.low, key=_value)
+        end = len(entries)
+        if self.high is not None:
+            end = (bisect_right if self.high_closed else bisect_left)(entries, self.high, key=_value)
+        if self.negate:
+            return entries[:start] + entries[end:]
+        return entries[start:end]
+
+
+@dataclass(frozen=True, slots=True)
+class QuantitySearch:
+    """A parsed quantity search value: ``[prefix]number[|system|code]``."""
+
+    prefix: str
+    number: Decimal
+    system: str | None = None
+    code: str | None = None
+
+    @classmethod
+    def parse(cls, value: str) -> QuantitySearch | None:
+        """Parse a search value, or return None if it is malformed."""
+        match = _SEARCH_PATTERN.match(value.strip())
+        if not match:
+            return None
+        prefix, number, system, code = match.groups()
+        return cls(prefix or "eq", Decimal(number), system or None, code or None)
+
+    def range(self) -> QuantityRange:
+        """Values matched by the prefix and number, in the search unit."""
+        number = self.number
+        # Half a unit of the last given digit: "5.4" stands for [5.35, 5.45)
+        half = Decimal(5).scaleb(number.as_tuple().exponent - 1)
+        if self.prefix in ("eq", "ne"):
+            return QuantityRange(number - half, number + half, high_closed=False, negate=self.prefix == "ne")
+        if self.prefix in ("gt", "sa"):
+            return QuantityRange(number, None, low_closed=False)
+        if self.prefix in ("lt", "eb"):
+            return QuantityRange(None, number, high_closed=False)
+        if self.prefix == "ge":
+            return QuantityRange(number, None)
+        if self.prefix == "le":
+            return QuantityRange(None, number)
+        # ap: within 10% of the number
+        margin = max(abs(number) / 10, half)
+        return QuantityRange(number - margin, number + margin)
+
+    def canonical(self) -> tuple[QuantityRange, Dimension] | None:
+        """The range in UCUM base units, or None if the search unit is not UCUM."""
+        if self.code is None or self.system not in (None, UCUM_SYSTEM):
+            return None
+        compiled = canonical_form(self.code)
+        if compiled is None:
+            return None
+        code = self.code
+
+        def base(bound: Decimal | None) -> Decimal | None:
+            canonical = None if bound is None else canonicalize(bound, code)
+            return None if canonical is None else canonical.value
+
+        search_range = self.range()
+        return replace(search_range, low=base(search_range.low), high=base(search_range.high)), compiled[2]
+
+    def matches_unit(self, system: str, code: str) -> bool:
+        """Check whether a recorded system and code (or unit) match the search unit."""
+        return self.code is None or (code == self.code and (self.system is None or system == self.system))
+
+
+def _decimal(value: Any) -> Decimal | None:
+    if isinstance(value, bool) or not isinstance(value, (int, float, str, Decimal)):
+        return None
+    try:
+        return Decimal(value) if isinstance(value, int) else Decimal(str(value))
+    except InvalidOperation:
+        return None
+
+
+def _unit(quantity: dict[str, Any]) -> tuple[str, str]:
+    """System and code of a Quantity, falling back to its human-readable unit."""
+    return quantity.get("system") or "", quantity.get("code") or quantity.get("unit") or ""
+
+
+def quantity_elements(resource: dict[str, Any], path: str) -> list[dict[str, Any]]:
+    """Collect the Quantity elements at a dotted path, descending into lists."""
+    current: list[Any] = [resource]
+    for part in path.split("."):
+        found: list[Any] = []
+        for item in current:
+            value = item.get(part) if isinstance(item, dict) else None
+            if isinstance(value, list):
+                found.extend(value)
+            elif value is not None:
+                found.append(value)
+        current = found
+    return [item for item in current if isinstance(item, dict)]
+
+
+def match_quantity(quantity: dict[str, Any], search: QuantitySearch) -> bool:
+    """Check whether one recorded Quantity matches a search value."""
+    value = _decimal(quantity.get("value"))
+    if value is None:
+        return False
+    system, code = _unit(quantity)
+    canonical = search.canonical()
+    if canonical is None:
+        return search.matches_unit(system, code) and search.range().contains(value)
+    # UCUM searches match data recorded in any compatible UCUM unit
+    recorded = canonicalize(value, code) if code and system in ("", UCUM_SYSTEM) else None
+    search_range, dimension = canonical
+    return recorded is not None and recorded.dimension == dimension and search_range.contains(recorded.value)
+
+
+class QuantityIndex:
+    """Sorted quantity values of indexed search parameters, kept up to date on write.
+
+    Canonical entries are ``(base-unit value, reference)`` tuples; raw entries
+    are ``(value, reference, system, code)`` tuples. Both are kept sorted by
+    value.
+    """
+
+    def __init__(self) -> None:
+        self._canonical: dict[tuple[str, str, Dimension], list[tuple[Decimal, str]]] = {}
+        self._raw: dict[tuple[str, str], list[tuple[Decimal, str, str, str]]] = {}
+        # Entries per resource reference, for removal on update and delete
+        self._entries: dict[str, list[tuple[tuple[Any, ...], tuple[Any, ...]]]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._raw.values())
+
+    @staticmethod
+    def is_indexed(resource_type: str, param: str) -> bool:
+        """Check whether a search parameter is served by the index."""
+        return param in QUANTITY_PARAMS.get(resource_type, {})
+
+    def add(self, resource: dict[str, Any]) -> None:
+        """Index a resource, replacing the entries of its previous version."""
+        resource_type = resource.get("resourceType")
+        ref = f"{resource_type}/{resource.get('id')}"
+        self.remove(ref)
+        params = QUANTITY_PARAMS.get(resource_type or "")
+        if not params:
+            return
+
+        added: list[tuple[tuple[Any, ...], tuple[Any, ...]]] = []
+        for param, path in params.items():
+            for quantity in quantity_elements(resource, path):
+                value = _decimal(quantity.get("value"))
+                if value is None:
+                    continue
+                system, code = _unit(quantity)
+                raw_key = (resource_type, param)
+                raw_entry = (value, ref, system, code)
+                insort(self._raw.setdefault(raw_key, []), raw_entry, key=_value)
+                added.append((raw_key, raw_entry))
+                if code and system in ("", UCUM_SYSTEM):
+                    canonical = canonicalize(value, code)
+                    if canonical is not None:
+                        key = (resource_type, param, canonical.dimension)
+                        entry = (canonical.value, ref)
+                        insort(self._canonical.setdefault(key, []), entry, key=_value)
+                        added.append((key, entry))
+        if added:
+            self._entries[ref] = added
+
+    def remove(self, ref: str) -> None:
+        """Remove the entries of a resource."""
+        for key, entry in self._entries.pop(ref, ()):
+            entries = self._raw[key] if len(key) == 2 else self._canonical[key]
+            position = bisect_left(entries, entry[0], key=_value)
+            while entries[position] != entry:
+                position += 1
+            del entries[position]
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        self._canonical.clear()
+        self._raw.clear()
+        self._entries.clear()
+
+    def search(self, resource_type: str, param: str, values: list[str]) -> set[str]:
+        """Find the resources matching any of the search values.
+
+        Args:
+            resource_type: FHIR resource type
+            param: Indexed quantity search parameter
+            values: Search values (OR semantics)
+
+        Returns:
+            References (``Type/id``) of the matching resources
+        """
+        refs: set[str] = set()
+        for value in values:
+            search = QuantitySearch.parse(value)
+            if search is None:
+                continue
+            canonical = search.canonical()
+            if canonical is not None:
+                search_range, dimension = canonical
+                refs.update(
+                    ref for _, ref in search_range.scan(self._canonical.get((resource_type, param, dimension), []))
+                )
+                continue
+            for _, ref, system, code in search.range().scan(self._raw.get((resource_type, param), [])):
+                if search.matches_unit(system, code):
+                    refs.add(ref)
+        return refs
@@ -0,0 +1,132 @@
+"""Sorted prefix index for string search parameters.
+
+FHIR string search matches values that start with the search value,
+ignoring case and accents: ``Patient?name=joh`` finds Johnson and Johanna.
+The index keeps the normalized values of each string search parameter in a
+list sorted by value, so such a search is a ``bisect`` range lookup instead
+of a scan of every resource. Multi-valued elements (several names, given
+names, address lines) contribute one entry per value.
+
+Like the text index, a resource type is indexed when it is first searched.
+Entries of resources written after that are collected and merged into the
+sorted lists at the next search.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections.abc import Iterable
+from operator import itemgetter
+from typing import Any
+
+from .text_index import normalize, string_params, string_values
+
+# Sorts after every character, to bound the keys that start with a prefix
+_HIGHEST = chr(0x10FFFF)
+# Up to this many written entries are inserted one by one; more are merged by sorting
+_INSERT_LIMIT = 64
+
+_key = itemgetter(0)
+
+
+class StringIndex:
+    """Sorted normalized values of string search parameters, kept up to date on write.
+
+    Entries are ``(normalized value, reference)`` tuples.
+    """
+
+    def __init__(self) -> None:
+        # Resource types whose resources are indexed
+        self._types: set[str] = set()
+        self._sorted: dict[tuple[str, str], list[tuple[str, str]]] = {}
+        # Entries written since the last search: {(type, param): entries}. A set,
+        # so that removing an entry on update or delete does not scan them.
+        self._pending: dict[tuple[str, str], set[tuple[str, str]]] = {}
+        # Entries per resource reference, for removal on update and delete
+        self._entries: dict[str, list[tuple[tuple[str, str], tuple[str, str]]]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    @staticmethod
+    def is_indexed(resource_type: str, param: str) -> bool:
+        """Check whether a search parameter is served by the index."""
+        return param in string_params(resource_type)
+
+    def covers(self, resource_type: str) -> bool:
+        """Check whether the resources of a type are indexed."""
+        return resource_type in self._types
+
+    def index_type(self, resource_type: str, resources: Iterable[dict[str, Any]]) -> None:
+        """Index the current resources of a type, and its resources written from now on."""
+        self._types.add(resource_type)
+        for resource in resources:
+            self.add(resource)
+
+    def add(self, resource: dict[str, Any]) -> None:
+        """Index a resource, replacing the entries of its previous version."""
+        resource_type = resource.get("resourceType")
+        if resource_type not in self._types:
+            return
+        ref = f"{resource_type}/{resource.get('id')}"
+        self.remove(ref)
+
+        added: list[tuple[tuple[str, str], tuple[str, str]]] = []
+        for param, path in string_params(resource_type).items():
+            key = (resource_type, param)
+            for value in {normalize(value) for value in string_values(resource, path) if value}:
+                entry = (value, ref)
+                self._pending.setdefault(key, set()).add(entry)
+                added.append((key, entry))
+        if added:
+            self._entries[ref] = added
+
+    def remove(self, ref: str) -> None:
+        """Remove the entries of a resource."""
+        for key, entry in self._entries.pop(ref, ()):
+            pending = self._pending.get(key)
+            if pending is not None and entry in pending:
+                pending.discard(entry)
+                continue
+            entries = self._sorted[key]
+            del entries[bisect_left(entries, entry)]
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        self._types.clear()
+        self._sorted.clear()
+        self._pending.clear()
+        self._entries.clear()
+
+    def _entries_of(self, key: tuple[str, str]) -> list[tuple[str, str]]:
+        """The sorted entries of a parameter, after merging the written entries."""
+        entries = self._sorted.setdefault(key, [])
+        pending = self._pending.pop(key, None)
+        if pending:
+            if len(pending) <= _INSERT_LIMIT:
+                for entry in pending:
+                    entries.insert(bisect_left(entries, entry), entry)
+            else:
+                entries.extend(pending)
+                entries.sort()
+        return entries
+
+    def search(self, resource_type: str, param: str, values: list[str]) -> set[str]:
+        """Find the resources with a value starting with any of the search values.
+
+        Args:
+            resource_type: FHIR resource type
+            param: String search parameter
+            values: Search values (OR semantics)
+
+        Returns:
+            References (``Type/id``) of the matching resources
+        """
+        entries = self._entries_of((resource_type, param))
+        refs: set[str] = set()
+        for value in values:
+            prefix = normalize(value)
+            start = bisect_left(entries, prefix, key=_key)
+            end = bisect_left(entries, prefix + _HIGHEST, key=_key)
+            refs.update(ref for _, ref in entries[start:end])
+        return refs
@@ -0,0 +1,278 @@
+"""Full-text and trigram index for string and text search.
+
+Text is indexed when a resource is written, normalized for matching (case
+folded, accents removed), in two kinds of postings per resource type:
+
+- trigram postings over the values of string search parameters, so that
+  ``Patient?name:contains=ohns`` intersects the postings of ``ohn`` and
+  ``hns`` and only checks the values of the few resources found in both;
+  ``:exact`` uses the same postings and then compares the values as written
+- word postings over the narrative (``_text``) and over all text in the
+  resource (``_content``); a search value matches resources containing all
+  of its words
+
+A resource type is indexed when it is first searched, so that loading data
+does not pay for indexing types that are never searched by text.
+"""
+
+from __future__ import annotations
+
+import html
+import re
+import unicodedata
+from collections.abc import Iterable
+from functools import cache
+from typing import Any
+
+# Search parameters over the text of the whole resource
+TEXT_PARAMS = ("_text", "_content")
+# Modifiers of string search parameters served by the index
+STRING_MODIFIERS = ("contains", "exact")
+
+# Parts of HumanName and Address searched by string parameters
+_STRING_PARTS = (
+    "text",
+    "family",
+    "given",
+    "prefix",
+    "suffix",
+    "line",
+    "city",
+    "district",
+    "state",
+    "postalCode",
+    "country",
+)
+_WORD = re.compile(r"\w+")
+_TAG = re.compile(r"<[^>]*>")
+
+
+def normalize(text: str) -> str:
+    """Case fold a string and remove its accents."""
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def trigrams(text: str) -> set[str]:
+    """The substrings of three characters of a (normalized) string."""
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def words(text: str) -> set[str]:
+    """The words of a (normalized) string."""
+    return set(_WORD.findall(text))
+
+
+@cache
+def string_params(resource_type: str) -> dict[str, str]:
+    """Paths of the string search parameters of a resource type."""
+    # Imported here: the API package imports the store
+    from ..api.search import SEARCH_PARAMS
+
+    return {
+        name: definition["path"]
+        for name, definition in SEARCH_PARAMS.get(resource_type, {}).items()
+        if definition["type"] == "string"
+    }
+
+
+def string_values(resource: dict[str, Any], path: str) -> list[str]:
+    """Collect the strings searched by a string parameter at a dotted path.
+
+    HumanName and Address elements contribute their name and address parts.
+    """
+    current: list[Any] = [resource]
+    for part in path.split("."):
+        found: list[Any] = []
+        for item in current:
+            value = item.get(part) if isinstance(item, dict) else None
+            if isinstance(value, list):
+                found.extend(value)
+            elif value is not None:
+                found.append(value)
+        current = found
+
+    values: list[str] = []
+    for item in current:
+        if isinstance(item, str):
+            values.append(item)
+        elif isinstance(item, dict):
+            for key in _STRING_PARTS:
+                part = item.get(key)
+                if isinstance(part, str):
+                    values.append(part)
+                elif isinstance(part, list):
+                    values.extend(p for p in part if isinstance(p, str))
+    return values
+
+
+def narrative(resource: dict[str, Any]) -> str:
+    """The text of a resource's narrative, without markup."""
+    div = (resource.get("text") or {}).get("div")
+    if not isinstance(div, str):
+        return ""
+    return html.unescape(_TAG.sub(" ", div))
+
+
+def _strings(value: Any, found: list[str]) -> list[str]:
+    if isinstance(value, str):
+        found.append(value)
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            if key not in ("meta", "div"):
+                _strings(item, found)
+    elif isinstance(value, list):
+        for item in value:
+            _strings(item, found)
+    return found
+
+
+def content(resource: dict[str, Any]) -> str:
+    """All text of a resource: its string values and narrative."""
+    return " ".join(_strings(resource, [narrative(resource)]))
+
+
+def _intersect(postings: list[set[str]]) -> set[str]:
+    if not postings:
+        return set()
+    postings.sort(key=len)
+    return postings[0].intersection(*postings[1:])
+
+
+class TextIndex:
+    """Trigram and word postings of stored resources, kept up to date on write."""
+
+    def __init__(self) -> None:
+        # Resource types whose resources are indexed
+        self._types: set[str] = set()
+        # String parameter values: {(type, param): {ref: ((value, normalized), ...)}}
+        self._values: dict[tuple[str, str], dict[str, tuple[tuple[str, str], ...]]] = {}
+        # Trigrams of all string parameter values: {type: {trigram: refs}}
+        self._trigrams: dict[str, dict[str, set[str]]] = {}
+        # Words of the narrative and of the whole resource: {(type, param): {word: refs}}
+        self._words: dict[tuple[str, str], dict[str, set[str]]] = {}
+        # Trigrams and words per resource reference, for removal on update and delete
+        self._entries: dict[str, tuple[frozenset[str], dict[str, frozenset[str]]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def is_indexed(resource_type: str, param: str) -> bool:
+        """Check whether a search parameter (with modifier) is served by the index."""
+        if param in TEXT_PARAMS:
+            return True
+        name, _, modifier = param.partition(":")
+        return modifier in STRING_MODIFIERS and name in string_params(resource_type)
+
+    def covers(self, resource_type: str) -> bool:
+        """Check whether the resources of a type are indexed."""
+        return resource_type in self._types
+
+    def index_type(self, resource_type: str, resources: Iterable[dict[str, Any]]) -> None:
+        """Index the current resources of a type, and its resources written from now on."""
+        self._types.add(resource_type)
+        for resource in resources:
+            self.add(resource)
+
+    def add(self, resource: dict[str, Any]) -> None:
+        """Index a resource, replacing the entries of its previous version."""
+        resource_type = resource.get("resourceType")
+        if resource_type not in self._types:
+            return
+        ref = f"{resource_type}/{resource.get('id')}"
+        self.remove(ref)
+
+        resource_trigrams: set[str] = set()
+        for param, path in string_params(resource_type).items():
+            values = tuple((value, normalize(value)) for value in string_values(resource, path) if value)
+            if values:
+                self._values.setdefault((resource_type, param), {})[ref] = values
+                for _, normalized in values:
+                    resource_trigrams |= trigrams(normalized)
+        type_trigrams = self._trigrams.setdefault(resource_type, {})
+        for trigram in resource_trigrams:
+            type_trigrams.setdefault(trigram, set()).add(ref)
+
+        resource_words = {
+            "_text": words(normalize(narrative(resource))),
+            "_content": words(normalize(content(resource))),
+        }
+        for param, param_words in resource_words.items():
+            postings = self._words.setdefault((resource_type, param), {})
+            for word in param_words:
+                postings.setdefault(word, set()).add(ref)
+
+        self._entries[ref] = (
+            frozenset(resource_trigrams),
+            {param: frozenset(param_words) for param, param_words in resource_words.items()},
+        )
+
+    def remove(self, ref: str) -> None:
+        """Remove the entries of a resource."""
+        entry = self._entries.pop(ref, None)
+        if entry is None:
+            return
+        resource_type = ref.split("/", 1)[0]
+        resource_trigrams, resource_words = entry
+        for param in string_params(resource_type):
+            self._values.get((resource_type, param), {}).pop(ref, None)
+        type_trigrams = self._trigrams[resource_type]
+        for trigram in resource_trigrams:
+            refs = type_trigrams[trigram]
+            refs.discard(ref)
+            if not refs:
+                del type_trigrams[trigram]
+        for param, param_words in resource_words.items():
+            postings = self._words[(resource_type, param)]
+            for word in param_words:
+                refs = postings[word]
+                refs.discard(ref)
+                if not refs:
+                    del postings[word]
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        self._types.clear()
+        self._values.clear()
+        self._trigrams.clear()
+        self._words.clear()
+        self._entries.clear()
+
+    def search(self, resource_type: str, param: str, values: list[str]) -> set[str]:
+        """Find the resources matching any of the search values.
+
+        Args:
+            resource_type: FHIR resource type
+            param: ``_text``, ``_content``, or a string parameter with the
+                ``contains`` or ``exact`` modifier
+            values: Search values (OR semantics)
+
+        Returns:
+            References (``Type/id``) of the matching resources
+        """
+        refs: set[str] = set()
+        if param in TEXT_PARAMS:
+            postings = self._words.get((resource_type, param), {})
+            for value in values:
+                query = words(normalize(value))
+                if query:
+                    refs |= _intersect([postings.get(word, set()) for word in query])
+            return refs
+
+        name, _, modifier = param.partition(":")
+        field = self._values.get((resource_type, name), {})
+        type_trigrams = self._trigrams.get(resource_type, {})
+        for value in values:
+            query = normalize(value)
+            if len(query) >= 3:
+                candidates = _intersect([type_trigrams.get(trigram, set()) for trigram in trigrams(query)])
+            else:
+                candidates = set(field)
+            if modifier == "exact":
+                refs.update(ref for ref in candidates if any(raw == value for raw, _ in field.get(ref, ())))
+            else:
+                refs.update(ref for ref in candidates if any(query in text for _, text in field.get(ref, ())))
+        return refs
@@ -0,0 +1,206 @@
+"""Code postings for terminology-aware token search modifiers.
+
+The codes of token search parameters (codings, CodeableConcepts and plain
+codes) are indexed when a resource is written, as postings from code to the
+resources that have it. The terminology modifiers then resolve their value
+to a set of codes once and look those codes up, instead of asking the
+terminology about the codes of each resource:
+
+- ``code:in=<ValueSet url>`` the codes of the (cached) ValueSet expansion
+- ``code:not-in=<ValueSet url>`` resources with none of those codes
+- ``code:below=[system|]code`` the code and the codes it subsumes
+- ``code:above=[system|]code`` the code and the codes that subsume it
+
+Subsumption comes from the transitive-closure tables of the stored
+CodeSystem hierarchies. Like the text index, a resource type is indexed
+when it is first searched with a modifier.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from functools import cache
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from ..terminology import FHIRStoreTerminologyProvider
+
+# Token modifiers served by the index
+TOKEN_MODIFIERS = ("in", "not-in", "below", "above")
+
+
+@cache
+def token_params(resource_type: str) -> dict[str, str]:
+    """Paths of the token search parameters of a resource type."""
+    # Imported here: the API package imports the store
+    from ..api.search import SEARCH_PARAMS
+
+    return {
+        name: definition["path"]
+        for name, definition in SEARCH_PARAMS.get(resource_type, {}).items()
+        if definition["type"] == "token" and name != "_id"
+    }
+
+
+def token_codes(resource: dict[str, Any], path: str) -> set[tuple[str, str]]:
+    """Collect the ``(system, code)`` pairs of a token parameter at a dotted path.
+
+    Codings and CodeableConcepts contribute their codes, plain strings are
+    codes without a system (an empty system).
+    """
+    current: list[Any] = [resource]
+    for part in path.split("."):
+        found: list[Any] = []
+        for item in current:
+            value = item.get(part) if isinstance(item, dict) else None
+            if isinstance(value, list):
+                found.extend(value)
+            elif value is not None:
+                found.append(value)
+        current = found
+
+    codes: set[tuple[str, str]] = set()
+    for item in current:
+        if isinstance(item, str):
+            codes.add(("", item))
+        elif isinstance(item, dict):
+            codings = item.get("coding")
+            for coding in codings if isinstance(codings, list) else [item]:
+                if isinstance(coding, dict) and isinstance(coding.get("code"), str):
+                    codes.add((coding.get("system") or "", coding["code"]))
+    return codes
+
+
+class TokenIndex:
+    """Postings from codes to the resources that have them, kept up to date on write."""
+
+    def __init__(self) -> None:
+        # Resource types whose resources are indexed
+        self._types: set[str] = set()
+        # Resources per code: {(type, param): {(system, code): refs}}
+        self._postings: dict[tuple[str, str], dict[tuple[str, str], set[str]]] = {}
+        # Resources per code of any system: {(type, param): {code: refs}}
+        self._by_code: dict[tuple[str, str], dict[str, set[str]]] = {}
+        # Indexed resources per type, for :not-in
+        self._refs: dict[str, set[str]] = {}
+        # Codes per resource reference, for removal on update and delete
+        self._entries: dict[str, list[tuple[tuple[str, str], tuple[str, str]]]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    @staticmethod
+    def is_indexed(resource_type: str, param: str) -> bool:
+        """Check whether a search parameter (with modifier) is served by the index."""
+        name, _, modifier = param.partition(":")
+        return modifier in TOKEN_MODIFIERS and name in token_params(resource_type)
+
+    def covers(self, resource_type: str) -> bool:
+        """Check whether the resources of a type are indexed."""
+        return resource_type in self._types
+
+    def index_type(self, resource_type: str, resources: Iterable[dict[str, Any]]) -> None:
+        """Index the current resources of a type, and its resources written from now on."""
+        self._types.add(resource_type)
+        self._refs.setdefault(resource_type, set())
+        for resource in resources:
+            self.add(resource)
+
+    def add(self, resource: dict[str, Any]) -> None:
+        """Index a resource, replacing the codes of its previous version."""
+        resource_type = resource.get("resourceType")
+        if resource_type not in self._types:
+            return
+        ref = f"{resource_type}/{resource.get('id')}"
+        self.remove(ref)
+        self._refs[resource_type].add(ref)
+
+        added: list[tuple[tuple[str, str], tuple[str, str]]] = []
+        for param, path in token_params(resource_type).items():
+            key = (resource_type, param)
+            for system, code in token_codes(resource, path):
+                self._postings.setdefault(key, {}).setdefault((system, code), set()).add(ref)
+                self._by_code.setdefault(key, {}).setdefault(code, set()).add(ref)
+                added.append((key, (system, code)))
+        if added:
+            self._entries[ref] = added
+
+    def remove(self, ref: str) -> None:
+        """Remove the codes of a resource."""
+        resource_type = ref.split("/", 1)[0]
+        self._refs.get(resource_type, set()).discard(ref)
+        for key, (system, code) in self._entries.pop(ref, ()):
+            postings = self._postings[key]
+            refs = postings[(system, code)]
+            refs.discard(ref)
+            if not refs:
+                del postings[(system, code)]
+            # A code in several systems has one entry per system, but is removed once
+            by_code = self._by_code[key]
+            refs = by_code.get(code)
+            if refs is not None:
+                refs.discard(ref)
+                if not refs:
+                    del by_code[code]
+
+    def clear(self) -> None:
+        """Remove all codes."""
+        self._types.clear()
+        self._postings.clear()
+        self._by_code.clear()
+        self._refs.clear()
+        self._entries.clear()
+
+    def lookup(self, resource_type: str, param: str, codes: Iterable[tuple[str, str]]) -> set[str]:
+        """Find the resources with any of the codes of a parameter.
+
+        Args:
+            resource_type: FHIR resource type
+            param: Token search parameter, without modifier
+            codes: ``(system, code)`` pairs; an empty system matches any system
+
+        Returns:
+            References (``Type/id``) of the matching resources
+        """
+        postings = self._postings.get((resource_type, param), {})
+        by_code = self._by_code.get((resource_type, param), {})
+        refs: set[str] = set()
+        for system, code in codes:
+            refs |= postings.get((system, code), set()) if system else by_code.get(code, set())
+        return refs
+
+    def search(
+        self,
+        resource_type: str,
+        param: str,
+        values: list[str],
+        terminology: FHIRStoreTerminologyProvider,
+    ) -> set[str]:
+        """Find the resources matching any of the search values of a token modifier.
+
+        Args:
+            resource_type: FHIR resource type
+            param: Token parameter with the ``in``, ``not-in``, ``below`` or ``above`` modifier
+            values: ValueSet URLs for ``in`` and ``not-in``, ``[system|]code`` otherwise (OR semantics)
+            terminology: Source of ValueSet expansions and CodeSystem closures
+
+        Returns:
+            References (``Type/id``) of the matching resources
+        """
+        name, _, modifier = param.partition(":")
+        codes: set[tuple[str, str]] = set()
+        for value in values:
+            if modifier in ("in", "not-in"):
+                codes |= terminology.expansion_codes(value)
+                continue
+            system, _, code = value.rpartition("|")
+            related = terminology.ancestors if modifier == "above" else terminology.descendants
+            codes.add((system, code))
+            # Without a system, the code is related in every CodeSystem that defines it
+            for code_system in [system] if system else terminology.code_systems(code):
+                codes.update((code_system, relative) for relative in related(code_system, code))
+
+        refs = self.lookup(resource_type, name, codes)
+        if modifier == "not-in":
+            return self._refs.get(resource_type, set()) - refs
+        return refs
@@ -1,6 +1,7 @@
 """Terminology provider for FHIR server."""
 
+from .compact_provider import CompactTerminologyProvider
 from .fhir_store_provider import FHIRStoreTerminologyProvider
 from .provider import TerminologyProvider
 
-__all__ = ["TerminologyProvider", "FHIRStoreTerminologyProvider"]
+__all__ = ["TerminologyProvider", "FHIRStoreTerminologyProvider", "CompactTerminologyProvider"]
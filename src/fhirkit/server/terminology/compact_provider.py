@@ -0,0 +1,289 @@
+"""Terminology provider backed by compact, memory-mapped CodeSystem files."""
+
+import uuid
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from fhirkit.terminology.compact import CompactCodeSystem
+
+from .provider import TerminologyProvider
+
+# File suffix of compact CodeSystems
+COMPACT_SUFFIX = ".fcs"
+
+
+class CompactTerminologyProvider(TerminologyProvider):
+    """Terminology operations on compact CodeSystem files.
+
+    Large CodeSystems (LOINC, SNOMED CT) are served from memory-mapped files
+    instead of CodeSystem resources in the store. ``$lookup`` and
+    ``$subsumes`` read the files directly, and ``$validate-code`` and
+    ``$expand`` read them for the implicit ValueSets of a CodeSystem
+    (``{system}?fhir_vs`` for all codes, ``{system}?fhir_vs=isa/{code}``
+    for a code and its descendants). Everything else goes to the fallback
+    provider, usually the store's.
+
+    Example:
+        provider = CompactTerminologyProvider.from_directory("terminology", fallback=store.terminology)
+        provider.subsumes("http://snomed.info/sct", "73211009", "44054006")
+    """
+
+    def __init__(
+        self,
+        code_systems: Iterable[CompactCodeSystem],
+        fallback: TerminologyProvider | None = None,
+    ):
+        """Initialize with compact CodeSystems.
+
+        Args:
+            code_systems: Mapped CodeSystem files; a later file replaces an
+                earlier one with the same URL and version
+            fallback: Provider for CodeSystems and ValueSets not in the files
+        """
+        self._fallback = fallback
+        # {url: {version: code system}}, the first version is the default
+        self._code_systems: dict[str, dict[str | None, CompactCodeSystem]] = {}
+        for code_system in code_systems:
+            self._code_systems.setdefault(code_system.url, {})[code_system.version] = code_system
+
+    @classmethod
+    def from_directory(
+        cls,
+        directory: str | Path,
+        fallback: TerminologyProvider | None = None,
+    ) -> "CompactTerminologyProvider":
+        """Map all compact CodeSystem files (``*.fcs``) of a directory.
+
+        Raises:
+            CompactCodeSystemError: If a file is not a compact CodeSystem
+        """
+        paths = sorted(Path(directory).glob(f"*{COMPACT_SUFFIX}"))
+        return cls([CompactCodeSystem(path) for path in paths], fallback=fallback)
+
+    def close(self) -> None:
+        """Release the memory maps of all files."""
+        for versions in self._code_systems.values():
+            for code_system in versions.values():
+                code_system.close()
+        self._code_systems.clear()
+
+    def code_system_urls(self) -> list[str]:
+        """Get the URLs of the mapped CodeSystems."""
+        return list(self._code_systems)
+
+    def code_system(self, system: str | None, version: str | None = None) -> CompactCodeSystem | None:
+        """Get the compact CodeSystem of a URL, or None if there is no file for it."""
+        versions = self._code_systems.get(system or "")
+        if not versions:
+            return None
+        if version is None:
+            return next(iter(versions.values()))
+        return versions.get(version)
+
+    def expand_valueset(
+        self,
+        url: str | None = None,
+        valueset_id: str | None = None,
+        filter_text: str | None = None,
+        count: int = 100,
+        offset: int = 0,
+        version: str | None = None,
+        active_only: bool = False,
+    ) -> dict[str, Any] | None:
+        """Expand a ValueSet, paging through the file for implicit ValueSets.
+
+        Compact files do not record concept status, so ``active_only`` only
+        applies to ValueSets of the fallback.
+        """
+        implicit = self._implicit_valueset(url) if url else None
+        if implicit is None:
+            if self._fallback is None:
+                return None
+            return self._fallback.expand_valueset(url, valueset_id, filter_text, count, offset, version, active_only)
+
+        code_system, root = implicit
+        if root is None and not filter_text:
+            # Concepts are numbered in code order, so a page is a slice
+            total = len(code_system)
+            page: Iterable[tuple[str, str | None]] = code_system.concepts(offset, offset + count)
+        else:
+            matches = self._implicit_concepts(code_system, root)
+            if filter_text:
+                filter_lower = filter_text.lower()
+                matches = (
+                    (code, display)
+                    for code, display in matches
+                    if filter_lower in code.lower() or filter_lower in (display or "").lower()
+                )
+            # The total needs every match, but only the page is kept
+            total = 0
+            kept: list[tuple[str, str | None]] = []
+            for concept in matches:
+                if offset <= total < offset + count:
+                    kept.append(concept)
+                total += 1
+            page = kept
+
+        contains = []
+        for code, display in page:
+            entry = {"system": code_system.url, "code": code}
+            if display:
+                entry["display"] = display
+            contains.append(entry)
+        return {
+            "resourceType": "ValueSet",
+            "url": url,
+            "status": "active",
+            "expansion": {
+                "identifier": f"urn:uuid:{uuid.uuid4()}",
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "total": total,
+                "offset": offset,
+                "contains": contains,
+            },
+        }
+
+    def validate_code(
+        self,
+        valueset_url: str | None = None,
+        valueset_id: str | None = None,
+        code: str | None = None,
+        system: str | None = None,
+        coding: dict[str, Any] | None = None,
+        codeable_concept: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        """Validate a code, against the file for implicit ValueSets."""
+        implicit = self._implicit_valueset(valueset_url) if valueset_url else None
+        if implicit is None:
+            if self._fallback is None:
+                return self._make_parameters(result=False, message=f"ValueSet not found: {valueset_url or valueset_id}")
+            return self._fallback.validate_code(valueset_url, valueset_id, code, system, coding, codeable_concept)
+
+        codes_to_check: list[tuple[str | None, str | None]] = [(code, system)]
+        if coding:
+            codes_to_check.append((coding.get("code"), coding.get("system")))
+        if codeable_concept:
+            codes_to_check.extend((c.get("code"), c.get("system")) for c in codeable_concept.get("coding", []))
+        codes_to_check = [(c, s) for c, s in codes_to_check if c]
+        if not codes_to_check:
+            return self._make_parameters(result=False, message="No code provided for validation")
+
+        code_system, root = implicit
+        for check_code, check_system in codes_to_check:
+            if check_system and check_system != code_system.url:
+                continue
+            if check_code in code_system and (root is None or code_system.subsumes(root, check_code)):
+                return self._make_parameters(result=True, display=code_system.display(check_code))
+
+        return self._make_parameters(
+            result=False, message=f"Code '{code or coding or codeable_concept}' not found in ValueSet"
+        )
+
+    def lookup_code(
+        self,
+        system: str,
+        code: str,
+        version: str | None = None,
+    ) -> dict[str, Any] | None:
+        """Look up a code, with its parents as properties."""
+        code_system = self.code_system(system, version)
+        if code_system is None:
+            return self._fallback.lookup_code(system, code, version) if self._fallback else None
+        if code not in code_system:
+            return None
+
+        params: list[dict[str, Any]] = [
+            {"name": "name", "valueString": code_system.name or ""},
+            {"name": "display", "valueString": code_system.display(code) or ""},
+            {"name": "code", "valueCode": code},
+            {"name": "system", "valueUri": system},
+        ]
+        if code_system.version:
+            params.append({"name": "version", "valueString": code_system.version})
+        for parent in code_system.parents(code):
+            params.append(
+                {
+                    "name": "property",
+                    "part": [{"name": "code", "valueCode": "parent"}, {"name": "value", "valueCode": parent}],
+                }
+            )
+        return {"resourceType": "Parameters", "parameter": params}
+
+    def subsumes(
+        self,
+        system: str,
+        code_a: str,
+        code_b: str,
+        version: str | None = None,
+    ) -> dict[str, Any]:
+        """Check subsumption with the post-order intervals of the file."""
+        code_system = self.code_system(system, version)
+        if code_system is None:
+            if self._fallback is not None:
+                return self._fallback.subsumes(system, code_a, code_b, version)
+            return self._make_subsumes_result("not-subsumed", message=f"CodeSystem not found: {system}")
+        return self._make_subsumes_result(code_system.relationship(code_a, code_b))
+
+    def member_of(
+        self,
+        valueset_url: str,
+        code: str,
+        system: str,
+    ) -> bool:
+        """Check if code is a member of a ValueSet."""
+        result = self.validate_code(valueset_url=valueset_url, code=code, system=system)
+        for param in result.get("parameter", []):
+            if param.get("name") == "result":
+                return param.get("valueBoolean", False)
+        return False
+
+    def _implicit_valueset(self, url: str) -> tuple[CompactCodeSystem, str | None] | None:
+        """Get the CodeSystem and is-a root of an implicit ValueSet URL of a compact file.
+
+        Returns:
+            (code system, root code or None for all codes), or None if the URL
+            is not an implicit ValueSet of a compact CodeSystem
+        """
+        system, separator, query = url.partition("?fhir_vs")
+        code_system = self.code_system(system) if separator else None
+        if code_system is None:
+            return None
+        if not query:
+            return code_system, None
+        if query.startswith("=isa/") and len(query) > len("=isa/"):
+            return code_system, query[len("=isa/") :]
+        return None
+
+    def _implicit_concepts(self, code_system: CompactCodeSystem, root: str | None) -> Iterator[tuple[str, str | None]]:
+        if root is None:
+            return code_system.concepts()
+        # Display is read per code from the pool, only for codes below the root
+        return ((code, code_system.display(code)) for code in code_system.descendants(root, include_self=True))
+
+    def _make_parameters(
+        self,
+        result: bool,
+        display: str | None = None,
+        message: str | None = None,
+    ) -> dict[str, Any]:
+        """Create a FHIR Parameters resource for validate-code response."""
+        params: list[dict[str, Any]] = [{"name": "result", "valueBoolean": result}]
+
+        if display:
+            params.append({"name": "display", "valueString": display})
+
+        if message:
+            params.append({"name": "message", "valueString": message})
+
+        return {"resourceType": "Parameters", "parameter": params}
+
+    def _make_subsumes_result(self, outcome: str, message: str | None = None) -> dict[str, Any]:
+        """Create a FHIR Parameters resource for $subsumes response."""
+        params: list[dict[str, Any]] = [{"name": "outcome", "valueCode": outcome}]
+
+        if message:
+            params.append({"name": "message", "valueString": message})
+
+        return {"resourceType": "Parameters", "parameter": params}
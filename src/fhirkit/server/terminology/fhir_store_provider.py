@@ -1,13 +1,23 @@
 """FHIRStore-backed terminology provider."""
 
 import uuid
+from collections import OrderedDict
 from datetime import datetime, timezone
 from typing import TYPE_CHECKING, Any
 
+from fhirkit.terminology.expansion import ExpansionIndex, concept_inactive, words
+from fhirkit.terminology.hierarchy import HIERARCHY_FILTER_OPS, HierarchyIndex
+
 from .provider import TerminologyProvider
 
 if TYPE_CHECKING:
+    from fhirkit.terminology.compact import CompactCodeSystem
+
     from ..storage.fhir_store import FHIRStore
+    from .compact_provider import CompactTerminologyProvider
+
+# Maximum number of $expand results kept per provider
+EXPAND_RESULT_CACHE_SIZE = 1024
 
 
 class FHIRStoreTerminologyProvider(TerminologyProvider):
@@ -15,6 +25,10 @@ class FHIRStoreTerminologyProvider(TerminologyProvider):
 
     Provides FHIR terminology operations ($expand, $lookup, $validate-code, $subsumes)
     using resources stored in the FHIR server's data store.
+
+    CodeSystems in compact files (see ``use_compact``) take the place of
+    stored CodeSystems with the same URL for hierarchies, so ``:below``,
+    ``:above`` and ``:in`` searches and ValueSet compose expansion see them.
     """
 
     def __init__(self, store: "FHIRStore"):
@@ -24,8 +38,27 @@ class FHIRStoreTerminologyProvider(TerminologyProvider):
             store: The FHIR data store to use for terminology lookups
         """
         self._store = store
-        # Cache for CodeSystem hierarchies: {system_url: {code: set[ancestor_codes]}}
-        self._hierarchy_cache: dict[str, dict[str, set[str]]] = {}
+        # Cache for CodeSystem hierarchies: {"system|version": (generation, index)}
+        self._hierarchy_cache: dict[str, tuple[int, HierarchyIndex | None]] = {}
+        # ValueSet and CodeSystem generations the expansion caches were filled at
+        self._expansion_generations = (-1, -1)
+        # Expansion indexes: {(url or "#id", version): (valueset, index) or None}
+        self._expansions: dict[tuple[str, str], tuple[dict[str, Any], ExpansionIndex] | None] = {}
+        # $expand results by parameters, least recently used first
+        self._expand_results: OrderedDict[tuple[Any, ...], dict[str, Any] | None] = OrderedDict()
+        # Compact CodeSystem files, consulted before stored CodeSystems
+        self._compact: CompactTerminologyProvider | None = None
+
+    def use_compact(self, provider: "CompactTerminologyProvider | None") -> None:
+        """Read CodeSystem hierarchies from compact files before the store.
+
+        Args:
+            provider: Provider of the mapped files, or None to stop using them
+                (before they are closed)
+        """
+        self._compact = provider
+        self._hierarchy_cache.clear()
+        self._expansion_generations = (-1, -1)
 
     def expand_valueset(
         self,
@@ -34,41 +67,47 @@ class FHIRStoreTerminologyProvider(TerminologyProvider):
         filter_text: str | None = None,
         count: int = 100,
         offset: int = 0,
+        version: str | None = None,
+        active_only: bool = False,
     ) -> dict[str, Any] | None:
-        """Expand a ValueSet to list all codes."""
-        valueset = self._get_valueset(url, valueset_id)
-        if not valueset:
-            return None
-
-        codes = self._extract_codes_from_valueset(valueset)
-
-        # Apply text filter
-        if filter_text:
-            filter_lower = filter_text.lower()
-            codes = [
-                c
-                for c in codes
-                if filter_lower in (c.get("display", "").lower()) or filter_lower in (c.get("code", "").lower())
-            ]
+        """Expand a ValueSet to list all codes.
 
-        # Apply pagination
-        total = len(codes)
-        paginated_codes = codes[offset : offset + count]
-
-        # Build expansion
-        return {
-            "resourceType": "ValueSet",
-            "id": valueset.get("id"),
-            "url": valueset.get("url"),
-            "status": valueset.get("status", "active"),
-            "expansion": {
-                "identifier": f"urn:uuid:{uuid.uuid4()}",
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "total": total,
-                "offset": offset,
-                "contains": paginated_codes,
-            },
-        }
+        Expansions are indexed once per ValueSet URL and version, and results
+        are cached per parameters, until ValueSets or CodeSystems are written.
+        The returned resource is shared with the cache and must not be modified.
+        """
+        self._sync_expansions()
+        key = (url, valueset_id, version, tuple(words(filter_text)), count, offset, active_only)
+        results = self._expand_results
+        if key in results:
+            results.move_to_end(key)
+            return results[key]
+
+        expansion = self._expansion(url, valueset_id, version)
+        result = None
+        if expansion is not None:
+            valueset, index = expansion
+            total, contains = index.page(filter_text, count, offset, active_only)
+            result = {
+                "resourceType": "ValueSet",
+                "id": valueset.get("id"),
+                "url": valueset.get("url"),
+                "status": valueset.get("status", "active"),
+                "expansion": {
+                    "identifier": f"urn:uuid:{uuid.uuid4()}",
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                    "total": total,
+                    "offset": offset,
+                    "contains": contains,
+                },
+            }
+            if valueset.get("version"):
+                result["version"] = valueset["version"]
+
+        results[key] = result
+        if len(results) > EXPAND_RESULT_CACHE_SIZE:
+            results.popitem(last=False)
+        return result
 
     def validate_code(
         self,
@@ -80,8 +119,9 @@ class FHIRStoreTerminologyProvider(TerminologyProvider):
         codeable_concept: dict[str, Any] | None = None,
     ) -> dict[str, Any]:
         """Validate a code against a ValueSet."""
-        valueset = self._get_valueset(valueset_url, valueset_id)
-        if not valueset:
+        self._sync_expansions()
+        expansion = self._expansion(valueset_url, valueset_id, None)
+        if expansion is None:
             return self._make_parameters(result=False, message=f"ValueSet not found: {valueset_url or valueset_id}")
 
         # Extract code and system from inputs
@@ -89,21 +129,11 @@ class FHIRStoreTerminologyProvider(TerminologyProvider):
         if not codes_to_check:
             return self._make_parameters(result=False, message="No code provided for validation")
 
-        # Get all codes in the ValueSet
-        valueset_codes = self._extract_codes_from_valueset(valueset)
-
-        # Check each code
+        index = expansion[1]
         for check_code, check_system in codes_to_check:
-            for vs_code in valueset_codes:
-                vs_code_value = vs_code.get("code")
-                vs_system = vs_code.get("system")
-
-                # Match code value
-                if vs_code_value == check_code:
-                    # If system specified, it must match
-                    if check_system and vs_system and check_system != vs_system:
-                        continue
-                    return self._make_parameters(result=True, display=vs_code.get("display"))
+            match = index.lookup(check_code, check_system)
+            if match is not None:
+                return self._make_parameters(result=True, display=match.get("display"))
 
         return self._make_parameters(
             result=False, message=f"Code '{code or coding or codeable_concept}' not found in ValueSet"
@@ -152,28 +182,12 @@ class FHIRStoreTerminologyProvider(TerminologyProvider):
         if code_a == code_b:
             return self._make_subsumes_result("equivalent")
 
-        codesystem = self._get_codesystem(system, version)
-        if not codesystem:
+        hierarchy = self._hierarchy(system, version)
+        if hierarchy is None:
             return self._make_subsumes_result("not-subsumed", message=f"CodeSystem not found: {system}")
 
-        # Build hierarchy if not cached
-        cache_key = f"{system}|{version or ''}"
-        if cache_key not in self._hierarchy_cache:
-            self._hierarchy_cache[cache_key] = self._build_hierarchy(codesystem)
-
-        hierarchy = self._hierarchy_cache[cache_key]
-
-        # Check if code_a subsumes code_b (code_a is ancestor of code_b)
-        ancestors_of_b = hierarchy.get(code_b, set())
-        if code_a in ancestors_of_b:
-            return self._make_subsumes_result("subsumes")
-
-        # Check if code_b subsumes code_a (code_a is subsumed by code_b)
-        ancestors_of_a = hierarchy.get(code_a, set())
-        if code_b in ancestors_of_a:
-            return self._make_subsumes_result("subsumed-by")
-
-        return self._make_subsumes_result("not-subsumed")
+        # Interval check of the hierarchy index instead of walking ancestors
+        return self._make_subsumes_result(hierarchy.relationship(code_a, code_b))
 
     def member_of(
         self,
@@ -189,21 +203,102 @@ class FHIRStoreTerminologyProvider(TerminologyProvider):
                 return param.get("valueBoolean", False)
         return False
 
+    def ancestors(self, system: str, code: str, version: str | None = None) -> set[str]:
+        """Get the codes that subsume a code in a CodeSystem, transitively.
+
+        Args:
+            system: CodeSystem URL
+            code: Code to look up
+            version: Optional CodeSystem version
+
+        Returns:
+            Ancestor codes, excluding the code itself
+        """
+        hierarchy = self._hierarchy(system, version)
+        return hierarchy.ancestors(code) if hierarchy else set()
+
+    def descendants(self, system: str, code: str, version: str | None = None) -> set[str]:
+        """Get the codes subsumed by a code in a CodeSystem, transitively.
+
+        Args:
+            system: CodeSystem URL
+            code: Code to look up
+            version: Optional CodeSystem version
+
+        Returns:
+            Descendant codes, excluding the code itself
+        """
+        hierarchy = self._hierarchy(system, version)
+        return set(hierarchy.descendants(code)) if hierarchy else set()
+
+    def code_systems(self, code: str) -> list[str]:
+        """Get the URLs of the stored and compact CodeSystems that define a code."""
+        urls = [
+            url
+            for codesystem in self._store.get_all_resources("CodeSystem")
+            if (url := codesystem.get("url")) and code in (self._hierarchy(url) or ())
+        ]
+        if self._compact is not None:
+            urls.extend(
+                url for url in self._compact.code_system_urls() if url not in urls and code in self._hierarchy(url)
+            )
+        return urls
+
+    def expansion_codes(self, url: str) -> frozenset[tuple[str, str]]:
+        """Get the (system, code) pairs of a ValueSet expansion.
+
+        Expansions are cached until ValueSets or CodeSystems are written.
+        Codes without a system have an empty system.
+
+        Args:
+            url: ValueSet URL
+
+        Returns:
+            Codes of the expansion, empty if the ValueSet is not found
+        """
+        self._sync_expansions()
+        expansion = self._expansion(url, None, None)
+        return expansion[1].codes if expansion else frozenset()
+
     # =========================================================================
     # Helper methods
     # =========================================================================
 
-    def _get_valueset(self, url: str | None, valueset_id: str | None) -> dict[str, Any] | None:
-        """Get ValueSet by URL or ID."""
+    def _get_valueset(
+        self, url: str | None, valueset_id: str | None, version: str | None = None
+    ) -> dict[str, Any] | None:
+        """Get ValueSet by URL (and optional version) or ID."""
         if valueset_id:
             return self._store.read("ValueSet", valueset_id)
 
         if url:
             results, _ = self._store.search("ValueSet", {"url": url})
+            if version:
+                results = [vs for vs in results if vs.get("version") == version]
             return results[0] if results else None
 
         return None
 
+    def _sync_expansions(self) -> None:
+        """Drop cached expansions and $expand results when ValueSets or CodeSystems were written."""
+        generations = (self._store.generation("ValueSet"), self._store.generation("CodeSystem"))
+        if generations != self._expansion_generations:
+            self._expansion_generations = generations
+            self._expansions.clear()
+            self._expand_results.clear()
+
+    def _expansion(
+        self, url: str | None, valueset_id: str | None, version: str | None
+    ) -> tuple[dict[str, Any], ExpansionIndex] | None:
+        """Get a ValueSet and the index of its expansion, or None if it is not found."""
+        key = (f"#{valueset_id}" if valueset_id else url or "", version or "")
+        if key not in self._expansions:
+            valueset = self._get_valueset(url, valueset_id, version)
+            self._expansions[key] = (
+                (valueset, ExpansionIndex(self._extract_codes_from_valueset(valueset))) if valueset else None
+            )
+        return self._expansions[key]
+
     def _get_codesystem(self, system: str, version: str | None = None) -> dict[str, Any] | None:
         """Get CodeSystem by URL and optional version."""
         params: dict[str, Any] = {"url": system}
@@ -237,10 +332,23 @@ class FHIRStoreTerminologyProvider(TerminologyProvider):
                     }
                 )
 
+            hierarchy_filters = [
+                f
+                for f in include.get("filter", [])
+                if f.get("property") == "concept" and f.get("op") in HIERARCHY_FILTER_OPS and f.get("value")
+            ]
+            if hierarchy_filters and system:
+                codes.extend(self._filter_codes(system, include.get("version"), hierarchy_filters))
+
             # If no concepts but system specified, try to expand from CodeSystem
-            if not include.get("concept") and system:
-                codesystem = self._get_codesystem(system)
-                if codesystem:
+            elif not include.get("concept") and system:
+                compact = self._compact_code_system(system, include.get("version"))
+                codesystem = self._get_codesystem(system) if compact is None else None
+                if compact is not None:
+                    codes.extend(
+                        {"system": system, "code": code, "display": display} for code, display in compact.concepts()
+                    )
+                elif codesystem:
                     codes.extend(self._extract_codes_from_codesystem(codesystem))
 
             # Include codes from referenced ValueSets
@@ -251,6 +359,32 @@ class FHIRStoreTerminologyProvider(TerminologyProvider):
 
         return codes
 
+    def _filter_codes(self, system: str, version: str | None, filters: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Select the codes of a CodeSystem matching all hierarchy filters (is-a, descendent-of, ...)."""
+        hierarchy = self._hierarchy(system, version)
+        if hierarchy is None:
+            return []
+        selected = hierarchy.filter(filters[0]["op"], filters[0]["value"])
+        for f in filters[1:]:
+            also = set(hierarchy.filter(f["op"], f["value"]))
+            selected = [code for code in selected if code in also]
+        # Compact files do not record concept status
+        codesystem = (
+            self._get_codesystem(system, version) if self._compact_code_system(system, version) is None else None
+        )
+        inactive = (
+            {c["code"] for c in self._extract_codes_from_codesystem(codesystem) if c.get("inactive")}
+            if codesystem
+            else set()
+        )
+        codes = []
+        for code in selected:
+            entry: dict[str, Any] = {"system": system, "code": code, "display": hierarchy.display(code)}
+            if code in inactive:
+                entry["inactive"] = True
+            codes.append(entry)
+        return codes
+
     def _extract_codes_from_codesystem(self, codesystem: dict[str, Any]) -> list[dict[str, Any]]:
         """Extract all codes from a CodeSystem recursively."""
         codes: list[dict[str, Any]] = []
@@ -258,13 +392,14 @@ class FHIRStoreTerminologyProvider(TerminologyProvider):
 
         def extract_recursive(concepts: list[dict[str, Any]]) -> None:
             for concept in concepts:
-                codes.append(
-                    {
-                        "system": system,
-                        "code": concept.get("code"),
-                        "display": concept.get("display"),
-                    }
-                )
+                entry = {
+                    "system": system,
+                    "code": concept.get("code"),
+                    "display": concept.get("display"),
+                }
+                if concept_inactive(concept):
+                    entry["inactive"] = True
+                codes.append(entry)
                 # Recurse into nested concepts
                 if concept.get("concept"):
                     extract_recursive(concept["concept"])
@@ -310,23 +445,27 @@ class FHIRStoreTerminologyProvider(TerminologyProvider):
 
         return search_recursive(codesystem.get("concept", []))
 
-    def _build_hierarchy(self, codesystem: dict[str, Any]) -> dict[str, set[str]]:
-        """Build a map of code -> set of ancestor codes from CodeSystem hierarchy."""
-        hierarchy: dict[str, set[str]] = {}
+    def _compact_code_system(self, system: str, version: str | None = None) -> "CompactCodeSystem | None":
+        """Get the compact file of a CodeSystem, or None if there is none."""
+        return self._compact.code_system(system, version) if self._compact is not None else None
 
-        def build_recursive(concepts: list[dict[str, Any]], ancestors: set[str]) -> None:
-            for concept in concepts:
-                code = concept.get("code", "")
-                if code:
-                    hierarchy[code] = ancestors.copy()
+    def _hierarchy(self, system: str, version: str | None = None) -> "HierarchyIndex | CompactCodeSystem | None":
+        """Get the hierarchy index of a CodeSystem, or None if it is not found.
 
-                    # Recurse with this code added to ancestors
-                    if concept.get("concept"):
-                        new_ancestors = ancestors | {code}
-                        build_recursive(concept["concept"], new_ancestors)
-
-        build_recursive(codesystem.get("concept", []), set())
-        return hierarchy
+        A compact file is its own index. Indexes of stored CodeSystems are
+        cached until CodeSystems are written.
+        """
+        compact = self._compact_code_system(system, version)
+        if compact is not None:
+            return compact
+        generation = self._store.generation("CodeSystem")
+        cache_key = f"{system}|{version or ''}"
+        cached = self._hierarchy_cache.get(cache_key)
+        if cached is None or cached[0] != generation:
+            codesystem = self._get_codesystem(system, version)
+            cached = (generation, HierarchyIndex.from_codesystem(codesystem) if codesystem else None)
+            self._hierarchy_cache[cache_key] = cached
+        return cached[1]
 
     def _make_parameters(
         self,
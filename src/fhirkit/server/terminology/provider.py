@@ -19,6 +19,8 @@ class TerminologyProvider(ABC):
         filter_text: str | None = None,
         count: int = 100,
         offset: int = 0,
+        version: str | None = None,
+        active_only: bool = False,
     ) -> dict[str, Any] | None:
         """Expand a ValueSet to list all codes.
 
@@ -28,6 +30,8 @@ class TerminologyProvider(ABC):
             filter_text: Filter to apply to code/display
             count: Maximum number of codes to return
             offset: Offset for pagination
+            version: ValueSet version, with the URL
+            active_only: Leave out inactive codes
 
         Returns:
             Expanded ValueSet resource with expansion element, or None if not found
@@ -20,11 +20,12 @@ Example:
             print(f"{issue.severity}: {issue.message} at {issue.location}")
 """
 
-from .profile_validator import ProfileValidator
+from .profile_validator import CompiledProfile, ProfileValidator
 from .rules import RESOURCE_RULES
 from .validator import FHIRValidator, ValidationIssue, ValidationResult
 
 __all__ = [
+    "CompiledProfile",
     "FHIRValidator",
     "ProfileValidator",
     "ValidationResult",
@@ -1,15 +1,26 @@
 """Profile Validator for FHIR StructureDefinition profiles.
 
 This module provides validation of FHIR resources against StructureDefinition
-profiles, checking cardinality, fixed values, patterns, and constraints.
+profiles, checking cardinality, fixed values, patterns, bindings and constraints.
+
+Profiles are compiled once into a ``CompiledProfile``: a validation plan with
+precomputed path accessors, cardinality bounds, fixed and pattern values, the
+codes of required bindings, and pre-parsed FHIRPath invariants. Compiled
+profiles are cached per store and profile URL (with version), and recompiled
+when a StructureDefinition or ValueSet in the store changes.
 """
 
 from __future__ import annotations
 
 import logging
 import re
+import weakref
+from collections.abc import Callable
+from dataclasses import dataclass
 from typing import TYPE_CHECKING, Any
 
+from fhirkit.engine.fhirpath import FHIRPathEvaluator
+
 from .validator import ValidationIssue, ValidationResult
 
 if TYPE_CHECKING:
@@ -17,629 +28,584 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
-
-class ProfileValidator:
-    """Validator for FHIR resources against StructureDefinition profiles.
-
-    Validates resources against profile constraints including:
-    - Cardinality (min/max occurrence)
-    - Required elements
-    - Fixed values (fixed[x])
-    - Pattern values (pattern[x])
-    - Code bindings
-    - FHIRPath constraints
+# Type suffixes tried for choice elements (e.g., deceased -> deceasedBoolean)
+CHOICE_SUFFIXES = (
+    "Boolean",
+    "Integer",
+    "Decimal",
+    "String",
+    "Uri",
+    "Date",
+    "DateTime",
+    "Time",
+    "Instant",
+    "CodeableConcept",
+    "Coding",
+    "Quantity",
+    "Range",
+    "Ratio",
+    "Period",
+    "Reference",
+    "Attachment",
+    "Identifier",
+    "Address",
+    "ContactPoint",
+    "HumanName",
+    "Age",
+    "Duration",
+    "Timing",
+    "Annotation",
+    "Signature",
+)
+
+
+def element_path_to_field_path(element_path: str) -> str:
+    """Convert an ElementDefinition path to a resource field path.
+
+    Examples:
+        "Patient.name" -> "name"
+        "Patient.name.given" -> "name.given"
+        "Patient.deceased[x]" -> "deceased"
 
     Args:
-        store: FHIRStore for loading StructureDefinition resources
-    """
-
-    def __init__(self, store: FHIRStore):
-        self._store = store
-        self._profile_cache: dict[str, dict[str, Any] | None] = {}
-
-    def validate_against_profile(
-        self,
-        resource: dict[str, Any],
-        profile_url: str,
-    ) -> ValidationResult:
-        """Validate a resource against a StructureDefinition profile.
-
-        Args:
-            resource: The FHIR resource to validate
-            profile_url: Canonical URL of the StructureDefinition profile
-
-        Returns:
-            ValidationResult with issues found
-        """
-        issues: list[ValidationIssue] = []
-
-        # Load the profile
-        profile = self._load_profile(profile_url)
-        if profile is None:
-            issues.append(
-                ValidationIssue(
-                    severity="error",
-                    code="not-found",
-                    location="meta.profile",
-                    message=f"Profile not found: {profile_url}",
-                )
-            )
-            return ValidationResult(valid=False, issues=issues)
-
-        # Check resource type matches profile type
-        profile_type = profile.get("type")
-        resource_type = resource.get("resourceType")
-        if profile_type and resource_type != profile_type:
-            issues.append(
-                ValidationIssue(
-                    severity="error",
-                    code="invalid",
-                    location="resourceType",
-                    message=f"Resource type '{resource_type}' does not match profile type '{profile_type}'",
-                )
-            )
-            return ValidationResult(valid=False, issues=issues)
-
-        # Get element definitions from snapshot or differential
-        elements = self._get_element_definitions(profile)
-
-        # Validate each element definition
-        for element in elements:
-            element_issues = self._validate_element(resource, element)
-            issues.extend(element_issues)
-
-        # Validate FHIRPath constraints
-        constraint_issues = self._validate_constraints(resource, profile)
-        issues.extend(constraint_issues)
-
-        return ValidationResult(
-            valid=not any(i.severity in ("fatal", "error") for i in issues),
-            issues=issues,
-        )
-
-    def _load_profile(self, url: str) -> dict[str, Any] | None:
-        """Load a StructureDefinition by canonical URL.
-
-        Uses caching to avoid repeated lookups.
-
-        Args:
-            url: Canonical URL of the profile (may include version: url|version)
-
-        Returns:
-            StructureDefinition resource or None if not found
-        """
-        # Check cache first
-        if url in self._profile_cache:
-            return self._profile_cache[url]
-
-        # Parse URL and version
-        base_url = url
-        version = None
-        if "|" in url:
-            base_url, version = url.split("|", 1)
-
-        # Search for the profile
-        search_params: dict[str, Any] = {"url": base_url}
-        if version:
-            search_params["version"] = version
-
-        results, total = self._store.search("StructureDefinition", search_params, _count=1, _offset=0)
-
-        profile = results[0] if results else None
-        self._profile_cache[url] = profile
-        return profile
-
-    def _get_element_definitions(self, profile: dict[str, Any]) -> list[dict[str, Any]]:
-        """Get element definitions from profile.
-
-        Prefers snapshot over differential for complete element definitions.
-
-        Args:
-            profile: StructureDefinition resource
-
-        Returns:
-            List of ElementDefinition dictionaries
-        """
-        # Try snapshot first (more complete)
-        snapshot = profile.get("snapshot", {})
-        if snapshot.get("element"):
-            return snapshot["element"]
-
-        # Fall back to differential
-        differential = profile.get("differential", {})
-        return differential.get("element", [])
-
-    def _validate_element(
-        self,
-        resource: dict[str, Any],
-        element_def: dict[str, Any],
-    ) -> list[ValidationIssue]:
-        """Validate a resource against an element definition.
-
-        Args:
-            resource: The FHIR resource
-            element_def: ElementDefinition from the profile
-
-        Returns:
-            List of validation issues
-        """
-        issues: list[ValidationIssue] = []
+        element_path: Path from ElementDefinition
 
-        path = element_def.get("id", element_def.get("path", ""))
-        if not path:
-            return issues
-
-        # Skip the root element (e.g., "Patient")
-        if "." not in path:
-            return issues
+    Returns:
+        Field path relative to resource root
+    """
+    # Remove the resource type prefix
+    parts = element_path.split(".", 1)
+    if len(parts) < 2:
+        return ""
 
-        # Get the field path relative to the resource
-        field_path = self._element_path_to_field_path(path)
-        if not field_path:
-            return issues
+    # Handle choice types - remove [x] suffix for checking
+    return re.sub(r"\[x\]$", "", parts[1])
 
-        # Get the actual value from the resource
-        value = self._get_value_at_path(resource, field_path)
 
-        # Validate cardinality
-        cardinality_issues = self._validate_cardinality(value, element_def, field_path)
-        issues.extend(cardinality_issues)
+def compile_path(path: str) -> Callable[[dict[str, Any]], Any]:
+    """Compile a field path into a function that gets its value from a resource.
 
-        # Validate fixed value
-        fixed_issues = self._validate_fixed_value(value, element_def, field_path)
-        issues.extend(fixed_issues)
+    Values of list elements are collected from all items. Missing keys are
+    looked up as choice elements (``deceased`` finds ``deceasedBoolean``).
+    """
+    steps = tuple((part, tuple(part + suffix for suffix in CHOICE_SUFFIXES)) for part in path.split("."))
 
-        # Validate pattern
-        pattern_issues = self._validate_pattern(value, element_def, field_path)
-        issues.extend(pattern_issues)
+    def get(resource: dict[str, Any]) -> Any:
+        current: Any = resource
+        for part, choices in steps:
+            if isinstance(current, dict):
+                if part in current:
+                    current = current[part]
+                    continue
+                current = next((current[key] for key in choices if key in current), None)
+                if current is None:
+                    return None
+            elif isinstance(current, list):
+                # Collect values from all items in the array
+                current = [item[part] for item in current if isinstance(item, dict) and part in item] or None
+            else:
+                return None
+        return current
 
-        # Validate binding
-        binding_issues = self._validate_binding(value, element_def, field_path)
-        issues.extend(binding_issues)
+    return get
 
-        return issues
 
-    def _element_path_to_field_path(self, element_path: str) -> str:
-        """Convert an ElementDefinition path to a resource field path.
+def values_equal(value1: Any, value2: Any) -> bool:
+    """Check if two values are equal.
 
-        Examples:
-            "Patient.name" -> "name"
-            "Patient.name.given" -> "name.given"
-            "Patient.deceased[x]" -> "deceased"
+    Handles complex types like CodeableConcept.
+    """
+    if type(value1) is not type(value2):
+        return False
 
-        Args:
-            element_path: Path from ElementDefinition
+    if isinstance(value1, dict):
+        return all(k in value1 and values_equal(value1[k], v) for k, v in value2.items())
 
-        Returns:
-            Field path relative to resource root
-        """
-        # Remove the resource type prefix
-        parts = element_path.split(".", 1)
-        if len(parts) < 2:
-            return ""
+    if isinstance(value1, list):
+        if len(value1) != len(value2):
+            return False
+        return all(values_equal(v1, v2) for v1, v2 in zip(value1, value2))
 
-        field_path = parts[1]
+    return value1 == value2
 
-        # Handle choice types - remove [x] suffix for checking
-        field_path = re.sub(r"\[x\]$", "", field_path)
 
-        return field_path
+def matches_pattern(value: Any, pattern: Any) -> bool:
+    """Check if value matches pattern.
 
-    def _get_value_at_path(self, resource: dict[str, Any], path: str) -> Any:
-        """Get value from resource at the given path.
+    Pattern matching is inclusive - value must contain at least
+    what's specified in the pattern.
+    """
+    if pattern is None:
+        return True
 
-        Handles array notation and choice types.
+    if value is None:
+        return False
 
-        Args:
-            resource: FHIR resource
-            path: Dot-separated path
+    if isinstance(pattern, dict):
+        if isinstance(value, list):
+            # If value is a list and pattern is a single object,
+            # pattern matches if ANY element in the list matches
+            return any(matches_pattern(v, pattern) for v in value)
+        if not isinstance(value, dict):
+            return False
+        # All pattern keys must be present in value
+        return all(k in value and matches_pattern(value[k], v) for k, v in pattern.items())
 
-        Returns:
-            Value at path or None if not found
-        """
-        if not path:
-            return resource
+    if isinstance(pattern, list):
+        if not isinstance(value, list):
+            return False
+        # Each pattern item must match at least one value item
+        return all(any(matches_pattern(v, p) for v in value) for p in pattern)
 
-        parts = path.split(".")
-        current: Any = resource
+    return value == pattern
 
-        for part in parts:
-            if current is None:
-                return None
 
-            # Handle choice types (e.g., deceased -> deceasedBoolean or deceasedDateTime)
-            if isinstance(current, dict):
-                if part in current:
-                    current = current[part]
-                else:
-                    # Try choice type variants
-                    choice_value = self._get_choice_value(current, part)
-                    if choice_value is not None:
-                        current = choice_value
-                    else:
-                        return None
-            elif isinstance(current, list):
-                # Collect values from all items in the array
-                values = []
-                for item in current:
-                    if isinstance(item, dict) and part in item:
-                        values.append(item[part])
-                current = values if values else None
-            else:
-                return None
+def is_truthy(result: Any) -> bool:
+    """Check if a FHIRPath result is truthy.
 
-        return current
+    Per FHIRPath spec:
+    - Empty collection is false
+    - Single true boolean is true
+    - Single false boolean is false
+    - Non-empty, non-boolean collection is true
+    """
+    if result is None:
+        return False
+    if isinstance(result, list):
+        if len(result) == 0:
+            return False
+        if len(result) == 1 and isinstance(result[0], bool):
+            return result[0]
+        return True
+    if isinstance(result, bool):
+        return result
+    return True
 
-    def _get_choice_value(self, obj: dict[str, Any], base_name: str) -> Any:
-        """Get value for a choice type field.
 
-        Args:
-            obj: Dictionary to search
-            base_name: Base name without type suffix (e.g., "deceased")
+def value_set_codes(value_set: dict[str, Any]) -> frozenset[tuple[str, str]] | None:
+    """Collect the (system, code) pairs of a ValueSet.
 
-        Returns:
-            Value if found, None otherwise
-        """
-        suffixes = [
-            "Boolean",
-            "Integer",
-            "Decimal",
-            "String",
-            "Uri",
-            "Date",
-            "DateTime",
-            "Time",
-            "Instant",
-            "CodeableConcept",
-            "Coding",
-            "Quantity",
-            "Range",
-            "Ratio",
-            "Period",
-            "Reference",
-            "Attachment",
-            "Identifier",
-            "Address",
-            "ContactPoint",
-            "HumanName",
-            "Age",
-            "Duration",
-            "Timing",
-            "Annotation",
-            "Signature",
-        ]
-
-        for suffix in suffixes:
-            key = base_name + suffix
-            if key in obj:
-                return obj[key]
+    Uses the expansion if present, otherwise the compose, as long as it only
+    enumerates concepts.
 
+    Returns:
+        The codes, or None if they cannot be enumerated from the resource
+    """
+    expansion = value_set.get("expansion")
+    if expansion:
+        codes: set[tuple[str, str]] = set()
+        pending = list(expansion.get("contains", []))
+        while pending:
+            item = pending.pop()
+            if "code" in item:
+                codes.add((item.get("system", ""), item["code"]))
+            pending.extend(item.get("contains", []))
+        return frozenset(codes)
+
+    compose = value_set.get("compose") or {}
+    includes = compose.get("include", [])
+    if not includes or compose.get("exclude"):
         return None
-
-    def _validate_cardinality(
-        self,
-        value: Any,
-        element_def: dict[str, Any],
-        path: str,
-    ) -> list[ValidationIssue]:
-        """Validate element cardinality (min/max).
-
-        Args:
-            value: Current value from resource
-            element_def: ElementDefinition
-            path: Field path for error reporting
-
-        Returns:
-            List of validation issues
-        """
+    codes = set()
+    for include in includes:
+        if include.get("filter") or include.get("valueSet") or not include.get("concept"):
+            return None
+        codes.update((include.get("system", ""), concept["code"]) for concept in include["concept"])
+    return frozenset(codes)
+
+
+def _codings(value: Any) -> list[tuple[str | None, str]] | None:
+    """The (system, code) pairs of a code, Coding or CodeableConcept; None for other values."""
+    if isinstance(value, str):
+        return [(None, value)]
+    if isinstance(value, dict):
+        if "coding" in value:
+            return [(c.get("system"), c["code"]) for c in value["coding"] if isinstance(c, dict) and "code" in c]
+        if "code" in value:
+            return [(value.get("system"), value["code"])]
+    return None
+
+
+@dataclass(frozen=True, slots=True)
+class ElementCheck:
+    """Compiled checks of one ElementDefinition."""
+
+    path: str
+    get: Callable[[dict[str, Any]], Any]
+    min: int
+    max: int | None
+    fixed: tuple[str, Any] | None
+    pattern: tuple[str, Any] | None
+    binding: tuple[str, frozenset[tuple[str, str]]] | None
+
+    def validate(self, resource: dict[str, Any]) -> list[ValidationIssue]:
+        """Validate the element of a resource."""
         issues: list[ValidationIssue] = []
-
-        min_val = element_def.get("min", 0)
-        max_val = element_def.get("max", "*")
+        path = self.path
+        value = self.get(resource)
 
         # Count occurrences
-        if value is None:
-            count = 0
-        elif isinstance(value, list):
-            count = len(value)
-        else:
-            count = 1
-
-        # Check minimum
-        if count < min_val:
+        count = 0 if value is None else len(value) if isinstance(value, list) else 1
+        if count < self.min:
+            issues.append(
+                ValidationIssue(
+                    severity="error",
+                    code="required" if self.min == 1 else "structure",
+                    location=path,
+                    message=f"Element '{path}' has {count} occurrences, minimum required is {self.min}",
+                )
+            )
+        if self.max is not None and count > self.max:
             issues.append(
                 ValidationIssue(
                     severity="error",
-                    code="required" if min_val == 1 else "structure",
+                    code="structure",
                     location=path,
-                    message=f"Element '{path}' has {count} occurrences, minimum required is {min_val}",
+                    message=f"Element '{path}' has {count} occurrences, maximum allowed is {self.max}",
                 )
             )
 
-        # Check maximum
-        if max_val != "*":
-            try:
-                max_int = int(max_val)
-                if count > max_int:
+        if self.fixed is not None:
+            fixed_key, fixed_value = self.fixed
+            if value is None:
+                issues.append(
+                    ValidationIssue(
+                        severity="error",
+                        code="value",
+                        location=path,
+                        message=f"Element '{path}' must have fixed value specified by {fixed_key}",
+                    )
+                )
+            elif not values_equal(value, fixed_value):
+                issues.append(
+                    ValidationIssue(
+                        severity="error",
+                        code="value",
+                        location=path,
+                        message=(
+                            f"Element '{path}' value does not match fixed value. Expected: {fixed_value}, Got: {value}"
+                        ),
+                    )
+                )
+
+        if self.pattern is not None:
+            pattern_key, pattern_value = self.pattern
+            if value is None:
+                issues.append(
+                    ValidationIssue(
+                        severity="error",
+                        code="value",
+                        location=path,
+                        message=f"Element '{path}' must match pattern specified by {pattern_key}",
+                    )
+                )
+            elif not matches_pattern(value, pattern_value):
+                issues.append(
+                    ValidationIssue(
+                        severity="error",
+                        code="value",
+                        location=path,
+                        message=f"Element '{path}' value does not match pattern. Pattern: {pattern_value}",
+                    )
+                )
+
+        if self.binding is not None and value is not None:
+            value_set, codes = self.binding
+            for item in value if isinstance(value, list) else [value]:
+                codings = _codings(item)
+                # A code matches any system of the value set; a Coding needs its own
+                if codings is not None and not any(
+                    (system, code) in codes if system is not None else any(code == c for _, c in codes)
+                    for system, code in codings
+                ):
                     issues.append(
                         ValidationIssue(
                             severity="error",
-                            code="structure",
+                            code="code-invalid",
                             location=path,
-                            message=f"Element '{path}' has {count} occurrences, maximum allowed is {max_int}",
+                            message=f"Element '{path}' has no code from the required value set {value_set}",
                         )
                     )
-            except ValueError:
-                pass  # Invalid max value, skip check
-
         return issues
 
-    def _validate_fixed_value(
-        self,
-        value: Any,
-        element_def: dict[str, Any],
-        path: str,
-    ) -> list[ValidationIssue]:
-        """Validate fixed[x] values.
-
-        Args:
-            value: Current value from resource
-            element_def: ElementDefinition
-            path: Field path for error reporting
 
-        Returns:
-            List of validation issues
-        """
-        issues: list[ValidationIssue] = []
+@dataclass(frozen=True, slots=True)
+class ConstraintCheck:
+    """A compiled FHIRPath invariant."""
 
-        # Find fixed[x] property
-        fixed_value = None
-        fixed_key = None
-        for key in element_def:
-            if key.startswith("fixed"):
-                fixed_value = element_def[key]
-                fixed_key = key
-                break
+    key: str
+    expression: str
+    human: str
+    severity: str
+    location: str
 
-        if fixed_value is None:
-            return issues
 
-        if value is None:
-            issues.append(
-                ValidationIssue(
-                    severity="error",
-                    code="value",
-                    location=path,
-                    message=f"Element '{path}' must have fixed value specified by {fixed_key}",
-                )
-            )
-        elif not self._values_equal(value, fixed_value):
-            issues.append(
-                ValidationIssue(
-                    severity="error",
-                    code="value",
-                    location=path,
-                    message=f"Element '{path}' value does not match fixed value. Expected: {fixed_value}, Got: {value}",
-                )
-            )
+class CompiledProfile:
+    """Validation plan of a StructureDefinition.
 
-        return issues
+    Args:
+        profile: StructureDefinition resource
+        value_sets: Looks up the codes of a ValueSet by URL for required
+            bindings; bindings to value sets it returns None for are skipped
+    """
 
-    def _validate_pattern(
+    def __init__(
         self,
-        value: Any,
-        element_def: dict[str, Any],
-        path: str,
-    ) -> list[ValidationIssue]:
-        """Validate pattern[x] values.
+        profile: dict[str, Any],
+        value_sets: Callable[[str], frozenset[tuple[str, str]] | None] | None = None,
+    ) -> None:
+        self.profile = profile
+        self.url: str | None = profile.get("url")
+        self.version: str | None = profile.get("version")
+        self.type: str | None = profile.get("type")
+        self.evaluator = FHIRPathEvaluator()
+        elements = self._element_definitions(profile)
+        self.elements = tuple(
+            check for element in elements if (check := self._compile_element(element, value_sets)) is not None
+        )
+        self.constraints = tuple(self._compile_constraints(elements))
 
-        Pattern validation is less strict than fixed - the value must
-        contain at least what's in the pattern.
+    @staticmethod
+    def _element_definitions(profile: dict[str, Any]) -> list[dict[str, Any]]:
+        """Get element definitions, preferring the snapshot over the differential."""
+        snapshot = profile.get("snapshot", {})
+        if snapshot.get("element"):
+            return snapshot["element"]
+        return profile.get("differential", {}).get("element", [])
+
+    @staticmethod
+    def _compile_element(
+        element: dict[str, Any],
+        value_sets: Callable[[str], frozenset[tuple[str, str]] | None] | None,
+    ) -> ElementCheck | None:
+        path = element.get("id", element.get("path", ""))
+        # Skip the root element (e.g., "Patient")
+        if not path or "." not in path:
+            return None
+        field_path = element_path_to_field_path(path)
+        if not field_path:
+            return None
+
+        max_value = element.get("max", "*")
+        try:
+            max_count = None if max_value == "*" else int(max_value)
+        except ValueError:
+            max_count = None  # Invalid max value, skip check
+
+        fixed_key = next((key for key in element if key.startswith("fixed")), None)
+        pattern_key = next((key for key in element if key.startswith("pattern")), None)
+
+        binding = None
+        element_binding = element.get("binding") or {}
+        if element_binding.get("strength") == "required" and value_sets is not None:
+            value_set = element_binding.get("valueSet", "")
+            codes = value_sets(value_set) if value_set else None
+            if codes is not None:
+                binding = (value_set, codes)
+            else:
+                logger.debug(f"Binding validation skipped for {field_path}: ValueSet {value_set} not available")
+
+        return ElementCheck(
+            path=field_path,
+            get=compile_path(field_path),
+            min=element.get("min", 0),
+            max=max_count,
+            fixed=(fixed_key, element[fixed_key]) if fixed_key and element[fixed_key] is not None else None,
+            pattern=(pattern_key, element[pattern_key]) if pattern_key and element[pattern_key] is not None else None,
+            binding=binding,
+        )
 
-        Args:
-            value: Current value from resource
-            element_def: ElementDefinition
-            path: Field path for error reporting
+    def _compile_constraints(self, elements: list[dict[str, Any]]) -> list[ConstraintCheck]:
+        constraints = []
+        for element in elements:
+            for constraint in element.get("constraint", []):
+                key = constraint.get("key", "")
+                expression = constraint.get("expression", "")
+                if not expression:
+                    continue
+                try:
+                    self.evaluator.compile(expression)
+                except Exception as e:
+                    logger.warning(f"Could not compile constraint {key}: {e}")
+                    continue
+                constraints.append(
+                    ConstraintCheck(
+                        key=key,
+                        expression=expression,
+                        human=constraint.get("human", ""),
+                        severity=constraint.get("severity", "error"),
+                        location=element.get("path", ""),
+                    )
+                )
+        return constraints
 
-        Returns:
-            List of validation issues
-        """
+    def validate(self, resource: dict[str, Any]) -> list[ValidationIssue]:
+        """Validate a resource of the profile's type."""
         issues: list[ValidationIssue] = []
+        for element in self.elements:
+            issues.extend(element.validate(resource))
 
-        # Find pattern[x] property
-        pattern_value = None
-        pattern_key = None
-        for key in element_def:
-            if key.startswith("pattern"):
-                pattern_value = element_def[key]
-                pattern_key = key
-                break
-
-        if pattern_value is None:
-            return issues
-
-        if value is None:
-            issues.append(
-                ValidationIssue(
-                    severity="error",
-                    code="value",
-                    location=path,
-                    message=f"Element '{path}' must match pattern specified by {pattern_key}",
-                )
-            )
-        elif not self._matches_pattern(value, pattern_value):
-            issues.append(
-                ValidationIssue(
-                    severity="error",
-                    code="value",
-                    location=path,
-                    message=f"Element '{path}' value does not match pattern. Pattern: {pattern_value}",
+        for constraint in self.constraints:
+            try:
+                result = self.evaluator.evaluate(constraint.expression, resource)
+            except Exception as e:
+                logger.warning(f"Could not evaluate constraint {constraint.key}: {e}")
+                continue
+            # Constraint should evaluate to true
+            if not is_truthy(result):
+                issues.append(
+                    ValidationIssue(
+                        severity=constraint.severity,
+                        code="invariant",
+                        location=constraint.location,
+                        message=f"Constraint {constraint.key} failed: {constraint.human}",
+                    )
                 )
-            )
-
         return issues
 
-    def _validate_binding(
-        self,
-        value: Any,
-        element_def: dict[str, Any],
-        path: str,
-    ) -> list[ValidationIssue]:
-        """Validate code bindings.
 
-        Args:
-            value: Current value from resource
-            element_def: ElementDefinition
-            path: Field path for error reporting
+@dataclass(slots=True)
+class _CacheEntry:
+    profile: CompiledProfile | None
+    generation: tuple[int, int]
 
-        Returns:
-            List of validation issues
-        """
-        issues: list[ValidationIssue] = []
 
-        binding = element_def.get("binding")
-        if not binding:
-            return issues
+# Compiled profiles per store and profile URL
+_compiled_profiles: weakref.WeakKeyDictionary[FHIRStore, dict[str, _CacheEntry]] = weakref.WeakKeyDictionary()
 
-        strength = binding.get("strength", "example")
-        value_set = binding.get("valueSet", "")
 
-        # Skip example and preferred bindings
-        if strength in ("example", "preferred"):
-            return issues
+class ProfileValidator:
+    """Validator for FHIR resources against StructureDefinition profiles.
+
+    Validates resources against profile constraints including:
+    - Cardinality (min/max occurrence)
+    - Required elements
+    - Fixed values (fixed[x])
+    - Pattern values (pattern[x])
+    - Required code bindings (to ValueSets in the store)
+    - FHIRPath constraints
 
-        if value is None:
-            return issues
+    Compiled profiles are shared by all validators of a store.
 
-        # For extensible/required bindings, we note that full validation
-        # would require ValueSet expansion. For now, log info only.
-        if strength == "required":
-            # Would need to validate against ValueSet
-            # This is a placeholder for future terminology service integration
-            logger.debug(f"Binding validation skipped for {path}: ValueSet {value_set} (strength: {strength})")
+    Args:
+        store: FHIRStore for loading StructureDefinition resources
+    """
 
-        return issues
+    def __init__(self, store: FHIRStore):
+        self._store = store
+        self._profile_cache: dict[str, dict[str, Any] | None] = {}
+        self._profile_generation = store.generation("StructureDefinition")
 
-    def _validate_constraints(
+    def validate_against_profile(
         self,
         resource: dict[str, Any],
-        profile: dict[str, Any],
-    ) -> list[ValidationIssue]:
-        """Validate FHIRPath constraints defined in the profile.
+        profile_url: str,
+    ) -> ValidationResult:
+        """Validate a resource against a StructureDefinition profile.
 
         Args:
-            resource: FHIR resource
-            profile: StructureDefinition
+            resource: The FHIR resource to validate
+            profile_url: Canonical URL of the StructureDefinition profile
 
         Returns:
-            List of validation issues
+            ValidationResult with issues found
         """
-        issues: list[ValidationIssue] = []
+        compiled = self.compile_profile(profile_url)
+        if compiled is None:
+            issue = ValidationIssue(
+                severity="error",
+                code="not-found",
+                location="meta.profile",
+                message=f"Profile not found: {profile_url}",
+            )
+            return ValidationResult(valid=False, issues=[issue])
 
-        elements = self._get_element_definitions(profile)
+        # Check resource type matches profile type
+        resource_type = resource.get("resourceType")
+        if compiled.type and resource_type != compiled.type:
+            issue = ValidationIssue(
+                severity="error",
+                code="invalid",
+                location="resourceType",
+                message=f"Resource type '{resource_type}' does not match profile type '{compiled.type}'",
+            )
+            return ValidationResult(valid=False, issues=[issue])
 
-        for element in elements:
-            constraints = element.get("constraint", [])
-            for constraint in constraints:
-                key = constraint.get("key", "")
-                expression = constraint.get("expression", "")
-                human = constraint.get("human", "")
-                severity = constraint.get("severity", "error")
+        issues = compiled.validate(resource)
+        return ValidationResult(
+            valid=not any(i.severity in ("fatal", "error") for i in issues),
+            issues=issues,
+        )
 
-                if not expression:
-                    continue
+    def compile_profile(self, url: str) -> CompiledProfile | None:
+        """Get the compiled profile for a canonical URL (``url`` or ``url|version``).
 
-                # Evaluate FHIRPath expression
-                try:
-                    from fhirkit.engine.fhirpath import FHIRPathEvaluator
-
-                    evaluator = FHIRPathEvaluator()
-                    result = evaluator.evaluate(expression, resource)
-
-                    # Constraint should evaluate to true
-                    if not self._is_truthy(result):
-                        issues.append(
-                            ValidationIssue(
-                                severity=severity,
-                                code="invariant",
-                                location=element.get("path", ""),
-                                message=f"Constraint {key} failed: {human}",
-                            )
-                        )
-                except Exception as e:
-                    logger.warning(f"Could not evaluate constraint {key}: {e}")
+        Returns:
+            The compiled profile, or None if the profile is not in the store
+        """
+        generation = (self._store.generation("StructureDefinition"), self._store.generation("ValueSet"))
+        cache = _compiled_profiles.setdefault(self._store, {})
+        entry = cache.get(url)
+        if entry is not None and entry.generation == generation:
+            return entry.profile
+
+        profile = self._load_profile(url)
+        if entry is not None and entry.profile is not None and entry.profile.profile is profile:
+            # Same StructureDefinition; only recompile if a ValueSet changed
+            if entry.generation[1] == generation[1]:
+                entry.generation = generation
+                return entry.profile
+        compiled = CompiledProfile(profile, self._value_set_codes) if profile is not None else None
+        cache[url] = _CacheEntry(compiled, generation)
+        return compiled
 
-        return issues
+    def _load_profile(self, url: str) -> dict[str, Any] | None:
+        """Load a StructureDefinition by canonical URL.
 
-    def _values_equal(self, value1: Any, value2: Any) -> bool:
-        """Check if two values are equal.
+        Uses caching to avoid repeated lookups, until StructureDefinitions
+        in the store change.
 
-        Handles complex types like CodeableConcept.
-        """
-        if type(value1) is not type(value2):
-            return False
+        Args:
+            url: Canonical URL of the profile (may include version: url|version)
 
-        if isinstance(value1, dict):
-            return all(k in value1 and self._values_equal(value1[k], v) for k, v in value2.items())
+        Returns:
+            StructureDefinition resource or None if not found
+        """
+        generation = self._store.generation("StructureDefinition")
+        if generation != self._profile_generation:
+            self._profile_cache.clear()
+            self._profile_generation = generation
 
-        if isinstance(value1, list):
-            if len(value1) != len(value2):
-                return False
-            return all(self._values_equal(v1, v2) for v1, v2 in zip(value1, value2))
+        # Check cache first
+        if url in self._profile_cache:
+            return self._profile_cache[url]
 
-        return value1 == value2
+        # Parse URL and version
+        base_url = url
+        version = None
+        if "|" in url:
+            base_url, version = url.split("|", 1)
 
-    def _matches_pattern(self, value: Any, pattern: Any) -> bool:
-        """Check if value matches pattern.
+        # Search for the profile
+        search_params: dict[str, Any] = {"url": base_url}
+        if version:
+            search_params["version"] = version
 
-        Pattern matching is inclusive - value must contain at least
-        what's specified in the pattern.
-        """
-        if pattern is None:
-            return True
+        results, total = self._store.search("StructureDefinition", search_params, _count=1, _offset=0)
 
-        if value is None:
-            return False
+        profile = results[0] if results else None
+        self._profile_cache[url] = profile
+        return profile
 
-        if isinstance(pattern, dict):
-            if isinstance(value, list):
-                # If value is a list and pattern is a single object,
-                # pattern matches if ANY element in the list matches
-                return any(self._matches_pattern(v, pattern) for v in value)
-            if not isinstance(value, dict):
-                return False
-            # All pattern keys must be present in value
-            return all(k in value and self._matches_pattern(value[k], v) for k, v in pattern.items())
-
-        if isinstance(pattern, list):
-            if not isinstance(value, list):
-                return False
-            # Each pattern item must match at least one value item
-            return all(any(self._matches_pattern(v, p) for v in value) for p in pattern)
-
-        return value == pattern
-
-    def _is_truthy(self, result: Any) -> bool:
-        """Check if a FHIRPath result is truthy.
-
-        Per FHIRPath spec:
-        - Empty collection is false
-        - Single true boolean is true
-        - Single false boolean is false
-        - Non-empty, non-boolean collection is true
-        """
-        if result is None:
-            return False
-        if isinstance(result, list):
-            if len(result) == 0:
-                return False
-            if len(result) == 1 and isinstance(result[0], bool):
-                return result[0]
-            return True
-        if isinstance(result, bool):
-            return result
-        return True
+    def _value_set_codes(self, url: str) -> frozenset[tuple[str, str]] | None:
+        base_url, _, version = url.partition("|")
+        search_params: dict[str, Any] = {"url": base_url}
+        if version:
+            search_params["version"] = version
+        results, _ = self._store.search("ValueSet", search_params, _count=1, _offset=0)
+        return value_set_codes(results[0]) if results else None
 
     def clear_cache(self) -> None:
-        """Clear the profile cache."""
+        """Clear the profile cache, including the compiled profiles of the store."""
         self._profile_cache.clear()
+        _compiled_profiles.pop(self._store, None)
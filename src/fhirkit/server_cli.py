@@ -1,6 +1,7 @@
 """FHIR Server CLI commands."""
 
 import json
+from collections.abc import Iterator
 from pathlib import Path
 from typing import Any
 
@@ -50,6 +51,7 @@ from fhirkit.server.generator import (
     ObservationGenerator,
     OrganizationGenerator,
     PatientGenerator,
+    PopulationGenerator,
     PractitionerGenerator,
     PractitionerRoleGenerator,
     ProcedureGenerator,
@@ -64,11 +66,13 @@ from fhirkit.server.generator import (
     SpecimenGenerator,
     TaskGenerator,
     ValueSetGenerator,
+    write_ndjson_by_type,
 )
+from fhirkit.server.generator.population import DEFAULT_SHARD_SIZE
 
 app = typer.Typer(
     name="server",
-    help="FHIR R4 server utilities (generate, load, stats, info). Use 'fhir serve' to start the server.",
+    help="FHIR R4 server utilities (generate, load, stats, info, dedup). Use 'fhir serve' to start the server.",
     no_args_is_help=True,
 )
 
@@ -595,6 +599,55 @@ def info(
         raise typer.Exit(1)
 
 
+def _populate_sharded(
+    url: str,
+    seed: int | None,
+    patients: int,
+    dry_run: bool,
+    workers: int,
+    output_dir: Path | None,
+    shard_size: int,
+    batch_size: int,
+) -> None:
+    """Generate patient records in shards and stream them to files and/or the server."""
+    generator = PopulationGenerator(patients, seed=seed, workers=workers, shard_size=shard_size)
+    rprint(f"[bold]Generating {patients} patient record(s) with {generator.workers} worker(s)...[/bold]")
+    rprint(f"  Random seed: {generator.seed}")
+
+    by_type: dict[str, int] = {}
+    batch: list[dict[str, Any]] = []
+
+    def stream() -> Iterator[dict[str, Any]]:
+        for resource in generator.iter_resources():
+            by_type[resource["resourceType"]] = by_type.get(resource["resourceType"], 0) + 1
+            if not dry_run:
+                batch.append(resource)
+                if len(batch) >= batch_size:
+                    _load_resources_to_server(batch, url)
+                    batch.clear()
+            yield resource
+
+    if output_dir is not None:
+        write_ndjson_by_type(stream(), output_dir)
+        rprint(f"[green]Written to {output_dir}[/green] (NDJSON per resource type)")
+    else:
+        for _ in stream():
+            pass
+    if batch:
+        _load_resources_to_server(batch, url)
+
+    table = Table(title="Generated Resources")
+    table.add_column("Resource Type", style="cyan")
+    table.add_column("Count", justify="right")
+    for rt, count in sorted(by_type.items()):
+        table.add_row(rt, str(count))
+    table.add_row("─" * 20, "─" * 8)
+    table.add_row("[bold]Total[/bold]", f"[bold]{sum(by_type.values())}[/bold]")
+    rprint(table)
+    if dry_run:
+        rprint("[yellow]Dry run - resources not loaded to server[/yellow]")
+
+
 @app.command("populate")
 def populate(
     url: str = typer.Option("http://localhost:8080", "--url", "-u", help="FHIR server URL"),
@@ -602,6 +655,12 @@ def populate(
     patients: int = typer.Option(3, "--patients", "-n", help="Number of patients to generate"),
     dry_run: bool = typer.Option(False, "--dry-run", help="Generate but don't load to server"),
     output: Path | None = typer.Option(None, "--output", "-o", help="Save generated resources to file"),
+    workers: int = typer.Option(1, "--workers", "-w", help="Generate patient records in N worker processes"),
+    output_dir: Path | None = typer.Option(
+        None, "--output-dir", help="Stream patient records to one NDJSON file per resource type"
+    ),
+    shard_size: int = typer.Option(DEFAULT_SHARD_SIZE, "--shard-size", help="Patients per worker task"),
+    batch_size: int = typer.Option(1000, "--batch-size", help="Resources per batch Bundle when loading"),
 ) -> None:
     """Populate a FHIR server with linked example resources of all types.
 
@@ -624,7 +683,19 @@ def populate(
 
         # Reproducible data
         fhir server populate --seed 42 --patients 5
+
+    With --workers or --output-dir, full patient records (as generated by
+    'fhir serve --patients') are generated in shards and streamed instead:
+    to NDJSON files, and to the server in batches unless --dry-run is given.
+    The output for a seed does not depend on the number of workers.
+
+        # One million patients, 8 worker processes, written per resource type
+        fhir server populate -n 1000000 -w 8 --seed 42 --output-dir ./population --dry-run
     """
+    if workers > 1 or output_dir is not None:
+        _populate_sharded(url, seed, patients, dry_run, workers, output_dir, shard_size, batch_size)
+        return
+
     from faker import Faker
 
     rprint("[bold]Generating linked FHIR resources...[/bold]")
@@ -1253,5 +1324,54 @@ def populate(
         rprint("[yellow]Dry run - resources not loaded to server[/yellow]")
 
 
+@app.command("dedup")
+def dedup(
+    data: Path = typer.Argument(..., help="NDJSON/JSON file or directory of Patient resources"),
+    output: Path | None = typer.Option(None, "--output", "-o", help="Output NDJSON file (default: stdout)"),
+    threshold: float = typer.Option(0.8, "--threshold", "-t", help="Minimum match score of a reported pair"),
+    workers: int = typer.Option(1, "--workers", "-w", help="Worker processes (0 = one per CPU)"),
+    max_block_size: int = typer.Option(1000, "--max-block-size", help="Skip blocking keys shared by more patients"),
+) -> None:
+    """Find likely duplicate patients in a population.
+
+    Patients sharing a blocking key (identifier, phonetic name with birth
+    year, phone, email, postal code) are compared pairwise with the $match
+    weights, and one NDJSON row is written per pair scoring at least the
+    threshold.
+
+    Examples:
+        fhir server dedup ./population/Patient.ndjson -o duplicates.ndjson
+        fhir server dedup ./population/Patient.ndjson -w 8 --threshold 0.9
+    """
+    import sys
+
+    from fhirkit.server.generator.population import default_workers
+    from fhirkit.server.operations.dedup import DuplicateFinder, iter_patients, write_ndjson
+
+    if not data.exists():
+        rprint(f"[red]Error:[/red] Data not found: {data}")
+        raise typer.Exit(1)
+
+    finder = DuplicateFinder(
+        threshold=threshold,
+        workers=workers if workers > 0 else default_workers(),
+        max_block_size=max_block_size,
+    )
+    stream = output.open("w") if output else sys.stdout
+    try:
+        count = write_ndjson(finder.run(iter_patients(data)), stream)
+    finally:
+        if output:
+            stream.close()
+
+    if output:
+        rprint(f"[dim]{count} pair(s) written to {output}[/dim]")
+    if finder.skipped_blocks:
+        rprint(
+            f"[yellow]{finder.skipped_blocks} blocking key(s) of over {max_block_size} patients skipped[/yellow]",
+            file=sys.stderr,
+        )
+
+
 if __name__ == "__main__":
     app()
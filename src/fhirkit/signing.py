@@ -0,0 +1,136 @@
+"""Signing of the pickles fhirkit writes to disk.
+
+Compiled CQL libraries (``CompiledLibraryCache``) and store snapshots
+(``FHIRStore.save_snapshot``) are pickles, and unpickling runs code chosen by
+whoever wrote the file. Both are signed with an HMAC-SHA256 under a key of
+this installation, and a file whose signature does not match is not
+unpickled: a process that can write the cache directory or the snapshot
+file, but cannot read the key, cannot make fhirkit load its pickle.
+
+The key is 32 random bytes in ``~/.fhirkit/signing.key`` (or the file named
+by ``FHIRKIT_SIGNING_KEY_FILE``), created on first use. It must be owned by
+the current user and not be readable or writable by anyone else; a key file
+that is refused raises ``SigningKeyError``. Files written with another key,
+such as on another machine, are not loaded.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import os
+import secrets
+import stat
+import threading
+from pathlib import Path
+from typing import BinaryIO
+
+KEY_FILE_ENV = "FHIRKIT_SIGNING_KEY_FILE"
+DEFAULT_KEY_FILE = Path("~/.fhirkit/signing.key")
+KEY_SIZE = 32
+DIGEST_SIZE = hashlib.sha256().digest_size
+
+# Keys by file, read once per process
+_keys: dict[Path, bytes] = {}
+_keys_lock = threading.Lock()
+
+
+class SigningKeyError(Exception):
+    """Exception raised when the signing key cannot be created or is not private."""
+
+
+def key_file() -> Path:
+    """Get the signing key file of this installation."""
+    return Path(os.environ.get(KEY_FILE_ENV) or DEFAULT_KEY_FILE).expanduser()
+
+
+def signing_key() -> bytes:
+    """Get the signing key, creating the key file if it does not exist.
+
+    Raises:
+        SigningKeyError: If the key file cannot be created or read, or is
+            accessible to other users
+    """
+    path = key_file()
+    with _keys_lock:
+        key = _keys.get(path)
+        if key is None:
+            key = _keys[path] = _read_or_create_key(path)
+        return key
+
+
+def _read_or_create_key(path: Path) -> bytes:
+    try:
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, "wb") as f:
+                f.write(secrets.token_bytes(KEY_SIZE))
+        with open(path, "rb") as f:
+            _check_private(path, os.fstat(f.fileno()))
+            key = f.read()
+    except OSError as e:
+        raise SigningKeyError(f"Cannot read signing key {path}: {e}") from e
+    if len(key) < KEY_SIZE:
+        raise SigningKeyError(f"Signing key {path} is shorter than {KEY_SIZE} bytes")
+    return key
+
+
+def _check_private(path: Path, status: os.stat_result) -> None:
+    if not stat.S_ISREG(status.st_mode):
+        raise SigningKeyError(f"Signing key {path} is not a regular file")
+    if hasattr(os, "getuid") and status.st_uid != os.getuid():
+        raise SigningKeyError(f"Signing key {path} is not owned by the current user")
+    if status.st_mode & 0o077:
+        raise SigningKeyError(f"Signing key {path} is accessible to other users; restrict it with chmod 600")
+
+
+def sign(data: bytes | memoryview) -> bytes:
+    """Compute the signature of some data."""
+    return hmac.digest(signing_key(), data, "sha256")
+
+
+def verify(data: bytes | memoryview, signature: bytes) -> bool:
+    """Check the signature of some data."""
+    return hmac.compare_digest(sign(data), signature)
+
+
+class SignedWriter:
+    """Writes to a binary stream, signing what is written.
+
+    Example:
+        writer = SignedWriter(f)
+        pickle.dump(state, writer)
+        f.write(writer.signature())
+    """
+
+    def __init__(self, stream: BinaryIO) -> None:
+        self._stream = stream
+        self._hmac = hmac.new(signing_key(), digestmod="sha256")
+
+    def write(self, data: bytes) -> int:
+        self._hmac.update(data)
+        return self._stream.write(data)
+
+    def signature(self) -> bytes:
+        """Get the signature of the bytes written so far."""
+        return self._hmac.digest()
+
+
+def verify_stream(stream: BinaryIO, length: int, chunk_size: int = 1 << 20) -> bool:
+    """Check the signature following the next ``length`` bytes of a stream.
+
+    The stream is left after the signature.
+    """
+    signer = hmac.new(signing_key(), digestmod="sha256")
+    remaining = length
+    while remaining > 0:
+        chunk = stream.read(min(chunk_size, remaining))
+        if not chunk:
+            return False
+        signer.update(chunk)
+        remaining -= len(chunk)
+    return hmac.compare_digest(signer.digest(), stream.read(DIGEST_SIZE))
@@ -29,8 +29,11 @@ Usage:
     app = create_app(value_set_directory="path/to/valuesets")
 """
 
+from .expansion import ExpansionIndex
+from .hierarchy import HierarchyIndex
 from .models import (
     CodeableConcept,
+    CodeSystem,
     Coding,
     MemberOfRequest,
     MemberOfResponse,
@@ -55,6 +58,7 @@ __all__ = [
     # Models
     "Coding",
     "CodeableConcept",
+    "CodeSystem",
     "ValueSet",
     "ValueSetCompose",
     "ValueSetComposeInclude",
@@ -67,6 +71,9 @@ __all__ = [
     "SubsumesResponse",
     "MemberOfRequest",
     "MemberOfResponse",
+    # Indexes
+    "HierarchyIndex",
+    "ExpansionIndex",
     # Services
     "TerminologyService",
     "InMemoryTerminologyService",
@@ -5,9 +5,14 @@ Provides FastAPI routes for FHIR terminology operations:
 - POST /CodeSystem/$subsumes
 - GET /memberOf
 - GET /ValueSet/{id}
+- POST / (batch Bundle of the operations above)
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Any
+from urllib.parse import parse_qsl, urlsplit
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
+from pydantic import BaseModel, ValidationError
 
 from ..models import (
     MemberOfRequest,
@@ -197,3 +202,80 @@ async def get_value_set_by_id(
             if vs.id == value_set_id:
                 return vs
     raise HTTPException(status_code=404, detail=f"ValueSet not found: {value_set_id}")
+
+
+def _to_parameters(response: BaseModel) -> dict[str, Any]:
+    """Convert an operation response to a FHIR Parameters resource."""
+    parameters = []
+    for name, value in response.model_dump(exclude_none=True).items():
+        if isinstance(value, bool):
+            parameters.append({"name": name, "valueBoolean": value})
+        elif name == "outcome":
+            parameters.append({"name": name, "valueCode": value})
+        else:
+            parameters.append({"name": name, "valueString": str(value)})
+    return {"resourceType": "Parameters", "parameter": parameters}
+
+
+def _outcome(message: str) -> dict[str, Any]:
+    return {
+        "resourceType": "OperationOutcome",
+        "issue": [{"severity": "error", "code": "processing", "diagnostics": message}],
+    }
+
+
+def _batch_entry(service: TerminologyService, entry: dict[str, Any]) -> dict[str, Any]:
+    """Run the GET request of a batch entry and build its response entry."""
+    request = entry.get("request", {})
+    url = urlsplit(request.get("url", ""))
+    path = url.path.strip("/")
+    params = dict(parse_qsl(url.query))
+    try:
+        if request.get("method", "").upper() != "GET":
+            return {"response": {"status": "405 Method Not Allowed"}}
+        if path.endswith("ValueSet/$validate-code"):
+            response: BaseModel = service.validate_code(
+                ValidateCodeRequest(
+                    url=params.get("url"),
+                    code=params.get("code"),
+                    system=params.get("system"),
+                    display=params.get("display"),
+                )
+            )
+        elif path.endswith("CodeSystem/$subsumes"):
+            response = service.subsumes(SubsumesRequest.model_validate(params))
+        elif path.endswith("memberOf"):
+            params.setdefault("valueSetUrl", params.pop("valueset", ""))
+            response = service.member_of(MemberOfRequest.model_validate(params))
+        else:
+            return {"response": {"status": "404 Not Found"}}
+    except ValidationError as e:
+        return {"response": {"status": "400 Bad Request", "outcome": _outcome(str(e))}}
+    except Exception as e:
+        return {"response": {"status": "500 Internal Server Error", "outcome": _outcome(str(e))}}
+    return {"resource": _to_parameters(response), "response": {"status": "200 OK"}}
+
+
+@router.post(
+    "",
+    summary="Run a batch of terminology operations",
+    description="Run the GET $validate-code, $subsumes and memberOf requests of a batch Bundle.",
+)
+async def batch(
+    bundle: dict[str, Any] = Body(...),
+    service: TerminologyService = Depends(get_service),
+) -> dict[str, Any]:
+    """Run a batch Bundle of terminology operations.
+
+    Each entry is a GET request relative to the service base, e.g.
+    ``ValueSet/$validate-code?url=...&system=...&code=...``. Results are
+    returned as Parameters resources in a batch-response Bundle, in entry
+    order; a failed entry does not affect the others.
+    """
+    if bundle.get("resourceType") != "Bundle" or bundle.get("type") != "batch":
+        raise HTTPException(status_code=400, detail="Expected a Bundle of type batch")
+    return {
+        "resourceType": "Bundle",
+        "type": "batch-response",
+        "entry": [_batch_entry(service, entry) for entry in bundle.get("entry", [])],
+    }
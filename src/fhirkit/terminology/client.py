@@ -0,0 +1,233 @@
+"""HTTP plumbing for remote terminology servers.
+
+``FHIRTerminologyService`` talks to a remote FHIR terminology server for
+every code a CQL measure or FHIRPath expression checks. The pieces here
+keep that affordable:
+
+- ``ConnectionPool`` keeps HTTP/1.1 connections open between requests
+  instead of a TCP (and TLS) handshake per code
+- ``ResultCache`` remembers results for a time-to-live, evicting the least
+  recently used entries beyond its size
+- ``RequestCoalescer`` lets concurrent callers asking the same question
+  share one request
+"""
+
+from __future__ import annotations
+
+import http.client
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from concurrent.futures import Future
+from typing import Any, TypeVar
+from urllib.parse import urlsplit
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_CACHE_SIZE = 10000
+DEFAULT_CACHE_TTL = 3600.0
+
+T = TypeVar("T")
+
+# Errors of a kept-alive connection that the server closed in the meantime
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+class ConnectionPool:
+    """Pool of keep-alive HTTP connections to one server.
+
+    Thread-safe: each request takes an idle connection (or opens one, up to
+    ``max_size`` at a time) and returns it afterwards. A kept-alive
+    connection that the server has closed is replaced once, transparently.
+
+    Args:
+        base_url: Server base URL; request paths are relative to its path
+        max_size: Maximum number of connections open at a time
+        timeout: Socket timeout in seconds
+    """
+
+    def __init__(self, base_url: str, max_size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT) -> None:
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Not an http(s) URL: {base_url}")
+        self._connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self._host = parts.hostname
+        self._port = parts.port
+        self._base_path = parts.path.rstrip("/")
+        self._timeout = timeout
+        self._idle: list[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        # Connections opened over the pool's lifetime
+        self.opened = 0
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        body: bytes | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> tuple[int, bytes]:
+        """Send a request and read the whole response.
+
+        Args:
+            method: HTTP method
+            path: Path relative to the base URL, with query string
+            body: Optional request body
+            headers: Request headers
+
+        Returns:
+            Status code and response body
+
+        Raises:
+            OSError: If the server cannot be reached
+            http.client.HTTPException: If the response is malformed
+        """
+        url = f"{self._base_path}{path}" or "/"
+        with self._slots:
+            connection, reused = self._acquire()
+            try:
+                try:
+                    status, data = self._send(connection, method, url, body, headers or {})
+                except _STALE_CONNECTION_ERRORS:
+                    if not reused:
+                        raise
+                    connection.close()
+                    connection, reused = self._open(), False
+                    status, data = self._send(connection, method, url, body, headers or {})
+            except BaseException:
+                connection.close()
+                raise
+            with self._lock:
+                self._idle.append(connection)
+            return status, data
+
+    def close(self) -> None:
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def _acquire(self) -> tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._open(), False
+
+    def _open(self) -> http.client.HTTPConnection:
+        with self._lock:
+            self.opened += 1
+        return self._connection_class(self._host, self._port, timeout=self._timeout)
+
+    @staticmethod
+    def _send(
+        connection: http.client.HTTPConnection,
+        method: str,
+        url: str,
+        body: bytes | None,
+        headers: dict[str, str],
+    ) -> tuple[int, bytes]:
+        connection.request(method, url, body=body, headers=headers)
+        response = connection.getresponse()
+        # The body must be read in full before the connection is reused
+        data = response.read()
+        if response.will_close:
+            connection.close()
+        return response.status, data
+
+
+class ResultCache:
+    """LRU cache of results that expire after a time-to-live.
+
+    Thread-safe: entries are guarded by a lock.
+
+    Args:
+        max_size: Maximum number of entries (0 disables the cache)
+        ttl: Seconds an entry stays valid
+        clock: Time source, monotonic seconds
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_CACHE_SIZE,
+        ttl: float = DEFAULT_CACHE_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._max_size = max_size
+        self._ttl = ttl
+        self._clock = clock
+        # {key: (expiry, value)}, least recently used first
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any | None:
+        """Get an unexpired result, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a result, evicting the least recently used entries beyond the size."""
+        if self._max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + self._ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+
+
+class RequestCoalescer:
+    """Share one call among concurrent callers with the same key.
+
+    The first caller of a key runs the call; callers arriving while it runs
+    wait for its result (or exception) instead of making their own.
+    """
+
+    def __init__(self) -> None:
+        self._pending: dict[Hashable, Future[Any]] = {}
+        self._lock = threading.Lock()
+        # Calls answered by another caller's call
+        self.coalesced = 0
+
+    def run(self, key: Hashable, call: Callable[[], T]) -> T:
+        """Run a call, or wait for the running call of the same key."""
+        with self._lock:
+            future = self._pending.get(key)
+            leader = future is None
+            if leader:
+                future = self._pending[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            result = call()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._pending[key]
@@ -0,0 +1,434 @@
+"""Compact, memory-mapped storage for large CodeSystems.
+
+A LOINC or SNOMED CT sized CodeSystem held as FHIR JSON costs gigabytes of
+Python objects. The compact format stores it as flat arrays in one file,
+which is memory-mapped and read in place, so that looking up a code only
+touches a few pages of the file:
+
+- a string pool with the UTF-8 codes (in sorted order) and displays
+- offsets of each code and display in the pool; a code is found by binary
+  search over the sorted codes
+- parent and child adjacency arrays (offsets into a flat list of concept
+  numbers)
+- the post-order intervals of ``HierarchyIndex`` for each concept, and the
+  concepts in post-order, so subsumption is a range check and descendants
+  are a slice
+
+Files are written by ``write_compact_codesystem`` (or ``fhir terminology
+import``) from FHIR CodeSystem JSON or a TSV file, and read by
+``CompactCodeSystem``.
+
+File layout: a 16-byte header (magic, format version, byte order), the
+offset and item count of each section, then the sections, each aligned to
+8 bytes. The first section is the JSON metadata (url, version, name).
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import Any
+
+from .hierarchy import HierarchyIndex
+
+MAGIC = b"FHIRKIT-CS"
+FORMAT_VERSION = 1
+
+# Sections, in file order, and the type of their items
+_SECTIONS: tuple[tuple[str, str], ...] = (
+    ("meta", "B"),
+    ("pool", "B"),
+    ("code_offsets", "Q"),
+    ("display_offsets", "Q"),
+    ("parent_index", "I"),
+    ("parents", "I"),
+    ("child_index", "I"),
+    ("children", "I"),
+    ("interval_index", "I"),
+    ("intervals", "I"),
+    ("post", "I"),
+    ("order", "I"),
+)
+_HEADER = struct.Struct("<10sBB4x")
+_SECTION = struct.Struct("<QQ")
+_BYTE_ORDERS = {"little": 0, "big": 1}
+
+
+class CompactCodeSystemError(Exception):
+    """A file is not a compact CodeSystem of a supported version."""
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def write_compact_codesystem(
+    path: str | Path,
+    concepts: Iterable[dict[str, Any]],
+    url: str,
+    version: str | None = None,
+    name: str | None = None,
+    title: str | None = None,
+) -> int:
+    """Write CodeSystem concepts to a compact file.
+
+    Args:
+        path: Output file, replaced atomically
+        concepts: FHIR ``concept`` elements; parents are given by nesting
+            and by ``parent`` properties
+        url: CodeSystem URL
+        version: CodeSystem version
+        name: CodeSystem name
+        title: CodeSystem title
+
+    Returns:
+        Number of concepts written
+    """
+    index = HierarchyIndex(concepts)
+    codes = sorted(index)
+    number = {code: i for i, code in enumerate(codes)}
+
+    pool = bytearray()
+    code_offsets = array("Q")
+    for code in codes:
+        code_offsets.append(len(pool))
+        pool += code.encode("utf-8")
+    code_offsets.append(len(pool))
+    display_offsets = array("Q")
+    for code in codes:
+        display_offsets.append(len(pool))
+        pool += (index.display(code) or "").encode("utf-8")
+    display_offsets.append(len(pool))
+
+    def adjacency(related: Any) -> tuple[array, array]:
+        offsets, items = array("I"), array("I")
+        for code in codes:
+            offsets.append(len(items))
+            items.extend(number[other] for other in related(code))
+        offsets.append(len(items))
+        return offsets, items
+
+    parent_index, parents = adjacency(index.parents)
+    child_index, children = adjacency(index.children)
+    interval_index, intervals = array("I"), array("I")
+    post = array("I")
+    order = array("I", bytes(4 * len(codes)))
+    for i, code in enumerate(codes):
+        interval_index.append(len(intervals) // 2)
+        for low, high in index.intervals(code):
+            intervals.extend((low, high))
+        position = index.position(code)
+        post.append(position)
+        order[position] = i
+    interval_index.append(len(intervals) // 2)
+
+    meta = {"url": url, "version": version, "name": name, "title": title, "count": len(codes)}
+    sections: dict[str, bytes | bytearray | array] = {
+        "meta": json.dumps(meta).encode("utf-8"),
+        "pool": pool,
+        "code_offsets": code_offsets,
+        "display_offsets": display_offsets,
+        "parent_index": parent_index,
+        "parents": parents,
+        "child_index": child_index,
+        "children": children,
+        "interval_index": interval_index,
+        # Stored as pairs; the count of this section is the number of intervals
+        "intervals": intervals,
+        "post": post,
+        "order": order,
+    }
+
+    path = Path(path)
+    temporary = path.with_name(path.name + ".tmp")
+    with open(temporary, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, _BYTE_ORDERS[sys.byteorder]))
+        offset = _align(_HEADER.size + _SECTION.size * len(_SECTIONS))
+        for section, _ in _SECTIONS:
+            data = sections[section]
+            count = len(data) // 2 if section == "intervals" else len(data)
+            f.write(_SECTION.pack(offset, count))
+            offset = _align(offset + len(memoryview(data).cast("B")))
+        for section, _ in _SECTIONS:
+            f.write(b"\0" * (_align(f.tell()) - f.tell()))
+            f.write(memoryview(sections[section]).cast("B"))
+    os.replace(temporary, path)
+    return len(codes)
+
+
+def concepts_from_tsv(path: str | Path) -> list[dict[str, Any]]:
+    """Read concepts from a tab-separated file.
+
+    The first row names the columns: ``code`` (required), ``display`` and
+    ``parent``. Several parents are separated by ``|``, or given on further
+    rows of the same code, as in a relationship export.
+
+    Args:
+        path: TSV file
+
+    Returns:
+        FHIR ``concept`` elements with ``parent`` properties
+
+    Raises:
+        ValueError: If the file has no ``code`` column
+    """
+    concepts: dict[str, dict[str, Any]] = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f, delimiter="\t", quoting=csv.QUOTE_NONE)
+        if "code" not in (reader.fieldnames or []):
+            raise ValueError(f"{path}: no 'code' column")
+        for row in reader:
+            code = (row.get("code") or "").strip()
+            if not code:
+                continue
+            concept = concepts.setdefault(code, {"code": code, "property": []})
+            display = (row.get("display") or "").strip()
+            if display:
+                concept["display"] = display
+            for parent in (row.get("parent") or "").split("|"):
+                if parent.strip():
+                    concept["property"].append({"code": "parent", "valueCode": parent.strip()})
+    return list(concepts.values())
+
+
+class CompactCodeSystem:
+    """A compact CodeSystem file, memory-mapped and read in place.
+
+    Concepts are numbered in code order. Arrays are memoryviews of the
+    mapped file, so only the pages that a lookup touches are read.
+
+    Example:
+        with CompactCodeSystem("snomed.fcs") as snomed:
+            snomed.display("44054006")
+            snomed.subsumes("73211009", "44054006")
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        """Map a compact CodeSystem file.
+
+        Args:
+            path: File written by write_compact_codesystem
+
+        Raises:
+            CompactCodeSystemError: If the file is not a compact CodeSystem
+                of a supported version and byte order
+        """
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < _HEADER.size:
+                raise CompactCodeSystemError(f"{self.path}: not a compact CodeSystem")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, byte_order = _HEADER.unpack_from(self._mmap, 0)
+            if magic != MAGIC:
+                raise CompactCodeSystemError(f"{self.path}: not a compact CodeSystem")
+            if version != FORMAT_VERSION:
+                raise CompactCodeSystemError(f"{self.path}: unsupported format version {version}")
+            if byte_order != _BYTE_ORDERS[sys.byteorder]:
+                raise CompactCodeSystemError(f"{self.path}: written on a machine of another byte order")
+            view = memoryview(self._mmap)
+            self._views: list[memoryview] = [view]
+            sections: dict[str, memoryview] = {}
+            offsets: dict[str, int] = {}
+            for i, (name, typecode) in enumerate(_SECTIONS):
+                offset, count = _SECTION.unpack_from(self._mmap, _HEADER.size + i * _SECTION.size)
+                size = count * array(typecode).itemsize * (2 if name == "intervals" else 1)
+                if offset + size > len(self._mmap):
+                    raise ValueError(f"section {name} extends past the end of the file")
+                offsets[name] = offset
+                section = view[offset : offset + size].cast(typecode)
+                self._views.append(section)
+                sections[name] = section
+        except (struct.error, ValueError, TypeError) as e:
+            self.close()
+            raise CompactCodeSystemError(f"{self.path}: corrupt compact CodeSystem: {e}") from e
+        except CompactCodeSystemError:
+            self.close()
+            raise
+
+        self.meta: dict[str, Any] = json.loads(bytes(sections["meta"]))
+        self._pool_offset = offsets["pool"]
+        self._code_offsets = sections["code_offsets"]
+        self._display_offsets = sections["display_offsets"]
+        self._parent_index = sections["parent_index"]
+        self._parents = sections["parents"]
+        self._child_index = sections["child_index"]
+        self._children = sections["children"]
+        self._interval_index = sections["interval_index"]
+        self._intervals = sections["intervals"]
+        self._post = sections["post"]
+        self._order = sections["order"]
+
+    @property
+    def url(self) -> str:
+        """CodeSystem URL."""
+        return self.meta["url"]
+
+    @property
+    def version(self) -> str | None:
+        """CodeSystem version."""
+        return self.meta.get("version")
+
+    @property
+    def name(self) -> str | None:
+        """CodeSystem name."""
+        return self.meta.get("name")
+
+    def close(self) -> None:
+        """Release the memory map."""
+        for view in reversed(getattr(self, "_views", [])):
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+    def __enter__(self) -> CompactCodeSystem:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._post)
+
+    def __contains__(self, code: object) -> bool:
+        return isinstance(code, str) and self.find(code) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.code(i) for i in range(len(self)))
+
+    def _string(self, offsets: memoryview, i: int) -> str:
+        start = self._pool_offset + offsets[i]
+        return self._mmap[start : self._pool_offset + offsets[i + 1]].decode("utf-8")
+
+    def find(self, code: str) -> int | None:
+        """Get the number of a code, by binary search of the sorted codes."""
+        key = code.encode("utf-8")
+        offsets = self._code_offsets
+        base = self._pool_offset
+        data = self._mmap
+        low, high = 0, len(self._post)
+        while low < high:
+            mid = (low + high) // 2
+            value = data[base + offsets[mid] : base + offsets[mid + 1]]
+            if value < key:
+                low = mid + 1
+            elif value > key:
+                high = mid
+            else:
+                return mid
+        return None
+
+    def code(self, number: int) -> str:
+        """Get the code of a concept number."""
+        return self._string(self._code_offsets, number)
+
+    def display(self, code: str) -> str | None:
+        """Get the display of a code, None if it has none or is not defined."""
+        i = self.find(code)
+        return None if i is None else self._string(self._display_offsets, i) or None
+
+    def parents(self, code: str) -> list[str]:
+        """Get the direct parents of a code."""
+        i = self.find(code)
+        if i is None:
+            return []
+        return [self.code(p) for p in self._parents[self._parent_index[i] : self._parent_index[i + 1]]]
+
+    def children(self, code: str) -> list[str]:
+        """Get the direct children of a code."""
+        i = self.find(code)
+        if i is None:
+            return []
+        return [self.code(c) for c in self._children[self._child_index[i] : self._child_index[i + 1]]]
+
+    def concepts(self, start: int = 0, stop: int | None = None) -> Iterator[tuple[str, str | None]]:
+        """Iterate over ``(code, display)`` pairs in code order, optionally a slice of them."""
+        for i in range(start, min(stop if stop is not None else len(self), len(self))):
+            yield self.code(i), self._string(self._display_offsets, i) or None
+
+    def _number_intervals(self, i: int) -> memoryview:
+        # Flat (low, high) pairs
+        return self._intervals[2 * self._interval_index[i] : 2 * self._interval_index[i + 1]]
+
+    def subsumes(self, code_a: str, code_b: str) -> bool:
+        """Check whether code A is code B or one of its ancestors."""
+        a = self.find(code_a)
+        b = self.find(code_b)
+        if a is None or b is None:
+            return False
+        position = self._post[b]
+        intervals = self._number_intervals(a)
+        if len(intervals) == 2:
+            return intervals[0] <= position <= intervals[1]
+        lows = intervals[::2]
+        k = bisect_right(lows, position) - 1
+        return k >= 0 and position <= intervals[2 * k + 1]
+
+    def relationship(self, code_a: str, code_b: str) -> str:
+        """Get the $subsumes outcome of two codes.
+
+        Returns:
+            "equivalent", "subsumes", "subsumed-by" or "not-subsumed"
+        """
+        if code_a == code_b:
+            return "equivalent"
+        if self.subsumes(code_a, code_b):
+            return "subsumes"
+        if self.subsumes(code_b, code_a):
+            return "subsumed-by"
+        return "not-subsumed"
+
+    def descendants(self, code: str, include_self: bool = False) -> Iterator[str]:
+        """Iterate over the codes subsumed by a code, read from slices of the post-order."""
+        i = self.find(code)
+        if i is None:
+            return
+        intervals = self._number_intervals(i)
+        for k in range(0, len(intervals), 2):
+            for number in self._order[intervals[k] : intervals[k + 1] + 1]:
+                if include_self or number != i:
+                    yield self.code(number)
+
+    def ancestors(self, code: str, include_self: bool = False) -> set[str]:
+        """Get the codes that subsume a code, following the parent links."""
+        i = self.find(code)
+        if i is None:
+            return set()
+        found: set[int] = set()
+        pending = list(self._parents[self._parent_index[i] : self._parent_index[i + 1]])
+        while pending:
+            parent = pending.pop()
+            if parent not in found:
+                found.add(parent)
+                pending.extend(self._parents[self._parent_index[parent] : self._parent_index[parent + 1]])
+        if include_self:
+            found.add(i)
+        else:
+            found.discard(i)
+        return {self.code(a) for a in found}
+
+    def filter(self, op: str, value: str) -> list[str]:
+        """Select codes with a hierarchy filter of a ValueSet compose include (see ``HierarchyIndex.filter``).
+
+        Raises:
+            ValueError: If the operator is not a hierarchy filter
+        """
+        if op == "is-a":
+            return list(self.descendants(value, include_self=True))
+        if op in ("descendent-of", "descendant-of"):
+            return list(self.descendants(value))
+        if op == "is-not-a":
+            below = set(self.descendants(value, include_self=True))
+            return [code for code in self if code not in below]
+        if op == "generalizes":
+            ancestors = self.ancestors(value, include_self=True)
+            return [code for code in self if code in ancestors]
+        raise ValueError(f"Unsupported hierarchy filter: {op}")
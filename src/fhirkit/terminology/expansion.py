@@ -0,0 +1,153 @@
+"""Prebuilt index of a ValueSet expansion.
+
+Type-ahead pickers call ``$expand`` with a ``filter`` on every keystroke.
+Instead of walking the ValueSet compose and scanning every display for
+each call, an expansion is materialized once and indexed:
+
+- every word of a display, and the code itself, goes into a sorted list of
+  (word, position) pairs, so the concepts with a word starting with a
+  filter word are one contiguous range found by bisection
+- the positions of active concepts are kept, for ``activeOnly``
+- concepts are kept by code, for ``$validate-code``
+
+A filter matches a concept when each of its words is the prefix of a word
+of the concept's display or code, case-insensitively.
+"""
+
+from __future__ import annotations
+
+import re
+from bisect import bisect_left
+from collections.abc import Iterable, Sequence
+from functools import cached_property
+from typing import Any
+
+_WORD = re.compile(r"\w+")
+
+# Concept property values that mark a concept as no longer active
+_INACTIVE_STATUSES = frozenset({"retired", "inactive", "deprecated"})
+
+
+def words(text: str | None) -> list[str]:
+    """Split text into lowercase words."""
+    return _WORD.findall(text.lower()) if text else []
+
+
+def concept_inactive(concept: dict[str, Any]) -> bool:
+    """Check if a CodeSystem concept or expansion entry is inactive.
+
+    Expansion entries carry ``inactive``; CodeSystem concepts carry an
+    ``inactive`` property or a ``status`` property of retired, inactive or
+    deprecated.
+    """
+    if concept.get("inactive"):
+        return True
+    for prop in concept.get("property", ()):
+        code = prop.get("code")
+        if code == "inactive" and prop.get("valueBoolean"):
+            return True
+        if code == "status" and (prop.get("valueCode") or prop.get("valueString")) in _INACTIVE_STATUSES:
+            return True
+    return False
+
+
+class ExpansionIndex:
+    """Filter and page index of the concepts of an expansion.
+
+    Example:
+        index = ExpansionIndex(contains)
+        total, page = index.page(filter_text="diab mel", count=20)
+    """
+
+    def __init__(self, contains: Iterable[dict[str, Any]]) -> None:
+        """Index expansion entries.
+
+        Args:
+            contains: Expansion entries (``system``, ``code``, ``display``
+                and optionally ``inactive``), in expansion order
+        """
+        self.contains: list[dict[str, Any]] = list(contains)
+        # Positions of active entries, in expansion order
+        self._active: list[int] = []
+        # Positions of entries per code, in expansion order
+        self._by_code: dict[str, list[int]] = {}
+        pairs: list[tuple[str, int]] = []
+        for i, entry in enumerate(self.contains):
+            code = entry.get("code") or ""
+            if not entry.get("inactive"):
+                self._active.append(i)
+            self._by_code.setdefault(code, []).append(i)
+            for word in {code.lower(), *words(code), *words(entry.get("display"))}:
+                if word:
+                    pairs.append((word, i))
+        pairs.sort()
+        self._words = [word for word, _ in pairs]
+        self._positions = [i for _, i in pairs]
+
+    def __len__(self) -> int:
+        return len(self.contains)
+
+    @cached_property
+    def codes(self) -> frozenset[tuple[str, str]]:
+        """The (system, code) pairs of the expansion, with an empty system for codes without one."""
+        return frozenset((entry.get("system") or "", entry["code"]) for entry in self.contains if entry.get("code"))
+
+    def lookup(self, code: str, system: str | None = None) -> dict[str, Any] | None:
+        """Get the first entry of a code, or None.
+
+        Entries without a system match any system, as do lookups without one.
+        """
+        for i in self._by_code.get(code, ()):
+            entry = self.contains[i]
+            entry_system = entry.get("system")
+            if not system or not entry_system or system == entry_system:
+                return entry
+        return None
+
+    def matches(self, filter_text: str | None = None, active_only: bool = False) -> Sequence[int]:
+        """Get the positions of the entries matching a filter, in expansion order.
+
+        Args:
+            filter_text: Words that must each start a word of the display or code
+            active_only: Leave out inactive entries
+
+        Returns:
+            Entry positions
+        """
+        filter_words = words(filter_text)
+        if not filter_words:
+            return self._active if active_only else range(len(self.contains))
+
+        # Start with the word with the fewest candidates, then narrow it down
+        ranges = sorted((self._prefix_range(word) for word in set(filter_words)), key=lambda r: r[1] - r[0])
+        low, high = ranges[0]
+        selected = set(self._positions[low:high])
+        for low, high in ranges[1:]:
+            if not selected:
+                break
+            selected.intersection_update(self._positions[low:high])
+        if active_only:
+            selected = {i for i in selected if not self.contains[i].get("inactive")}
+        return sorted(selected)
+
+    def page(
+        self,
+        filter_text: str | None = None,
+        count: int = 100,
+        offset: int = 0,
+        active_only: bool = False,
+    ) -> tuple[int, list[dict[str, Any]]]:
+        """Get a page of the entries matching a filter.
+
+        Returns:
+            Total number of matches, and the entries of the page
+        """
+        positions = self.matches(filter_text, active_only)
+        contains = self.contains
+        return len(positions), [contains[i] for i in positions[offset : offset + count]]
+
+    def _prefix_range(self, prefix: str) -> tuple[int, int]:
+        """Get the range of the sorted words starting with a prefix."""
+        low = bisect_left(self._words, prefix)
+        high = bisect_left(self._words, prefix + "\U0010ffff", low)
+        return low, high
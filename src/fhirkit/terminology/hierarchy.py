@@ -0,0 +1,310 @@
+"""Interval-labelled index of a CodeSystem hierarchy.
+
+Concepts are numbered in the post-order of a depth-first walk of the
+hierarchy, so the descendants reached through the walk's spanning tree
+occupy the contiguous range of numbers just before the concept itself.
+Each concept is labelled with that interval: ``a`` subsumes ``b`` when the
+number of ``b`` falls in the interval of ``a``, and the descendants of
+``a`` are a slice of the concepts in post-order.
+
+Concepts with several parents (a polyhierarchy) are reached once through
+the tree; their other parents, and the ancestors of those, get the
+intervals of the concept's subtree as additional labels. Intervals are
+merged where they meet, so most concepts keep a single interval and the
+few with more are checked by bisection. Memory is linear in the number of
+concepts plus the extra intervals, instead of a set of ancestors per
+concept.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_right
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+# Filter operators of ValueSet compose includes that select by subsumption
+HIERARCHY_FILTER_OPS = ("is-a", "descendent-of", "descendant-of", "is-not-a", "generalizes")
+
+
+def _merge(intervals: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Merge overlapping and adjacent intervals (inclusive bounds) into sorted disjoint ones."""
+    intervals.sort()
+    merged = [intervals[0]]
+    for low, high in intervals[1:]:
+        last_low, last_high = merged[-1]
+        if low <= last_high + 1:
+            if high > last_high:
+                merged[-1] = (last_low, high)
+        else:
+            merged.append((low, high))
+    return merged
+
+
+class HierarchyIndex:
+    """Subsumption index of the concepts of a CodeSystem.
+
+    Parents are given by nesting concepts and by ``parent`` properties.
+    Codes are numbered internally, in order of first appearance.
+
+    Example:
+        index = HierarchyIndex.from_codesystem(codesystem)
+        index.subsumes("73211009", "44054006")  # True
+        index.descendants("73211009")  # codes below diabetes mellitus
+    """
+
+    def __init__(self, concepts: Iterable[dict[str, Any]] = ()) -> None:
+        """Build the index from CodeSystem concepts.
+
+        Args:
+            concepts: Top-level ``concept`` elements of a CodeSystem
+        """
+        # Number of each code, and the code, display, parents and children per number
+        self._ids: dict[str, int] = {}
+        self._codes: list[str] = []
+        self._display: list[str | None] = []
+        self._parents: list[list[int]] = []
+        self._children: list[list[int]] = []
+        self._collect(concepts)
+
+        # Codes in post-order, and the post-order position per number
+        self._order: list[str] = []
+        self._post: list[int] = []
+        # Lowest post-order position in the spanning subtree per number
+        self._low: list[int] = []
+        # Merged intervals of codes with descendants outside their subtree
+        self._intervals: dict[int, list[tuple[int, int]]] = {}
+        self._label(self._number())
+
+    @classmethod
+    def from_codesystem(cls, codesystem: dict[str, Any]) -> HierarchyIndex:
+        """Build the index of a CodeSystem resource."""
+        return cls(codesystem.get("concept", []))
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def __contains__(self, code: object) -> bool:
+        return code in self._ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._codes)
+
+    def display(self, code: str) -> str | None:
+        """Get the display of a code."""
+        i = self._ids.get(code)
+        return None if i is None else self._display[i]
+
+    def parents(self, code: str) -> list[str]:
+        """Get the direct parents of a code."""
+        i = self._ids.get(code)
+        return [] if i is None else [self._codes[p] for p in self._parents[i]]
+
+    def children(self, code: str) -> list[str]:
+        """Get the direct children of a code."""
+        i = self._ids.get(code)
+        return [] if i is None else [self._codes[c] for c in self._children[i]]
+
+    def _id(self, code: str) -> int:
+        i = self._ids.get(code)
+        if i is None:
+            i = self._ids[code] = len(self._codes)
+            self._codes.append(code)
+            self._display.append(None)
+            self._parents.append([])
+            self._children.append([])
+        return i
+
+    def _collect(self, concepts: Iterable[dict[str, Any]]) -> None:
+        """Record the codes, displays and parent links of nested concepts."""
+        number = self._id
+        parents = self._parents
+        children = self._children
+        display = self._display
+
+        def link(parent: int, child: int) -> None:
+            if parent != child and parent not in parents[child]:
+                parents[child].append(parent)
+                children[parent].append(child)
+
+        stack: list[tuple[Iterable[dict[str, Any]], int | None]] = [(concepts, None)]
+        while stack:
+            level, parent = stack.pop()
+            for concept in level:
+                code = concept.get("code")
+                if not code:
+                    continue
+                i = number(code)
+                if concept.get("display"):
+                    display[i] = concept["display"]
+                if parent is not None:
+                    link(parent, i)
+                for prop in concept.get("property", ()):
+                    if prop.get("code") == "parent" and prop.get("valueCode"):
+                        link(number(prop["valueCode"]), i)
+                if concept.get("concept"):
+                    stack.append((concept["concept"], i))
+
+    def _number(self) -> list[int]:
+        """Number the codes in post-order of a depth-first walk from the roots.
+
+        Returns:
+            Code numbers in post-order
+        """
+        count = len(self._codes)
+        walked: list[int] = []
+        children = self._children
+        codes = self._codes
+        order = self._order
+        post = self._post = [-1] * count
+        low = self._low = [-1] * count
+        roots = [i for i in range(count) if not self._parents[i]]
+        # Codes only reachable through a cycle are walked from the first of them
+        for start in [*roots, *range(count)]:
+            if low[start] >= 0:
+                continue
+            low[start] = len(order)
+            stack = [(start, iter(children[start]))]
+            while stack:
+                i, pending = stack[-1]
+                for child in pending:
+                    if low[child] < 0:
+                        low[child] = len(order)
+                        stack.append((child, iter(children[child])))
+                        break
+                else:
+                    stack.pop()
+                    post[i] = len(order)
+                    order.append(codes[i])
+                    walked.append(i)
+        return walked
+
+    def _label(self, walked: list[int]) -> None:
+        """Add the intervals of descendants reached outside the spanning tree."""
+        post = self._post
+        low = self._low
+        labelled = self._intervals
+        # Children are numbered before their parents, except along cycles
+        for i in walked:
+            extra: list[tuple[int, int]] = []
+            for child in self._children[i]:
+                child_post = post[child]
+                if child_post > post[i]:
+                    continue
+                if child in labelled:
+                    extra.extend(labelled[child])
+                elif child_post < low[i]:
+                    extra.append((low[child], child_post))
+            if extra:
+                merged = _merge([(low[i], post[i]), *extra])
+                if len(merged) > 1 or merged[0] != (low[i], post[i]):
+                    labelled[i] = merged
+
+    def position(self, code: str) -> int | None:
+        """Get the post-order position of a code, the number its intervals refer to."""
+        i = self._ids.get(code)
+        return None if i is None else self._post[i]
+
+    def intervals(self, code: str) -> list[tuple[int, int]]:
+        """Get the post-order intervals (inclusive) of a code and its descendants."""
+        i = self._ids.get(code)
+        if i is None:
+            return []
+        if i in self._intervals:
+            return self._intervals[i]
+        return [(self._low[i], self._post[i])]
+
+    def subsumes(self, code_a: str, code_b: str) -> bool:
+        """Check whether code A is code B or one of its ancestors."""
+        a = self._ids.get(code_a)
+        b = self._ids.get(code_b)
+        if a is None or b is None:
+            return False
+        post = self._post[b]
+        intervals = self._intervals.get(a)
+        if intervals is None:
+            return self._low[a] <= post <= self._post[a]
+        k = bisect_right(intervals, (post, len(self._order))) - 1
+        return k >= 0 and intervals[k][0] <= post <= intervals[k][1]
+
+    def relationship(self, code_a: str, code_b: str) -> str:
+        """Get the $subsumes outcome of two codes.
+
+        Returns:
+            "equivalent", "subsumes" (A is an ancestor of B), "subsumed-by"
+            (A is a descendant of B) or "not-subsumed"
+        """
+        if code_a == code_b:
+            return "equivalent"
+        if self.subsumes(code_a, code_b):
+            return "subsumes"
+        if self.subsumes(code_b, code_a):
+            return "subsumed-by"
+        return "not-subsumed"
+
+    def descendants(self, code: str, include_self: bool = False) -> list[str]:
+        """Get the codes subsumed by a code, as slices of the post-order.
+
+        Args:
+            code: Code to look up
+            include_self: Include the code itself (``is-a``) instead of only
+                its descendants (``descendent-of``)
+
+        Returns:
+            Descendant codes, empty if the code is not in the hierarchy
+        """
+        i = self._ids.get(code)
+        if i is None:
+            return []
+        post = self._post[i]
+        found: list[str] = []
+        for low, high in self.intervals(code):
+            if include_self or not low <= post <= high:
+                found.extend(self._order[low : high + 1])
+            else:
+                found.extend(self._order[low:post])
+                found.extend(self._order[post + 1 : high + 1])
+        return found
+
+    def ancestors(self, code: str, include_self: bool = False) -> set[str]:
+        """Get the codes that subsume a code, following the parent links."""
+        i = self._ids.get(code)
+        if i is None:
+            return set()
+        found: set[int] = set()
+        pending = list(self._parents[i])
+        while pending:
+            parent = pending.pop()
+            if parent not in found:
+                found.add(parent)
+                pending.extend(self._parents[parent])
+        if include_self:
+            found.add(i)
+        else:
+            # A code in a cycle is among its own parents' ancestors
+            found.discard(i)
+        return {self._codes[a] for a in found}
+
+    def filter(self, op: str, value: str) -> list[str]:
+        """Select codes with a hierarchy filter of a ValueSet compose include.
+
+        Args:
+            op: ``is-a``, ``descendent-of`` (or ``descendant-of``), ``is-not-a`` or ``generalizes``
+            value: Code the filter is relative to
+
+        Returns:
+            Selected codes
+
+        Raises:
+            ValueError: If the operator is not a hierarchy filter
+        """
+        if op == "is-a":
+            return self.descendants(value, include_self=True)
+        if op in ("descendent-of", "descendant-of"):
+            return self.descendants(value)
+        if op == "is-not-a":
+            below = set(self.descendants(value, include_self=True))
+            return [code for code in self._codes if code not in below]
+        if op == "generalizes":
+            ancestors = self.ancestors(value, include_self=True)
+            return [code for code in self._codes if code in ancestors]
+        raise ValueError(f"Unsupported hierarchy filter: {op}")
@@ -4,12 +4,26 @@ This module provides the TerminologyService protocol and implementations
 for validating codes against value sets and performing terminology operations.
 """
 
+import http.client
 import json
 from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable
 from pathlib import Path
 from typing import Any
-
+from urllib.parse import urlencode
+
+from .client import (
+    DEFAULT_CACHE_SIZE,
+    DEFAULT_CACHE_TTL,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_TIMEOUT,
+    ConnectionPool,
+    RequestCoalescer,
+    ResultCache,
+)
+from .hierarchy import HIERARCHY_FILTER_OPS, HierarchyIndex
 from .models import (
+    CodeSystem,
     MemberOfRequest,
     MemberOfResponse,
     SubsumesRequest,
@@ -17,6 +31,7 @@ from .models import (
     ValidateCodeRequest,
     ValidateCodeResponse,
     ValueSet,
+    ValueSetComposeInclude,
 )
 
 
@@ -86,7 +101,7 @@ class InMemoryTerminologyService(TerminologyService):
 
     def __init__(self) -> None:
         self._value_sets: dict[str, ValueSet] = {}
-        self._code_systems: dict[str, dict[str, dict[str, Any]]] = {}  # url -> code -> concept
+        self._code_systems: dict[str, HierarchyIndex] = {}  # url -> hierarchy index of its concepts
 
     def add_value_set(self, value_set: ValueSet) -> None:
         """Add a value set to the service.
@@ -100,6 +115,23 @@ class InMemoryTerminologyService(TerminologyService):
             if value_set.version:
                 self._value_sets[f"{value_set.url}|{value_set.version}"] = value_set
 
+    def add_code_system(self, code_system: CodeSystem) -> None:
+        """Add a code system, indexing its concept hierarchy for subsumption.
+
+        Args:
+            code_system: CodeSystem to add
+        """
+        if code_system.url:
+            self._code_systems[code_system.url] = HierarchyIndex(code_system.concept)
+
+    def add_code_system_from_json(self, json_data: dict[str, Any]) -> None:
+        """Add a code system from JSON data.
+
+        Args:
+            json_data: CodeSystem as dictionary
+        """
+        self.add_code_system(CodeSystem.model_validate(json_data))
+
     def add_value_set_from_json(self, json_data: dict[str, Any]) -> None:
         """Add a value set from JSON data.
 
@@ -172,9 +204,31 @@ class InMemoryTerminologyService(TerminologyService):
                 system = include.system or ""
                 for concept in include.concept:
                     codes.add((system, concept.code))
+                codes.update((system, code) for code in self._filter_codes(include))
 
         return codes
 
+    def _filter_codes(self, include: ValueSetComposeInclude) -> list[str]:
+        """Select the codes of an include's hierarchy filters (is-a, descendent-of, ...).
+
+        Returns:
+            Codes matching all hierarchy filters, empty without such filters
+            or if the code system has not been added
+        """
+        hierarchy = self._code_systems.get(include.system or "")
+        filters = [
+            f
+            for f in include.filter
+            if f.get("property") == "concept" and f.get("op") in HIERARCHY_FILTER_OPS and f.get("value")
+        ]
+        if hierarchy is None or not filters:
+            return []
+        selected = hierarchy.filter(filters[0]["op"], filters[0]["value"])
+        for f in filters[1:]:
+            also = set(hierarchy.filter(f["op"], f["value"]))
+            selected = [code for code in selected if code in also]
+        return selected
+
     def validate_code(self, request: ValidateCodeRequest) -> ValidateCodeResponse:
         """Validate a code against a value set."""
         # Get the value set
@@ -270,31 +324,75 @@ class InMemoryTerminologyService(TerminologyService):
     def subsumes(self, request: SubsumesRequest) -> SubsumesResponse:
         """Check subsumption between codes.
 
-        Note: This basic implementation only checks equivalence.
-        Full subsumption requires hierarchical code system data.
+        Uses the hierarchy of the code system if it has been added with
+        ``add_code_system``; otherwise only equivalence can be detected.
         """
         if request.codeA == request.codeB:
             return SubsumesResponse(outcome="equivalent")
 
-        # Without hierarchical data, we can only check equivalence
-        return SubsumesResponse(outcome="not-subsumed")
+        hierarchy = self._code_systems.get(request.system)
+        if hierarchy is None:
+            return SubsumesResponse(outcome="not-subsumed")
+        return SubsumesResponse(outcome=hierarchy.relationship(request.codeA, request.codeB))
 
 
 class FHIRTerminologyService(TerminologyService):
     """Terminology service that delegates to an external FHIR server.
 
-    Proxies terminology operations to a FHIR terminology server.
+    Proxies terminology operations to a FHIR terminology server over a pool
+    of keep-alive connections. Results are cached by operation, system,
+    code, ValueSet and version for ``cache_ttl`` seconds, concurrent
+    identical requests share one round-trip, and ``validate_codes`` checks
+    many codes with batch Bundles.
+
+    Example:
+        with FHIRTerminologyService("https://tx.fhir.org/r4") as service:
+            results = service.validate_codes(
+                ValidateCodeRequest(url=valueset_url, system=system, code=code) for code in codes
+            )
     """
 
-    def __init__(self, base_url: str, headers: dict[str, str] | None = None) -> None:
+    def __init__(
+        self,
+        base_url: str,
+        headers: dict[str, str] | None = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+        cache_ttl: float = DEFAULT_CACHE_TTL,
+        batch_size: int = 100,
+        validate_display: bool = False,
+    ) -> None:
         """Initialize the FHIR terminology service.
 
         Args:
             base_url: Base URL of the FHIR terminology server
             headers: Optional HTTP headers for authentication
+            timeout: Socket timeout in seconds
+            pool_size: Maximum number of connections open at a time
+            cache_size: Maximum number of cached results (0 disables caching)
+            cache_ttl: Seconds a cached result stays valid
+            batch_size: Maximum number of entries in one batch Bundle
+            validate_display: Send the display of codings, so that the
+                server also checks it; by default only codes are validated
         """
         self.base_url = base_url.rstrip("/")
         self.headers = headers or {}
+        self.batch_size = batch_size
+        self.validate_display = validate_display
+        self.cache = ResultCache(cache_size, cache_ttl)
+        self._pool = ConnectionPool(self.base_url, pool_size, timeout)
+        self._coalescer = RequestCoalescer()
+
+    def close(self) -> None:
+        """Close the pooled connections."""
+        self._pool.close()
+
+    def __enter__(self) -> "FHIRTerminologyService":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
 
     def _make_request(self, method: str, path: str, data: dict[str, Any] | None = None) -> dict[str, Any] | None:
         """Make an HTTP request to the FHIR server.
@@ -307,59 +405,160 @@ class FHIRTerminologyService(TerminologyService):
         Returns:
             Response JSON or None on error
         """
-        import urllib.error
-        import urllib.request
-
-        url = f"{self.base_url}{path}"
         headers = {"Content-Type": "application/fhir+json", "Accept": "application/fhir+json", **self.headers}
-
+        body = json.dumps(data).encode("utf-8") if data else None
         try:
-            if data:
-                body = json.dumps(data).encode("utf-8")
-                req = urllib.request.Request(url, data=body, headers=headers, method=method)
-            else:
-                req = urllib.request.Request(url, headers=headers, method=method)
-
-            with urllib.request.urlopen(req, timeout=30) as response:
-                return json.loads(response.read().decode("utf-8"))
-        except urllib.error.URLError:
+            status, response = self._pool.request(method, path, body, headers)
+        except (OSError, http.client.HTTPException):
             return None
-        except json.JSONDecodeError:
+        if status >= 400:
             return None
+        try:
+            return json.loads(response.decode("utf-8"))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return None
+
+    def _cached(self, key: tuple[Any, ...], fetch: Callable[[], tuple[Any, bool]]) -> Any:
+        """Get a result from the cache, or fetch it once for all concurrent callers.
+
+        ``fetch`` returns the result and whether it may be cached.
+        """
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        def call() -> Any:
+            result, cacheable = fetch()
+            if cacheable:
+                self.cache.put(key, result)
+            return result
+
+        return self._coalescer.run(key, call)
 
     def validate_code(self, request: ValidateCodeRequest) -> ValidateCodeResponse:
         """Validate code via FHIR server."""
-        params: dict[str, Any] = {}
-        if request.url:
-            params["url"] = request.url
+        queries = self._validate_code_queries(request)
+        responses = []
+        for key, params in queries:
+            response = self._cached(key, lambda params=params: self._fetch_validate_code(params))
+            if response.result:
+                return response
+            responses.append(response)
+        return responses[0]
+
+    def validate_codes(self, requests: Iterable[ValidateCodeRequest]) -> list[ValidateCodeResponse]:
+        """Validate many codes, sending the uncached ones in batch Bundles.
+
+        Entries that the server does not answer (or all of them, if it does
+        not support batches) are validated one request at a time.
+
+        Args:
+            requests: Codes to validate
+
+        Returns:
+            A response per request, in order
+        """
+        queries = [self._validate_code_queries(request) for request in requests]
+        results: dict[tuple[Any, ...], ValidateCodeResponse] = {}
+        pending: dict[tuple[Any, ...], dict[str, str]] = {}
+        for request_queries in queries:
+            for key, params in request_queries:
+                if key in results or key in pending:
+                    continue
+                cached = self.cache.get(key)
+                if cached is not None:
+                    results[key] = cached
+                else:
+                    pending[key] = params
+
+        items = list(pending.items())
+        for start in range(0, len(items), self.batch_size):
+            chunk = items[start : start + self.batch_size]
+            answers = self._fetch_validate_code_batch([params for _, params in chunk])
+            for (key, params), answer in zip(chunk, answers):
+                if answer is None:
+                    answer = self._cached(key, lambda params=params: self._fetch_validate_code(params))
+                else:
+                    self.cache.put(key, answer)
+                results[key] = answer
+
+        responses = []
+        for request_queries in queries:
+            answers = [results[key] for key, _ in request_queries]
+            responses.append(next((answer for answer in answers if answer.result), answers[0]))
+        return responses
+
+    def _validate_code_queries(self, request: ValidateCodeRequest) -> list[tuple[tuple[Any, ...], dict[str, str]]]:
+        """Get the cache key and query parameters of each coding in a request."""
+        codings: list[tuple[str | None, str | None, str | None, str | None]] = []
         if request.code:
-            params["code"] = request.code
-        if request.system:
-            params["system"] = request.system
-
-        # Build query string
-        query = "&".join(f"{k}={v}" for k, v in params.items())
-        path = f"/ValueSet/$validate-code?{query}"
-
-        result = self._make_request("GET", path)
-        if result:
-            # Parse Parameters response
-            is_valid = False
-            message = None
-            display = None
-
-            for param in result.get("parameter", []):
-                name = param.get("name")
-                if name == "result":
-                    is_valid = param.get("valueBoolean", False)
-                elif name == "message":
-                    message = param.get("valueString")
-                elif name == "display":
-                    display = param.get("valueString")
-
-            return ValidateCodeResponse(result=is_valid, message=message, display=display)
-
-        return ValidateCodeResponse(result=False, message="Failed to contact terminology server")
+            codings.append((request.code, request.system, request.version, request.display))
+        if request.coding and request.coding.code:
+            coding = request.coding
+            codings.append((coding.code, coding.system, coding.version, coding.display))
+        if request.codeableConcept:
+            codings.extend((c.code, c.system, c.version, c.display) for c in request.codeableConcept.coding if c.code)
+        if not codings:
+            codings.append((None, request.system, request.version, None))
+
+        queries = []
+        for code, system, version, display in codings:
+            if not self.validate_display:
+                display = None
+            params = {"url": request.url, "code": code, "system": system, "systemVersion": version, "display": display}
+            params = {name: value for name, value in params.items() if value}
+            key = ("validate-code", system, code, request.url, version, display)
+            queries.append((key, params))
+        return queries
+
+    def _fetch_validate_code(self, params: dict[str, str]) -> tuple[ValidateCodeResponse, bool]:
+        result = self._make_request("GET", f"/ValueSet/$validate-code?{urlencode(params)}")
+        if result is None:
+            return ValidateCodeResponse(result=False, message="Failed to contact terminology server"), False
+        return self._parse_validate_code(result), True
+
+    def _fetch_validate_code_batch(self, queries: list[dict[str, str]]) -> list[ValidateCodeResponse | None]:
+        """Validate codes with one batch Bundle.
+
+        Returns:
+            A response per query, None for entries that failed
+        """
+        bundle = {
+            "resourceType": "Bundle",
+            "type": "batch",
+            "entry": [
+                {"request": {"method": "GET", "url": f"ValueSet/$validate-code?{urlencode(params)}"}}
+                for params in queries
+            ],
+        }
+        result = self._make_request("POST", "", bundle)
+        entries = result.get("entry", []) if result and result.get("resourceType") == "Bundle" else []
+        if len(entries) != len(queries):
+            return [None] * len(queries)
+        answers: list[ValidateCodeResponse | None] = []
+        for entry in entries:
+            status = str(entry.get("response", {}).get("status", ""))
+            resource = entry.get("resource")
+            answers.append(self._parse_validate_code(resource) if status.startswith("2") and resource else None)
+        return answers
+
+    @staticmethod
+    def _parse_validate_code(result: dict[str, Any]) -> ValidateCodeResponse:
+        """Parse a Parameters resource (or a plain response) of $validate-code."""
+        if result.get("resourceType") != "Parameters" and "result" in result:
+            return ValidateCodeResponse.model_validate(result)
+        is_valid = False
+        message = None
+        display = None
+        for param in result.get("parameter", []):
+            name = param.get("name")
+            if name == "result":
+                is_valid = param.get("valueBoolean", False)
+            elif name == "message":
+                message = param.get("valueString")
+            elif name == "display":
+                display = param.get("valueString")
+        return ValidateCodeResponse(result=is_valid, message=message, display=display)
 
     def member_of(self, request: MemberOfRequest) -> MemberOfResponse:
         """Check membership via FHIR server."""
@@ -367,6 +566,7 @@ class FHIRTerminologyService(TerminologyService):
             url=request.valueSetUrl,
             code=request.code,
             system=request.system,
+            version=request.version,
         )
         validate_result = self.validate_code(validate_request)
 
@@ -379,6 +579,10 @@ class FHIRTerminologyService(TerminologyService):
 
     def subsumes(self, request: SubsumesRequest) -> SubsumesResponse:
         """Check subsumption via FHIR server."""
+        key = ("subsumes", request.system, request.codeA, request.codeB, request.version)
+        return self._cached(key, lambda: self._fetch_subsumes(request))
+
+    def _fetch_subsumes(self, request: SubsumesRequest) -> tuple[SubsumesResponse, bool]:
         params = {
             "codeA": request.codeA,
             "codeB": request.codeB,
@@ -387,16 +591,15 @@ class FHIRTerminologyService(TerminologyService):
         if request.version:
             params["version"] = request.version
 
-        query = "&".join(f"{k}={v}" for k, v in params.items())
-        path = f"/CodeSystem/$subsumes?{query}"
-
-        result = self._make_request("GET", path)
-        if result:
-            for param in result.get("parameter", []):
-                if param.get("name") == "outcome":
-                    return SubsumesResponse(outcome=param.get("valueCode", "not-subsumed"))
-
-        return SubsumesResponse(outcome="not-subsumed")
+        result = self._make_request("GET", f"/CodeSystem/$subsumes?{urlencode(params)}")
+        if result is None:
+            return SubsumesResponse(outcome="not-subsumed"), False
+        if result.get("resourceType") != "Parameters" and "outcome" in result:
+            return SubsumesResponse.model_validate(result), True
+        for param in result.get("parameter", []):
+            if param.get("name") == "outcome":
+                return SubsumesResponse(outcome=param.get("valueCode", "not-subsumed")), True
+        return SubsumesResponse(outcome="not-subsumed"), True
 
     def get_value_set(self, url: str, version: str | None = None) -> ValueSet | None:
         """Get value set from FHIR server."""
@@ -404,10 +607,7 @@ class FHIRTerminologyService(TerminologyService):
         if version:
             params["version"] = version
 
-        query = "&".join(f"{k}={v}" for k, v in params.items())
-        path = f"/ValueSet?{query}"
-
-        result = self._make_request("GET", path)
+        result = self._make_request("GET", f"/ValueSet?{urlencode(params)}")
         if result and result.get("entry"):
             entry = result["entry"][0]
             if "resource" in entry:
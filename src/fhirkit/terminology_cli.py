@@ -183,5 +183,63 @@ def list_valuesets(
     console.print(table)
 
 
+@app.command("import")
+def import_codesystem(
+    source: Path = typer.Argument(..., help="CodeSystem JSON or TSV file"),
+    output: Path = typer.Argument(..., help="Compact CodeSystem file to write (.fcs)"),
+    url: Optional[str] = typer.Option(None, "--url", "-u", help="CodeSystem URL (required for TSV)"),
+    version: Optional[str] = typer.Option(None, "--version", help="CodeSystem version"),
+    name: Optional[str] = typer.Option(None, "--name", "-n", help="CodeSystem name"),
+    file_format: Optional[str] = typer.Option(
+        None, "--format", "-f", help="Source format: json or tsv (default: from the file suffix)"
+    ),
+) -> None:
+    """Import a CodeSystem into a compact, memory-mapped file.
+
+    JSON sources are FHIR CodeSystem resources. TSV sources have a header row
+    with a 'code' column and optional 'display' and 'parent' columns.
+
+    Examples:
+        fhir terminology import snomed-codesystem.json ./terminology/snomed.fcs
+
+        fhir terminology import loinc.tsv ./terminology/loinc.fcs \\
+            --url http://loinc.org --version 2.77
+    """
+    import json
+
+    from .terminology.compact import concepts_from_tsv, write_compact_codesystem
+
+    file_format = (file_format or ("tsv" if source.suffix.lower() in (".tsv", ".txt") else "json")).lower()
+    if file_format == "json":
+        with open(source, encoding="utf-8") as f:
+            codesystem = json.load(f)
+        if codesystem.get("resourceType") != "CodeSystem":
+            console.print(f"[red]Error:[/red] {source} is not a CodeSystem")
+            raise typer.Exit(1)
+        concepts = codesystem.get("concept", [])
+        url = url or codesystem.get("url")
+        version = version or codesystem.get("version")
+        name = name or codesystem.get("name")
+        title = codesystem.get("title")
+    elif file_format == "tsv":
+        try:
+            concepts = concepts_from_tsv(source)
+        except ValueError as e:
+            console.print(f"[red]Error:[/red] {e}")
+            raise typer.Exit(1) from e
+        title = None
+    else:
+        console.print(f"[red]Error:[/red] unknown format '{file_format}', expected json or tsv")
+        raise typer.Exit(1)
+
+    if not url:
+        console.print("[red]Error:[/red] CodeSystem URL is required (--url)")
+        raise typer.Exit(1)
+
+    count = write_compact_codesystem(output, concepts, url, version=version, name=name, title=title)
+    size = output.stat().st_size
+    console.print(f"[green]✓ Imported[/green] {count} concepts of {url} into {output} ({size / 1e6:.1f} MB)")
+
+
 if __name__ == "__main__":
     app()
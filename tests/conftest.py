@@ -0,0 +1,34 @@
+"""Shared pytest configuration.
+
+Tests marked ``benchmark`` compare wall-clock timings. Timings on shared CI
+runners are too noisy to gate the suite on, so they are skipped unless
+``FHIRKIT_BENCHMARKS=1`` is set:
+
+    FHIRKIT_BENCHMARKS=1 pytest -m benchmark
+
+The key that signs compiled CQL libraries and store snapshots is kept in a
+temporary directory rather than the user's home.
+"""
+
+import os
+from collections.abc import Iterator
+
+import pytest
+
+from fhirkit.signing import KEY_FILE_ENV
+
+
+def pytest_collection_modifyitems(config: pytest.Config, items: list[pytest.Item]) -> None:
+    if os.environ.get("FHIRKIT_BENCHMARKS") == "1":
+        return
+    skip = pytest.mark.skip(reason="benchmark; set FHIRKIT_BENCHMARKS=1 to run")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _signing_key_file(tmp_path_factory: pytest.TempPathFactory) -> Iterator[None]:
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv(KEY_FILE_ENV, str(tmp_path_factory.mktemp("signing") / "signing.key"))
+        yield
@@ -1,15 +1,21 @@
 """Tests for FHIR server audit logging functionality."""
 
+import asyncio
+import json
 from unittest.mock import MagicMock
 
 import pytest
+from fastapi.testclient import TestClient
 
+from fhirkit.server.api.app import create_app
+from fhirkit.server.audit import AuditPipeline, NDJSONAuditSink, StoreAuditSink
 from fhirkit.server.audit.service import (
     REST_SUBTYPES,
     AuditAction,
     AuditOutcome,
     AuditService,
 )
+from fhirkit.server.config.settings import FHIRServerSettings
 from fhirkit.server.storage.fhir_store import FHIRStore
 
 
@@ -322,3 +328,109 @@ class TestAuditServiceIntegration:
 
         results, total = store.search("AuditEvent", {})
         assert total >= 4
+
+
+def _event(index: int) -> dict:
+    return {"resourceType": "AuditEvent", "id": f"ae-{index}", "action": "R", "outcome": "0"}
+
+
+class TestAuditPipeline:
+    """Tests for the batched audit pipeline and its sinks."""
+
+    def test_writes_immediately_when_not_running(self):
+        store = FHIRStore()
+        pipeline = AuditPipeline([StoreAuditSink(store)])
+        assert pipeline.submit(_event(1))
+        assert store.read("AuditEvent", "ae-1") is not None
+
+    def test_background_batches(self):
+        store = FHIRStore()
+        pipeline = AuditPipeline([StoreAuditSink(store)], batch_size=10, flush_interval=60)
+
+        async def run():
+            await pipeline.start()
+            for i in range(5):
+                pipeline.submit(_event(i))
+            # Below the batch size, events wait in the queue
+            await asyncio.sleep(0.01)
+            assert len(pipeline) == 5 and store.count("AuditEvent") == 0
+            for i in range(5, 25):
+                pipeline.submit(_event(i))
+            await asyncio.sleep(0.01)
+            assert store.count("AuditEvent") >= 20
+            await pipeline.stop()
+
+        asyncio.run(run())
+        assert store.count("AuditEvent") == 25
+        assert not pipeline.running
+
+    @pytest.mark.parametrize(
+        ("overflow", "kept", "dropped"),
+        [("drop-oldest", ["ae-2", "ae-3"], 2), ("drop-newest", ["ae-0", "ae-1"], 2), ("write", [], 0)],
+    )
+    def test_overflow(self, overflow, kept, dropped):
+        written: list[dict] = []
+        sink = MagicMock()
+        sink.write.side_effect = written.extend
+        pipeline = AuditPipeline([sink], max_queue=2, batch_size=100, flush_interval=60, overflow=overflow)
+
+        async def run():
+            await pipeline.start()
+            results = [pipeline.submit(_event(i)) for i in range(4)]
+            queued = [event["id"] for event in pipeline._queue]
+            await pipeline.stop()
+            return results, queued
+
+        results, queued = asyncio.run(run())
+        assert pipeline.dropped == dropped
+        assert results.count(False) == (dropped if overflow == "drop-newest" else 0)
+        if overflow == "write":
+            # The request that found the queue full wrote the queued batch itself
+            assert queued == ["ae-2", "ae-3"]
+        else:
+            assert queued == kept
+        assert len(written) == 4 - dropped
+
+    def test_unknown_overflow_policy(self):
+        with pytest.raises(ValueError):
+            AuditPipeline([], overflow="block")
+
+    def test_store_retention(self):
+        store = FHIRStore()
+        sink = StoreAuditSink(store, max_events=3)
+        sink.write([_event(i) for i in range(5)])
+        sink.write([_event(5)])
+        assert sorted(r["id"] for r in store.get_all_resources("AuditEvent")) == ["ae-3", "ae-4", "ae-5"]
+        assert store.history("AuditEvent", "ae-0") == []
+
+    def test_ndjson_rotation(self, tmp_path):
+        path = tmp_path / "audit" / "audit.ndjson"
+        sink = NDJSONAuditSink(path, max_bytes=200, backup_count=2)
+        for i in range(20):
+            sink.write([_event(i)])
+        sink.close()
+        files = sorted(p.name for p in path.parent.iterdir())
+        assert files == ["audit.ndjson", "audit.ndjson.1", "audit.ndjson.2"]
+        assert all(p.stat().st_size <= 200 for p in path.parent.iterdir())
+        last = [json.loads(line)["id"] for line in path.read_text().splitlines()]
+        assert last[-1] == "ae-19"
+
+    def test_server_audit_log(self, tmp_path):
+        store = FHIRStore()
+        log = tmp_path / "audit.ndjson"
+        settings = FHIRServerSettings(
+            patients=0,
+            enable_docs=False,
+            enable_ui=False,
+            api_base_path="",
+            enable_audit=True,
+            audit_exclude_reads=False,
+            audit_sink="both",
+            audit_log_path=str(log),
+        )
+        with TestClient(create_app(settings=settings, store=store)) as client:
+            client.post("/Patient", json={"resourceType": "Patient", "id": "p1"})
+            client.get("/Patient/p1")
+        # Stopping the server writes the queued events
+        assert [json.loads(line)["action"] for line in log.read_text().splitlines()] == ["C", "R"]
+        assert store.count("AuditEvent") == 2
@@ -0,0 +1,148 @@
+"""Tests for Bundle responses built from cached resource bytes."""
+
+import json
+from typing import Any
+
+import pytest
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from fhirkit.server.api.app import create_app
+from fhirkit.server.api.bundle_writer import STREAMING_THRESHOLD, BundleWriter
+from fhirkit.server.config.settings import FHIRServerSettings
+from fhirkit.server.models.responses import Bundle, BundleEntry, BundleEntryRequest, BundleLink
+from fhirkit.server.storage import fhir_store
+from fhirkit.server.storage.fhir_store import FHIRStore
+
+
+def _observations(count: int) -> list[dict[str, Any]]:
+    return [
+        {
+            "resourceType": "Observation",
+            "id": f"obs-{i}",
+            "status": "final",
+            "code": {"coding": [{"system": "http://loinc.org", "code": "2339-0", "display": "Glucose"}]},
+            "subject": {"reference": f"Patient/p{i % 10}"},
+            "effectiveDateTime": f"2024-01-{1 + i % 28:02d}T08:00:00Z",
+            "valueQuantity": {"value": 5 + i % 7, "unit": "mmol/L", "system": "http://unitsofmeasure.org"},
+            "note": [{"text": "Fasting – ünïcode"}],
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def store() -> FHIRStore:
+    store = FHIRStore()
+    store.bulk_load(_observations(1000))
+    return store
+
+
+def _pydantic_bundle(resources: list[dict[str, Any]], links: list[BundleLink]) -> bytes:
+    bundle = Bundle(
+        id="b1",
+        type="searchset",
+        total=len(resources),
+        link=links,
+        entry=[
+            BundleEntry(fullUrl=f"http://test/Observation/{r['id']}", resource=r, search={"mode": "match"})
+            for r in resources
+        ],
+    )
+    return JSONResponse(content=bundle.model_dump(exclude_none=True)).body
+
+
+class TestBundleWriter:
+    """Tests for BundleWriter."""
+
+    def test_same_bytes_as_pydantic_bundle(self, store: FHIRStore) -> None:
+        resources = store.get_all_resources("Observation")[:50]
+        links = [BundleLink(relation="self", url="http://test/Observation")]
+        writer = BundleWriter(store, "searchset", total=len(resources), links=links, bundle_id="b1")
+        for resource in resources:
+            writer.add(resource, full_url=f"http://test/Observation/{resource['id']}", search_mode="match")
+        assert writer.render() == _pydantic_bundle(resources, links)
+
+    def test_history_entries_and_empty_bundle(self, store: FHIRStore) -> None:
+        writer = BundleWriter(store, "history")
+        assert json.loads(writer.render())["entry"] == []
+        writer.add(store.read("Observation", "obs-1"), request=BundleEntryRequest(method="GET", url="Observation/1"))
+        bundle = json.loads(writer.render())
+        assert "total" not in bundle
+        assert bundle["entry"][0]["request"] == {"method": "GET", "url": "Observation/1"}
+
+    def test_chunks(self, store: FHIRStore) -> None:
+        writer = BundleWriter(store, "searchset")
+        for resource in store.get_all_resources("Observation"):
+            writer.add(resource)
+        chunks = list(writer.iter_bytes(chunk_size=4096))
+        assert len(chunks) > 10
+        assert len(json.loads(b"".join(chunks))["entry"]) == 1000
+        assert isinstance(writer.response(), StreamingResponse)
+
+    def test_serialization_cache_follows_writes(self, store: FHIRStore) -> None:
+        resource = store.read("Observation", "obs-1")
+        first = store.resource_json(resource)
+        assert store.resource_json(resource) is first
+
+        store.update("Observation", "obs-1", {**resource, "status": "amended"})
+        updated = store.read("Observation", "obs-1")
+        assert json.loads(store.resource_json(updated))["status"] == "amended"
+        # The previous version is not the current resource any more
+        assert json.loads(store.resource_json(resource))["status"] == "final"
+
+    def test_cached_resources_not_serialized_again(self, store: FHIRStore, monkeypatch: pytest.MonkeyPatch) -> None:
+        resources = store.get_all_resources("Observation")
+        links = [BundleLink(relation="self", url="http://test/Observation")]
+
+        def render() -> bytes:
+            writer = BundleWriter(store, "searchset", total=len(resources), links=links, bundle_id="b1")
+            for resource in resources:
+                writer.add(resource, full_url=f"http://test/Observation/{resource['id']}", search_mode="match")
+            return writer.render()
+
+        render()
+        encoded: list[Any] = []
+        encode_json = fhir_store.encode_json
+
+        def recording_encode_json(value: Any) -> bytes:
+            encoded.append(value)
+            return encode_json(value)
+
+        monkeypatch.setattr(fhir_store, "encode_json", recording_encode_json)
+        assert render() == _pydantic_bundle(resources, links)
+        # The bytes of the 1000 resources come from the store's cache
+        assert encoded == []
+
+
+class TestBundleRoutes:
+    """Tests for the routes returning Bundles."""
+
+    @pytest.fixture
+    def client(self, store: FHIRStore) -> TestClient:
+        settings = FHIRServerSettings(patients=0, enable_docs=False, enable_ui=False, api_base_path="")
+        return TestClient(create_app(settings=settings, store=store))
+
+    def test_large_search_is_streamed(self, client: TestClient) -> None:
+        response = client.get("/Observation", params={"_count": 1000})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/fhir+json"
+        assert "content-length" not in response.headers
+        bundle = response.json()
+        assert bundle["total"] == 1000
+        assert len(bundle["entry"]) == 1000 > STREAMING_THRESHOLD
+
+    def test_search_reflects_updates(self, client: TestClient) -> None:
+        client.get("/Observation", params={"_id": "obs-2"})
+        resource = client.get("/Observation/obs-2").json()
+        client.put("/Observation/obs-2", json={**resource, "status": "amended"})
+        entry = client.get("/Observation", params={"_id": "obs-2"}).json()["entry"][0]
+        assert entry["resource"]["status"] == "amended"
+        assert entry["search"] == {"mode": "match"}
+
+    def test_history(self, client: TestClient) -> None:
+        resource = client.get("/Observation/obs-3").json()
+        client.put("/Observation/obs-3", json={**resource, "status": "amended"})
+        bundle = client.get("/Observation/obs-3/_history").json()
+        assert bundle["type"] == "history"
+        assert [e["resource"]["status"] for e in bundle["entry"]] == ["amended", "final"]
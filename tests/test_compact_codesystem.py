@@ -0,0 +1,297 @@
+"""Tests for compact, memory-mapped CodeSystems and their terminology provider."""
+
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+from typer.testing import CliRunner
+
+from fhirkit.server.api.app import create_app
+from fhirkit.server.config.settings import FHIRServerSettings
+from fhirkit.server.storage.fhir_store import FHIRStore
+from fhirkit.server.terminology import CompactTerminologyProvider
+from fhirkit.terminology import HierarchyIndex
+from fhirkit.terminology.compact import (
+    CompactCodeSystem,
+    CompactCodeSystemError,
+    concepts_from_tsv,
+    write_compact_codesystem,
+)
+from fhirkit.terminology_cli import app as terminology_app
+
+SNOMED = "http://snomed.info/sct"
+
+# 73211009 diabetes mellitus
+#   46635009 type 1, 44054006 type 2
+#     313436004 type 2 with neuropathy, also below 230572002 diabetic neuropathy
+CONCEPTS: list[dict[str, Any]] = [
+    {
+        "code": "73211009",
+        "display": "Diabetes mellitus",
+        "concept": [
+            {"code": "46635009", "display": "Type 1 diabetes mellitus"},
+            {
+                "code": "44054006",
+                "display": "Type 2 diabetes mellitus",
+                "concept": [{"code": "313436004", "display": "Type 2 diabetes with neuropathy"}],
+            },
+        ],
+    },
+    {"code": "230572002", "display": "Diabetic neuropathy"},
+    {"code": "313436004", "property": [{"code": "parent", "valueCode": "230572002"}]},
+    {"code": "38341003", "display": "Hypertension – essential"},
+]
+
+
+@pytest.fixture
+def compact_path(tmp_path: Path) -> Path:
+    path = tmp_path / "snomed.fcs"
+    write_compact_codesystem(path, CONCEPTS, SNOMED, version="2024-09", name="SNOMEDCT")
+    return path
+
+
+@pytest.fixture
+def snomed(compact_path: Path) -> CompactCodeSystem:
+    code_system = CompactCodeSystem(compact_path)
+    yield code_system
+    code_system.close()
+
+
+class TestCompactCodeSystem:
+    """Tests for writing and reading compact files."""
+
+    def test_metadata(self, snomed: CompactCodeSystem) -> None:
+        assert (snomed.url, snomed.version, snomed.name) == (SNOMED, "2024-09", "SNOMEDCT")
+        assert len(snomed) == 6
+
+    def test_lookup(self, snomed: CompactCodeSystem) -> None:
+        assert "44054006" in snomed
+        assert "4405400" not in snomed
+        assert snomed.display("38341003") == "Hypertension – essential"
+        assert snomed.display("313436004") == "Type 2 diabetes with neuropathy"
+        assert snomed.display("unknown") is None
+        assert [code for code, _ in snomed.concepts()] == sorted(
+            ["73211009", "46635009", "44054006", "313436004", "230572002", "38341003"]
+        )
+        assert list(snomed.concepts(1, 3)) == [
+            ("313436004", "Type 2 diabetes with neuropathy"),
+            ("38341003", snomed.display("38341003")),
+        ]
+
+    def test_hierarchy(self, snomed: CompactCodeSystem) -> None:
+        assert sorted(snomed.parents("313436004")) == ["230572002", "44054006"]
+        assert sorted(snomed.children("73211009")) == ["44054006", "46635009"]
+        assert snomed.relationship("73211009", "313436004") == "subsumes"
+        assert snomed.relationship("313436004", "230572002") == "subsumed-by"
+        assert snomed.relationship("46635009", "44054006") == "not-subsumed"
+        assert snomed.relationship("unknown", "44054006") == "not-subsumed"
+        assert sorted(snomed.descendants("73211009")) == ["313436004", "44054006", "46635009"]
+        assert sorted(snomed.descendants("230572002", include_self=True)) == ["230572002", "313436004"]
+
+    def test_matches_hierarchy_index(self, tmp_path: Path) -> None:
+        # Every second concept has a second parent, so labels have several intervals
+        concepts = [{"code": "0"}]
+        for i in range(1, 300):
+            parents = [str((i - 1) // 3)] + ([str(i // 7)] if i % 2 else [])
+            concepts.append({"code": str(i), "property": [{"code": "parent", "valueCode": p} for p in parents]})
+        index = HierarchyIndex(concepts)
+        write_compact_codesystem(tmp_path / "poly.fcs", concepts, "http://example.org/poly")
+        with CompactCodeSystem(tmp_path / "poly.fcs") as compact:
+            for code in index:
+                assert sorted(compact.descendants(code)) == sorted(index.descendants(code))
+                assert all(compact.subsumes(code, other) == index.subsumes(code, other) for other in index)
+                assert compact.ancestors(code) == index.ancestors(code)
+            for op in ("is-a", "descendent-of", "is-not-a", "generalizes"):
+                assert sorted(compact.filter(op, "5")) == sorted(index.filter(op, "5"))
+
+    def test_not_a_compact_file(self, tmp_path: Path, compact_path: Path) -> None:
+        path = tmp_path / "other.fcs"
+        path.write_bytes(b"{}")
+        with pytest.raises(CompactCodeSystemError):
+            CompactCodeSystem(path)
+        path.write_bytes(b'{"resourceType": "CodeSystem"}')
+        with pytest.raises(CompactCodeSystemError, match="not a compact CodeSystem"):
+            CompactCodeSystem(path)
+        path.write_bytes(compact_path.read_bytes()[:200])
+        with pytest.raises(CompactCodeSystemError, match="corrupt"):
+            CompactCodeSystem(path)
+
+    def test_concepts_from_tsv(self, tmp_path: Path) -> None:
+        path = tmp_path / "codes.tsv"
+        path.write_text(
+            "code\tdisplay\tparent\nroot\tRoot\t\na\tA\troot\nb\tB\troot|a\nc\tC\ta\nc\t\tb\n",
+            encoding="utf-8",
+        )
+        concepts = concepts_from_tsv(path)
+        index = HierarchyIndex(concepts)
+        assert index.parents("b") == ["root", "a"]
+        assert index.parents("c") == ["a", "b"]
+        assert index.display("c") == "C"
+        path.write_text("id\tdisplay\n1\tOne\n", encoding="utf-8")
+        with pytest.raises(ValueError, match="code"):
+            concepts_from_tsv(path)
+
+
+class TestCompactTerminologyProvider:
+    """Tests for terminology operations on compact files."""
+
+    @pytest.fixture
+    def provider(self, compact_path: Path) -> CompactTerminologyProvider:
+        provider = CompactTerminologyProvider.from_directory(compact_path.parent)
+        yield provider
+        provider.close()
+
+    def test_lookup(self, provider: CompactTerminologyProvider) -> None:
+        result = provider.lookup_code(SNOMED, "313436004")
+        params = {p["name"]: p for p in result["parameter"] if p["name"] != "property"}
+        assert params["display"]["valueString"] == "Type 2 diabetes with neuropathy"
+        assert params["version"]["valueString"] == "2024-09"
+        parents = [p["part"][1]["valueCode"] for p in result["parameter"] if p["name"] == "property"]
+        assert sorted(parents) == ["230572002", "44054006"]
+        assert provider.lookup_code(SNOMED, "unknown") is None
+        assert provider.lookup_code(SNOMED, "44054006", version="2020-01") is None
+        assert provider.lookup_code("http://loinc.org", "1234-5") is None
+
+    def test_subsumes(self, provider: CompactTerminologyProvider) -> None:
+        assert provider.subsumes(SNOMED, "230572002", "313436004")["parameter"][0]["valueCode"] == "subsumes"
+        result = provider.subsumes("http://loinc.org", "a", "b")
+        assert result["parameter"][1]["valueString"] == "CodeSystem not found: http://loinc.org"
+
+    def test_validate_implicit_valuesets(self, provider: CompactTerminologyProvider) -> None:
+        result = provider.validate_code(valueset_url=f"{SNOMED}?fhir_vs", code="38341003", system=SNOMED)
+        assert result["parameter"][0]["valueBoolean"] is True
+        assert provider.member_of(f"{SNOMED}?fhir_vs=isa/44054006", "313436004", SNOMED)
+        assert provider.member_of(f"{SNOMED}?fhir_vs=isa/44054006", "44054006", SNOMED)
+        assert not provider.member_of(f"{SNOMED}?fhir_vs=isa/44054006", "46635009", SNOMED)
+        assert not provider.member_of(f"{SNOMED}?fhir_vs", "38341003", "http://loinc.org")
+        result = provider.validate_code(valueset_url=f"{SNOMED}?fhir_vs", coding={"system": SNOMED, "code": "46635009"})
+        assert result["parameter"][1]["valueString"] == "Type 1 diabetes mellitus"
+        result = provider.validate_code(valueset_url="http://example.org/fhir/ValueSet/other", code="1")
+        assert result["parameter"][1]["valueString"] == "ValueSet not found: http://example.org/fhir/ValueSet/other"
+
+    def test_expand_implicit_valuesets(self, provider: CompactTerminologyProvider) -> None:
+        expansion = provider.expand_valueset(url=f"{SNOMED}?fhir_vs", count=2, offset=1)["expansion"]
+        assert expansion["total"] == 6
+        assert [c["code"] for c in expansion["contains"]] == ["313436004", "38341003"]
+        expansion = provider.expand_valueset(url=f"{SNOMED}?fhir_vs=isa/73211009", filter_text="type 2")["expansion"]
+        assert expansion["total"] == 2
+        assert sorted(c["code"] for c in expansion["contains"]) == ["313436004", "44054006"]
+        assert provider.expand_valueset(url="http://example.org/fhir/ValueSet/other") is None
+
+    def test_fallback(self, compact_path: Path) -> None:
+        store = FHIRStore()
+        store.create(
+            {
+                "resourceType": "CodeSystem",
+                "url": "http://example.org/colors",
+                "status": "active",
+                "concept": [{"code": "red", "concept": [{"code": "crimson"}]}],
+            }
+        )
+        provider = CompactTerminologyProvider([CompactCodeSystem(compact_path)], fallback=store.terminology)
+        assert provider.subsumes("http://example.org/colors", "red", "crimson")["parameter"][0]["valueCode"] == (
+            "subsumes"
+        )
+        assert provider.lookup_code("http://example.org/colors", "crimson")["parameter"][2]["valueCode"] == "crimson"
+        provider.close()
+
+
+class TestCompactTerminologyRoutes:
+    """Tests for terminology operations of the server on compact files."""
+
+    def test_operations(self, compact_path: Path) -> None:
+        settings = FHIRServerSettings(
+            patients=0, enable_docs=False, enable_ui=False, api_base_path="", terminology_dir=str(compact_path.parent)
+        )
+        client = TestClient(create_app(settings=settings, store=FHIRStore()))
+        response = client.get("/CodeSystem/$lookup", params={"system": SNOMED, "code": "44054006"})
+        assert response.status_code == 200
+        assert response.json()["parameter"][1]["valueString"] == "Type 2 diabetes mellitus"
+        response = client.get(
+            "/CodeSystem/$subsumes", params={"system": SNOMED, "codeA": "44054006", "codeB": "313436004"}
+        )
+        assert response.json()["parameter"][0]["valueCode"] == "subsumes"
+        response = client.get(
+            "/ValueSet/$validate-code",
+            params={"url": f"{SNOMED}?fhir_vs=isa/73211009", "system": SNOMED, "code": "38341003"},
+        )
+        assert response.json()["parameter"][0]["valueBoolean"] is False
+        response = client.get("/ValueSet/$expand", params={"url": f"{SNOMED}?fhir_vs", "count": 3})
+        assert response.json()["expansion"]["total"] == 6
+
+    def test_store_terminology(self, compact_path: Path) -> None:
+        settings = FHIRServerSettings(
+            patients=0, enable_docs=False, enable_ui=False, api_base_path="", terminology_dir=str(compact_path.parent)
+        )
+        store = FHIRStore()
+        for i, code in enumerate(["313436004", "46635009", "38341003"]):
+            store.create(
+                {"resourceType": "Condition", "id": f"c{i}", "code": {"coding": [{"system": SNOMED, "code": code}]}}
+            )
+        store.create(
+            {
+                "resourceType": "ValueSet",
+                "url": "http://example.org/fhir/ValueSet/neuropathy",
+                "status": "active",
+                "compose": {
+                    "include": [
+                        {"system": SNOMED, "filter": [{"property": "concept", "op": "is-a", "value": "230572002"}]}
+                    ]
+                },
+            }
+        )
+        with TestClient(create_app(settings=settings, store=store)) as client:
+            response = client.get("/Condition", params={"code:below": f"{SNOMED}|44054006"})
+            assert [e["resource"]["id"] for e in response.json()["entry"]] == ["c0"]
+            response = client.get("/Condition", params={"code:above": "313436004"})
+            assert [e["resource"]["id"] for e in response.json()["entry"]] == ["c0"]
+            response = client.get("/Condition", params={"code:in": "http://example.org/fhir/ValueSet/neuropathy"})
+            assert [e["resource"]["id"] for e in response.json()["entry"]] == ["c0"]
+            response = client.get("/ValueSet/$expand", params={"url": "http://example.org/fhir/ValueSet/neuropathy"})
+            assert sorted(c["code"] for c in response.json()["expansion"]["contains"]) == ["230572002", "313436004"]
+            assert store.terminology.descendants(SNOMED, "73211009") == {"46635009", "44054006", "313436004"}
+        # The files are closed on shutdown, and the store no longer reads them
+        assert store.terminology.descendants(SNOMED, "73211009") == set()
+
+
+class TestImportCommand:
+    """Tests for the terminology import command."""
+
+    runner = CliRunner()
+
+    def test_import_json(self, tmp_path: Path) -> None:
+        source = tmp_path / "snomed.json"
+        source.write_text(
+            json.dumps({"resourceType": "CodeSystem", "url": SNOMED, "version": "2024-09", "concept": CONCEPTS})
+        )
+        output = tmp_path / "snomed.fcs"
+        result = self.runner.invoke(terminology_app, ["import", str(source), str(output)])
+        assert result.exit_code == 0, result.output
+        assert "6 concepts" in result.output
+        with CompactCodeSystem(output) as snomed:
+            assert (snomed.url, snomed.version) == (SNOMED, "2024-09")
+            assert snomed.subsumes("230572002", "313436004")
+
+    def test_import_tsv(self, tmp_path: Path) -> None:
+        source = tmp_path / "codes.tsv"
+        source.write_text("code\tdisplay\tparent\nroot\tRoot\t\na\tA\troot\n", encoding="utf-8")
+        output = tmp_path / "codes.fcs"
+        result = self.runner.invoke(terminology_app, ["import", str(source), str(output)])
+        assert result.exit_code == 1
+        assert "--url" in result.output
+        result = self.runner.invoke(
+            terminology_app, ["import", str(source), str(output), "--url", "http://example.org"]
+        )
+        assert result.exit_code == 0, result.output
+        with CompactCodeSystem(output) as codes:
+            assert codes.display("a") == "A"
+            assert codes.parents("a") == ["root"]
+
+    def test_import_not_a_codesystem(self, tmp_path: Path) -> None:
+        source = tmp_path / "valueset.json"
+        source.write_text(json.dumps({"resourceType": "ValueSet"}))
+        result = self.runner.invoke(terminology_app, ["import", str(source), str(tmp_path / "out.fcs")])
+        assert result.exit_code == 1
+        assert "not a CodeSystem" in result.output
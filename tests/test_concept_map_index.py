@@ -0,0 +1,204 @@
+"""Tests for indexed ConceptMap translation and batch $translate."""
+
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from fhirkit.server.api.app import create_app
+from fhirkit.server.config.settings import FHIRServerSettings
+from fhirkit.server.operations import ConceptMapTranslator, translate
+from fhirkit.server.operations.translate import ConceptMapIndex
+from fhirkit.server.storage.fhir_store import FHIRStore
+
+LOCAL = "http://example.org/fhir/CodeSystem/local-lab"
+LOINC = "http://loinc.org"
+
+
+def _concept_map(map_id: str, elements: dict[str, list[tuple[str, str]]], **extra: Any) -> dict[str, Any]:
+    return {
+        "resourceType": "ConceptMap",
+        "id": map_id,
+        "url": f"http://example.org/fhir/ConceptMap/{map_id}",
+        "status": "active",
+        "sourceUri": LOCAL,
+        "targetUri": LOINC,
+        "group": [
+            {
+                "source": LOCAL,
+                "target": LOINC,
+                "element": [
+                    {
+                        "code": code,
+                        "display": f"Local {code}",
+                        "target": [{"code": t, "equivalence": equivalence} for t, equivalence in targets],
+                    }
+                    for code, targets in elements.items()
+                ],
+            }
+        ],
+        **extra,
+    }
+
+
+def _matches(result: dict[str, Any]) -> list[tuple[str, str]]:
+    found = []
+    for param in result["parameter"]:
+        if param["name"] == "match":
+            parts = {p["name"]: p for p in param["part"]}
+            found.append((parts["concept"]["valueCoding"]["code"], parts["equivalence"]["valueCode"]))
+    return found
+
+
+@pytest.fixture
+def store() -> FHIRStore:
+    store = FHIRStore()
+    store.create(
+        _concept_map(
+            "glucose",
+            {"GLU": [("2345-7", "equivalent")], "GLU-POC": [("2345-7", "wider"), ("41653-7", "equivalent")]},
+        )
+    )
+    store.create(_concept_map("sodium", {"NA": [("2951-2", "equivalent")]}))
+    return store
+
+
+class TestConceptMapIndex:
+    """Tests for the per-ConceptMap translation index."""
+
+    def test_forward_and_reverse(self, store: FHIRStore) -> None:
+        index = ConceptMapIndex(store.read("ConceptMap", "glucose"))
+        assert [(s, m["concept"]["code"]) for s, m in index.translations(LOCAL, "GLU-POC")] == [
+            (LOINC, "2345-7"),
+            (LOINC, "41653-7"),
+        ]
+        assert sorted(m["concept"]["code"] for _, m in index.translations(LOINC, "2345-7", reverse=True)) == [
+            "GLU",
+            "GLU-POC",
+        ]
+        assert index.translations(LOCAL, "NA") == []
+
+    def test_applies(self, store: FHIRStore) -> None:
+        index = ConceptMapIndex(store.read("ConceptMap", "glucose"))
+        assert index.applies(LOCAL, LOINC)
+        assert not index.applies(LOINC, None)
+        assert index.applies(LOINC, LOCAL, reverse=True)
+
+
+class TestConceptMapTranslator:
+    """Tests for translation with indexed ConceptMaps."""
+
+    def test_translate(self, store: FHIRStore) -> None:
+        translator = ConceptMapTranslator(store)
+        assert _matches(translator.translate("GLU-POC", LOCAL)) == [("2345-7", "wider"), ("41653-7", "equivalent")]
+        assert _matches(translator.translate("NA", LOCAL, target=LOINC)) == [("2951-2", "equivalent")]
+        assert _matches(translator.translate("GLU", LOCAL, target="http://snomed.info/sct")) == []
+
+    def test_reverse(self, store: FHIRStore) -> None:
+        translator = ConceptMapTranslator(store)
+        result = translator.translate("2345-7", LOINC, reverse=True)
+        assert sorted(code for code, _ in _matches(result)) == ["GLU", "GLU-POC"]
+
+    def test_indexes_follow_writes(self, store: FHIRStore) -> None:
+        translator = ConceptMapTranslator(store)
+        translator.translate("NA", LOCAL)
+        glucose = translator._indexes["glucose"]
+        store.update("ConceptMap", "sodium", _concept_map("sodium", {"NA": [("2947-0", "equivalent")]}))
+        assert _matches(translator.translate("NA", LOCAL)) == [("2947-0", "equivalent")]
+        # Only the written ConceptMap is indexed again
+        assert translator._indexes["glucose"] is glucose
+        store.delete("ConceptMap", "sodium")
+        assert _matches(translator.translate("NA", LOCAL)) == []
+
+    def test_more_maps_than_a_search_page(self) -> None:
+        store = FHIRStore()
+        for i in range(150):
+            store.create(_concept_map(f"map-{i}", {f"C{i}": [(f"L{i}", "equivalent")]}))
+        translator = ConceptMapTranslator(store)
+        assert _matches(translator.translate("C149", LOCAL)) == [("L149", "equivalent")]
+
+    def test_translate_batch(self, store: FHIRStore) -> None:
+        translator = ConceptMapTranslator(store)
+        result = translator.translate_batch(
+            [
+                {"system": LOCAL, "code": "GLU"},
+                {"system": LOCAL, "code": "XX"},
+                {"code": "NA"},
+                {"system": LOCAL, "code": "NA"},
+            ]
+        )
+        translations = [{p["name"]: p for p in t["part"] if p["name"] != "match"} for t in result["parameter"]]
+        assert [t["coding"]["valueCoding"].get("code") for t in translations] == ["GLU", "XX", "NA", "NA"]
+        assert [t["result"]["valueBoolean"] for t in translations] == [True, False, False, True]
+        assert translations[2]["message"]["valueString"] == "Both code and system are required"
+        matches = [_matches({"parameter": t["part"]}) for t in result["parameter"]]
+        assert matches[3] == [("2951-2", "equivalent")]
+
+    def test_map_indexed_once_per_batch(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        elements = {f"LAB{i}": [(f"{i}-0", "equivalent")] for i in range(20000)}
+        store = FHIRStore()
+        store.create(_concept_map("lab", elements))
+        translator = ConceptMapTranslator(store)
+        codings = [{"system": LOCAL, "code": f"LAB{i * 7 % 20000}"} for i in range(2000)]
+        indexed: list[dict[str, Any]] = []
+
+        class CountingIndex(ConceptMapIndex):
+            def __init__(self, concept_map: dict[str, Any]) -> None:
+                indexed.append(concept_map)
+                super().__init__(concept_map)
+
+        monkeypatch.setattr(translate, "ConceptMapIndex", CountingIndex)
+        result = translator.translate_batch(codings)
+        # One index for 2000 codes, instead of a walk over the 20000 elements per code
+        assert len(indexed) == 1
+        assert [[code for code, _ in _matches({"parameter": t["part"]})] for t in result["parameter"]] == [
+            [f"{i * 7 % 20000}-0"] for i in range(2000)
+        ]
+        translator.translate_batch(codings)
+        assert len(indexed) == 1
+
+
+class TestTranslateRoutes:
+    """Tests for single and batch $translate through the REST API."""
+
+    @pytest.fixture
+    def client(self, store: FHIRStore) -> TestClient:
+        settings = FHIRServerSettings(patients=0, enable_docs=False, enable_ui=False, api_base_path="")
+        return TestClient(create_app(settings=settings, store=store))
+
+    def test_batch(self, client: TestClient) -> None:
+        body = {
+            "resourceType": "Parameters",
+            "parameter": [
+                {"name": "coding", "valueCoding": {"system": LOCAL, "code": "GLU"}},
+                {"name": "coding", "valueCoding": {"system": LOCAL, "code": "NA"}},
+                {"name": "target", "valueUri": LOINC},
+            ],
+        }
+        response = client.post("/ConceptMap/$translate", json=body)
+        assert response.status_code == 200
+        translations = response.json()["parameter"]
+        assert [t["name"] for t in translations] == ["translation", "translation"]
+        assert [_matches({"parameter": t["part"]}) for t in translations] == [
+            [("2345-7", "equivalent")],
+            [("2951-2", "equivalent")],
+        ]
+        response = client.post("/ConceptMap/glucose/$translate", json=body)
+        assert [_matches({"parameter": t["part"]}) for t in response.json()["parameter"]] == [
+            [("2345-7", "equivalent")],
+            [],
+        ]
+
+    def test_single_coding(self, client: TestClient) -> None:
+        body = {
+            "resourceType": "Parameters",
+            "parameter": [{"name": "coding", "valueCoding": {"system": LOCAL, "code": "GLU-POC"}}],
+        }
+        response = client.post("/ConceptMap/$translate", json=body)
+        assert _matches(response.json()) == [("2345-7", "wider"), ("41653-7", "equivalent")]
+
+    def test_follows_writes(self, client: TestClient) -> None:
+        params = {"system": LOCAL, "code": "NA"}
+        assert _matches(client.get("/ConceptMap/$translate", params=params).json()) == [("2951-2", "equivalent")]
+        client.put("/ConceptMap/sodium", json=_concept_map("sodium", {"NA": [("2947-0", "equivalent")]}))
+        assert _matches(client.get("/ConceptMap/$translate", params=params).json()) == [("2947-0", "equivalent")]
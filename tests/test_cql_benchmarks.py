@@ -0,0 +1,128 @@
+"""Benchmarks for CQL evaluation.
+
+Evaluates a measure-style library over a synthetic patient population with
+and without compiled execution plans. The timing comparison only runs with
+``FHIRKIT_BENCHMARKS=1``. The population is kept small by default so the suite
+stays fast; set ``FHIRKIT_BENCH_PATIENTS`` (e.g. to 10000) for a full-size run:
+
+    FHIRKIT_BENCHMARKS=1 FHIRKIT_BENCH_PATIENTS=10000 pytest tests/test_cql_benchmarks.py
+"""
+
+import os
+import time
+from typing import Any
+
+import pytest
+
+from fhirkit.engine.cql import CQLEvaluator, InMemoryDataSource
+
+PATIENT_COUNT = int(os.environ.get("FHIRKIT_BENCH_PATIENTS", "200"))
+
+MEASURE_LIBRARY = """
+library BenchmarkMeasure version '1.0'
+
+using FHIR version '4.0.1'
+
+codesystem "SNOMED": 'http://snomed.info/sct'
+code "Diabetes": '44054006' from "SNOMED"
+
+parameter "Measurement Period" Interval<DateTime>
+  default Interval[@2024-01-01T00:00:00.0, @2024-12-31T23:59:59.999]
+
+context Patient
+
+define function Score(age Integer, conditions Integer):
+  if age >= 65 then conditions * 2 + 10
+  else if age >= 40 then conditions * 2 + 5
+  else conditions * 2
+
+define "Age": AgeInYears()
+
+define "Condition Count": Count([Condition])
+
+define "Has Diabetes":
+  exists ([Condition] C where C.code.coding[0].code = '44054006')
+
+define "Initial Population":
+  "Age" >= 18 and "Age" < 85
+
+define "Denominator":
+  "Initial Population" and "Has Diabetes"
+
+define "Numerator":
+  "Denominator" and "Condition Count" > 1
+
+define "Risk Score":
+  Score("Age", "Condition Count") + (if "Has Diabetes" then 3 else 0) * 2 - 1
+
+define "Risk Band":
+  if "Risk Score" > 15 then 'high'
+  else if "Risk Score" > 5 then 'medium'
+  else 'low'
+"""
+
+DEFINITIONS = ["Initial Population", "Denominator", "Numerator", "Risk Score", "Risk Band"]
+
+
+def _population(count: int) -> tuple[list[dict[str, Any]], InMemoryDataSource]:
+    data_source = InMemoryDataSource()
+    patients = []
+    for i in range(count):
+        patient = {
+            "resourceType": "Patient",
+            "id": f"patient-{i}",
+            "gender": "female" if i % 2 else "male",
+            "birthDate": f"{1940 + i % 70}-{1 + i % 12:02d}-15",
+        }
+        patients.append(patient)
+        data_source.add_resource(patient)
+        for j in range(i % 4):
+            data_source.add_resource(
+                {
+                    "resourceType": "Condition",
+                    "id": f"condition-{i}-{j}",
+                    "subject": {"reference": f"Patient/patient-{i}"},
+                    "code": {
+                        "coding": [
+                            {
+                                "system": "http://snomed.info/sct",
+                                "code": "44054006" if j == 0 and i % 3 == 0 else "38341003",
+                            }
+                        ]
+                    },
+                }
+            )
+    return patients, data_source
+
+
+def _run(compile_plans: bool, patients: list[dict[str, Any]], data_source: InMemoryDataSource) -> tuple[float, list]:
+    evaluator = CQLEvaluator(data_source=data_source, compile_plans=compile_plans)
+    evaluator.compile(MEASURE_LIBRARY)
+    start = time.perf_counter()
+    results = [[evaluator.evaluate_definition(name, resource=patient) for name in DEFINITIONS] for patient in patients]
+    return time.perf_counter() - start, results
+
+
+@pytest.fixture(scope="module")
+def population() -> tuple[list[dict[str, Any]], InMemoryDataSource]:
+    return _population(PATIENT_COUNT)
+
+
+class TestMeasureBenchmark:
+    """Compiled plans against the visitor over a patient population."""
+
+    def test_plans_match_interpreter(self, population: tuple[list[dict[str, Any]], InMemoryDataSource]) -> None:
+        patients, data_source = population
+        _, compiled = _run(True, patients, data_source)
+        _, interpreted = _run(False, patients, data_source)
+        assert compiled == interpreted
+        assert any(row[2] for row in compiled)
+
+    @pytest.mark.benchmark
+    def test_plans_are_not_slower(self, population: tuple[list[dict[str, Any]], InMemoryDataSource]) -> None:
+        patients, data_source = population
+        # Warm up caches (unit tables, function registry) before timing
+        _run(True, patients[:10], data_source)
+        compiled_time, _ = _run(True, patients, data_source)
+        interpreted_time, _ = _run(False, patients, data_source)
+        assert compiled_time < interpreted_time * 1.5
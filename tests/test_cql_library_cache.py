@@ -0,0 +1,235 @@
+"""Tests for the compiled CQL library cache."""
+
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from fhirkit.engine.cql import (
+    CompiledLibraryCache,
+    CQLEvaluator,
+    InMemoryLibraryResolver,
+    get_library_cache,
+    library_cache,
+    library_cache_key,
+    set_library_cache,
+)
+from fhirkit.engine.cql.library_cache import dump_library, load_library
+from fhirkit.engine.cql.plan import get_plan
+from fhirkit.server.api.app import create_app
+from fhirkit.server.config.settings import FHIRServerSettings
+from fhirkit.server.storage.fhir_store import FHIRStore
+from fhirkit.signing import DIGEST_SIZE
+
+SOURCE = """
+library CacheTest version '1.0'
+
+codesystem "LOINC": 'http://loinc.org'
+code "Glucose": '2339-0' from "LOINC"
+
+parameter Threshold Integer default 3
+
+define function Double(x Integer): x * 2
+
+define Sum: 1 + 2
+define Doubled: Double(Sum)
+define Filtered: ({1, 2, 3, 4}) X where X > Threshold
+define GlucoseCode: "Glucose"
+"""
+
+HELPER_SOURCE = """
+library CacheHelper version '1.0'
+
+define Ten: 10
+"""
+
+MAIN_SOURCE = """
+library CacheMain version '1.0'
+
+include CacheHelper version '1.0' called Helper
+
+define Result: Helper.Ten + 1
+"""
+
+
+@pytest.fixture(autouse=True)
+def restore_library_cache():
+    """Restore the process-wide cache replaced by server tests."""
+    cache = get_library_cache()
+    yield
+    set_library_cache(cache)
+
+
+def _forbid_parsing(monkeypatch: pytest.MonkeyPatch) -> None:
+    def fail(self: CQLEvaluator, source: str) -> None:
+        raise AssertionError("library was parsed")
+
+    monkeypatch.setattr(CQLEvaluator, "_parse_library", fail)
+
+
+class TestLibraryCacheKey:
+    """Tests for library_cache_key."""
+
+    def test_key_is_stable(self) -> None:
+        assert library_cache_key(SOURCE) == library_cache_key(SOURCE)
+        assert len(library_cache_key(SOURCE)) == 64
+
+    def test_key_depends_on_source_and_options(self) -> None:
+        assert library_cache_key(SOURCE) != library_cache_key(SOURCE + " ")
+        assert library_cache_key(SOURCE, compile_plans=True) != library_cache_key(SOURCE, compile_plans=False)
+
+
+class TestCompiledLibraryCache:
+    """Tests for the in-memory layer."""
+
+    def test_lru_eviction(self) -> None:
+        cache = CompiledLibraryCache(max_size=2)
+        libraries = [CQLEvaluator(library_cache=cache).compile(f"library L{i}\ndefine X: {i}") for i in range(3)]
+        assert len(cache) == 2
+        assert library_cache_key("library L0\ndefine X: 0") not in cache
+        assert cache.get(library_cache_key("library L2\ndefine X: 2")) is libraries[2]
+
+    def test_get_refreshes_recency(self) -> None:
+        cache = CompiledLibraryCache(max_size=2)
+        evaluator = CQLEvaluator(library_cache=cache)
+        evaluator.compile("library A\ndefine X: 1")
+        evaluator.compile("library B\ndefine X: 2")
+        cache.get(library_cache_key("library A\ndefine X: 1"))
+        evaluator.compile("library C\ndefine X: 3")
+        assert library_cache_key("library A\ndefine X: 1") in cache
+        assert library_cache_key("library B\ndefine X: 2") not in cache
+
+    def test_zero_size_disables_cache(self) -> None:
+        cache = CompiledLibraryCache(max_size=0)
+        first = CQLEvaluator(library_cache=cache).compile(SOURCE)
+        second = CQLEvaluator(library_cache=cache).compile(SOURCE)
+        assert first is not second
+        assert len(cache) == 0
+
+    def test_compile_errors_are_not_cached(self) -> None:
+        cache = CompiledLibraryCache()
+        with pytest.raises(Exception):
+            CQLEvaluator(library_cache=cache).compile("library Broken define X: (")
+        assert len(cache) == 0
+
+
+class TestEvaluatorCaching:
+    """CQLEvaluator reuses cached compilations."""
+
+    def test_repeat_compile_skips_parsing(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        cache = CompiledLibraryCache()
+        library = CQLEvaluator(library_cache=cache).compile(SOURCE)
+
+        _forbid_parsing(monkeypatch)
+        evaluator = CQLEvaluator(library_cache=cache)
+        assert evaluator.compile(SOURCE) is library
+        assert evaluator.current_library is library
+        assert evaluator.evaluate_definition("Doubled") == 6
+        assert evaluator.evaluate_definition("Filtered", parameters={"Threshold": 1}) == [2, 3, 4]
+        assert cache.hits == 1
+
+    def test_plan_setting_is_part_of_key(self) -> None:
+        cache = CompiledLibraryCache()
+        compiled = CQLEvaluator(library_cache=cache).compile(SOURCE)
+        interpreted = CQLEvaluator(library_cache=cache, compile_plans=False).compile(SOURCE)
+        assert compiled is not interpreted
+        assert interpreted.get_definition("Sum").plan is None
+
+    def test_included_libraries_are_cached(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        cache = CompiledLibraryCache()
+        resolver = InMemoryLibraryResolver()
+        resolver.add_library("CacheHelper", HELPER_SOURCE, "1.0")
+
+        evaluator = CQLEvaluator(library_resolver=resolver, library_cache=cache)
+        evaluator.compile(MAIN_SOURCE)
+        assert evaluator.evaluate_definition("Result") == 11
+        assert len(cache) == 2
+
+        _forbid_parsing(monkeypatch)
+        evaluator = CQLEvaluator(library_resolver=resolver, library_cache=cache)
+        evaluator.compile(MAIN_SOURCE)
+        assert evaluator.evaluate_definition("Result") == 11
+
+
+class TestDiskCache:
+    """Tests for the on-disk layer."""
+
+    def test_serialization_round_trip(self) -> None:
+        library = CQLEvaluator(library_cache=CompiledLibraryCache(max_size=0)).compile(SOURCE)
+        restored = load_library(dump_library(library))
+        assert restored.name == "CacheTest"
+        assert restored.get_definition("Sum").plan is None
+        assert restored.get_definition("Sum").expression_tree.getText() == "1+2"
+        # The original library keeps its plans
+        assert library.get_definition("Sum").plan is not None
+
+    def test_new_process_loads_from_disk(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        CQLEvaluator(library_cache=CompiledLibraryCache(directory=tmp_path)).compile(SOURCE)
+        assert list(tmp_path.glob("*.pickle"))
+
+        # A fresh cache simulates a new process sharing the directory
+        _forbid_parsing(monkeypatch)
+        cache = CompiledLibraryCache(directory=tmp_path)
+        evaluator = CQLEvaluator(library_cache=cache)
+        library = evaluator.compile(SOURCE)
+        assert get_plan(library.get_definition("Sum").expression_tree) is not None
+        assert evaluator.evaluate_definition("Doubled") == 6
+        assert evaluator.evaluate_definition("Filtered") == [4]
+        assert evaluator.evaluate_definition("GlucoseCode").code == "2339-0"
+
+    def test_corrupt_entry_is_recompiled(self, tmp_path: Path) -> None:
+        key = library_cache_key(SOURCE)
+        (tmp_path / f"{key}.pickle").write_bytes(b"not a pickle")
+        cache = CompiledLibraryCache(directory=tmp_path)
+        evaluator = CQLEvaluator(library_cache=cache)
+        evaluator.compile(SOURCE)
+        assert evaluator.evaluate_definition("Sum") == 3
+        assert cache.misses == 1
+        assert load_library((tmp_path / f"{key}.pickle").read_bytes()[DIGEST_SIZE:]).name == "CacheTest"
+
+    def test_unsigned_entry_is_not_loaded(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        library = CQLEvaluator(library_cache=CompiledLibraryCache(max_size=0)).compile(SOURCE)
+        key = library_cache_key(SOURCE)
+        path = tmp_path / f"{key}.pickle"
+        path.write_bytes(bytes(DIGEST_SIZE) + dump_library(library))
+
+        def unpickle(data: bytes) -> None:
+            raise AssertionError("Unsigned entry unpickled")
+
+        monkeypatch.setattr(library_cache, "load_library", unpickle)
+        cache = CompiledLibraryCache(directory=tmp_path)
+        assert cache.get(key) is None
+        assert not path.exists()
+
+    def test_clear_disk(self, tmp_path: Path) -> None:
+        cache = CompiledLibraryCache(directory=tmp_path)
+        CQLEvaluator(library_cache=cache).compile(SOURCE)
+        cache.clear(disk=True)
+        assert len(cache) == 0
+        assert not list(tmp_path.glob("*.pickle"))
+
+
+class TestServerCaching:
+    """The server configures the process-wide cache from its settings."""
+
+    def test_settings_configure_cache(self, tmp_path: Path) -> None:
+        settings = FHIRServerSettings(
+            enable_docs=False,
+            enable_ui=False,
+            api_base_path="",
+            cql_library_cache_size=8,
+            cql_library_cache_dir=str(tmp_path),
+        )
+        create_app(settings=settings, store=FHIRStore())
+        assert get_library_cache().directory == tmp_path
+
+    def test_repeat_cql_requests_skip_parsing(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        settings = FHIRServerSettings(enable_docs=False, enable_ui=False, api_base_path="")
+        client = TestClient(create_app(settings=settings, store=FHIRStore()))
+
+        response = client.post("/$cql", json={"code": SOURCE, "definitions": ["Doubled"]})
+        assert response.json()["results"]["Doubled"] == 6
+
+        _forbid_parsing(monkeypatch)
+        response = client.post("/$cql", json={"code": SOURCE, "definitions": ["Doubled"]})
+        assert response.json()["results"]["Doubled"] == 6
@@ -0,0 +1,147 @@
+"""Tests for CQL execution plans."""
+
+from decimal import Decimal
+
+import pytest
+
+from fhirkit.engine.cql import CQLEvaluator
+from fhirkit.engine.cql.plan import PlanCompiler, get_plan
+from fhirkit.engine.cql.plugins import CQLPluginRegistry
+
+LIBRARY = """
+library PlanTest version '1.0'
+
+codesystem "LOINC": 'http://loinc.org'
+code "Glucose": '2339-0' from "LOINC" display 'Glucose'
+
+parameter Threshold Integer default 10
+
+define function Double(x Integer): x * 2
+define function Double(x Decimal): x * 2.0
+define function Label(x Integer): 'Value ' + ToString(x)
+
+define Arithmetic: 1 + 2 * 3 - 4 div 2
+define Negative: -2147483648
+define NegativeDecimal: -1.5
+define Comparison: 5 > 3 and 2 <= 2
+define Logic: (true or null) and not false
+define ThreeValued: null and false
+define IsNullTest: null is null
+define Membership: 3 in {1, 2, 3}
+define IntervalTest: 5 in Interval[1, 10)
+define ListValue: {1, 2, 3}
+define TupleValue: Tuple { a: 1, b: 'x' }
+define IfTest: if Threshold > 5 then 'high' else 'low'
+define Reference: Arithmetic + 1
+define UserFunction: Double(21)
+define UserFunctionDecimal: Double(1.5)
+define Fluent: Label(Double(2))
+define Builtin: Length('hello') + Abs(-3)
+define CodeRef: "Glucose".code
+define Quantity: 5 'mg' + 3 'mg'
+define Today: Today() = Today()
+define Exists: exists ({1})
+define Query: ({1, 2, 3}) X where X > Threshold / 5 return X * 10
+"""
+
+
+@pytest.fixture
+def evaluator() -> CQLEvaluator:
+    evaluator = CQLEvaluator()
+    evaluator.compile(LIBRARY)
+    return evaluator
+
+
+class TestPlanCompilation:
+    """Plans are attached to library definitions at compile time."""
+
+    def test_definitions_have_plans(self, evaluator: CQLEvaluator) -> None:
+        library = evaluator.current_library
+        assert library is not None
+        for name in ("Arithmetic", "Comparison", "UserFunction", "Query"):
+            assert library.get_definition(name).plan is not None
+        assert get_plan(library.get_definition("Arithmetic").expression_tree) is not None
+
+    def test_unlowered_nodes_fall_back_to_visitor(self, evaluator: CQLEvaluator) -> None:
+        # Queries run through the visitor, but their sub-expressions have plans
+        tree = evaluator.current_library.get_definition("Query").expression_tree
+        assert get_plan(tree) is None
+        assert get_plan(tree.query().whereClause().expression()) is not None
+
+    def test_function_overloads_have_plans(self, evaluator: CQLEvaluator) -> None:
+        library = evaluator.current_library
+        assert all(function.plan is not None for function in library.functions["Double"])
+
+    def test_plans_can_be_disabled(self) -> None:
+        evaluator = CQLEvaluator(compile_plans=False)
+        library = evaluator.compile(LIBRARY)
+        assert library.get_definition("Arithmetic").plan is None
+        assert evaluator.evaluate_definition("Arithmetic") == 5
+
+    def test_ad_hoc_expressions_are_compiled(self) -> None:
+        evaluator = CQLEvaluator()
+        assert evaluator.evaluate_expression("1 + 1") == 2
+        tree = evaluator._parse_expression("1 + 1")
+        assert get_plan(tree) is not None
+
+    def test_compiler_without_library(self) -> None:
+        evaluator = CQLEvaluator(compile_plans=False)
+        tree = evaluator._parse_expression("Length('abc') * 2")
+        PlanCompiler().compile(tree)
+        assert get_plan(tree) is not None
+        assert evaluator.evaluate_expression("Length('abc') * 2") == 6
+
+
+class TestPlanResults:
+    """Plans produce the same results as the visitor."""
+
+    @pytest.mark.parametrize(
+        "name",
+        [
+            "Arithmetic",
+            "Negative",
+            "NegativeDecimal",
+            "Comparison",
+            "Logic",
+            "ThreeValued",
+            "IsNullTest",
+            "Membership",
+            "IntervalTest",
+            "ListValue",
+            "TupleValue",
+            "IfTest",
+            "Reference",
+            "UserFunction",
+            "UserFunctionDecimal",
+            "Fluent",
+            "Builtin",
+            "CodeRef",
+            "Quantity",
+            "Today",
+            "Exists",
+            "Query",
+        ],
+    )
+    def test_matches_interpreter(self, evaluator: CQLEvaluator, name: str) -> None:
+        interpreter = CQLEvaluator(compile_plans=False)
+        interpreter.compile(LIBRARY)
+        assert evaluator.evaluate_definition(name) == interpreter.evaluate_definition(name)
+
+    def test_literal_values(self, evaluator: CQLEvaluator) -> None:
+        assert evaluator.evaluate_definition("Negative") == -2147483648
+        assert evaluator.evaluate_definition("NegativeDecimal") == Decimal("-1.5")
+        assert evaluator.evaluate_definition("ThreeValued") is False
+        assert evaluator.evaluate_definition("UserFunction") == 42
+        assert evaluator.evaluate_definition("Fluent") == "Value 4"
+
+    def test_parameters_stay_dynamic(self, evaluator: CQLEvaluator) -> None:
+        assert evaluator.evaluate_definition("IfTest") == "high"
+        assert evaluator.evaluate_definition("IfTest", parameters={"Threshold": 1}) == "low"
+        assert evaluator.evaluate_definition("Query", parameters={"Threshold": 5}) == [20, 30]
+
+    def test_plugins_override_builtins(self) -> None:
+        registry = CQLPluginRegistry()
+        registry.register("Length", lambda value: -1)
+        evaluator = CQLEvaluator(plugin_registry=registry)
+        evaluator.compile(LIBRARY)
+        assert evaluator.evaluate_definition("Builtin") == 2
@@ -0,0 +1,221 @@
+"""Tests for retrieve caching and data-requirements prefetching."""
+
+from typing import Any
+
+from fhirkit.engine.cql import CQLEvaluator, InMemoryDataSource, MeasureEvaluator
+from fhirkit.engine.cql.data_requirements import collect_retrieve_requests
+from fhirkit.engine.cql.datasource import RetrieveRequest
+from fhirkit.engine.cql.types import CQLCode
+
+LIBRARY = """
+library RetrieveCache version '1.0'
+
+using FHIR version '4.0.1'
+
+codesystem "SNOMED": 'http://snomed.info/sct'
+valueset "Diabetes VS": 'http://example.org/vs/diabetes'
+code "Diabetes": '44054006' from "SNOMED"
+
+context Patient
+
+define "Conditions": [Condition]
+define "Diabetes Conditions": [Condition: "Diabetes"]
+define "Diabetes By ValueSet": [Condition: "Diabetes VS"]
+define "Condition Count": Count([Condition])
+define "Has Diabetes": exists "Diabetes Conditions"
+define "Initial Population": exists [Condition]
+define "Denominator": "Initial Population" and exists ([Condition] C where C.id is not null)
+define "Numerator": "Has Diabetes"
+define "Observations": [Observation]
+define "Dynamic": [Condition: Code '38341003' from "SNOMED"]
+define "Dynamic Diabetes": [Condition: Code '44054006' from "SNOMED"]
+"""
+
+
+class CountingDataSource(InMemoryDataSource):
+    """In-memory data source that counts calls."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.retrieve_calls: list[str] = []
+        self.batch_calls = 0
+
+    def retrieve(self, resource_type: str, context: Any = None, **kwargs: Any) -> list[dict[str, Any]]:
+        self.retrieve_calls.append(resource_type)
+        return super().retrieve(resource_type, context, **kwargs)
+
+    def retrieve_batch(self, requests: Any, context: Any = None) -> list[list[dict[str, Any]]]:
+        self.batch_calls += 1
+        return super().retrieve_batch(requests, context)
+
+
+class NonBatchingDataSource:
+    """Data source implementing only the DataSource protocol."""
+
+    def __init__(self, resources: list[dict[str, Any]]) -> None:
+        self.resources = resources
+        self.calls = 0
+
+    def retrieve(self, resource_type: str, context: Any = None, **kwargs: Any) -> list[dict[str, Any]]:
+        self.calls += 1
+        return [r for r in self.resources if r["resourceType"] == resource_type]
+
+    def resolve_reference(self, reference: str) -> dict[str, Any] | None:
+        return None
+
+
+def _patient(patient_id: str) -> dict[str, Any]:
+    return {"resourceType": "Patient", "id": patient_id}
+
+
+def _condition(condition_id: str, patient_id: str, code: str) -> dict[str, Any]:
+    return {
+        "resourceType": "Condition",
+        "id": condition_id,
+        "subject": {"reference": f"Patient/{patient_id}"},
+        "code": {"coding": [{"system": "http://snomed.info/sct", "code": code}]},
+    }
+
+
+def _data_source() -> CountingDataSource:
+    data_source = CountingDataSource()
+    data_source.add_resources(
+        [
+            _patient("p1"),
+            _patient("p2"),
+            _condition("c1", "p1", "44054006"),
+            _condition("c2", "p1", "38341003"),
+            _condition("c3", "p2", "38341003"),
+        ]
+    )
+    data_source.add_valueset(
+        "http://example.org/vs/diabetes", [CQLCode(code="44054006", system="http://snomed.info/sct")]
+    )
+    return data_source
+
+
+class TestDataRequirements:
+    """Tests for collect_retrieve_requests."""
+
+    def test_collects_distinct_static_retrieves(self) -> None:
+        library = CQLEvaluator().compile(LIBRARY)
+        requests = collect_retrieve_requests(library)
+
+        assert RetrieveRequest("Condition", "code") in requests
+        assert RetrieveRequest("Observation", "code") in requests
+        assert RetrieveRequest("Condition", "code", valueset="http://example.org/vs/diabetes") in requests
+        diabetes = [r for r in requests if r.codes]
+        assert len(diabetes) == 1
+        assert diabetes[0].codes[0].code == "44054006"
+        # [Condition] appears in several definitions but is requested once
+        assert len(requests) == 4
+
+    def test_requirements_are_stored_on_library(self) -> None:
+        library = CQLEvaluator().compile(LIBRARY)
+        assert collect_retrieve_requests(library) is collect_retrieve_requests(library)
+
+
+class TestRetrieveCache:
+    """Tests for the CQLContext retrieve cache."""
+
+    def test_shared_context_retrieves_once(self) -> None:
+        data_source = _data_source()
+        evaluator = CQLEvaluator(data_source=data_source)
+        evaluator.compile(LIBRARY)
+
+        context = evaluator.create_context(resource=_patient("p1"), prefetch=False)
+        assert evaluator.evaluate_definition("Condition Count", context=context) == 2
+        assert evaluator.evaluate_definition("Initial Population", context=context) is True
+        assert evaluator.evaluate_definition("Denominator", context=context) is True
+        assert data_source.retrieve_calls == ["Condition"]
+
+    def test_cache_is_per_patient(self) -> None:
+        data_source = _data_source()
+        evaluator = CQLEvaluator(data_source=data_source)
+        evaluator.compile(LIBRARY)
+
+        assert evaluator.evaluate_definition("Condition Count", resource=_patient("p1")) == 2
+        assert evaluator.evaluate_definition("Condition Count", resource=_patient("p2")) == 1
+        assert evaluator.evaluate_definition("Has Diabetes", resource=_patient("p2")) is False
+
+    def test_cached_results_are_copies(self) -> None:
+        data_source = _data_source()
+        evaluator = CQLEvaluator(data_source=data_source)
+        evaluator.compile(LIBRARY)
+
+        context = evaluator.create_context(resource=_patient("p1"))
+        first = evaluator.evaluate_definition("Conditions", context=context)
+        first.clear()
+        assert len(evaluator.evaluate_definition("Conditions", context=context)) == 2
+
+    def test_dynamic_terminology_is_cached_at_runtime(self) -> None:
+        data_source = _data_source()
+        evaluator = CQLEvaluator(data_source=data_source)
+        evaluator.compile(LIBRARY)
+
+        context = evaluator.create_context(resource=_patient("p1"))
+        assert data_source.batch_calls == 1
+        assert len(evaluator.evaluate_definition("Dynamic", context=context)) == 1
+        assert len(evaluator.evaluate_definition("Dynamic", context=context)) == 1
+        assert data_source.retrieve_calls == ["Condition"]
+
+    def test_runtime_terminology_shares_prefetched_entries(self) -> None:
+        data_source = _data_source()
+        evaluator = CQLEvaluator(data_source=data_source)
+        evaluator.compile(LIBRARY)
+
+        context = evaluator.create_context(resource=_patient("p1"))
+        # Evaluates to the same code as "Diabetes", so the prefetched result is used
+        assert len(evaluator.evaluate_definition("Dynamic Diabetes", context=context)) == 1
+        assert data_source.retrieve_calls == []
+
+
+class TestPrefetch:
+    """Tests for batched prefetching of data requirements."""
+
+    def test_prefetch_uses_one_batch_call(self) -> None:
+        data_source = _data_source()
+        evaluator = CQLEvaluator(data_source=data_source)
+        evaluator.compile(LIBRARY)
+
+        context = evaluator.create_context(resource=_patient("p1"))
+        assert data_source.batch_calls == 1
+
+        assert evaluator.evaluate_definition("Condition Count", context=context) == 2
+        assert evaluator.evaluate_definition("Has Diabetes", context=context) is True
+        assert len(evaluator.evaluate_definition("Diabetes By ValueSet", context=context)) == 1
+        assert evaluator.evaluate_definition("Observations", context=context) == []
+        assert data_source.retrieve_calls == []
+
+    def test_batch_matches_individual_retrieves(self) -> None:
+        data_source = _data_source()
+        evaluator = CQLEvaluator(data_source=data_source)
+        library = evaluator.compile(LIBRARY)
+        requests = collect_retrieve_requests(library)
+
+        context = evaluator.create_context(resource=_patient("p1"), prefetch=False)
+        batched = data_source.retrieve_batch(requests, context)
+        assert batched == [request.retrieve_from(data_source, context) for request in requests]
+
+    def test_data_source_without_batching(self) -> None:
+        data_source = NonBatchingDataSource([_condition("c1", "p1", "44054006")])
+        evaluator = CQLEvaluator(data_source=data_source)
+        evaluator.compile(LIBRARY)
+
+        context = evaluator.create_context(resource=_patient("p1"))
+        assert data_source.calls == 0
+        assert evaluator.evaluate_definition("Condition Count", context=context) == 1
+        assert evaluator.evaluate_definition("Initial Population", context=context) is True
+        assert data_source.calls == 1
+
+    def test_measure_evaluation_batches_per_patient(self) -> None:
+        data_source = _data_source()
+        measure = MeasureEvaluator(data_source=data_source)
+        measure.load_measure(LIBRARY)
+
+        report = measure.evaluate_population([_patient("p1"), _patient("p2")])
+        assert data_source.batch_calls == 2
+        assert data_source.retrieve_calls == []
+        group = report.groups[0]
+        assert group.populations["initial-population"].count == 2
+        assert group.populations["numerator"].count == 1
@@ -0,0 +1,201 @@
+"""Benchmarks for ELM evaluation.
+
+Evaluates a measure-style ELM library (the ELM form of the library in
+``test_cql_benchmarks``, written in the same JSON style as the ELM fixtures
+of the other tests) over a synthetic patient population, with and without
+lowering libraries into their executable form. The timing comparison only
+runs with ``FHIRKIT_BENCHMARKS=1``; set ``FHIRKIT_BENCH_PATIENTS`` for a
+full-size run:
+
+    FHIRKIT_BENCHMARKS=1 FHIRKIT_BENCH_PATIENTS=10000 pytest tests/test_elm_benchmarks.py
+"""
+
+import time
+from typing import Any
+
+import pytest
+
+from fhirkit.engine.cql import InMemoryDataSource
+from fhirkit.engine.elm import ELMEvaluator
+from tests.test_cql_benchmarks import DEFINITIONS, PATIENT_COUNT, _population
+
+ELM_TYPES = "{urn:hl7-org:elm-types:r1}"
+
+
+def _int(value: int) -> dict[str, Any]:
+    return {"type": "Literal", "valueType": f"{ELM_TYPES}Integer", "value": str(value)}
+
+
+def _str(value: str) -> dict[str, Any]:
+    return {"type": "Literal", "valueType": f"{ELM_TYPES}String", "value": value}
+
+
+def _ref(name: str) -> dict[str, Any]:
+    return {"type": "ExpressionRef", "name": name}
+
+
+def _op(node_type: str, *operands: dict[str, Any]) -> dict[str, Any]:
+    return {"type": node_type, "operand": list(operands)}
+
+
+def _if(condition: dict[str, Any], then: dict[str, Any], otherwise: dict[str, Any]) -> dict[str, Any]:
+    return {"type": "If", "condition": condition, "then": then, "else": otherwise}
+
+
+def _score(age: dict[str, Any], conditions: dict[str, Any]) -> dict[str, Any]:
+    doubled = _op("Multiply", conditions, _int(2))
+    return _if(
+        _op("GreaterOrEqual", age, _int(65)),
+        _op("Add", doubled, _int(10)),
+        _if(_op("GreaterOrEqual", age, _int(40)), _op("Add", doubled, _int(5)), doubled),
+    )
+
+
+MEASURE_ELM: dict[str, Any] = {
+    "library": {
+        "identifier": {"id": "BenchmarkMeasure", "version": "1.0"},
+        "schemaIdentifier": {"id": "urn:hl7-org:elm", "version": "r1"},
+        "usings": [{"localIdentifier": "FHIR", "uri": "http://hl7.org/fhir", "version": "4.0.1"}],
+        "parameters": [
+            {
+                "name": "Measurement Period",
+                "default": {
+                    "type": "Interval",
+                    "low": {"type": "Literal", "valueType": f"{ELM_TYPES}DateTime", "value": "2024-01-01T00:00:00.0"},
+                    "high": {
+                        "type": "Literal",
+                        "valueType": f"{ELM_TYPES}DateTime",
+                        "value": "2024-12-31T23:59:59.999",
+                    },
+                },
+            }
+        ],
+        "statements": {
+            "def": [
+                {
+                    "name": "Score",
+                    "operand": [{"name": "age"}, {"name": "conditions"}],
+                    "expression": _score(
+                        {"type": "OperandRef", "name": "age"}, {"type": "OperandRef", "name": "conditions"}
+                    ),
+                },
+                {
+                    "name": "Age",
+                    "expression": {
+                        "type": "CalculateAge",
+                        "precision": "Year",
+                        "operand": {"type": "Property", "path": "birthDate"},
+                    },
+                },
+                {
+                    "name": "Conditions",
+                    "expression": {"type": "Retrieve", "dataType": "{http://hl7.org/fhir}Condition"},
+                },
+                {"name": "Condition Count", "expression": {"type": "Count", "source": _ref("Conditions")}},
+                {
+                    "name": "Has Diabetes",
+                    "expression": {
+                        "type": "Exists",
+                        "operand": {
+                            "type": "Query",
+                            "source": [{"alias": "C", "expression": _ref("Conditions")}],
+                            "where": _op(
+                                "Equal",
+                                _op("Indexer", {"type": "Property", "path": "code.coding.code", "scope": "C"}, _int(0)),
+                                _str("44054006"),
+                            ),
+                        },
+                    },
+                },
+                {
+                    "name": "Initial Population",
+                    "expression": _op(
+                        "And", _op("GreaterOrEqual", _ref("Age"), _int(18)), _op("Less", _ref("Age"), _int(85))
+                    ),
+                },
+                {"name": "Denominator", "expression": _op("And", _ref("Initial Population"), _ref("Has Diabetes"))},
+                {
+                    "name": "Numerator",
+                    "expression": _op("And", _ref("Denominator"), _op("Greater", _ref("Condition Count"), _int(1))),
+                },
+                {
+                    "name": "Risk Score",
+                    "expression": _op(
+                        "Subtract",
+                        _op(
+                            "Add",
+                            {"type": "FunctionRef", "name": "Score", "operand": [_ref("Age"), _ref("Condition Count")]},
+                            _op("Multiply", _if(_ref("Has Diabetes"), _int(3), _int(0)), _int(2)),
+                        ),
+                        _int(1),
+                    ),
+                },
+                {
+                    "name": "Risk Band",
+                    "expression": _if(
+                        _op("Greater", _ref("Risk Score"), _int(15)),
+                        _str("high"),
+                        _if(_op("Greater", _ref("Risk Score"), _int(5)), _str("medium"), _str("low")),
+                    ),
+                },
+            ]
+        },
+    }
+}
+
+
+class _PatientIndexedDataSource(InMemoryDataSource):
+    """Scopes retrieves through a patient index.
+
+    Keeps the linear scan of ``InMemoryDataSource`` out of the timings, so
+    that they measure expression evaluation.
+    """
+
+    def __init__(self, source: InMemoryDataSource) -> None:
+        super().__init__()
+        self._resources = source._resources
+        self._index: dict[tuple[str, str], list[dict[str, Any]]] = {}
+        for resource_type, resources in self._resources.items():
+            for resource in resources:
+                key = (resource_type, self._get_patient_reference(resource) or "")
+                self._index.setdefault(key, []).append(resource)
+
+    def _scoped_resources(self, resource_type: str, context: Any) -> list[dict[str, Any]]:
+        if resource_type == "Patient" or not (context and context.resource):
+            return super()._scoped_resources(resource_type, context)
+        return self._index.get((resource_type, f"Patient/{context.resource.get('id')}"), [])
+
+
+def _run(lower: bool, patients: list[dict[str, Any]], data_source: InMemoryDataSource) -> tuple[float, list]:
+    evaluator = ELMEvaluator(data_source=data_source, lower=lower)
+    evaluator.load(MEASURE_ELM)
+    start = time.perf_counter()
+    results = [[evaluator.evaluate_definition(name, resource=patient) for name in DEFINITIONS] for patient in patients]
+    return time.perf_counter() - start, results
+
+
+@pytest.fixture(scope="module")
+def population() -> tuple[list[dict[str, Any]], InMemoryDataSource]:
+    patients, data_source = _population(PATIENT_COUNT)
+    return patients, _PatientIndexedDataSource(data_source)
+
+
+class TestELMMeasureBenchmark:
+    """Lowered libraries against the expression dicts over a patient population."""
+
+    def test_lowered_matches_dicts(self, population: tuple[list[dict[str, Any]], InMemoryDataSource]) -> None:
+        patients, data_source = population
+        _, lowered = _run(True, patients, data_source)
+        _, dicts = _run(False, patients, data_source)
+        assert lowered == dicts
+        assert any(row[2] for row in lowered)
+        assert {row[4] for row in lowered} == {"low", "medium", "high"}
+
+    @pytest.mark.benchmark
+    def test_lowered_is_not_slower(self, population: tuple[list[dict[str, Any]], InMemoryDataSource]) -> None:
+        patients, data_source = population
+        # Warm up before timing
+        _run(True, patients[:10], data_source)
+        lowered_time, _ = _run(True, patients, data_source)
+        dict_time, _ = _run(False, patients, data_source)
+        assert lowered_time < dict_time * 1.5
@@ -0,0 +1,157 @@
+"""Tests for the executable form of ELM libraries."""
+
+from decimal import Decimal
+from typing import Any
+
+import pytest
+
+from fhirkit.engine.cql.context import CQLContext
+from fhirkit.engine.elm import ELMEvaluator, ELMLoader
+from fhirkit.engine.elm.exceptions import ELMExecutionError
+from fhirkit.engine.elm.executable import ELMNode, ExecutableFunction, get_executable, lower_library
+from fhirkit.engine.elm.visitor import ELMExpressionVisitor
+
+INTEGER = "{urn:hl7-org:elm-types:r1}Integer"
+
+
+def _int(value: int) -> dict[str, Any]:
+    return {"type": "Literal", "valueType": INTEGER, "value": str(value)}
+
+
+LIBRARY: dict[str, Any] = {
+    "library": {
+        "identifier": {"id": "Lowering", "version": "1.0"},
+        "parameters": [{"name": "Offset", "default": _int(5)}],
+        "statements": {
+            "def": [
+                {"name": "Base", "expression": _int(10)},
+                {
+                    "name": "Derived",
+                    "expression": {
+                        "type": "Add",
+                        "operand": [
+                            {"type": "ExpressionRef", "name": "Base"},
+                            {"type": "ParameterRef", "name": "Offset"},
+                        ],
+                    },
+                },
+                {
+                    "name": "Double",
+                    "operand": [{"name": "x"}],
+                    "expression": {"type": "Multiply", "operand": [{"type": "OperandRef", "name": "x"}, _int(2)]},
+                },
+                {
+                    "name": "Doubled",
+                    "expression": {
+                        "type": "FunctionRef",
+                        "name": "Double",
+                        "operand": [{"type": "ExpressionRef", "name": "Derived"}],
+                    },
+                },
+                {
+                    "name": "AsString",
+                    "expression": {"type": "FunctionRef", "name": "ToString", "operand": [_int(7)]},
+                },
+                {"name": "Decimal", "expression": {"type": "Literal", "valueType": "Decimal", "value": "1.50"}},
+                {"name": "Unsupported", "expression": {"type": "NoSuchOperator"}},
+                {"name": "BadLiteral", "expression": {"type": "Literal", "valueType": INTEGER, "value": "x"}},
+            ]
+        },
+    }
+}
+
+
+class TestLowering:
+    """Tests for lower_library."""
+
+    def test_nodes_are_lowered(self) -> None:
+        executable = lower_library(ELMLoader.parse(LIBRARY))
+        derived = executable.definitions["Derived"]
+        assert type(derived) is ELMNode
+        assert derived == LIBRARY["library"]["statements"]["def"][1]["expression"]
+        assert derived.handler is ELMExpressionVisitor._eval_add
+        assert all(type(operand) is ELMNode for operand in derived["operand"])
+
+    def test_literals_are_decoded(self) -> None:
+        executable = lower_library(ELMLoader.parse(LIBRARY))
+        assert executable.definitions["Base"].constant == 10
+        assert executable.definitions["Decimal"].constant == Decimal("1.50")
+        assert executable.parameters["Offset"].constant == 5
+
+    def test_references_are_linked(self) -> None:
+        executable = lower_library(ELMLoader.parse(LIBRARY))
+        base_ref = executable.definitions["Derived"]["operand"][0]
+        assert base_ref.target is executable.definitions["Base"]
+
+        function_ref = executable.definitions["Doubled"]
+        assert isinstance(function_ref.target, ExecutableFunction)
+        assert function_ref.target is executable.functions["Double"]
+        assert function_ref.target.operands == ("x",)
+
+        assert executable.definitions["AsString"].target(7) == "7"
+
+    def test_nodes_are_immutable(self) -> None:
+        node = lower_library(ELMLoader.parse(LIBRARY)).definitions["Base"]
+        with pytest.raises(TypeError):
+            node["value"] = "11"
+        with pytest.raises(TypeError):
+            node.update(value="11")
+
+    def test_executable_is_cached_on_library(self) -> None:
+        library = ELMLoader.parse(LIBRARY)
+        assert get_executable(library) is get_executable(library)
+
+    def test_pydantic_models_are_dumped(self) -> None:
+        library = ELMLoader.parse(LIBRARY)
+        library.get_definition("Base").expression = ELMLoader.parse(
+            {"identifier": {"id": "Inner"}, "statements": {"def": [{"name": "X", "expression": _int(3)}]}}
+        ).get_definition("X")
+        node = lower_library(library).definitions["Base"]
+        assert type(node) is ELMNode
+        assert node["name"] == "X"
+
+
+class TestLoweredEvaluation:
+    """ELMEvaluator evaluates through the executable form."""
+
+    def test_load_lowers_library(self) -> None:
+        evaluator = ELMEvaluator()
+        library = evaluator.load(LIBRARY)
+        assert library._executable is not None
+
+        assert ELMEvaluator(lower=False).load(LIBRARY)._executable is None
+
+    @pytest.mark.parametrize("lower", [True, False])
+    def test_results(self, lower: bool) -> None:
+        evaluator = ELMEvaluator(lower=lower)
+        evaluator.load(LIBRARY)
+        assert evaluator.evaluate_definition("Derived") == 15
+        assert evaluator.evaluate_definition("Derived", parameters={"Offset": 1}) == 11
+        assert evaluator.evaluate_definition("Doubled") == 30
+        assert evaluator.evaluate_definition("AsString") == "7"
+        assert evaluator.evaluate_definition("Decimal") == Decimal("1.50")
+
+    @pytest.mark.parametrize("lower", [True, False])
+    def test_errors(self, lower: bool) -> None:
+        evaluator = ELMEvaluator(lower=lower)
+        evaluator.load(LIBRARY)
+        with pytest.raises(ELMExecutionError, match="Unsupported expression type: NoSuchOperator"):
+            evaluator.evaluate_definition("Unsupported")
+        with pytest.raises(ELMExecutionError, match="Error evaluating Literal"):
+            evaluator.evaluate_definition("BadLiteral")
+
+    def test_plain_dicts_resolve_lowered_definitions(self) -> None:
+        library = ELMLoader.parse(LIBRARY)
+        visitor = ELMExpressionVisitor(CQLContext())
+        visitor.set_library(library)
+        assert visitor.evaluate({"type": "ExpressionRef", "name": "Base"}) == 10
+        assert library._executable is not None
+
+    def test_missing_type_in_lowered_node(self) -> None:
+        library = ELMLoader.parse(
+            {"identifier": {"id": "Untyped"}, "statements": {"def": [{"name": "X", "expression": {"value": 1}}]}}
+        )
+        evaluator = ELMEvaluator()
+        evaluator.load(library.model_dump(by_alias=True))
+        with pytest.raises(ELMExecutionError, match="Missing 'type' field"):
+            evaluator.evaluate_definition("X")
@@ -0,0 +1,194 @@
+"""Tests for population-scale ELM evaluation."""
+
+import csv
+import io
+import json
+from decimal import Decimal
+from pathlib import Path
+from typing import Any
+
+import pytest
+from typer.testing import CliRunner
+
+from fhirkit.elm_cli import app
+from fhirkit.engine.cql import BundleDataSource
+from fhirkit.engine.cql.types import CQLCode, CQLInterval, CQLTuple
+from fhirkit.engine.elm import ELMEvaluator, PopulationRunner, iter_patient_bundles
+from fhirkit.engine.elm.exceptions import ELMReferenceError
+from fhirkit.engine.elm.population import PatientBundle, result_to_json, write_csv, write_ndjson
+from fhirkit.engine.types import FHIRDate, Quantity
+from tests.test_elm_benchmarks import MEASURE_ELM
+
+DEFINITIONS = ["Age", "Condition Count", "Has Diabetes", "Risk Band"]
+
+cli = CliRunner()
+
+
+def _bundle(index: int) -> dict[str, Any]:
+    patient = {"resourceType": "Patient", "id": f"p{index}", "birthDate": f"{1940 + index * 7}-03-01"}
+    conditions = [
+        {
+            "resourceType": "Condition",
+            "id": f"p{index}-c{i}",
+            "subject": {"reference": f"Patient/p{index}"},
+            "code": {"coding": [{"system": "http://snomed.info/sct", "code": "44054006" if i == 0 else "38341003"}]},
+        }
+        for i in range(index % 3)
+    ]
+    return {
+        "resourceType": "Bundle",
+        "type": "collection",
+        "entry": [{"resource": resource} for resource in [patient, *conditions]],
+    }
+
+
+BUNDLES = [_bundle(i) for i in range(8)]
+
+
+def _expected(bundle: dict[str, Any]) -> dict[str, Any]:
+    evaluator = ELMEvaluator(data_source=BundleDataSource(bundle))
+    evaluator.load(MEASURE_ELM)
+    patient = bundle["entry"][0]["resource"]
+    return {name: evaluator.evaluate_definition(name, resource=patient) for name in DEFINITIONS}
+
+
+@pytest.fixture
+def library_file(tmp_path: Path) -> Path:
+    path = tmp_path / "measure.elm.json"
+    path.write_text(json.dumps(MEASURE_ELM))
+    return path
+
+
+@pytest.fixture
+def extract(tmp_path: Path) -> Path:
+    path = tmp_path / "extract.ndjson"
+    path.write_text("".join(json.dumps(bundle) + "\n" for bundle in BUNDLES))
+    return path
+
+
+class TestPatientInput:
+    """Tests for iter_patient_bundles."""
+
+    def test_ndjson(self, extract: Path) -> None:
+        items = list(iter_patient_bundles(extract))
+        assert [item.bundle for item in items] == BUNDLES
+        assert items[1].source == f"{extract}:2"
+
+    def test_directory(self, tmp_path: Path) -> None:
+        directory = tmp_path / "bundles"
+        directory.mkdir()
+        (directory / "a.json").write_text(json.dumps(BUNDLES[0]))
+        (directory / "b.ndjson").write_text(json.dumps(BUNDLES[1]) + "\n\n" + json.dumps(BUNDLES[2]) + "\n")
+        (directory / "c.json").write_text("{not json")
+        (directory / "notes.txt").write_text("ignored")
+
+        items = list(iter_patient_bundles(directory))
+        assert [item.bundle for item in items[:3]] == BUNDLES[:3]
+        assert items[3].bundle is None and "Invalid JSON" in (items[3].error or "")
+        assert len(items) == 4
+
+    def test_missing(self, tmp_path: Path) -> None:
+        with pytest.raises(FileNotFoundError):
+            list(iter_patient_bundles(tmp_path / "missing.ndjson"))
+
+
+class TestPopulationRunner:
+    """Tests for PopulationRunner."""
+
+    def test_results_match_single_patient_evaluation(self) -> None:
+        runner = PopulationRunner(MEASURE_ELM, DEFINITIONS)
+        results = list(runner.run(PatientBundle(str(i), bundle) for i, bundle in enumerate(BUNDLES)))
+        assert [result.patient_id for result in results] == [f"p{i}" for i in range(len(BUNDLES))]
+        for result, bundle in zip(results, BUNDLES):
+            assert not result.errors
+            assert result.results == _expected(bundle)
+
+    def test_workers_preserve_order(self, extract: Path) -> None:
+        serial = [r.to_row() for r in PopulationRunner(MEASURE_ELM, DEFINITIONS).run(iter_patient_bundles(extract))]
+        runner = PopulationRunner(MEASURE_ELM, DEFINITIONS, workers=2, max_pending=3)
+        parallel = [result.to_row() for result in runner.run(iter_patient_bundles(extract))]
+        assert parallel == serial
+
+    def test_default_definitions_are_public(self) -> None:
+        runner = PopulationRunner(MEASURE_ELM)
+        assert "Risk Band" in runner.definitions
+        assert "Score" not in runner.definitions
+
+    def test_unknown_definition(self) -> None:
+        with pytest.raises(ELMReferenceError):
+            PopulationRunner(MEASURE_ELM, ["Nope"])
+
+    def test_unreadable_input_is_reported(self) -> None:
+        runner = PopulationRunner(MEASURE_ELM, DEFINITIONS)
+        (result,) = runner.run([PatientBundle("bad:1", None, "Invalid JSON")])
+        assert result.errors == {"_input": "Invalid JSON"}
+
+
+class TestWriters:
+    """Tests for the NDJSON and CSV writers."""
+
+    def _results(self) -> list[Any]:
+        runner = PopulationRunner(MEASURE_ELM, DEFINITIONS)
+        return list(runner.run(PatientBundle(str(i), bundle) for i, bundle in enumerate(BUNDLES[:3])))
+
+    def test_ndjson(self) -> None:
+        stream = io.StringIO()
+        assert write_ndjson(self._results(), stream) == 3
+        rows = [json.loads(line) for line in stream.getvalue().splitlines()]
+        assert rows[2]["patient"] == "p2"
+        assert rows[2]["Condition Count"] == 2
+        assert rows[2]["Has Diabetes"] is True
+
+    def test_csv(self) -> None:
+        stream = io.StringIO()
+        assert write_csv(self._results(), stream, DEFINITIONS) == 3
+        rows = list(csv.DictReader(io.StringIO(stream.getvalue())))
+        assert list(rows[0]) == ["source", "patient", *DEFINITIONS, "errors"]
+        assert rows[1]["patient"] == "p1"
+        assert rows[1]["Condition Count"] == "1"
+        assert rows[1]["errors"] == ""
+
+    def test_result_to_json(self) -> None:
+        value = CQLTuple(
+            elements={
+                "when": CQLInterval(low=FHIRDate.parse("2024-01-01"), high=FHIRDate.parse("2024-12-31")),
+                "dose": Quantity(value=Decimal("2.5"), unit="mg"),
+                "codes": [CQLCode(code="44054006", system="http://snomed.info/sct")],
+            }
+        )
+        converted = result_to_json(value)
+        assert converted["when"]["low"] == "2024-01-01"
+        assert converted["dose"] == {"value": 2.5, "unit": "mg"}
+        assert converted["codes"][0]["code"] == "44054006"
+        json.dumps(converted)
+
+
+class TestPopulationCommand:
+    """Tests for fhir elm population."""
+
+    def test_ndjson_output(self, library_file: Path, extract: Path, tmp_path: Path) -> None:
+        output = tmp_path / "results.ndjson"
+        result = cli.invoke(app, ["population", str(library_file), str(extract), "-o", str(output)])
+        assert result.exit_code == 0, result.stdout
+        rows = [json.loads(line) for line in output.read_text().splitlines()]
+        assert len(rows) == len(BUNDLES)
+        assert "Risk Band" in rows[0]
+
+    def test_csv_output_with_selected_definitions(self, library_file: Path, extract: Path, tmp_path: Path) -> None:
+        output = tmp_path / "results.csv"
+        args = ["population", str(library_file), str(extract), "-e", "Age", "-e", "Has Diabetes", "-o", str(output)]
+        result = cli.invoke(app, args)
+        assert result.exit_code == 0, result.stdout
+        rows = list(csv.DictReader(output.open()))
+        assert list(rows[0]) == ["source", "patient", "Age", "Has Diabetes", "errors"]
+        assert len(rows) == len(BUNDLES)
+
+    def test_stdout(self, library_file: Path, extract: Path) -> None:
+        result = cli.invoke(app, ["population", str(library_file), str(extract), "-e", "Age"])
+        assert result.exit_code == 0
+        assert len(result.stdout.splitlines()) == len(BUNDLES)
+
+    def test_unknown_definition(self, library_file: Path, extract: Path) -> None:
+        result = cli.invoke(app, ["population", str(library_file), str(extract), "-e", "Nope"])
+        assert result.exit_code == 1
+        assert "Definition not found" in result.stdout
@@ -0,0 +1,172 @@
+"""Tests for hash-based equality keys and collection operators."""
+
+from decimal import Decimal
+from typing import Any
+
+import pytest
+
+from fhirkit.engine.context import EvaluationContext
+from fhirkit.engine.cql import CQLEvaluator
+from fhirkit.engine.cql.functions.list_funcs import _distinct, _except, _intersect
+from fhirkit.engine.cql.types import CQLCode, CQLConcept, CQLInterval, CQLTuple
+from fhirkit.engine.equality import EqualityIndex, distinct_values, equality_key
+from fhirkit.engine.fhirpath.functions import collections
+from fhirkit.engine.fhirpath.functions.collections import (
+    fn_distinct,
+    fn_exclude,
+    fn_intersect,
+    fn_subset_of,
+    fn_union,
+)
+from fhirkit.engine.types import FHIRDate, FHIRDateTime, Quantity
+
+
+def _observations(count: int) -> list[dict]:
+    return [
+        {
+            "resourceType": "Observation",
+            "id": f"obs-{i}",
+            "code": {"coding": [{"system": "http://loinc.org", "code": "2339-0"}]},
+            "valueQuantity": {"value": i, "unit": "mg/dL"},
+        }
+        for i in range(count)
+    ]
+
+
+class TestEqualityKey:
+    """Tests for equality_key."""
+
+    def test_dict_key_ignores_insertion_order(self) -> None:
+        assert equality_key({"a": 1, "b": [1, 2]}) == equality_key({"b": [1, 2], "a": 1})
+
+    def test_list_key_is_order_sensitive(self) -> None:
+        assert equality_key([1, 2]) != equality_key([2, 1])
+
+    def test_quantity_key_uses_canonical_units(self) -> None:
+        gram = Quantity(value=Decimal("1"), unit="g")
+        milligram = Quantity(value=Decimal("1000"), unit="mg")
+        assert equality_key(gram) == equality_key(milligram)
+
+    def test_quantity_key_separates_dimensions(self) -> None:
+        gram = Quantity(value=Decimal("1"), unit="g")
+        metre = Quantity(value=Decimal("1"), unit="m")
+        assert equality_key(gram) != equality_key(metre)
+
+    def test_quantity_with_unknown_unit(self) -> None:
+        a = Quantity(value=Decimal("1"), unit="{tablets}")
+        b = Quantity(value=Decimal("1.0"), unit="{tablets}")
+        assert equality_key(a) == equality_key(b)
+
+    def test_date_precision_is_part_of_key(self) -> None:
+        assert equality_key(FHIRDate(year=2024)) != equality_key(FHIRDate(year=2024, month=1))
+        assert equality_key(FHIRDateTime(year=2024, month=1, day=1)) == equality_key(
+            FHIRDateTime(year=2024, month=1, day=1)
+        )
+
+    def test_concept_key_ignores_code_order(self) -> None:
+        a = CQLCode(code="a", system="s")
+        b = CQLCode(code="b", system="s")
+        assert equality_key(CQLConcept(codes=(a, b))) == equality_key(CQLConcept(codes=(b, a)))
+
+    def test_code_key_ignores_display(self) -> None:
+        assert equality_key(CQLCode(code="a", system="s", display="A")) == equality_key(CQLCode(code="a", system="s"))
+
+    def test_interval_with_quantity_bounds(self) -> None:
+        a = CQLInterval(low=Quantity(value=Decimal("1"), unit="g"), high=Quantity(value=Decimal("2"), unit="g"))
+        b = CQLInterval(low=Quantity(value=Decimal("1000"), unit="mg"), high=Quantity(value=Decimal("2"), unit="g"))
+        assert equality_key(a) == equality_key(b)
+
+    def test_tuple_matches_dict_in_python_mode(self) -> None:
+        assert equality_key(CQLTuple(elements={"a": 1})) == equality_key({"a": 1})
+        assert equality_key(CQLTuple(elements={"a": 1}), strict=True) != equality_key({"a": 1}, strict=True)
+
+    def test_strict_mode_separates_decimal_and_integer(self) -> None:
+        assert equality_key(Decimal("1")) == equality_key(1)
+        assert equality_key(Decimal("1"), strict=True) != equality_key(1, strict=True)
+        assert equality_key(1.0, strict=True) == equality_key(1, strict=True)
+
+
+class TestEqualityIndex:
+    """Tests for EqualityIndex."""
+
+    def test_add_and_contains(self) -> None:
+        index = EqualityIndex([1, 2])
+        assert 1 in index
+        assert 3 not in index
+        assert index.add(2) is False
+        assert index.add(3) is True
+        assert len(index) == 3
+
+    def test_unhashable_values_fall_back_to_linear_scan(self) -> None:
+        class Unhashable:
+            __hash__ = None  # type: ignore[assignment]
+
+            def __init__(self, value: int) -> None:
+                self.value = value
+
+            def __eq__(self, other: object) -> bool:
+                return isinstance(other, Unhashable) and other.value == self.value
+
+        index = EqualityIndex([Unhashable(1), 2])
+        assert Unhashable(1) in index
+        assert Unhashable(2) not in index
+        assert 2 in index
+
+    def test_distinct_values_preserves_order(self) -> None:
+        assert distinct_values([3, 1, 3, 2, 1]) == [3, 1, 2]
+
+
+class TestFHIRPathCollections:
+    """FHIRPath collection functions keep their equality semantics."""
+
+    def test_distinct_dicts(self) -> None:
+        ctx = EvaluationContext()
+        assert fn_distinct(ctx, [{"a": 1}, {"a": 1}, {"a": 2}]) == [{"a": 1}, {"a": 2}]
+
+    def test_distinct_is_type_strict(self) -> None:
+        ctx = EvaluationContext()
+        assert fn_distinct(ctx, [1, 1.0, Decimal("1"), "1"]) == [1, Decimal("1"), "1"]
+
+    def test_union_intersect_exclude(self) -> None:
+        ctx = EvaluationContext()
+        assert fn_union(ctx, [1, 2, 2], [2, 3]) == [1, 2, 3]
+        assert fn_intersect(ctx, [1, 2, 2, 3], [2, 3, 4]) == [2, 3]
+        assert fn_exclude(ctx, [1, 2, 2, 3], [2]) == [1, 3]
+        assert fn_subset_of(ctx, [1, 2], [1, 2, 3]) == [True]
+        assert fn_subset_of(ctx, [1, 4], [1, 2, 3]) == [False]
+
+    def test_union_of_large_collections_compares_within_buckets(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        comparisons = 0
+        deep_equals = collections._deep_equals
+
+        def counting_deep_equals(a: Any, b: Any) -> bool:
+            nonlocal comparisons
+            comparisons += 1
+            return deep_equals(a, b)
+
+        monkeypatch.setattr(collections, "_deep_equals", counting_deep_equals)
+        result = fn_union(EvaluationContext(), _observations(5000), _observations(5000))
+        assert len(result) == 5000
+        # Each duplicate is compared (element by element) with the one value of its hash bucket;
+        # comparing values pairwise would take millions of comparisons
+        assert comparisons <= 20 * 5000
+
+
+class TestCQLListOperators:
+    """CQL list operators keep their equality semantics."""
+
+    def test_distinct_skips_nulls(self) -> None:
+        assert _distinct([[1, None, 1, 2]]) == [1, 2]
+
+    def test_intersect_and_except_with_quantities(self) -> None:
+        gram = Quantity(value=Decimal("1"), unit="g")
+        milligram = Quantity(value=Decimal("1000"), unit="mg")
+        metre = Quantity(value=Decimal("1"), unit="m")
+        assert _intersect([[gram, metre], [milligram]]) == [gram]
+        assert _except([[gram, metre], [milligram]]) == [metre]
+
+    def test_set_expressions(self) -> None:
+        evaluator = CQLEvaluator()
+        assert evaluator.evaluate_expression("{1, 2, 3} intersect {2, 3, 4}") == [2, 3]
+        assert evaluator.evaluate_expression("{1, 2, 3} except {2}") == [1, 3]
+        assert evaluator.evaluate_expression("distinct {1, 1, 2, null}") == [1, 2]
@@ -0,0 +1,218 @@
+"""Tests for the prebuilt ValueSet expansion index and paged $expand."""
+
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from fhirkit.server.api.app import create_app
+from fhirkit.server.config.settings import FHIRServerSettings
+from fhirkit.server.storage.fhir_store import FHIRStore
+from fhirkit.terminology import ExpansionIndex
+from fhirkit.terminology.expansion import concept_inactive
+
+SYSTEM = "http://example.org/fhir/CodeSystem/conditions"
+VALUESET = "http://example.org/fhir/ValueSet/conditions"
+
+CONCEPTS = [
+    {"code": "E10", "display": "Type 1 diabetes mellitus"},
+    {"code": "E11", "display": "Type 2 diabetes mellitus"},
+    {
+        "code": "E13",
+        "display": "Other specified diabetes mellitus",
+        "property": [{"code": "inactive", "valueBoolean": True}],
+    },
+    {"code": "I10", "display": "Essential (primary) hypertension"},
+    {"code": "O24.4", "display": "Gestational diabetes", "property": [{"code": "status", "valueCode": "retired"}]},
+]
+
+
+def _codes(contains: list[dict[str, Any]]) -> list[str]:
+    return [c["code"] for c in contains]
+
+
+@pytest.fixture
+def store() -> FHIRStore:
+    store = FHIRStore()
+    store.create(
+        {"resourceType": "CodeSystem", "id": "conditions", "url": SYSTEM, "status": "active", "concept": CONCEPTS}
+    )
+    store.create(
+        {
+            "resourceType": "ValueSet",
+            "id": "conditions",
+            "url": VALUESET,
+            "version": "1",
+            "status": "active",
+            "compose": {"include": [{"system": SYSTEM}]},
+        }
+    )
+    return store
+
+
+class TestExpansionIndex:
+    """Tests for word-prefix filtering and paging of an expansion."""
+
+    @pytest.fixture
+    def index(self) -> ExpansionIndex:
+        return ExpansionIndex(
+            {"system": SYSTEM, "code": c["code"], "display": c["display"], "inactive": concept_inactive(c)}
+            for c in CONCEPTS
+        )
+
+    def test_word_prefixes(self, index: ExpansionIndex) -> None:
+        assert _codes(index.page("diab")[1]) == ["E10", "E11", "E13", "O24.4"]
+        assert _codes(index.page("DIAB TYP")[1]) == ["E10", "E11"]
+        assert _codes(index.page("mellitus 2")[1]) == ["E11"]
+        assert _codes(index.page("prim")[1]) == ["I10"]
+        # Words are matched from their start only
+        assert index.page("abetes")[0] == 0
+
+    def test_codes(self, index: ExpansionIndex) -> None:
+        assert _codes(index.page("e1")[1]) == ["E10", "E11", "E13"]
+        assert _codes(index.page("O24.")[1]) == ["O24.4"]
+
+    def test_paging_and_active_only(self, index: ExpansionIndex) -> None:
+        assert index.page(count=2, offset=1) == (5, index.contains[1:3])
+        assert _codes(index.page(active_only=True)[1]) == ["E10", "E11", "I10"]
+        total, page = index.page("diab", count=1, offset=1, active_only=True)
+        assert (total, _codes(page)) == (2, ["E11"])
+        assert index.page("diab", offset=10) == (4, [])
+
+    def test_lookup(self) -> None:
+        index = ExpansionIndex([{"code": "A"}, {"system": SYSTEM, "code": "B"}])
+        assert index.lookup("A", SYSTEM) == {"code": "A"}
+        assert index.lookup("B") == {"system": SYSTEM, "code": "B"}
+        assert index.lookup("B", "http://example.org/other") is None
+        assert index.codes == frozenset({("", "A"), (SYSTEM, "B")})
+
+
+class TestStoreProviderExpansion:
+    """Tests for indexed expansions of the store's terminology provider."""
+
+    def test_filter_and_active_only(self, store: FHIRStore) -> None:
+        result = store.terminology.expand_valueset(url=VALUESET, filter_text="diabetes", active_only=True)
+        assert result["version"] == "1"
+        assert result["expansion"]["total"] == 2
+        assert _codes(result["expansion"]["contains"]) == ["E10", "E11"]
+        contains = store.terminology.expand_valueset(url=VALUESET)["expansion"]["contains"]
+        assert [c.get("inactive", False) for c in contains] == [False, False, True, False, True]
+
+    def test_hierarchy_filter_inactive(self, store: FHIRStore) -> None:
+        store.create(
+            {
+                "resourceType": "ValueSet",
+                "url": f"{VALUESET}-is-a",
+                "status": "active",
+                "compose": {
+                    "include": [{"system": SYSTEM, "filter": [{"property": "concept", "op": "is-a", "value": "E13"}]}]
+                },
+            }
+        )
+        result = store.terminology.expand_valueset(url=f"{VALUESET}-is-a")
+        assert result["expansion"]["contains"] == [
+            {"system": SYSTEM, "code": "E13", "display": "Other specified diabetes mellitus", "inactive": True}
+        ]
+        assert store.terminology.expand_valueset(url=f"{VALUESET}-is-a", active_only=True)["expansion"]["total"] == 0
+
+    def test_version(self, store: FHIRStore) -> None:
+        assert store.terminology.expand_valueset(url=VALUESET, version="1") is not None
+        assert store.terminology.expand_valueset(url=VALUESET, version="2") is None
+
+    def test_results_cached_until_terminology_writes(self, store: FHIRStore) -> None:
+        provider = store.terminology
+        first = provider.expand_valueset(url=VALUESET, filter_text="diab", count=2)
+        assert provider.expand_valueset(url=VALUESET, filter_text=" Diab ", count=2) is first
+        assert provider.validate_code(valueset_url=VALUESET, code="I10", system=SYSTEM)["parameter"][0]["valueBoolean"]
+
+        codesystem = store.read("CodeSystem", "conditions")
+        store.update(
+            "CodeSystem",
+            "conditions",
+            {**codesystem, "concept": [*CONCEPTS, {"code": "E08", "display": "Diabetes due to underlying condition"}]},
+        )
+        result = provider.expand_valueset(url=VALUESET, filter_text="diab", count=2)
+        assert result is not first
+        assert result["expansion"]["total"] == 5
+        assert (SYSTEM, "E08") in provider.expansion_codes(VALUESET)
+
+        store.delete("ValueSet", "conditions")
+        assert provider.expand_valueset(url=VALUESET) is None
+
+    def test_validate_code(self, store: FHIRStore) -> None:
+        provider = store.terminology
+        result = provider.validate_code(valueset_url=VALUESET, code="E11", system=SYSTEM)
+        assert result["parameter"] == [
+            {"name": "result", "valueBoolean": True},
+            {"name": "display", "valueString": "Type 2 diabetes mellitus"},
+        ]
+        assert not provider.member_of(VALUESET, "E11", "http://example.org/other")
+
+    def test_keystrokes_do_not_expand(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        store = FHIRStore()
+        words = ["acute", "chronic", "diabetes", "fracture", "infection", "kidney", "lung", "renal", "heart", "liver"]
+        concepts = [
+            {"code": f"C{i}", "display": f"{words[i % 10]} {words[i // 10 % 10]} disorder {i}"} for i in range(20000)
+        ]
+        store.create({"resourceType": "CodeSystem", "url": SYSTEM, "status": "active", "concept": concepts})
+        valueset = {"resourceType": "ValueSet", "url": VALUESET, "status": "active"}
+        valueset["compose"] = {"include": [{"system": SYSTEM}]}
+        store.create(valueset)
+        provider = store.terminology
+        # The index is built once per ValueSet, before the user starts typing
+        provider.expand_valueset(url=VALUESET)
+
+        def expand(*args: Any) -> list[dict[str, Any]]:
+            raise AssertionError("ValueSet expanded per keystroke")
+
+        monkeypatch.setattr(provider, "_extract_codes_from_valueset", expand)
+        for text in ["diabetes kidney"[:n] for n in range(1, 16)]:
+            provider.expand_valueset(url=VALUESET, filter_text=text, count=20)
+        # "kidney diabetes" matches too
+        assert provider.expand_valueset(url=VALUESET, filter_text="diabetes kid")["expansion"]["total"] == 400
+
+
+class TestExpandRoutes:
+    """Tests for paged $expand through the REST API."""
+
+    @pytest.fixture
+    def client(self, store: FHIRStore) -> TestClient:
+        settings = FHIRServerSettings(patients=0, enable_docs=False, enable_ui=False, api_base_path="")
+        return TestClient(create_app(settings=settings, store=store))
+
+    def test_get(self, client: TestClient) -> None:
+        response = client.get(
+            "/ValueSet/$expand",
+            params={
+                "url": VALUESET,
+                "valueSetVersion": "1",
+                "filter": "diab",
+                "count": 1,
+                "offset": 1,
+                "activeOnly": "true",
+            },
+        )
+        assert response.status_code == 200
+        expansion = response.json()["expansion"]
+        assert (expansion["total"], expansion["offset"], _codes(expansion["contains"])) == (2, 1, ["E11"])
+        response = client.get("/ValueSet/$expand", params={"url": VALUESET, "valueSetVersion": "2"})
+        assert response.status_code == 404
+
+    def test_post(self, client: TestClient) -> None:
+        body = {
+            "resourceType": "Parameters",
+            "parameter": [
+                {"name": "url", "valueUri": VALUESET},
+                {"name": "filter", "valueString": "mell"},
+                {"name": "count", "valueInteger": 2},
+                {"name": "activeOnly", "valueBoolean": True},
+            ],
+        }
+        expansion = client.post("/ValueSet/$expand", json=body).json()["expansion"]
+        assert (expansion["total"], _codes(expansion["contains"])) == (2, ["E10", "E11"])
+
+    def test_by_id(self, client: TestClient) -> None:
+        response = client.get("/ValueSet/conditions/$expand", params={"count": 2, "offset": 2})
+        assert _codes(response.json()["expansion"]["contains"]) == ["E13", "I10"]
+        response = client.get("/ValueSet/conditions/$expand", params={"activeOnly": "true"})
+        assert response.json()["expansion"]["total"] == 3
@@ -1,11 +1,14 @@
 """Tests for FHIR server REST API."""
 
+import pickle
+
 import pytest
 from fastapi.testclient import TestClient
 
 from fhirkit.server.api.app import create_app
 from fhirkit.server.config.settings import FHIRServerSettings
-from fhirkit.server.storage.fhir_store import FHIRStore
+from fhirkit.server.storage.fhir_store import SNAPSHOT_MAGIC, SNAPSHOT_VERSION, FHIRStore, SnapshotError
+from fhirkit.signing import KEY_FILE_ENV
 
 
 @pytest.fixture
@@ -378,6 +381,93 @@ class TestFHIRStore:
         assert len(history) == 3
 
 
+class TestSnapshot:
+    """Tests for store snapshots."""
+
+    def _store(self) -> FHIRStore:
+        store = FHIRStore()
+        store.create({"resourceType": "Patient", "id": "p1", "gender": "male"})
+        store.update("Patient", "p1", {"resourceType": "Patient", "id": "p1", "gender": "female"})
+        store.create({"resourceType": "Patient", "id": "p2"})
+        store.delete("Patient", "p2")
+        store.create(
+            {
+                "resourceType": "Observation",
+                "id": "o1",
+                "valueQuantity": {"value": 5.4, "system": "http://unitsofmeasure.org", "code": "mmol/L"},
+            }
+        )
+        return store
+
+    @pytest.mark.parametrize("use_mmap", [True, False])
+    def test_round_trip(self, tmp_path, use_mmap):
+        path = tmp_path / "store.snapshot"
+        assert self._store().save_snapshot(path) == 3
+
+        restored = FHIRStore()
+        restored.create({"resourceType": "Patient", "id": "replaced"})
+        assert restored.restore_snapshot(path, use_mmap=use_mmap) == 3
+        assert restored.read("Patient", "replaced") is None
+        assert restored.read("Patient", "p1")["gender"] == "female"
+        assert len(restored.history("Patient", "p1")) == 2
+        assert restored.read("Patient", "p2") is None
+        results, total = restored.search("Observation", {"value-quantity": "gt5000|http://unitsofmeasure.org|umol/L"})
+        assert total == 1
+        # Restored resources are shared between the type lists and the ID index
+        restored.update("Patient", "p1", {"resourceType": "Patient", "id": "p1", "active": True})
+        assert restored.search("Patient", {"active": "true"})[1] == 1
+
+    def test_invalid_file(self, tmp_path):
+        path = tmp_path / "store.snapshot"
+        path.write_bytes(b"not a snapshot")
+        with pytest.raises(SnapshotError):
+            FHIRStore().restore_snapshot(path)
+        path.write_bytes(b"")
+        with pytest.raises(SnapshotError):
+            FHIRStore().restore_snapshot(path)
+        # Snapshots of earlier versions lack indexes
+        path.write_bytes(SNAPSHOT_MAGIC + bytes([SNAPSHOT_VERSION - 1]))
+        with pytest.raises(SnapshotError, match="Unsupported snapshot version"):
+            FHIRStore().restore_snapshot(path)
+
+    @pytest.mark.parametrize("use_mmap", [True, False])
+    def test_signature_checked_before_unpickling(self, tmp_path, monkeypatch, use_mmap):
+        path = tmp_path / "store.snapshot"
+        self._store().save_snapshot(path)
+        data = bytearray(path.read_bytes())
+        data[-1] ^= 1
+        path.write_bytes(data)
+
+        def unpickle(*args):
+            raise AssertionError("Snapshot unpickled")
+
+        monkeypatch.setattr(pickle, "load", unpickle)
+        with pytest.raises(SnapshotError, match="signature does not match"):
+            FHIRStore().restore_snapshot(path, use_mmap=use_mmap)
+
+    def test_other_installation_refused(self, tmp_path, monkeypatch):
+        path = tmp_path / "store.snapshot"
+        self._store().save_snapshot(path)
+        monkeypatch.setenv(KEY_FILE_ENV, str(tmp_path / "other.key"))
+        with pytest.raises(SnapshotError, match="signature does not match"):
+            FHIRStore().restore_snapshot(path)
+
+    def test_startup_writes_then_restores(self, tmp_path):
+        path = tmp_path / "store.snapshot"
+        settings = FHIRServerSettings(
+            patients=1, seed=1, store_snapshot=str(path), enable_docs=False, enable_ui=False, api_base_path=""
+        )
+        generated = FHIRStore()
+        with TestClient(create_app(settings=settings, store=generated)):
+            pass
+        assert path.exists()
+
+        restored = FHIRStore()
+        with TestClient(create_app(settings=settings, store=restored)) as client:
+            assert client.get("/Patient").json()["total"] == generated.count("Patient")
+        assert restored.count() == generated.count()
+
+
 class TestTransaction:
     """Tests for transaction atomicity."""
 
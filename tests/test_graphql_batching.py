@@ -0,0 +1,195 @@
+"""Tests for batched GraphQL reference resolution and the query cost limit."""
+
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+from graphql import parse
+
+from fhirkit.server.api.app import create_app
+from fhirkit.server.config.settings import FHIRServerSettings
+from fhirkit.server.graphql import create_schema, estimate_cost, reference_key
+from fhirkit.server.graphql.types import references_at
+from fhirkit.server.storage.fhir_store import FHIRStore
+
+OBSERVATION_SUBJECTS = """
+{
+    observations(_count: 50) {
+        id
+        reference(path: "subject") { reference resource }
+    }
+}
+"""
+
+
+@pytest.fixture
+def store() -> FHIRStore:
+    store = FHIRStore()
+    store.bulk_load(
+        [
+            {"resourceType": "Patient", "id": "p1", "gender": "female"},
+            {"resourceType": "Patient", "id": "p2", "gender": "male"},
+            {"resourceType": "Practitioner", "id": "dr1"},
+        ]
+    )
+    subjects = ["Patient/p1", "Patient/p2", "http://example.org/fhir/Patient/p1", "Patient/p1/_history/1"]
+    for i, subject in enumerate(subjects):
+        store.create(
+            {
+                "resourceType": "Observation",
+                "id": f"o{i}",
+                "status": "final",
+                "subject": {"reference": subject},
+                "performer": [{"reference": "Practitioner/dr1"}, {"display": "Nurse"}, {"reference": "Practitioner/x"}],
+            }
+        )
+    return store
+
+
+@pytest.fixture(scope="module")
+def schema() -> Any:
+    return create_schema(FHIRStore())._schema
+
+
+def _client(store: FHIRStore, **settings: Any) -> TestClient:
+    settings = FHIRServerSettings(patients=0, enable_docs=False, enable_ui=False, api_base_path="", **settings)
+    return TestClient(create_app(settings=settings, store=store))
+
+
+def _query(client: TestClient, query: str, **variables: Any) -> dict[str, Any]:
+    response = client.post("/$graphql", json={"query": query, "variables": variables})
+    assert response.status_code == 200
+    return response.json()
+
+
+class TestReferenceLoader:
+    """Tests for per-request batching and caching of reference resolution."""
+
+    @pytest.mark.parametrize(
+        ("reference", "reference_type", "key"),
+        [
+            ("Patient/1", None, "Patient/1"),
+            ("http://example.org/fhir/Patient/1", None, "Patient/1"),
+            ("Patient/1/_history/2", None, "Patient/1/_history/2"),
+            ("http://example.org/fhir/Patient/1/_history/2", None, "Patient/1/_history/2"),
+            ("1", "Patient", "Patient/1"),
+            ("1", None, None),
+            ("#contained", None, None),
+        ],
+    )
+    def test_reference_key(self, reference: str, reference_type: str | None, key: str | None) -> None:
+        assert reference_key(reference, reference_type) == key
+
+    def test_one_batch_per_request(self, store: FHIRStore, monkeypatch: pytest.MonkeyPatch) -> None:
+        batches: list[list[str]] = []
+        read_many = store.read_many
+
+        def recording_read_many(refs: list[str]) -> list[dict[str, Any] | None]:
+            batches.append(list(refs))
+            return read_many(refs)
+
+        monkeypatch.setattr(store, "read_many", recording_read_many)
+        client = _client(store)
+        observations = _query(client, OBSERVATION_SUBJECTS)["data"]["observations"]
+        assert [o["reference"]["resource"]["id"] for o in observations] == ["p1", "p2", "p1", "p1"]
+        # Four references to two patients and a version, read in one batch
+        assert batches == [["Patient/p1", "Patient/p2", "Patient/p1/_history/1"]]
+
+        # Nothing is cached across requests
+        store.update("Patient", "p2", {"resourceType": "Patient", "id": "p2", "gender": "unknown"})
+        observations = _query(client, OBSERVATION_SUBJECTS)["data"]["observations"]
+        assert observations[1]["reference"]["resource"]["gender"] == "unknown"
+        assert len(batches) == 2
+
+    def test_versioned_references(self, store: FHIRStore) -> None:
+        store.update("Patient", "p1", {"resourceType": "Patient", "id": "p1", "gender": "other"})
+        observations = _query(_client(store), OBSERVATION_SUBJECTS)["data"]["observations"]
+        assert [o["reference"]["resource"]["gender"] for o in observations] == ["other", "male", "other", "female"]
+        assert observations[3]["reference"]["resource"]["meta"]["versionId"] == "1"
+
+        store.create(
+            {
+                "resourceType": "Observation",
+                "id": "o4",
+                "status": "final",
+                "subject": {"reference": "Patient/p1/_history/9"},
+            }
+        )
+        query = '{ observation(id: "o4") { reference(path: "subject") { resource(optional: true) } } }'
+        assert _query(_client(store), query)["data"]["observation"]["reference"]["resource"] is None
+
+    def test_references_and_missing_targets(self, store: FHIRStore) -> None:
+        query = """
+        {
+            observation(id: "o0") {
+                references(path: "performer") { reference resource(optional: true) }
+            }
+        }
+        """
+        performers = _query(_client(store), query)["data"]["observation"]["references"]
+        assert [(p["reference"], p["resource"] and p["resource"]["id"]) for p in performers] == [
+            ("Practitioner/dr1", "dr1"),
+            ("Practitioner/x", None),
+        ]
+
+        result = _query(_client(store), query.replace("(optional: true)", ""))
+        assert result["errors"][0]["message"] == "Reference not found: Practitioner/x"
+
+    def test_references_at(self) -> None:
+        encounter = {
+            "participant": [
+                {"individual": {"reference": "Practitioner/1"}},
+                {"type": [{"text": "attender"}]},
+                {"individual": {"reference": "Practitioner/2"}},
+            ],
+            "subject": {"display": "No reference"},
+        }
+        assert references_at(encounter, "participant.individual") == [
+            {"reference": "Practitioner/1"},
+            {"reference": "Practitioner/2"},
+        ]
+        assert references_at(encounter, "subject") == []
+        assert references_at(encounter, "participant.type.text") == []
+
+
+class TestQueryCost:
+    """Tests for the estimated cost of queries and its limit."""
+
+    @pytest.mark.parametrize(
+        ("query", "cost"),
+        [
+            ('{ patient(id: "1") { id data } }', 3),
+            ("{ patients(_count: 20) { id } }", 21),
+            # The default _count is 100
+            ("{ patients { id data } }", 201),
+            ('{ observations(_count: 1000) { id reference(path: "subject") { resource } } }', 3001),
+            ("{ patientConnection(first: 50) { edges { node { id } } pageInfo { hasNextPage } } }", 104),
+            # Connections without first or last return 10 items
+            ("{ patientConnection { edges { cursor } } }", 12),
+            ("{ patients(_count: 5) { ...ids } } fragment ids on Resource { id meta { versionId } }", 16),
+        ],
+    )
+    def test_estimate(self, schema: Any, query: str, cost: int) -> None:
+        assert estimate_cost(schema, parse(query)) == cost
+
+    def test_variables_and_operation_name(self, schema: Any) -> None:
+        document = parse(
+            "query Few($n: Int!) { patients(_count: $n) { id } } query Many { observations(_count: 500) { id } }"
+        )
+        assert estimate_cost(schema, document, {"n": 7}, "Few") == 8
+        assert estimate_cost(schema, document, operation_name="Many") == 501
+
+    def test_limit(self, store: FHIRStore) -> None:
+        client = _client(store, graphql_max_cost=1000)
+        query = "query($n: Int!) { patients(_count: $n) { id data } }"
+        result = _query(client, query, n=600)
+        assert result["data"] is None
+        assert result["errors"][0]["message"].startswith("Query cost 1201 exceeds the limit of 1000")
+        assert len(_query(client, query, n=10)["data"]["patients"]) == 2
+
+        # Introspection is not limited by the cost of the types it lists
+        assert "errors" not in _query(client, "{ __schema { types { name fields { name } } } }")
+
+    def test_no_limit(self, store: FHIRStore) -> None:
+        client = _client(store, graphql_max_cost=0)
+        assert len(_query(client, "{ observations(_count: 100000) { id data } }")["data"]["observations"]) == 4
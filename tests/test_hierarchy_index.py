@@ -0,0 +1,207 @@
+"""Tests for the interval-labelled CodeSystem hierarchy index."""
+
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from fhirkit.server.api.app import create_app
+from fhirkit.server.config.settings import FHIRServerSettings
+from fhirkit.server.storage.fhir_store import FHIRStore
+from fhirkit.terminology import HierarchyIndex, InMemoryTerminologyService, SubsumesRequest, ValidateCodeRequest
+
+SYSTEM = "http://example.org/fhir/CodeSystem/findings"
+
+
+def _parent(code: str, *parents: str) -> dict[str, Any]:
+    return {"code": code, "property": [{"code": "parent", "valueCode": parent} for parent in parents]}
+
+
+# disorder
+#   metabolic          infection
+#     diabetes           pneumonia
+#       type-1             viral-pneumonia (also below viral)
+#       type-2         viral
+CONCEPTS: list[dict[str, Any]] = [
+    {
+        "code": "disorder",
+        "display": "Disorder",
+        "concept": [
+            {
+                "code": "metabolic",
+                "concept": [
+                    {
+                        "code": "diabetes",
+                        "display": "Diabetes mellitus",
+                        "concept": [{"code": "type-1"}, {"code": "type-2"}],
+                    }
+                ],
+            },
+            {"code": "infection", "concept": [{"code": "pneumonia"}, {"code": "viral"}]},
+        ],
+    },
+    _parent("viral-pneumonia", "pneumonia", "viral"),
+]
+
+
+@pytest.fixture
+def index() -> HierarchyIndex:
+    return HierarchyIndex(CONCEPTS)
+
+
+class TestHierarchyIndex:
+    """Tests for subsumption and descendant lookups."""
+
+    def test_subsumes_tree(self, index: HierarchyIndex) -> None:
+        assert index.subsumes("disorder", "type-2")
+        assert index.subsumes("diabetes", "diabetes")
+        assert not index.subsumes("type-2", "diabetes")
+        assert not index.subsumes("metabolic", "pneumonia")
+        assert not index.subsumes("unknown", "diabetes")
+
+    def test_polyhierarchy(self, index: HierarchyIndex) -> None:
+        assert index.subsumes("pneumonia", "viral-pneumonia")
+        assert index.subsumes("viral", "viral-pneumonia")
+        assert index.subsumes("infection", "viral-pneumonia")
+        assert index.parents("viral-pneumonia") == ["pneumonia", "viral"]
+        assert index.ancestors("viral-pneumonia") == {"pneumonia", "viral", "infection", "disorder"}
+
+    def test_relationship(self, index: HierarchyIndex) -> None:
+        assert index.relationship("diabetes", "diabetes") == "equivalent"
+        assert index.relationship("diabetes", "type-1") == "subsumes"
+        assert index.relationship("viral-pneumonia", "viral") == "subsumed-by"
+        assert index.relationship("type-1", "type-2") == "not-subsumed"
+
+    def test_descendants(self, index: HierarchyIndex) -> None:
+        assert sorted(index.descendants("diabetes")) == ["type-1", "type-2"]
+        assert sorted(index.descendants("diabetes", include_self=True)) == ["diabetes", "type-1", "type-2"]
+        assert sorted(index.descendants("infection")) == ["pneumonia", "viral", "viral-pneumonia"]
+        assert index.descendants("viral") == ["viral-pneumonia"]
+        assert index.descendants("unknown") == []
+
+    def test_subtree_is_one_interval(self, index: HierarchyIndex) -> None:
+        assert len(index.intervals("metabolic")) == 1
+        assert index.intervals("unknown") == []
+
+    def test_filters(self, index: HierarchyIndex) -> None:
+        assert sorted(index.filter("is-a", "metabolic")) == ["diabetes", "metabolic", "type-1", "type-2"]
+        assert index.filter("descendent-of", "pneumonia") == ["viral-pneumonia"]
+        assert sorted(index.filter("is-not-a", "disorder")) == []
+        assert index.filter("generalizes", "type-1") == ["disorder", "metabolic", "diabetes", "type-1"]
+        with pytest.raises(ValueError):
+            index.filter("regex", "x")
+
+    def test_cycle(self) -> None:
+        index = HierarchyIndex([_parent("a", "b"), _parent("b", "a"), _parent("c", "b")])
+        assert len(index) == 3
+        assert index.subsumes("a", "c")
+        assert index.ancestors("a") == {"b"}
+
+    def test_matches_ancestor_walk(self) -> None:
+        # Every second concept has a second parent, so most labels have several intervals
+        concepts = [_parent("0")]
+        parents: dict[str, list[str]] = {"0": []}
+        for i in range(1, 300):
+            codes = [str((i - 1) // 3)] + ([str(i // 7)] if i % 2 else [])
+            parents[str(i)] = codes
+            concepts.append(_parent(str(i), *codes))
+        index = HierarchyIndex(concepts)
+
+        def ancestors(code: str) -> set[str]:
+            found: set[str] = set()
+            pending = list(parents[code])
+            while pending:
+                parent = pending.pop()
+                if parent not in found:
+                    found.add(parent)
+                    pending.extend(parents[parent])
+            return found
+
+        for code in parents:
+            below = {other for other in parents if code in ancestors(other)}
+            assert sorted(index.descendants(code)) == sorted(below)
+            assert index.ancestors(code) == ancestors(code)
+            assert all(index.subsumes(code, other) == (other in below) for other in parents if other != code)
+
+
+class TestInMemoryTerminologyService:
+    """Tests for subsumption and is-a ValueSets in the in-memory service."""
+
+    @pytest.fixture
+    def service(self) -> InMemoryTerminologyService:
+        service = InMemoryTerminologyService()
+        service.add_code_system_from_json({"resourceType": "CodeSystem", "url": SYSTEM, "concept": CONCEPTS})
+        service.add_value_set_from_json(
+            {
+                "resourceType": "ValueSet",
+                "url": "http://example.org/fhir/ValueSet/infections",
+                "compose": {
+                    "include": [
+                        {"system": SYSTEM, "filter": [{"property": "concept", "op": "is-a", "value": "infection"}]}
+                    ]
+                },
+            }
+        )
+        return service
+
+    def test_subsumes(self, service: InMemoryTerminologyService) -> None:
+        request = SubsumesRequest(codeA="infection", codeB="viral-pneumonia", system=SYSTEM)
+        assert service.subsumes(request).outcome == "subsumes"
+        request = SubsumesRequest(codeA="type-1", codeB="metabolic", system=SYSTEM)
+        assert service.subsumes(request).outcome == "subsumed-by"
+        request = SubsumesRequest(codeA="type-1", codeB="metabolic", system="http://example.org/other")
+        assert service.subsumes(request).outcome == "not-subsumed"
+
+    def test_is_a_value_set(self, service: InMemoryTerminologyService) -> None:
+        url = "http://example.org/fhir/ValueSet/infections"
+        assert service.validate_code(ValidateCodeRequest(url=url, system=SYSTEM, code="viral-pneumonia")).result
+        assert not service.validate_code(ValidateCodeRequest(url=url, system=SYSTEM, code="diabetes")).result
+
+
+class TestStoreExpansion:
+    """Tests for hierarchy filters in $expand and $subsumes of the server."""
+
+    @pytest.fixture
+    def client(self) -> TestClient:
+        store = FHIRStore()
+        store.bulk_load(
+            [
+                {
+                    "resourceType": "CodeSystem",
+                    "id": "findings",
+                    "url": SYSTEM,
+                    "status": "active",
+                    "concept": CONCEPTS,
+                },
+                {
+                    "resourceType": "ValueSet",
+                    "id": "diabetes",
+                    "url": "http://example.org/fhir/ValueSet/diabetes",
+                    "status": "active",
+                    "compose": {
+                        "include": [
+                            {"system": SYSTEM, "filter": [{"property": "concept", "op": "is-a", "value": "diabetes"}]},
+                            {
+                                "system": SYSTEM,
+                                "filter": [{"property": "concept", "op": "descendent-of", "value": "viral"}],
+                            },
+                        ]
+                    },
+                },
+            ]
+        )
+        settings = FHIRServerSettings(patients=0, enable_docs=False, enable_ui=False, api_base_path="")
+        return TestClient(create_app(settings=settings, store=store))
+
+    def test_expand_is_a(self, client: TestClient) -> None:
+        response = client.get("/ValueSet/$expand", params={"url": "http://example.org/fhir/ValueSet/diabetes"})
+        assert response.status_code == 200
+        contains = response.json()["expansion"]["contains"]
+        assert sorted(c["code"] for c in contains) == ["diabetes", "type-1", "type-2", "viral-pneumonia"]
+        assert {c["code"]: c.get("display") for c in contains}["diabetes"] == "Diabetes mellitus"
+
+    def test_subsumes_polyhierarchy(self, client: TestClient) -> None:
+        response = client.get(
+            "/CodeSystem/$subsumes", params={"system": SYSTEM, "codeA": "viral", "codeB": "viral-pneumonia"}
+        )
+        assert response.json()["parameter"][0]["valueCode"] == "subsumes"
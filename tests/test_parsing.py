@@ -0,0 +1,144 @@
+"""Tests for two-stage (SLL then LL) parsing of CQL and FHIRPath.
+
+Also benchmarks parsing the bundled CQL examples and FHIRHelpers against a
+fresh single-stage parser per source, which is how sources were parsed before.
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from antlr4 import CommonTokenStream, InputStream
+
+from fhirkit.engine.cql import CQLEvaluator
+from fhirkit.engine.cql import evaluator as cql_evaluator_module
+from fhirkit.engine.exceptions import CQLError, FHIRPathError
+from fhirkit.engine.fhirpath import FHIRPathEvaluator
+from fhirkit.engine.fhirpath import evaluator as fhirpath_evaluator_module
+from fhirkit.engine.parsing import TwoStageParser
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "generated" / "cql"))
+
+from cqlLexer import cqlLexer  # noqa: E402
+from cqlParser import cqlParser  # noqa: E402
+
+EXAMPLES_DIR = Path(__file__).parent.parent / "src" / "fhirkit" / "server" / "cql_examples"
+FHIR_HELPERS = Path(__file__).parent.parent / "src" / "fhirkit" / "engine" / "cql" / "builtins" / "FHIRHelpers.cql"
+
+
+def _sources() -> list[str]:
+    sources = [path.read_text(encoding="utf-8") for path in sorted(EXAMPLES_DIR.rglob("*.cql"))]
+    sources.append(FHIR_HELPERS.read_text(encoding="utf-8"))
+    return sources
+
+
+def _single_stage_parse(source: str) -> cqlParser.LibraryContext:
+    parser = cqlParser(CommonTokenStream(cqlLexer(InputStream(source))))
+    parser.removeErrorListeners()
+    parser.addErrorListener(cql_evaluator_module.CQLErrorListener())
+    return parser.library()
+
+
+class TestTwoStageParser:
+    """Tests for TwoStageParser."""
+
+    def test_valid_input_uses_sll(self) -> None:
+        parser = TwoStageParser(cqlLexer, cqlParser, cql_evaluator_module.CQLErrorListener)
+        tree = parser.parse("1 + 2 * 3", "expression")
+        assert tree.getText() == "1+2*3"
+        assert (parser.sll_parses, parser.ll_parses) == (1, 0)
+
+    def test_syntax_errors_fall_back_to_ll_and_raise(self) -> None:
+        parser = TwoStageParser(cqlLexer, cqlParser, cql_evaluator_module.CQLErrorListener)
+        with pytest.raises(CQLError, match="Syntax error"):
+            parser.parse("define X: (1 +", "library")
+        assert parser.sll_parses == 0
+        # The reused instances recover for the next parse
+        assert parser.parse("define X: 1", "library").getText().startswith("defineX")
+
+    def test_instances_are_reused(self) -> None:
+        parser = TwoStageParser(cqlLexer, cqlParser, cql_evaluator_module.CQLErrorListener)
+        first = parser.parse("1", "expression")
+        second = parser.parse("'a' + 'b'", "expression")
+        assert first.getText() == "1"
+        assert second.getText() == "'a'+'b'"
+        assert first.start.line == second.start.line == 1
+
+    def test_thread_safety(self) -> None:
+        parser = TwoStageParser(cqlLexer, cqlParser, cql_evaluator_module.CQLErrorListener)
+        errors: list[str] = []
+
+        def work(i: int) -> None:
+            for j in range(20):
+                text = f"{i} + {j} * 2"
+                if parser.parse(text, "expression").getText() != text.replace(" ", ""):
+                    errors.append(text)
+
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+
+
+class TestEvaluatorParsing:
+    """The evaluators parse through the shared two-stage parsers."""
+
+    def test_cql_results_and_errors(self) -> None:
+        evaluator = CQLEvaluator()
+        assert evaluator.evaluate_expression("Length('abc') + 1") == 4
+        with pytest.raises(CQLError):
+            evaluator.compile("library Broken define X: (")
+
+    def test_fhirpath_results_and_errors(self) -> None:
+        evaluator = FHIRPathEvaluator()
+        assert evaluator.evaluate("name.given.first()", {"resourceType": "Patient", "name": [{"given": ["A"]}]}) == [
+            "A"
+        ]
+        with pytest.raises(FHIRPathError):
+            evaluator.evaluate("name.where(", {})
+
+    def test_warm_up(self) -> None:
+        cql_evaluator_module.warm_up_parser()
+        fhirpath_evaluator_module.warm_up_parser()
+        assert cql_evaluator_module._parser.sll_parses > 0
+        assert fhirpath_evaluator_module._parser.sll_parses > 0
+
+
+class TestParseBenchmark:
+    """Parse the bundled CQL examples and FHIRHelpers."""
+
+    def test_examples_parse_identically(self) -> None:
+        parser = TwoStageParser(cqlLexer, cqlParser, cql_evaluator_module.CQLErrorListener)
+        for source in _sources()[:5]:
+            assert parser.parse(source, "library").toStringTree(recog=None) == _single_stage_parse(source).toStringTree(
+                recog=None
+            )
+
+    def test_examples_parse_in_sll_mode(self) -> None:
+        # SLL prediction is the fast path; none of the examples need the full LL fallback
+        parser = TwoStageParser(cqlLexer, cqlParser, cql_evaluator_module.CQLErrorListener)
+        sources = _sources()
+        for source in sources:
+            parser.parse(source, "library")
+        assert (parser.sll_parses, parser.ll_parses) == (len(sources), 0)
+
+    @pytest.mark.benchmark
+    def test_two_stage_is_faster(self) -> None:
+        sources = _sources()
+        cql_evaluator_module.warm_up_parser()
+
+        start = time.perf_counter()
+        for source in sources:
+            cql_evaluator_module._parser.parse(source, "library")
+        two_stage_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for source in sources:
+            _single_stage_parse(source)
+        single_stage_time = time.perf_counter() - start
+
+        assert two_stage_time < single_stage_time
@@ -0,0 +1,241 @@
+"""Tests for the Patient blocking-key index, $match candidates and duplicate detection."""
+
+import json
+import random
+from pathlib import Path
+from typing import Any
+
+import pytest
+from typer.testing import CliRunner
+
+from fhirkit.server.operations import DuplicateFinder, PatientMatcher
+from fhirkit.server.operations.dedup import iter_patients, write_ndjson
+from fhirkit.server.storage.fhir_store import FHIRStore, TransactionError
+from fhirkit.server.storage.match_index import blocking_keys, soundex
+from fhirkit.server_cli import app
+
+cli = CliRunner()
+
+
+def _patient(patient_id: str, family: str, given: str, birth_date: str | None = None, **fields: Any) -> dict[str, Any]:
+    patient: dict[str, Any] = {
+        "resourceType": "Patient",
+        "id": patient_id,
+        "name": [{"family": family, "given": [given]}],
+        **fields,
+    }
+    if birth_date:
+        patient["birthDate"] = birth_date
+    return patient
+
+
+@pytest.fixture
+def store() -> FHIRStore:
+    store = FHIRStore()
+    store.bulk_load(
+        [
+            _patient("p1", "Smith", "John", "1980-04-02", gender="male"),
+            _patient("p2", "Smyth", "Jon", "1980-04-02", gender="male"),
+            _patient("p3", "Smith", "Anna", "1975-01-01"),
+            _patient("p4", "Jones", "Mary", "1980-09-09", telecom=[{"system": "phone", "value": "+1 (555) 010-2030"}]),
+            _patient("p5", "Brown", "Lee", "1990-02-02", identifier=[{"system": "urn:mrn", "value": "A-17"}]),
+        ]
+    )
+    return store
+
+
+def _ids(patients: list[dict[str, Any]]) -> list[str]:
+    return [p["id"] for p in patients]
+
+
+class TestBlockingKeys:
+    """Tests for the phonetic code and the blocking keys of a patient."""
+
+    @pytest.mark.parametrize(
+        ("name", "code"),
+        [
+            ("Robert", "R163"),
+            ("Rupert", "R163"),
+            ("Ashcraft", "A261"),
+            ("Tymczak", "T522"),
+            ("Pfister", "P236"),
+            ("Lee", "L000"),
+            ("Müller", "M460"),
+            ("O'Brien", "O165"),
+            ("123", ""),
+        ],
+    )
+    def test_soundex(self, name: str, code: str) -> None:
+        assert soundex(name) == code
+
+    def test_keys(self) -> None:
+        patient = _patient(
+            "p",
+            "Smith",
+            "John",
+            "1980-04-02",
+            identifier=[{"system": "urn:mrn", "value": "a-17 "}],
+            telecom=[{"system": "phone", "value": "+1 (555) 010-2030"}, {"system": "email", "value": "J@X.org"}],
+            address=[{"postalCode": "12345-6789"}],
+        )
+        assert blocking_keys(patient) == {
+            "identifier:urn:mrn|a17",
+            "family:S530",
+            "family:S530:1980",
+            "given:J500:1980",
+            "phone:5550102030",
+            "email:j@x.org",
+            "postal:123456789",
+        }
+        assert "family:S530" not in blocking_keys(patient, broad=False)
+        assert blocking_keys(_patient("p", "Smith", "John")) == {"family:S530", "family:S530:-"}
+        assert blocking_keys({"resourceType": "Patient", "gender": "male"}) == set()
+
+
+class TestMatchCandidates:
+    """Tests for $match candidates from the store's match index."""
+
+    def test_phonetic_name_and_birth_year(self, store: FHIRStore) -> None:
+        assert _ids(store.match_candidates(_patient("x", "Smithe", "Johnny", "1980-12-31"))) == ["p1", "p2"]
+        # Without a birth date, the family name alone
+        assert _ids(store.match_candidates(_patient("x", "Smith", "Zed"))) == ["p1", "p2", "p3"]
+        # Given name and birth year, with another family name
+        assert _ids(store.match_candidates(_patient("x", "Doe", "Mery", "1980-01-01"))) == ["p4"]
+
+    def test_without_birth_date(self, store: FHIRStore) -> None:
+        store.create(_patient("p6", "Smith", "John"))
+        query = _patient("x", "Smith", "John", "1980-01-01")
+        assert _ids(store.match_candidates(query)) == ["p1", "p2", "p6"]
+        bundle = PatientMatcher(store).match(query)
+        assert [(e["resource"]["id"], round(e["search"]["score"], 3)) for e in bundle["entry"]] == [
+            ("p1", 0.667),
+            ("p6", 0.667),
+        ]
+
+    def test_identifier_and_phone(self, store: FHIRStore) -> None:
+        patient = {"resourceType": "Patient", "identifier": [{"system": "urn:mrn", "value": "a17"}]}
+        assert _ids(store.match_candidates(patient)) == ["p5"]
+        patient = {"resourceType": "Patient", "telecom": [{"system": "phone", "value": "555-010-2030"}]}
+        assert _ids(store.match_candidates(patient)) == ["p4"]
+
+    def test_without_keys_all_patients(self, store: FHIRStore) -> None:
+        assert len(store.match_candidates({"resourceType": "Patient", "gender": "male"})) == 5
+
+    def test_follows_writes(self, store: FHIRStore) -> None:
+        patient = _patient("x", "Smith", "John", "1980-04-02")
+        assert _ids(store.match_candidates(patient)) == ["p1", "p2"]
+        store.update("Patient", "p1", _patient("p1", "Smith", "John", "1981-04-02"))
+        store.delete("Patient", "p2")
+        store.create(_patient("p6", "Smitt", "Jack", "1980-05-05"))
+        assert _ids(store.match_candidates(patient)) == ["p6"]
+
+    def test_rollback(self, store: FHIRStore) -> None:
+        patient = _patient("x", "Jones", "Mary", "1980-09-09")
+        store.match_candidates(patient)
+        with pytest.raises(TransactionError):
+            with store.transaction():
+                store.delete("Patient", "p4")
+                raise RuntimeError("failed")
+        assert _ids(store.match_candidates(patient)) == ["p4"]
+
+    def test_match(self, store: FHIRStore) -> None:
+        bundle = PatientMatcher(store).match(_patient("x", "Smith", "John", "1980-04-02", gender="male"))
+        # p2 is a candidate, but Smyth and Jon score too low to match Smith and John
+        assert [e["resource"]["id"] for e in bundle["entry"]] == ["p1"]
+        assert bundle["entry"][0]["search"]["extension"][0]["valueCode"] == "certain"
+
+    def test_score_and_grade(self) -> None:
+        matcher = PatientMatcher()
+        score = matcher.score(_patient("a", "Smith", "John", "1980-04-02"), _patient("b", "Smith", "John"))
+        assert score == pytest.approx(50 / 75)
+        assert matcher.grade(score) == "possible"
+        assert matcher.grade(matcher.score(_patient("a", "Smith", "John"), _patient("b", "Smith", "John"))) == "certain"
+
+    def test_scores_candidates_only(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        rng = random.Random(3)
+        families = [f"Family{chr(65 + i % 26)}{chr(65 + i // 26 % 26)}" for i in range(2000)]
+        patients = [
+            _patient(f"p{i}", rng.choice(families), f"Given{i % 300}", f"{1930 + i % 90}-01-01", gender="female")
+            for i in range(20000)
+        ]
+        store = FHIRStore()
+        store.bulk_load(patients)
+        matcher = PatientMatcher(store)
+        query = _patient("x", patients[123]["name"][0]["family"], "Given123", "1953-01-01", gender="female")
+        best = max(matcher.score(query, p) for p in store.get_all_resources("Patient"))
+
+        scored: list[dict[str, Any]] = []
+        score = matcher.score
+
+        def counting_score(input_patient: dict[str, Any], candidate: dict[str, Any]) -> float:
+            scored.append(candidate)
+            return score(input_patient, candidate)
+
+        monkeypatch.setattr(matcher, "score", counting_score)
+        bundle = matcher.match(query)
+        assert bundle["entry"][0]["search"]["score"] == best == 1.0
+        # The patients sharing a name and birth year block, instead of all 20000
+        assert 0 < len(scored) < 500
+
+
+class TestDuplicateFinder:
+    """Tests for blocked duplicate detection over a population."""
+
+    @pytest.fixture
+    def population(self) -> list[dict[str, Any]]:
+        return [
+            _patient("a1", "Smith", "John", "1980-04-02", gender="male", address=[{"postalCode": "12345"}]),
+            _patient("a2", "Smith", "Johnny", "1980-04-02", gender="male", address=[{"postalCode": "12345"}]),
+            _patient("b1", "Jones", "Mary", "1975-03-03", identifier=[{"system": "urn:mrn", "value": "9"}]),
+            _patient("b2", "Evans", "Kate", "1999-09-09", identifier=[{"system": "urn:mrn", "value": "9"}]),
+            _patient("c1", "Brown", "Lee", "1990-02-02", address=[{"postalCode": "12345"}]),
+            {"resourceType": "Patient", "name": [{"family": "Smith", "given": ["John"]}], "birthDate": "1980-04-02"},
+        ]
+
+    def test_pairs(self, population: list[dict[str, Any]]) -> None:
+        pairs = list(DuplicateFinder(threshold=0.8).run(population))
+        assert sorted((p.patient_a, p.patient_b, p.grade) for p in pairs) == [
+            ("a1", "a2", "probable"),
+            ("b1", "b2", "certain"),
+        ]
+        # a1 and a2 share their family name, birth year and postal code keys, but are compared once
+        assert len(pairs) == 2
+
+    def test_large_blocks_skipped(self, population: list[dict[str, Any]]) -> None:
+        finder = DuplicateFinder(threshold=0.0, max_block_size=2)
+        pairs = {(p.patient_a, p.patient_b) for p in finder.run(population)}
+        # The postal code block of a1, a2 and c1 is left out, the name blocks are not
+        assert pairs == {("a1", "a2"), ("b1", "b2")}
+        assert finder.skipped_blocks == 1
+
+    def test_same_pairs_with_workers(self) -> None:
+        rng = random.Random(5)
+        population = []
+        for i in range(600):
+            patient = _patient(f"p{i}", f"Name{i % 150}", f"Given{i % 7}", f"{1950 + i % 40}-01-01")
+            population.append(patient)
+            if rng.random() < 0.1:
+                population.append({**patient, "id": f"d{i}"})
+        serial = [p.to_row() for p in DuplicateFinder().run(population)]
+        parallel = [p.to_row() for p in DuplicateFinder(workers=2, max_pending=1).run(population)]
+        assert parallel == serial
+        assert {row["patientB"] for row in serial} >= {f"Patient/{p['id']}" for p in population if p["id"][0] == "d"}
+
+    def test_cli(self, tmp_path: Path, population: list[dict[str, Any]]) -> None:
+        data = tmp_path / "Patient.ndjson"
+        data.write_text("".join(json.dumps(p) + "\n" for p in population) + "not json\n")
+        assert len(list(iter_patients(data))) == 6
+
+        output = tmp_path / "duplicates.ndjson"
+        result = cli.invoke(app, ["dedup", str(data), "-o", str(output)])
+        assert result.exit_code == 0, result.output
+        rows = [json.loads(line) for line in output.read_text().splitlines()]
+        assert {(row["patientA"], row["patientB"]) for row in rows} == {
+            ("Patient/a1", "Patient/a2"),
+            ("Patient/b1", "Patient/b2"),
+        }
+        assert rows[0].keys() == {"patientA", "patientB", "score", "grade", "key"}
+
+    def test_write_ndjson(self, population: list[dict[str, Any]], tmp_path: Path) -> None:
+        with open(tmp_path / "out.ndjson", "w") as out:
+            assert write_ndjson(DuplicateFinder().run(population), out) == 2
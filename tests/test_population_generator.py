@@ -0,0 +1,133 @@
+"""Tests for sharded, streaming population generation."""
+
+import json
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from typer.testing import CliRunner
+
+from fhirkit.server.generator import PatientRecordGenerator, PopulationGenerator, write_ndjson_by_type
+from fhirkit.server.generator.base import fixed_generation_time, generation_date, generation_time, relative_time
+from fhirkit.server.generator.population import shard_seed
+from fhirkit.server.storage.fhir_store import FHIRStore
+from fhirkit.server_cli import app
+
+REFERENCE_TIME = datetime(2025, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+# Small records keep the tests fast
+RECORD_OPTIONS: dict[str, Any] = {
+    "num_conditions": (1, 1),
+    "num_encounters": (1, 2),
+    "num_observations_per_encounter": (1, 1),
+    "num_medications": (0, 1),
+    "num_procedures": (0, 1),
+}
+
+cli = CliRunner()
+
+
+def _population(**kwargs: Any) -> list[dict[str, Any]]:
+    options = {"seed": 42, "shard_size": 2, "reference_time": REFERENCE_TIME, **RECORD_OPTIONS, **kwargs}
+    return list(PopulationGenerator(5, **options).iter_resources())
+
+
+def _refs(resource: Any) -> list[str]:
+    """Collect the relative references in a resource."""
+    if isinstance(resource, dict):
+        found = [resource["reference"]] if isinstance(resource.get("reference"), str) else []
+        return found + [ref for value in resource.values() for ref in _refs(value)]
+    if isinstance(resource, list):
+        return [ref for item in resource for ref in _refs(item)]
+    return []
+
+
+class TestGenerationTime:
+    """Tests for pinning the generation time."""
+
+    def test_fixed_generation_time(self) -> None:
+        with fixed_generation_time(REFERENCE_TIME):
+            assert generation_time() == REFERENCE_TIME
+            assert generation_date() == REFERENCE_TIME.date()
+        assert generation_time() != REFERENCE_TIME
+
+    def test_relative_time(self) -> None:
+        with fixed_generation_time(REFERENCE_TIME):
+            assert relative_time("now") == REFERENCE_TIME
+            assert relative_time("-30d") == datetime(2025, 5, 2, 12, 0, tzinfo=timezone.utc)
+            assert relative_time("+1h30m") == datetime(2025, 6, 1, 13, 30, tzinfo=timezone.utc)
+
+    def test_seeded_ids_are_reproducible(self) -> None:
+        with fixed_generation_time(REFERENCE_TIME):
+            first = PatientRecordGenerator(seed=7).generate_patient_record(**RECORD_OPTIONS)
+            second = PatientRecordGenerator(seed=7).generate_patient_record(**RECORD_OPTIONS)
+        assert first == second
+
+
+class TestPopulationGenerator:
+    """Tests for PopulationGenerator."""
+
+    def test_patients_and_shards(self) -> None:
+        generator = PopulationGenerator(5, seed=1, shard_size=2)
+        assert [shard.count for shard in generator.shards()] == [2, 2, 1]
+        assert generator.shards()[1].seed == shard_seed(1, 1)
+        counts = Counter(r["resourceType"] for r in _population())
+        assert counts["Patient"] == 5
+        assert counts["Group"] == 1
+        # Shared resources are generated once
+        assert counts["Organization"] == counts["Practitioner"] == counts["Schedule"] == 1
+
+    def test_same_output_for_any_number_of_workers(self) -> None:
+        serial = _population()
+        assert _population(workers=2, max_pending=1) == serial
+
+    def test_seed_changes_output(self) -> None:
+        assert _population(seed=43) != _population()
+
+    def test_ids_unique_and_references_resolve(self) -> None:
+        resources = _population()
+        refs = [f"{r['resourceType']}/{r['id']}" for r in resources]
+        assert len(refs) == len(set(refs))
+        known = set(refs)
+        dangling = {ref for r in resources for ref in _refs(r) if "/" in ref and ref.split("/")[0][:1].isupper()}
+        assert dangling <= known
+
+    def test_slots_are_not_double_booked(self) -> None:
+        resources = _population()
+        slots = [r for r in resources if r["resourceType"] == "Slot"]
+        booked = [ref for r in resources if r["resourceType"] == "Appointment" for ref in _refs(r.get("slot", []))]
+        assert len(booked) == len(set(booked))
+        assert {f"Slot/{s['id']}" for s in slots if s["status"] == "busy"} == set(booked)
+
+    def test_without_terminology_and_group(self) -> None:
+        types = {r["resourceType"] for r in _population(include_terminology=False, include_group=False)}
+        assert not types & {"CodeSystem", "ValueSet", "Group"}
+
+
+class TestPopulationOutput:
+    """Tests for writing and loading generated populations."""
+
+    def test_ndjson_by_type(self, tmp_path: Path) -> None:
+        resources = _population()
+        counts = write_ndjson_by_type(resources, tmp_path / "out")
+        assert counts == Counter(r["resourceType"] for r in resources)
+        patients = [json.loads(line) for line in (tmp_path / "out" / "Patient.ndjson").read_text().splitlines()]
+        assert patients == [r for r in resources if r["resourceType"] == "Patient"]
+
+    def test_bulk_load(self) -> None:
+        store = FHIRStore()
+        resources = _population()
+        assert store.bulk_load(resources) == len(resources)
+        assert store.count("Patient") == 5
+        patient = store.get_all_resources("Patient")[0]
+        assert patient["meta"]["versionId"] == "1"
+        assert store.history("Patient", patient["id"])[0]["id"] == patient["id"]
+
+    def test_populate_command(self, tmp_path: Path) -> None:
+        output = tmp_path / "population"
+        args = ["populate", "-n", "3", "--seed", "42", "--output-dir", str(output), "--shard-size", "2", "--dry-run"]
+        result = cli.invoke(app, args)
+        assert result.exit_code == 0, result.stdout
+        assert len((output / "Patient.ndjson").read_text().splitlines()) == 3
+        assert (output / "Group.ndjson").exists()
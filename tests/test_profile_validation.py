@@ -508,3 +508,122 @@ class TestValidationResult:
         assert len(outcome["issue"]) == 2
         assert outcome["issue"][0]["severity"] == "error"
         assert outcome["issue"][1]["severity"] == "warning"
+
+
+class TestCompiledProfiles:
+    """Tests for compiled, cached validation plans."""
+
+    URL = "http://example.org/fhir/StructureDefinition/coded-observation"
+
+    @pytest.fixture
+    def store(self):
+        store = FHIRStore()
+        store.create(
+            {
+                "resourceType": "ValueSet",
+                "id": "obs-status",
+                "url": "http://example.org/fhir/ValueSet/obs-status",
+                "status": "active",
+                "compose": {
+                    "include": [
+                        {
+                            "system": "http://hl7.org/fhir/observation-status",
+                            "concept": [{"code": "final"}, {"code": "amended"}],
+                        }
+                    ]
+                },
+            }
+        )
+        store.create(
+            {
+                "resourceType": "StructureDefinition",
+                "id": "coded-observation",
+                "url": self.URL,
+                "type": "Observation",
+                "snapshot": {
+                    "element": [
+                        {"id": "Observation", "path": "Observation"},
+                        {
+                            "id": "Observation.status",
+                            "path": "Observation.status",
+                            "min": 1,
+                            "max": "1",
+                            "binding": {
+                                "strength": "required",
+                                "valueSet": "http://example.org/fhir/ValueSet/obs-status",
+                            },
+                        },
+                        {
+                            "id": "Observation.value[x]",
+                            "path": "Observation.value[x]",
+                            "constraint": [
+                                {
+                                    "key": "obs-1",
+                                    "severity": "error",
+                                    "human": "Value must be positive",
+                                    "expression": "value.exists() implies value.value > 0",
+                                }
+                            ],
+                        },
+                    ]
+                },
+            }
+        )
+        return store
+
+    @staticmethod
+    def _observation(**fields):
+        return {"resourceType": "Observation", "status": "final", "code": {"text": "x"}, **fields}
+
+    def test_plan_shared_between_validators(self, store):
+        first = ProfileValidator(store).compile_profile(self.URL)
+        assert first is not None
+        assert ProfileValidator(store).compile_profile(self.URL) is first
+        # Writes of other resource types keep the plan
+        store.create({"resourceType": "Patient"})
+        assert ProfileValidator(store).compile_profile(self.URL) is first
+
+    def test_recompiled_when_profile_changes(self, store):
+        validator = ProfileValidator(store)
+        first = validator.compile_profile(self.URL)
+        profile = store.read("StructureDefinition", "coded-observation")
+        elements = profile["snapshot"]["element"] + [{"id": "Observation.note", "path": "Observation.note", "min": 1}]
+        store.update("StructureDefinition", "coded-observation", {**profile, "snapshot": {"element": elements}})
+
+        second = validator.compile_profile(self.URL)
+        assert second is not first
+        result = validator.validate_against_profile(self._observation(), self.URL)
+        assert [issue.location for issue in result.issues] == ["note"]
+
+    def test_required_binding(self, store):
+        validator = ProfileValidator(store)
+        assert validator.validate_against_profile(self._observation(status="amended"), self.URL).valid
+        result = validator.validate_against_profile(self._observation(status="unknown"), self.URL)
+        assert not result.valid
+        assert result.issues[0].code == "code-invalid"
+
+    def test_constraints(self, store):
+        validator = ProfileValidator(store)
+        observation = self._observation(valueQuantity={"value": 5})
+        assert validator.validate_against_profile(observation, self.URL).valid
+        result = validator.validate_against_profile(self._observation(valueQuantity={"value": -1}), self.URL)
+        assert [issue.code for issue in result.issues] == ["invariant"]
+
+    def test_validate_profiles_on_write(self, store):
+        from fastapi.testclient import TestClient
+
+        from fhirkit.server.api.app import create_app
+        from fhirkit.server.config.settings import FHIRServerSettings
+
+        settings = FHIRServerSettings(
+            patients=0, enable_docs=False, enable_ui=False, api_base_path="", validate_profiles_on_write=True
+        )
+        client = TestClient(create_app(settings=settings, store=store))
+        meta = {"profile": [self.URL]}
+
+        response = client.post("/Observation", json=self._observation(status="unknown", meta=meta))
+        assert response.status_code == 422
+        assert response.json()["issue"][0]["code"] == "code-invalid"
+        assert client.post("/Observation", json=self._observation(meta=meta)).status_code == 201
+        # Resources without profiles are not checked
+        assert client.post("/Observation", json=self._observation(status="unknown")).status_code == 201
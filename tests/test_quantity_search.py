@@ -0,0 +1,161 @@
+"""Tests for unit-aware quantity search and the canonical quantity index."""
+
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+
+from fhirkit.engine.types import Quantity
+from fhirkit.server.api.app import create_app
+from fhirkit.server.api.search import filter_resources
+from fhirkit.server.config.settings import FHIRServerSettings
+from fhirkit.server.storage.fhir_store import FHIRStore, TransactionError
+from fhirkit.server.storage.quantity_index import QuantityIndex, QuantitySearch
+
+UCUM = "http://unitsofmeasure.org"
+
+
+def _observation(obs_id: str, value: float, code: str, system: str | None = UCUM) -> dict:
+    quantity = {"value": value, "unit": code, "code": code}
+    if system:
+        quantity["system"] = system
+    return {"resourceType": "Observation", "id": obs_id, "status": "final", "valueQuantity": quantity}
+
+
+OBSERVATIONS = [
+    _observation("glucose-mg", 99, "mg/dL"),
+    _observation("glucose-g", 1.2, "g/L"),
+    _observation("glucose-low", 0.7, "g/L"),
+    _observation("potassium", 5.4, "mmol/L"),
+    _observation("potassium-high", 6.1, "mmol/L"),
+    _observation("pressure", 140, "mmHg", system=None),
+    _observation("temperature", 98.6, "[degF]"),
+]
+
+
+@pytest.fixture
+def store() -> FHIRStore:
+    store = FHIRStore()
+    for observation in OBSERVATIONS:
+        store.create(dict(observation, valueQuantity=dict(observation["valueQuantity"])))
+    return store
+
+
+def _ids(store: FHIRStore, value: str | list[str]) -> set[str]:
+    resources, _ = store.search("Observation", {"value-quantity": value})
+    return {r["id"] for r in resources}
+
+
+class TestQuantitySearchValue:
+    """Tests for parsing quantity search values."""
+
+    def test_parse(self) -> None:
+        search = QuantitySearch.parse("gt5.4|http://unitsofmeasure.org|mmol/L")
+        assert search == QuantitySearch("gt", Decimal("5.4"), UCUM, "mmol/L")
+        assert QuantitySearch.parse("5.4||mg") == QuantitySearch("eq", Decimal("5.4"), None, "mg")
+        assert QuantitySearch.parse("abc") is None
+
+    def test_implied_precision(self) -> None:
+        search_range = QuantitySearch.parse("5.4").range()
+        assert search_range.contains(Decimal("5.35"))
+        assert search_range.contains(Decimal("5.449"))
+        assert not search_range.contains(Decimal("5.45"))
+
+
+class TestQuantityIndexSearch:
+    """Tests for FHIRStore quantity search through the index."""
+
+    def test_canonical_range_scan(self, store: FHIRStore) -> None:
+        # 99 mg/dL = 0.99 g/L
+        assert _ids(store, f"gt0.8|{UCUM}|g/L") == {"glucose-mg", "glucose-g"}
+        assert _ids(store, f"lt100|{UCUM}|mg/dL") == {"glucose-mg", "glucose-low"}
+
+    def test_equality_uses_precision(self, store: FHIRStore) -> None:
+        assert _ids(store, f"99|{UCUM}|mg/dL") == {"glucose-mg"}
+        assert _ids(store, f"0.99|{UCUM}|g/L") == {"glucose-mg"}
+        assert _ids(store, f"ne5.4|{UCUM}|mmol/L") == {"potassium-high"}
+
+    def test_incompatible_dimensions_do_not_match(self, store: FHIRStore) -> None:
+        # Amount-of-substance concentrations are not comparable to mass concentrations
+        assert _ids(store, f"gt0|{UCUM}|mg/dL") == {"glucose-mg", "glucose-g", "glucose-low"}
+        assert _ids(store, f"gt5.4|{UCUM}|mmol/L") == {"potassium-high"}
+
+    def test_offset_units(self, store: FHIRStore) -> None:
+        assert _ids(store, f"ap37|{UCUM}|Cel") == {"temperature"}
+
+    def test_without_units(self, store: FHIRStore) -> None:
+        assert _ids(store, "140") == {"pressure"}
+        assert _ids(store, "ge99") == {"glucose-mg", "pressure"}
+
+    def test_non_ucum_units_match_by_code(self, store: FHIRStore) -> None:
+        assert _ids(store, "140||mmHg") == {"pressure"}
+        assert _ids(store, "140||mm") == set()
+
+    def test_or_values(self, store: FHIRStore) -> None:
+        assert _ids(store, [f"6.1|{UCUM}|mmol/L", "140||mmHg"]) == {"potassium-high", "pressure"}
+        assert _ids(store, "5.4,6.1") == {"potassium", "potassium-high"}
+
+    def test_component_values(self, store: FHIRStore) -> None:
+        store.create(
+            {
+                "resourceType": "Observation",
+                "id": "bp",
+                "component": [
+                    {"valueQuantity": {"value": 120, "system": UCUM, "code": "mm[Hg]"}},
+                    {"valueQuantity": {"value": 80, "system": UCUM, "code": "mm[Hg]"}},
+                ],
+            }
+        )
+        resources, _ = store.search("Observation", {"component-value-quantity": f"lt90|{UCUM}|mm[Hg]"})
+        assert [r["id"] for r in resources] == ["bp"]
+
+    def test_index_follows_writes(self, store: FHIRStore) -> None:
+        store.update("Observation", "potassium", _observation("potassium", 3.1, "mmol/L"))
+        assert _ids(store, f"lt4|{UCUM}|mmol/L") == {"potassium"}
+        assert _ids(store, f"5.4|{UCUM}|mmol/L") == set()
+
+        store.delete("Observation", "potassium")
+        assert _ids(store, f"lt4|{UCUM}|mmol/L") == set()
+
+    def test_rollback_restores_index(self, store: FHIRStore) -> None:
+        with pytest.raises(TransactionError):
+            with store.transaction():
+                store.update("Observation", "potassium", _observation("potassium", 3.1, "mmol/L"))
+                raise RuntimeError("fail")
+        assert _ids(store, f"5.4|{UCUM}|mmol/L") == {"potassium"}
+
+    def test_index_entries_are_replaced(self) -> None:
+        index = QuantityIndex()
+        index.add(_observation("a", 1, "mg"))
+        index.add(_observation("a", 2, "mg"))
+        assert len(index) == 1
+        assert index.search("Observation", "value-quantity", [f"2|{UCUM}|mg"]) == {"Observation/a"}
+
+
+class TestQuantityFilter:
+    """Tests for quantity matching outside the store index."""
+
+    def test_filter_resources_converts_units(self) -> None:
+        matched = filter_resources(OBSERVATIONS, "Observation", {"value-quantity": f"gt0.8|{UCUM}|g/L"})
+        assert {r["id"] for r in matched} == {"glucose-mg", "glucose-g"}
+
+    def test_rest_search(self, store: FHIRStore) -> None:
+        settings = FHIRServerSettings(patients=0, enable_docs=False, enable_ui=False, api_base_path="")
+        client = TestClient(create_app(settings=settings, store=store))
+        response = client.get("/Observation", params={"value-quantity": f"gt5.4|{UCUM}|mmol/L"})
+        assert response.status_code == 200
+        assert [entry["resource"]["id"] for entry in response.json()["entry"]] == ["potassium-high"]
+
+
+class TestQuantityComparison:
+    """Tests for cross-unit Quantity comparison."""
+
+    def test_compatible_units(self) -> None:
+        assert Quantity(value=Decimal("1"), unit="g") == Quantity(value=Decimal("1000"), unit="mg")
+        assert Quantity(value=Decimal("180"), unit="mg/dL") > Quantity(value=Decimal("1.7"), unit="g/L")
+        assert Quantity(value=Decimal("60"), unit="/min") == Quantity(value=Decimal("1"), unit="/s")
+
+    def test_incompatible_units(self) -> None:
+        assert Quantity(value=Decimal("1"), unit="mg") != Quantity(value=Decimal("1"), unit="mmol")
+        with pytest.raises(TypeError):
+            _ = Quantity(value=Decimal("1"), unit="mg") < Quantity(value=Decimal("1"), unit="mmol")
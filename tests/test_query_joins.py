@@ -0,0 +1,266 @@
+"""Tests for query planning and hash joins in CQL and ELM queries."""
+
+from decimal import Decimal
+from typing import Any
+
+import pytest
+
+from fhirkit.engine.cql import CQLEvaluator, InMemoryDataSource
+from fhirkit.engine.cql.visitor import CQLEvaluatorVisitor
+from fhirkit.engine.elm import ELMEvaluator, ELMLoader
+from fhirkit.engine.elm.executable import get_executable
+from fhirkit.engine.elm.visitor import ELMExpressionVisitor
+from fhirkit.engine.joins import JoinIndex
+
+ENCOUNTERS = 40
+
+
+def _data_source() -> InMemoryDataSource:
+    """Encounters, of which the even ones have a Condition pointing at them."""
+    data_source = InMemoryDataSource()
+    for i in range(ENCOUNTERS):
+        data_source.add_resource({"resourceType": "Encounter", "id": f"e{i}", "status": "finished"})
+        if i % 2 == 0:
+            data_source.add_resource(
+                {
+                    "resourceType": "Condition",
+                    "id": f"c{i}",
+                    "encounter": {"reference": f"Encounter/e{i}"},
+                }
+            )
+    # A condition without an encounter never matches
+    data_source.add_resource({"resourceType": "Condition", "id": "orphan"})
+    return data_source
+
+
+class TestJoinIndex:
+    """Tests for JoinIndex."""
+
+    def test_candidates_by_key(self) -> None:
+        items = [{"k": "a"}, {"k": "b"}, {"k": "a"}]
+        index = JoinIndex(items, lambda item: item["k"])
+        assert list(index.candidates("a")) == [items[0], items[2]]
+        assert list(index.candidates("c")) == []
+        assert len(index) == 3
+
+    def test_null_keys_and_probes_never_match(self) -> None:
+        index = JoinIndex([{"k": None}, {"k": "a"}], lambda item: item["k"])
+        assert list(index.candidates(None)) == []
+        assert list(index.candidates("a")) == [{"k": "a"}]
+
+    def test_numbers_share_buckets(self) -> None:
+        index = JoinIndex([1, Decimal("2.0")], lambda item: item)
+        assert list(index.candidates(Decimal("1.0"))) == [1]
+        assert list(index.candidates(2)) == [Decimal("2.0")]
+
+    def test_unhashable_values_fall_back_to_scan(self) -> None:
+        items = [{"k": ["a"]}, {}, {"k": "b"}]
+        index = JoinIndex(items, lambda item: item["k"])
+        # Items whose key is a list or fails to evaluate are always candidates
+        assert list(index.candidates("b")) == [items[2], items[0], items[1]]
+        # Probes that cannot be hashed are checked against every item
+        assert list(index.candidates({"x": 1})) == items
+
+
+class TestCQLQueryJoins:
+    """CQL with/without clauses and where pushdown."""
+
+    LIBRARY = """
+        library Joins version '1.0'
+        using FHIR version '4.0.1'
+
+        define "With Condition":
+            [Encounter] E
+              with [Condition] C such that C.encounter.reference = 'Encounter/' + E.id
+
+        define "Without Condition":
+            [Encounter] E
+              without [Condition] C such that 'Encounter/' + E.id = C.encounter.reference
+
+        define "Correlated":
+            ({ Tuple { id: 1, tags: { 'a', 'b' } }, Tuple { id: 2, tags: { 'c' } } }) T
+              with (T.tags) X such that X = 'b'
+              return T.id
+
+        define "Pairs":
+            from ({1, 2, 3, 4}) A, ({2, 3, 4, 5}) B
+              where A > 2 and B < 4 and A + B > 5
+              return Tuple { a: A, b: B }
+    """
+
+    def _evaluator(self) -> CQLEvaluator:
+        evaluator = CQLEvaluator(data_source=_data_source())
+        evaluator.compile(self.LIBRARY)
+        return evaluator
+
+    def test_with_and_without(self) -> None:
+        evaluator = self._evaluator()
+        with_ids = [e["id"] for e in evaluator.evaluate_definition("With Condition")]
+        without_ids = [e["id"] for e in evaluator.evaluate_definition("Without Condition")]
+        assert with_ids == [f"e{i}" for i in range(0, ENCOUNTERS, 2)]
+        assert without_ids == [f"e{i}" for i in range(1, ENCOUNTERS, 2)]
+
+    def test_join_is_not_nested_loop(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        evaluator = self._evaluator()
+        calls = 0
+        equality_operation = CQLEvaluatorVisitor._equality_operation
+
+        def counting(self: CQLEvaluatorVisitor, op: str, left: Any, right: Any) -> bool | None:
+            nonlocal calls
+            calls += 1
+            return equality_operation(self, op, left, right)
+
+        monkeypatch.setattr(CQLEvaluatorVisitor, "_equality_operation", counting)
+        evaluator.evaluate_definition("With Condition")
+        # A nested loop compares each encounter with every condition until a match
+        assert calls <= ENCOUNTERS
+
+    def test_correlated_source_is_evaluated_per_row(self) -> None:
+        assert self._evaluator().evaluate_definition("Correlated") == [1]
+
+    def test_where_pushdown(self) -> None:
+        pairs = self._evaluator().evaluate_definition("Pairs")
+        assert [(pair.elements["a"], pair.elements["b"]) for pair in pairs] == [(3, 3), (4, 2), (4, 3)]
+
+
+def _retrieve(resource_type: str) -> dict[str, Any]:
+    return {"type": "Retrieve", "dataType": f"{{http://hl7.org/fhir}}{resource_type}"}
+
+
+def _property(path: str, scope: str) -> dict[str, Any]:
+    return {"type": "Property", "path": path, "scope": scope}
+
+
+def _string(value: str) -> dict[str, Any]:
+    return {"type": "Literal", "valueType": "{urn:hl7-org:elm-types:r1}String", "value": value}
+
+
+def _integer(value: int) -> dict[str, Any]:
+    return {"type": "Literal", "valueType": "{urn:hl7-org:elm-types:r1}Integer", "value": str(value)}
+
+
+def _list(*values: int) -> dict[str, Any]:
+    return {"type": "List", "element": [_integer(value) for value in values]}
+
+
+def _encounter_join(relationship_type: str) -> dict[str, Any]:
+    return {
+        "type": "Query",
+        "source": [{"alias": "E", "expression": _retrieve("Encounter")}],
+        "relationship": [
+            {
+                "type": relationship_type,
+                "alias": "C",
+                "expression": _retrieve("Condition"),
+                "suchThat": {
+                    "type": "Equal",
+                    "operand": [
+                        _property("encounter.reference", "C"),
+                        {"type": "Concatenate", "operand": [_string("Encounter/"), _property("id", "E")]},
+                    ],
+                },
+            }
+        ],
+    }
+
+
+ELM_LIBRARY: dict[str, Any] = {
+    "library": {
+        "identifier": {"id": "Joins", "version": "1.0"},
+        "statements": {
+            "def": [
+                {"name": "With Condition", "expression": _encounter_join("With")},
+                {"name": "Without Condition", "expression": _encounter_join("Without")},
+                {
+                    "name": "Pairs",
+                    "expression": {
+                        "type": "Query",
+                        "source": [
+                            {"alias": "A", "expression": _list(1, 2, 3, 4)},
+                            {"alias": "B", "expression": _list(2, 3, 4, 5)},
+                        ],
+                        "where": {
+                            "type": "And",
+                            "operand": [
+                                {
+                                    "type": "And",
+                                    "operand": [
+                                        {
+                                            "type": "Greater",
+                                            "operand": [{"type": "AliasRef", "name": "A"}, _integer(2)],
+                                        },
+                                        {"type": "Less", "operand": [{"type": "AliasRef", "name": "B"}, _integer(4)]},
+                                    ],
+                                },
+                                {
+                                    "type": "Greater",
+                                    "operand": [
+                                        {
+                                            "type": "Add",
+                                            "operand": [
+                                                {"type": "AliasRef", "name": "A"},
+                                                {"type": "AliasRef", "name": "B"},
+                                            ],
+                                        },
+                                        _integer(5),
+                                    ],
+                                },
+                            ],
+                        },
+                        "return": {
+                            "expression": {
+                                "type": "List",
+                                "element": [{"type": "AliasRef", "name": "A"}, {"type": "AliasRef", "name": "B"}],
+                            },
+                            "distinct": False,
+                        },
+                    },
+                },
+            ]
+        },
+    }
+}
+
+
+class TestELMQueryJoins:
+    """ELM relationship clauses and where pushdown."""
+
+    def test_plan(self) -> None:
+        executable = get_executable(ELMLoader.parse(ELM_LIBRARY))
+        join_plan = executable.definitions["With Condition"].plan
+        assert join_plan.relationships[0].lifted
+        assert join_plan.relationships[0].build["path"] == "encounter.reference"
+
+        pairs_plan = executable.definitions["Pairs"].plan
+        assert set(pairs_plan.source_filters) == {"A", "B"}
+        assert len(pairs_plan.where) == 1
+
+    @pytest.mark.parametrize("lower", [True, False])
+    def test_with_and_without(self, lower: bool) -> None:
+        evaluator = ELMEvaluator(data_source=_data_source(), lower=lower)
+        evaluator.load(ELM_LIBRARY)
+        with_ids = [e["id"] for e in evaluator.evaluate_definition("With Condition")]
+        without_ids = [e["id"] for e in evaluator.evaluate_definition("Without Condition")]
+        assert with_ids == [f"e{i}" for i in range(0, ENCOUNTERS, 2)]
+        assert without_ids == [f"e{i}" for i in range(1, ENCOUNTERS, 2)]
+
+    @pytest.mark.parametrize("lower", [True, False])
+    def test_where_pushdown(self, lower: bool) -> None:
+        evaluator = ELMEvaluator(lower=lower)
+        evaluator.load(ELM_LIBRARY)
+        assert evaluator.evaluate_definition("Pairs") == [[3, 3], [4, 2], [4, 3]]
+
+    def test_join_is_not_nested_loop(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        calls = 0
+        eval_equal = ELMExpressionVisitor._eval_equal
+
+        def counting(self: ELMExpressionVisitor, node: dict[str, Any]) -> Any:
+            nonlocal calls
+            calls += 1
+            return eval_equal(self, node)
+
+        monkeypatch.setattr(ELMExpressionVisitor, "_eval_equal", counting)
+        evaluator = ELMEvaluator(data_source=_data_source(), lower=False)
+        evaluator.load(ELM_LIBRARY)
+        evaluator.evaluate_definition("With Condition")
+        assert calls <= ENCOUNTERS
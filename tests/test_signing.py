@@ -0,0 +1,81 @@
+"""Tests for the signing key and signatures of pickles written to disk."""
+
+import io
+import os
+from pathlib import Path
+
+import pytest
+
+from fhirkit import signing
+from fhirkit.signing import DIGEST_SIZE, KEY_FILE_ENV, SignedWriter, SigningKeyError, sign, verify, verify_stream
+
+
+@pytest.fixture
+def key_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path / "keys" / "signing.key"
+    monkeypatch.setenv(KEY_FILE_ENV, str(path))
+    monkeypatch.setattr(signing, "_keys", {})
+    return path
+
+
+class TestSigningKey:
+    """Tests for the creation and checks of the key file."""
+
+    def test_created_private(self, key_file: Path) -> None:
+        key = signing.signing_key()
+        assert len(key) == signing.KEY_SIZE
+        assert key_file.read_bytes() == key
+        if os.name == "posix":
+            assert key_file.stat().st_mode & 0o777 == 0o600
+            assert key_file.parent.stat().st_mode & 0o777 == 0o700
+
+    def test_reused(self, key_file: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        key = signing.signing_key()
+        monkeypatch.setattr(signing, "_keys", {})
+        assert signing.signing_key() == key
+
+    @pytest.mark.skipif(os.name != "posix", reason="file modes")
+    def test_readable_by_others_refused(self, key_file: Path) -> None:
+        key_file.parent.mkdir()
+        key_file.write_bytes(bytes(32))
+        key_file.chmod(0o644)
+        with pytest.raises(SigningKeyError, match="accessible to other users"):
+            signing.signing_key()
+
+    def test_short_key_refused(self, key_file: Path) -> None:
+        key_file.parent.mkdir()
+        key_file.write_bytes(b"short")
+        key_file.chmod(0o600)
+        with pytest.raises(SigningKeyError, match="shorter"):
+            signing.signing_key()
+
+
+class TestSignatures:
+    """Tests for signing bytes and streams."""
+
+    def test_verify(self, key_file: Path) -> None:
+        signature = sign(b"data")
+        assert len(signature) == DIGEST_SIZE
+        assert verify(b"data", signature)
+        assert not verify(b"date", signature)
+        assert not verify(b"data", bytes(DIGEST_SIZE))
+
+    def test_other_key(self, key_file: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        signature = sign(b"data")
+        monkeypatch.setenv(KEY_FILE_ENV, str(key_file.with_name("other.key")))
+        assert not verify(b"data", signature)
+
+    def test_stream(self, key_file: Path) -> None:
+        stream = io.BytesIO()
+        writer = SignedWriter(stream)
+        writer.write(b"header")
+        writer.write(b"payload")
+        stream.write(writer.signature())
+
+        stream.seek(0)
+        assert verify_stream(stream, len(b"headerpayload"), chunk_size=4)
+        assert stream.read() == b""
+        stream.seek(0)
+        assert not verify_stream(stream, len(b"header"))
+        # Truncated
+        assert not verify_stream(io.BytesIO(b"head"), len(b"headerpayload"))
@@ -0,0 +1,145 @@
+"""Tests for the sorted prefix index of string search parameters."""
+
+from typing import Any
+
+import pytest
+
+from fhirkit.server.api.search import filter_resources
+from fhirkit.server.graphql.resolvers import ListResolver, search_resources
+from fhirkit.server.operations import PatientMatcher
+from fhirkit.server.storage.fhir_store import FHIRStore
+from fhirkit.server.storage.string_index import StringIndex
+
+
+def _patient(patient_id: str, *names: tuple[str, list[str]], **fields: Any) -> dict[str, Any]:
+    return {
+        "resourceType": "Patient",
+        "id": patient_id,
+        "name": [{"family": family, "given": given} for family, given in names],
+        **fields,
+    }
+
+
+@pytest.fixture
+def store() -> FHIRStore:
+    store = FHIRStore()
+    store.bulk_load(
+        [
+            _patient("p1", ("Johnson", ["Anna", "Marie"]), gender="female"),
+            _patient("p2", ("Smith", ["John"]), ("Johanson", ["John"]), gender="male"),
+            _patient("p3", ("Müller", ["Jörg"]), address=[{"city": "Zürich", "line": ["Bahnhofstrasse 1"]}]),
+            _patient("p4", ("Ojohns", ["Li"]), gender="male"),
+        ]
+    )
+    return store
+
+
+def _ids(store: FHIRStore, params: dict[str, Any]) -> list[str]:
+    resources, total = store.search("Patient", params)
+    assert total == len(resources)
+    return [r["id"] for r in resources]
+
+
+class TestStringIndex:
+    """Tests for string searches served by the prefix index."""
+
+    def test_starts_with(self, store: FHIRStore) -> None:
+        assert _ids(store, {"family": "joh"}) == ["p1", "p2"]
+        assert _ids(store, {"name": "JOH"}) == ["p1", "p2"]
+        assert _ids(store, {"given": "mar"}) == ["p1"]
+        # Not a prefix of any name part
+        assert _ids(store, {"name": "ohns"}) == []
+
+    def test_multi_valued_names(self, store: FHIRStore) -> None:
+        assert _ids(store, {"family": "smith"}) == ["p2"]
+        assert _ids(store, {"family": "johanson"}) == ["p2"]
+        assert _ids(store, {"given": "john"}) == ["p2"]
+
+    def test_accents_and_or(self, store: FHIRStore) -> None:
+        assert _ids(store, {"family": "muller"}) == ["p3"]
+        assert _ids(store, {"given": "jorg,li"}) == ["p3", "p4"]
+        assert _ids(store, {"address-city": "zur"}) == ["p3"]
+        assert _ids(store, {"address": "bahnhof"}) == ["p3"]
+
+    def test_combined_with_filters(self, store: FHIRStore) -> None:
+        assert _ids(store, {"name": "jo", "gender": "male"}) == ["p2"]
+
+    def test_follows_writes(self, store: FHIRStore) -> None:
+        assert _ids(store, {"family": "joh"}) == ["p1", "p2"]
+        store.update("Patient", "p1", _patient("p1", ("Jones", ["Anna"])))
+        store.delete("Patient", "p2")
+        store.create(_patient("p5", ("Johnston", ["Eve"])))
+        assert _ids(store, {"family": "joh"}) == ["p5"]
+        assert _ids(store, {"family": "jon"}) == ["p1"]
+        store.expunge(["Patient/p5"])
+        assert _ids(store, {"family": "joh"}) == []
+
+    def test_bulk_writes_are_merged(self) -> None:
+        index = StringIndex()
+        index.index_type("Patient", [])
+        for i in range(200):
+            index.add(_patient(f"p{i}", (f"Name{i:03d}", [])))
+        assert index.search("Patient", "family", ["name01"]) == {f"Patient/p{i}" for i in range(10, 20)}
+        index.add(_patient("p15", ("Other", [])))
+        index.remove("Patient/p16")
+        assert len(index.search("Patient", "family", ["name01"])) == 8
+        assert index.search("Patient", "family", ["oth"]) == {"Patient/p15"}
+
+    def test_rewrites_before_merge(self) -> None:
+        index = StringIndex()
+        index.index_type("Patient", [])
+        for version in range(3):
+            for i in range(100):
+                index.add(_patient(f"p{i}", (f"V{version}Name{i:02d}", [])))
+        index.remove("Patient/p5")
+        # Earlier versions are dropped from the entries waiting to be merged
+        assert index.search("Patient", "family", ["v0", "v1"]) == set()
+        assert len(index.search("Patient", "family", ["v2name0"])) == 9
+        # The name and family entries of the other 99 patients
+        assert len(index) == 2 * 99
+
+    def test_rollback(self, store: FHIRStore) -> None:
+        _ids(store, {"family": "smith"})
+        store.begin_transaction()
+        store.update("Patient", "p2", _patient("p2", ("Brown", ["John"])))
+        assert _ids(store, {"family": "smith"}) == []
+        store.rollback_transaction()
+        assert _ids(store, {"family": "smith"}) == ["p2"]
+
+    def test_search_does_not_scan(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        store = FHIRStore()
+        store.bulk_load(_patient(f"p{i}", (f"Family{i}", [f"Given{i % 97}"])) for i in range(20000))
+        scanned = filter_resources(store.get_all_resources("Patient"), "Patient", {"family": "family1234"})
+
+        def scan(*args: Any) -> list[dict[str, Any]]:
+            raise AssertionError("Indexed parameter filtered resource by resource")
+
+        monkeypatch.setattr(store, "_filter_by_param", scan)
+        indexed, _ = store.search("Patient", {"family": "family1234"})
+        assert indexed == scanned
+        assert len(indexed) == 11
+
+
+class TestIndexUsers:
+    """Tests for GraphQL and $match using the index."""
+
+    def test_graphql_list(self, store: FHIRStore) -> None:
+        assert [r["id"] for r in search_resources(store, "Patient", {"name": "joh", "gender": "male"})] == ["p2"]
+        resources = ListResolver(store).resolve("Patient", family="joh")
+        assert [r.id for r in resources] == ["p1", "p2"]
+
+    def test_match_candidates(self, store: FHIRStore) -> None:
+        matcher = PatientMatcher(store)
+        candidates = matcher._candidates(_patient("x", ("Johnsen", ["Anne"])))
+        assert [c["id"] for c in candidates] == ["p1", "p2"]
+        bundle = matcher.match(_patient("x", ("Johnson", ["Anna"]), gender="female"))
+        assert bundle["entry"][0]["resource"]["id"] == "p1"
+
+    def test_match_candidates_by_identifier(self, store: FHIRStore) -> None:
+        store.update(
+            "Patient",
+            "p3",
+            _patient("p3", ("Müller", ["Jörg"]), identifier=[{"system": "urn:mrn", "value": "42"}]),
+        )
+        patient = _patient("x", ("Meier", ["Georg"]), identifier=[{"system": "urn:mrn", "value": "42"}])
+        assert [c["id"] for c in PatientMatcher(store)._candidates(patient)] == ["p3"]
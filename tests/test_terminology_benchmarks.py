@@ -0,0 +1,176 @@
+"""Benchmarks for the CodeSystem hierarchy index.
+
+Builds a synthetic polyhierarchy (one in ten concepts has a second parent)
+and compares the interval-labelled index with a set of ancestors per
+concept and with walking the parent links, and the heap of the index with
+that of the same hierarchy in a memory-mapped compact file. The hierarchy is kept small by
+default so the suite stays fast; set ``FHIRKIT_BENCH_CONCEPTS`` (e.g. to
+300000) for a full-size run. The timing comparisons only run with
+``FHIRKIT_BENCHMARKS=1``:
+
+    FHIRKIT_BENCHMARKS=1 FHIRKIT_BENCH_CONCEPTS=300000 pytest tests/test_terminology_benchmarks.py
+"""
+
+import os
+import random
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from fhirkit.terminology import HierarchyIndex
+from fhirkit.terminology.compact import CompactCodeSystem, write_compact_codesystem
+
+CONCEPT_COUNT = int(os.environ.get("FHIRKIT_BENCH_CONCEPTS", "30000"))
+
+
+def _polyhierarchy(count: int) -> tuple[list[dict[str, Any]], dict[str, list[str]]]:
+    """Concepts with about eight children each, and a second parent for one in ten."""
+    rng = random.Random(7)
+    concepts: list[dict[str, Any]] = [{"code": "0"}]
+    parents: dict[str, list[str]] = {"0": []}
+    for i in range(1, count):
+        codes = [str(rng.randrange(max(0, i // 8 - 50), i // 8 + 1) if i > 8 else 0)]
+        if rng.random() < 0.1:
+            codes.append(str(rng.randrange(0, i)))
+        parents[str(i)] = codes
+        concepts.append({"code": str(i), "property": [{"code": "parent", "valueCode": code} for code in codes]})
+    return concepts, parents
+
+
+def _ancestor_sets(parents: dict[str, list[str]]) -> dict[str, set[str]]:
+    # Parents always come before their children
+    ancestors: dict[str, set[str]] = {}
+    for code, code_parents in parents.items():
+        found: set[str] = set()
+        for parent in code_parents:
+            found.add(parent)
+            found |= ancestors[parent]
+        ancestors[code] = found
+    return ancestors
+
+
+def _walk_subsumes(parents: dict[str, list[str]], code_a: str, code_b: str) -> bool:
+    pending = [code_b]
+    seen: set[str] = set()
+    while pending:
+        code = pending.pop()
+        if code == code_a:
+            return True
+        if code not in seen:
+            seen.add(code)
+            pending.extend(parents[code])
+    return False
+
+
+def _subsumption_pairs(parents: dict[str, list[str]]) -> list[tuple[str, str]]:
+    """Pairs along ancestor chains, so that about half are subsumed."""
+    rng = random.Random(3)
+    codes = list(parents)
+    pairs = []
+    for _ in range(2000):
+        code_b = rng.choice(codes)
+        code_a = code_b
+        for _ in range(rng.randrange(4)):
+            code_a = parents[code_a][0] if parents[code_a] else code_a
+        pairs.append((code_a, code_b) if rng.random() < 0.5 else (code_a, rng.choice(codes)))
+    return pairs
+
+
+def _walk_descendants(parents: dict[str, list[str]], code: str) -> set[str]:
+    children: dict[str, list[str]] = {}
+    for child, code_parents in parents.items():
+        for parent in code_parents:
+            children.setdefault(parent, []).append(child)
+    found = {code}
+    pending = [code]
+    while pending:
+        for child in children.get(pending.pop(), ()):
+            if child not in found:
+                found.add(child)
+                pending.append(child)
+    return found
+
+
+def _measure(build: Any) -> tuple[Any, int]:
+    tracemalloc.start()
+    try:
+        result = build()
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.fixture(scope="module")
+def hierarchy() -> tuple[list[dict[str, Any]], dict[str, list[str]], HierarchyIndex]:
+    concepts, parents = _polyhierarchy(CONCEPT_COUNT)
+    return concepts, parents, HierarchyIndex(concepts)
+
+
+class TestHierarchyBenchmark:
+    """Interval labels against ancestor sets and parent walks."""
+
+    def test_memory(self, hierarchy: tuple[list[dict[str, Any]], dict[str, list[str]], HierarchyIndex]) -> None:
+        concepts, parents, _ = hierarchy
+        _, index_memory = _measure(lambda: HierarchyIndex(concepts))
+        _, sets_memory = _measure(lambda: _ancestor_sets(parents))
+        assert index_memory < sets_memory
+
+    def test_subsumes(self, hierarchy: tuple[list[dict[str, Any]], dict[str, list[str]], HierarchyIndex]) -> None:
+        _, parents, index = hierarchy
+        pairs = _subsumption_pairs(parents)
+        assert [index.subsumes(a, b) for a, b in pairs] == [_walk_subsumes(parents, a, b) for a, b in pairs]
+
+    @pytest.mark.benchmark
+    def test_subsumes_not_slower(
+        self, hierarchy: tuple[list[dict[str, Any]], dict[str, list[str]], HierarchyIndex]
+    ) -> None:
+        _, parents, index = hierarchy
+        pairs = _subsumption_pairs(parents)
+        start = time.perf_counter()
+        for a, b in pairs:
+            index.subsumes(a, b)
+        index_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for a, b in pairs:
+            _walk_subsumes(parents, a, b)
+        walk_time = time.perf_counter() - start
+        # The hierarchy is shallow, so walks are short: only check that labels are not slower
+        assert index_time < walk_time * 1.5
+
+    def test_is_a_expansion(self, hierarchy: tuple[list[dict[str, Any]], dict[str, list[str]], HierarchyIndex]) -> None:
+        _, parents, index = hierarchy
+        sliced = index.filter("is-a", "1")
+        found = _walk_descendants(parents, "1")
+        assert len(sliced) == len(found)
+        assert set(sliced) == found
+
+    @pytest.mark.benchmark
+    def test_is_a_expansion_faster(
+        self, hierarchy: tuple[list[dict[str, Any]], dict[str, list[str]], HierarchyIndex]
+    ) -> None:
+        _, parents, index = hierarchy
+        start = time.perf_counter()
+        index.filter("is-a", "1")
+        index_time = time.perf_counter() - start
+        start = time.perf_counter()
+        _walk_descendants(parents, "1")
+        walk_time = time.perf_counter() - start
+        assert index_time < walk_time
+
+    def test_compact_file(
+        self, hierarchy: tuple[list[dict[str, Any]], dict[str, list[str]], HierarchyIndex], tmp_path: Path
+    ) -> None:
+        concepts, parents, index = hierarchy
+        path = tmp_path / "bench.fcs"
+        write_compact_codesystem(path, concepts, "http://example.org/bench")
+        compact, compact_memory = _measure(lambda: CompactCodeSystem(path))
+        with compact:
+            rng = random.Random(5)
+            codes = list(parents)
+            pairs = [(rng.choice(codes), rng.choice(codes)) for _ in range(2000)]
+            assert [compact.subsumes(a, b) for a, b in pairs] == [index.subsumes(a, b) for a, b in pairs]
+        # The file is read in place: the heap holds the metadata and views only
+        assert compact_memory < 64 * 1024
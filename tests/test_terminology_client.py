@@ -0,0 +1,276 @@
+"""Tests for the pooled, caching and batching remote terminology client.
+
+The client runs against the package's own terminology app, served by
+uvicorn on a local port.
+"""
+
+import socket
+import threading
+import time
+from collections.abc import Iterator
+from typing import Any
+
+import pytest
+import uvicorn
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from fhirkit.terminology import (
+    FHIRTerminologyService,
+    InMemoryTerminologyService,
+    MemberOfRequest,
+    SubsumesRequest,
+    ValidateCodeRequest,
+)
+from fhirkit.terminology.api import create_app
+from fhirkit.terminology.client import RequestCoalescer, ResultCache
+
+SYSTEM = "http://example.org/fhir/CodeSystem/colors"
+VALUESET = "http://example.org/fhir/ValueSet/warm"
+WARM = [f"warm-{i}" for i in range(300)]
+
+
+class CountingService(InMemoryTerminologyService):
+    """In-memory service that counts the codes it validates, optionally slowly."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.validated: list[str | None] = []
+        self.delay = 0.0
+
+    def validate_code(self, request: ValidateCodeRequest) -> Any:
+        self.validated.append(request.code)
+        time.sleep(self.delay)
+        return super().validate_code(request)
+
+
+class StandIn:
+    """Terminology app on a local port, recording the requests it gets."""
+
+    def __init__(self) -> None:
+        self.service = CountingService()
+        self.service.add_value_set_from_json(
+            {
+                "resourceType": "ValueSet",
+                "url": VALUESET,
+                "compose": {"include": [{"system": SYSTEM, "concept": [{"code": c, "display": c} for c in WARM]}]},
+            }
+        )
+        self.service.add_code_system_from_json(
+            {"resourceType": "CodeSystem", "url": SYSTEM, "concept": [{"code": "warm", "concept": [{"code": "red"}]}]}
+        )
+        self.requests: list[str] = []
+        self.queries: list[dict[str, str]] = []
+        self.reject_batches = False
+        app = create_app(service=self.service)
+
+        @app.middleware("http")
+        async def record(request: Request, call_next: Any) -> Any:
+            self.requests.append(f"{request.method} {request.url.path}")
+            self.queries.append(dict(request.query_params))
+            if self.reject_batches and request.method == "POST":
+                return JSONResponse({"detail": "Method Not Allowed"}, status_code=405)
+            return await call_next(request)
+
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        self.url = f"http://127.0.0.1:{sock.getsockname()[1]}/terminology"
+        self._server = uvicorn.Server(uvicorn.Config(app, log_level="warning", timeout_keep_alive=30))
+        self._thread = threading.Thread(target=self._server.run, kwargs={"sockets": [sock]}, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+
+    def reset(self) -> None:
+        self.service.validated.clear()
+        self.service.delay = 0.0
+        self.requests.clear()
+        self.queries.clear()
+        self.reject_batches = False
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join()
+
+
+@pytest.fixture(scope="module")
+def stand_in() -> Iterator[StandIn]:
+    server = StandIn()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def client(stand_in: StandIn) -> Iterator[FHIRTerminologyService]:
+    stand_in.reset()
+    with FHIRTerminologyService(stand_in.url, batch_size=100) as service:
+        yield service
+
+
+def _request(code: str) -> ValidateCodeRequest:
+    return ValidateCodeRequest(url=VALUESET, system=SYSTEM, code=code)
+
+
+class TestResultCache:
+    """Tests for the TTL and LRU policies of the result cache."""
+
+    def test_expiry(self) -> None:
+        now = [0.0]
+        cache = ResultCache(max_size=10, ttl=60, clock=lambda: now[0])
+        cache.put("a", 1)
+        now[0] = 59
+        assert cache.get("a") == 1
+        now[0] = 61
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_least_recently_used_evicted(self) -> None:
+        cache = ResultCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        assert cache.get("b") is None
+        assert (cache.get("a"), cache.get("c")) == (1, 3)
+        assert (cache.hits, cache.misses) == (3, 1)
+
+    def test_disabled(self) -> None:
+        cache = ResultCache(max_size=0)
+        cache.put("a", 1)
+        assert cache.get("a") is None
+
+
+class TestRequestCoalescer:
+    """Tests for sharing calls among concurrent callers."""
+
+    def test_exception_shared(self) -> None:
+        coalescer = RequestCoalescer()
+        started = threading.Event()
+        errors: list[Exception] = []
+
+        def fail() -> None:
+            started.set()
+            time.sleep(0.1)
+            raise ValueError("down")
+
+        def wait() -> None:
+            started.wait()
+            try:
+                coalescer.run("key", lambda: None)
+            except ValueError as e:
+                errors.append(e)
+
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        with pytest.raises(ValueError):
+            coalescer.run("key", fail)
+        waiter.join()
+        assert len(errors) == 1
+        assert coalescer.coalesced == 1
+
+
+class TestFHIRTerminologyService:
+    """Tests for the remote client against a local terminology app."""
+
+    def test_connections_kept_alive(self, client: FHIRTerminologyService, stand_in: StandIn) -> None:
+        for code in WARM[:20]:
+            assert client.validate_code(_request(code)).result
+        assert not client.validate_code(_request("blue")).result
+        assert len(stand_in.requests) == 21
+        assert client._pool.opened == 1
+
+    def test_results_cached(self, client: FHIRTerminologyService, stand_in: StandIn) -> None:
+        first = client.validate_code(_request("warm-1"))
+        assert client.validate_code(_request("warm-1")) == first
+        assert client.member_of(MemberOfRequest(code="warm-1", system=SYSTEM, valueSetUrl=VALUESET)).result
+        assert stand_in.service.validated == ["warm-1"]
+        # Another ValueSet, system or code is another key
+        client.validate_code(ValidateCodeRequest(url=VALUESET, system="http://example.org/other", code="warm-1"))
+        assert len(stand_in.service.validated) == 2
+
+    def test_subsumes(self, client: FHIRTerminologyService, stand_in: StandIn) -> None:
+        request = SubsumesRequest(codeA="warm", codeB="red", system=SYSTEM)
+        assert client.subsumes(request).outcome == "subsumes"
+        assert client.subsumes(request).outcome == "subsumes"
+        assert stand_in.requests == ["GET /terminology/CodeSystem/$subsumes"]
+
+    def test_concurrent_lookups_coalesced(self, client: FHIRTerminologyService, stand_in: StandIn) -> None:
+        stand_in.service.delay = 0.2
+        results: list[bool] = []
+        threads = [
+            threading.Thread(target=lambda: results.append(client.validate_code(_request("warm-2")).result))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == [True] * 8
+        assert stand_in.service.validated == ["warm-2"]
+
+    def test_batched_validation(self, client: FHIRTerminologyService, stand_in: StandIn) -> None:
+        client.validate_code(_request("warm-0"))
+        requests = [_request(code) for code in WARM[:250]] + [_request("blue"), _request("warm-3")]
+        responses = client.validate_codes(requests)
+        assert [r.result for r in responses] == [True] * 250 + [False, True]
+        # warm-0 was cached; the other 250 distinct codes go in three batches
+        assert stand_in.requests.count("POST /terminology") == 3
+        assert len(stand_in.service.validated) == 251
+        assert client._pool.opened == 1
+        assert client.validate_codes([_request("warm-7")])[0].result
+        assert stand_in.requests.count("POST /terminology") == 3
+
+    def test_codeable_concept(self, client: FHIRTerminologyService) -> None:
+        request = ValidateCodeRequest.model_validate(
+            {
+                "url": VALUESET,
+                "codeableConcept": {
+                    "coding": [{"system": SYSTEM, "code": "blue"}, {"system": SYSTEM, "code": "warm-9"}]
+                },
+            }
+        )
+        assert client.validate_code(request).result
+        assert [r.result for r in client.validate_codes([request, _request("blue")])] == [True, False]
+
+    def test_without_batch_support(self, client: FHIRTerminologyService, stand_in: StandIn) -> None:
+        stand_in.reject_batches = True
+        responses = client.validate_codes([_request("warm-4"), _request("green")])
+        assert [r.result for r in responses] == [True, False]
+        assert stand_in.requests == [
+            "POST /terminology",
+            "GET /terminology/ValueSet/$validate-code",
+            "GET /terminology/ValueSet/$validate-code",
+        ]
+
+    def test_unreachable_server_not_cached(self) -> None:
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        with FHIRTerminologyService(f"http://127.0.0.1:{port}", timeout=2) as client:
+            response = client.validate_code(_request("warm-1"))
+            assert not response.result
+            assert response.message == "Failed to contact terminology server"
+            assert len(client.cache) == 0
+            assert client.subsumes(SubsumesRequest(codeA="a", codeB="b", system=SYSTEM)).outcome == "not-subsumed"
+
+    def test_display_sent_on_request(self, client: FHIRTerminologyService, stand_in: StandIn) -> None:
+        request = ValidateCodeRequest(url=VALUESET, system=SYSTEM, code="warm-5", display="Not warm-5", version="1")
+        assert client.validate_code(request).result
+        assert stand_in.queries == [{"url": VALUESET, "code": "warm-5", "system": SYSTEM, "systemVersion": "1"}]
+        # Displays are not part of the cache key unless they are validated
+        assert client.validate_code(request.model_copy(update={"display": "warm-5"})).result
+        assert len(stand_in.queries) == 1
+
+        with FHIRTerminologyService(stand_in.url, validate_display=True) as validating:
+            validating.validate_code(request)
+        assert stand_in.queries[1]["display"] == "Not warm-5"
+
+    def test_one_request_per_batch(self, stand_in: StandIn) -> None:
+        stand_in.reset()
+        with FHIRTerminologyService(stand_in.url) as client:
+            responses = client.validate_codes(_request(code) for code in WARM[:200])
+            assert client._pool.opened == 1
+        assert all(r.result for r in responses)
+        # Two batches of 100 over one connection, instead of a request and a connection per code
+        assert stand_in.requests == ["POST /terminology"] * 2
@@ -0,0 +1,139 @@
+"""Tests for full-text and trigram search."""
+
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from fhirkit.server.api.app import create_app
+from fhirkit.server.api.search import filter_resources
+from fhirkit.server.config.settings import FHIRServerSettings
+from fhirkit.server.storage.fhir_store import FHIRStore
+from fhirkit.server.storage.text_index import TextIndex, normalize, trigrams
+
+
+def _patient(patient_id: str, family: str, given: str, narrative: str = "", city: str = "Boston") -> dict[str, Any]:
+    patient: dict[str, Any] = {
+        "resourceType": "Patient",
+        "id": patient_id,
+        "name": [{"family": family, "given": [given]}],
+        "address": [{"city": city, "line": ["1 Main Street"]}],
+    }
+    if narrative:
+        patient["text"] = {"status": "generated", "div": f'<div xmlns="http://www.w3.org/1999/xhtml">{narrative}</div>'}
+    return patient
+
+
+@pytest.fixture
+def store() -> FHIRStore:
+    store = FHIRStore()
+    store.bulk_load(
+        [
+            _patient("p1", "Johnson", "Anna", "Known &amp; treated <b>diabetes</b> mellitus"),
+            _patient("p2", "Johns", "Bob", "Asthma"),
+            _patient("p3", "Müller", "José", city="Zürich"),
+            _patient("p4", "Mueller", "Li", "Type 2 Diabetes and hypertension"),
+        ]
+    )
+    return store
+
+
+def _ids(store: FHIRStore, params: dict[str, Any]) -> list[str]:
+    resources, total = store.search("Patient", params)
+    assert total == len(resources)
+    return [r["id"] for r in resources]
+
+
+class TestNormalization:
+    """Tests for text normalization."""
+
+    def test_case_and_accents(self) -> None:
+        assert normalize("MÜLLER") == normalize("muller") == "muller"
+        assert normalize("José") == "jose"
+
+    def test_trigrams(self) -> None:
+        assert trigrams("ohns") == {"ohn", "hns"}
+        assert trigrams("li") == set()
+
+
+class TestTextIndex:
+    """Tests for searches served by the text index."""
+
+    def test_contains(self, store: FHIRStore) -> None:
+        assert _ids(store, {"name:contains": "ohns"}) == ["p1", "p2"]
+        assert _ids(store, {"family:contains": "MULL"}) == ["p3"]
+        assert _ids(store, {"given:contains": "i"}) == ["p4"]
+        assert _ids(store, {"address-city:contains": "uric"}) == ["p3"]
+
+    def test_exact(self, store: FHIRStore) -> None:
+        assert _ids(store, {"family:exact": "Johns"}) == ["p2"]
+        assert _ids(store, {"family:exact": "johns"}) == []
+        assert _ids(store, {"family:exact": "Müller,Mueller"}) == ["p3", "p4"]
+
+    def test_text_and_content(self, store: FHIRStore) -> None:
+        assert _ids(store, {"_text": "diabetes"}) == ["p1", "p4"]
+        assert _ids(store, {"_text": "diabetes mellitus"}) == ["p1"]
+        assert _ids(store, {"_text": "treated"}) == ["p1"]
+        assert _ids(store, {"_text": "Boston"}) == []
+        assert _ids(store, {"_content": "boston diabetes"}) == ["p1", "p4"]
+        assert _ids(store, {"_content": "zurich,asthma"}) == ["p2", "p3"]
+
+    def test_combined_with_other_params(self, store: FHIRStore) -> None:
+        assert _ids(store, {"name:contains": "ohns", "_text": "asthma"}) == ["p2"]
+        assert _ids(store, {"_text": "diabetes", "given": "Li"}) == ["p4"]
+
+    def test_follows_writes(self, store: FHIRStore) -> None:
+        assert _ids(store, {"name:contains": "ohns"}) == ["p1", "p2"]
+        store.update("Patient", "p2", _patient("p2", "Smith", "Bob"))
+        store.delete("Patient", "p1")
+        store.create(_patient("p5", "Johnston", "Eve", "Diabetes"))
+        assert _ids(store, {"name:contains": "ohns"}) == ["p5"]
+        assert _ids(store, {"_text": "diabetes"}) == ["p4", "p5"]
+        store.expunge(["Patient/p5"])
+        assert _ids(store, {"name:contains": "ohns"}) == []
+
+    def test_rollback(self, store: FHIRStore) -> None:
+        _ids(store, {"_content": "asthma"})
+        store.begin_transaction()
+        store.update("Patient", "p2", _patient("p2", "Johns", "Bob", "Recovered"))
+        assert _ids(store, {"_content": "asthma"}) == []
+        store.rollback_transaction()
+        assert _ids(store, {"_content": "asthma"}) == ["p2"]
+
+    def test_types_indexed_when_searched(self, store: FHIRStore) -> None:
+        index = TextIndex()
+        index.add(_patient("p1", "Johnson", "Anna"))
+        assert len(index) == 0
+        index.index_type("Patient", store.get_all_resources("Patient"))
+        index.add(_patient("p9", "Johnson", "Anna"))
+        assert index.search("Patient", "family:contains", ["johnson"]) == {"Patient/p1", "Patient/p9"}
+
+    def test_compartment_filter(self, store: FHIRStore) -> None:
+        resources = store.get_all_resources("Patient")
+        assert [r["id"] for r in filter_resources(resources, "Patient", {"family:contains": "LLER"})] == ["p3", "p4"]
+        assert [r["id"] for r in filter_resources(resources, "Patient", {"family:exact": "Mueller"})] == ["p4"]
+
+    def test_search_does_not_scan(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        store = FHIRStore()
+        store.bulk_load(_patient(f"p{i}", f"Family{i}", f"Given{i % 97}") for i in range(20000))
+        scanned = filter_resources(store.get_all_resources("Patient"), "Patient", {"family:contains": "ily1234"})
+
+        def scan(*args: Any) -> list[dict[str, Any]]:
+            raise AssertionError("Indexed parameter filtered resource by resource")
+
+        monkeypatch.setattr(store, "_filter_by_param", scan)
+        indexed, _ = store.search("Patient", {"family:contains": "ily1234"})
+        assert indexed == scanned
+        assert len(indexed) == 11
+
+
+class TestTextSearchRoutes:
+    """Tests for text search through the REST API."""
+
+    def test_search(self, store: FHIRStore) -> None:
+        settings = FHIRServerSettings(patients=0, enable_docs=False, enable_ui=False, api_base_path="")
+        client = TestClient(create_app(settings=settings, store=store))
+        bundle = client.get("/Patient", params={"name:contains": "ohns"}).json()
+        assert bundle["total"] == 2
+        bundle = client.get("/Patient", params={"_text": "hypertension"}).json()
+        assert [e["resource"]["id"] for e in bundle["entry"]] == ["p4"]
@@ -0,0 +1,218 @@
+"""Tests for the :in, :not-in, :below and :above token modifiers."""
+
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from fhirkit.server.api.app import create_app
+from fhirkit.server.config.settings import FHIRServerSettings
+from fhirkit.server.storage.fhir_store import FHIRStore
+from fhirkit.server.storage.token_index import TokenIndex, token_codes
+
+SNOMED = "http://snomed.info/sct"
+ICD10 = "http://hl7.org/fhir/sid/icd-10"
+DIABETES_VS = "http://example.org/fhir/ValueSet/diabetes"
+
+
+def _condition(condition_id: str, *codings: tuple[str, str], status: str = "active") -> dict[str, Any]:
+    return {
+        "resourceType": "Condition",
+        "id": condition_id,
+        "code": {"coding": [{"system": system, "code": code} for system, code in codings]},
+        "clinicalStatus": {"coding": [{"code": status}]},
+    }
+
+
+def _codesystem() -> dict[str, Any]:
+    # 73211009 diabetes mellitus
+    #   46635009 type 1, 44054006 type 2
+    #     313436004 type 2 with neuropathy, also below 230572002 diabetic neuropathy
+    return {
+        "resourceType": "CodeSystem",
+        "id": "snomed",
+        "url": SNOMED,
+        "status": "active",
+        "content": "fragment",
+        "concept": [
+            {
+                "code": "73211009",
+                "concept": [
+                    {"code": "46635009"},
+                    {"code": "44054006", "concept": [{"code": "313436004"}]},
+                ],
+            },
+            {"code": "230572002"},
+            {"code": "313436004", "property": [{"code": "parent", "valueCode": "230572002"}]},
+            {"code": "38341003"},
+        ],
+    }
+
+
+def _valueset(*codes: str) -> dict[str, Any]:
+    return {
+        "resourceType": "ValueSet",
+        "id": "diabetes",
+        "url": DIABETES_VS,
+        "status": "active",
+        "compose": {"include": [{"system": SNOMED, "concept": [{"code": code} for code in codes]}]},
+    }
+
+
+@pytest.fixture
+def store() -> FHIRStore:
+    store = FHIRStore()
+    store.bulk_load(
+        [
+            _codesystem(),
+            _valueset("46635009", "44054006"),
+            _condition("c1", (SNOMED, "73211009")),
+            _condition("c2", (SNOMED, "44054006"), (ICD10, "E11")),
+            _condition("c3", (SNOMED, "313436004"), status="resolved"),
+            _condition("c4", (SNOMED, "38341003")),
+            _condition("c5", (ICD10, "46635009")),
+        ]
+    )
+    return store
+
+
+def _ids(store: FHIRStore, params: dict[str, Any]) -> list[str]:
+    resources, total = store.search("Condition", params)
+    assert total == len(resources)
+    return [r["id"] for r in resources]
+
+
+class TestTokenCodes:
+    """Tests for collecting the codes of token parameters."""
+
+    def test_codings_and_codes(self) -> None:
+        condition = _condition("c1", (SNOMED, "1"), (ICD10, "2"))
+        assert token_codes(condition, "code.coding") == {(SNOMED, "1"), (ICD10, "2")}
+        assert token_codes(condition, "clinicalStatus.coding") == {("", "active")}
+        assert token_codes({"status": "final"}, "status") == {("", "final")}
+        assert token_codes({}, "code.coding") == set()
+
+
+class TestTokenModifiers:
+    """Tests for token modifiers served by the code postings."""
+
+    def test_below(self, store: FHIRStore) -> None:
+        assert _ids(store, {"code:below": f"{SNOMED}|73211009"}) == ["c1", "c2", "c3"]
+        assert _ids(store, {"code:below": f"{SNOMED}|44054006"}) == ["c2", "c3"]
+        # Second parent given by a property
+        assert _ids(store, {"code:below": f"{SNOMED}|230572002"}) == ["c3"]
+        assert _ids(store, {"code:below": f"{SNOMED}|46635009"}) == []
+
+    def test_below_without_system(self, store: FHIRStore) -> None:
+        # The ICD-10 coding of c5 has the same code as a SNOMED concept
+        assert _ids(store, {"code:below": "46635009"}) == ["c5"]
+        assert _ids(store, {"code:below": "44054006"}) == ["c2", "c3"]
+        assert _ids(store, {"code:below": "E11"}) == ["c2"]
+
+    def test_above(self, store: FHIRStore) -> None:
+        assert _ids(store, {"code:above": f"{SNOMED}|313436004"}) == ["c1", "c2", "c3"]
+        assert _ids(store, {"code:above": f"{SNOMED}|73211009"}) == ["c1"]
+
+    def test_in_and_not_in(self, store: FHIRStore) -> None:
+        assert _ids(store, {"code:in": DIABETES_VS}) == ["c2"]
+        assert _ids(store, {"code:not-in": DIABETES_VS}) == ["c1", "c3", "c4", "c5"]
+        assert _ids(store, {"code:in": "http://example.org/fhir/ValueSet/unknown"}) == []
+
+    def test_or_and_combined(self, store: FHIRStore) -> None:
+        assert _ids(store, {"code:below": f"{SNOMED}|46635009,{SNOMED}|44054006"}) == ["c2", "c3"]
+        assert _ids(store, {"code:below": f"{SNOMED}|73211009", "clinical-status": "active"}) == ["c1", "c2"]
+        assert _ids(store, {"code:below": f"{SNOMED}|73211009", "clinical-status:not-in": DIABETES_VS}) == [
+            "c1",
+            "c2",
+            "c3",
+        ]
+
+    def test_follows_writes(self, store: FHIRStore) -> None:
+        assert _ids(store, {"code:below": f"{SNOMED}|44054006"}) == ["c2", "c3"]
+        store.update("Condition", "c2", _condition("c2", (SNOMED, "38341003")))
+        store.delete("Condition", "c3")
+        store.create(_condition("c6", (SNOMED, "313436004")))
+        assert _ids(store, {"code:below": f"{SNOMED}|44054006"}) == ["c6"]
+        assert _ids(store, {"code:not-in": DIABETES_VS}) == ["c1", "c2", "c4", "c5", "c6"]
+
+    def test_terminology_changes(self, store: FHIRStore) -> None:
+        assert _ids(store, {"code:in": DIABETES_VS}) == ["c2"]
+        assert _ids(store, {"code:below": f"{SNOMED}|38341003"}) == ["c4"]
+        store.update("ValueSet", "diabetes", _valueset("73211009", "313436004"))
+        codesystem = _codesystem()
+        codesystem["concept"].append({"code": "73211009", "property": [{"code": "parent", "valueCode": "38341003"}]})
+        store.update("CodeSystem", "snomed", codesystem)
+        assert _ids(store, {"code:in": DIABETES_VS}) == ["c1", "c3"]
+        assert _ids(store, {"code:below": f"{SNOMED}|38341003"}) == ["c1", "c2", "c3", "c4"]
+
+    def test_rollback(self, store: FHIRStore) -> None:
+        _ids(store, {"code:in": DIABETES_VS})
+        store.begin_transaction()
+        store.update("Condition", "c2", _condition("c2", (SNOMED, "38341003")))
+        assert _ids(store, {"code:in": DIABETES_VS}) == []
+        store.rollback_transaction()
+        assert _ids(store, {"code:in": DIABETES_VS}) == ["c2"]
+
+    def test_types_indexed_when_searched(self, store: FHIRStore) -> None:
+        index = TokenIndex()
+        index.add(_condition("c1", (SNOMED, "1")))
+        assert len(index) == 0
+        index.index_type("Condition", store.get_all_resources("Condition"))
+        assert index.lookup("Condition", "code", [("", "46635009")]) == {"Condition/c5"}
+        assert index.lookup("Condition", "code", [(SNOMED, "46635009")]) == set()
+        index.remove("Condition/c2")
+        assert index.lookup("Condition", "code", [("", "44054006"), (ICD10, "E11")]) == set()
+
+    def test_search_does_not_scan(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        # A four-level hierarchy of 10 + 100 + 1000 + 10000 concepts below a root
+        concepts = [
+            {
+                "code": f"{a}",
+                "concept": [
+                    {
+                        "code": f"{a}.{b}",
+                        "concept": [
+                            {"code": f"{a}.{b}.{c}", "concept": [{"code": f"{a}.{b}.{c}.{d}"} for d in range(10)]}
+                            for c in range(10)
+                        ],
+                    }
+                    for b in range(10)
+                ],
+            }
+            for a in range(10)
+        ]
+        codesystem = {"resourceType": "CodeSystem", "id": "big", "url": SNOMED, "concept": [{"code": "root"}]}
+        codesystem["concept"][0]["concept"] = concepts
+        store = FHIRStore()
+        store.bulk_load([codesystem])
+        store.bulk_load(_condition(f"c{i}", (SNOMED, f"{i % 10}.{i % 7}.{i % 3}.{i % 9}")) for i in range(20000))
+        terminology = store.terminology
+        scanned = [
+            condition
+            for condition in store.get_all_resources("Condition")
+            if any(
+                terminology.subsumes(SNOMED, "3.4", coding["code"])["parameter"][0]["valueCode"]
+                in ("equivalent", "subsumes")
+                for coding in condition["code"]["coding"]
+            )
+        ]
+
+        def scan(*args: Any) -> list[dict[str, Any]]:
+            raise AssertionError("Indexed parameter filtered resource by resource")
+
+        monkeypatch.setattr(store, "_filter_by_param", scan)
+        indexed, _ = store.search("Condition", {"code:below": f"{SNOMED}|3.4"}, _count=20000)
+        assert indexed == scanned
+        assert len(indexed) == sum(1 for i in range(20000) if i % 10 == 3 and i % 7 == 4)
+
+
+class TestTokenModifierRoutes:
+    """Tests for token modifiers through the REST API."""
+
+    def test_search(self, store: FHIRStore) -> None:
+        settings = FHIRServerSettings(patients=0, enable_docs=False, enable_ui=False, api_base_path="")
+        client = TestClient(create_app(settings=settings, store=store))
+        bundle = client.get("/Condition", params={"code:below": f"{SNOMED}|73211009"}).json()
+        assert [e["resource"]["id"] for e in bundle["entry"]] == ["c1", "c2", "c3"]
+        bundle = client.get("/Condition", params={"code:in": DIABETES_VS}).json()
+        assert bundle["total"] == 1
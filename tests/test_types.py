@@ -1,8 +1,11 @@
 """Tests for FHIR types module."""
 
+import pickle
 from datetime import date, timedelta, timezone
 from decimal import Decimal
 
+import pytest
+
 from fhirkit.engine.types import (
     FHIRDate,
     FHIRDateTime,
@@ -377,6 +380,52 @@ class TestQuantity:
         assert str(q) == "10.5 'mg'"
 
 
+class TestValueTypes:
+    """Tests for the slots-based value type behaviour."""
+
+    def test_immutable(self) -> None:
+        """Test that fields cannot be assigned or deleted."""
+        dt = FHIRDateTime(year=2024, month=3)
+        with pytest.raises(AttributeError):
+            dt.year = 2025  # type: ignore[misc]
+        with pytest.raises(AttributeError):
+            del dt.month
+
+    def test_no_instance_dict(self) -> None:
+        """Test that values do not carry a per-instance dict."""
+        assert not hasattr(FHIRDate(year=2024), "__dict__")
+        assert not hasattr(Quantity(value=1, unit="mg"), "__dict__")
+
+    def test_pickle(self) -> None:
+        """Test pickling round trips, including cached hashes."""
+        dt = FHIRDateTime(year=2024, month=3, day=15, hour=10, tz_offset="+02:00")
+        hash(dt)
+        restored = pickle.loads(pickle.dumps(dt))
+        assert restored == dt
+        assert hash(restored) == hash(dt)
+        assert restored.tz_offset == "+02:00"
+
+    def test_coercion(self) -> None:
+        """Test that numeric fields are coerced like the former models."""
+        assert Quantity(value=2, unit="mg").value == Decimal(2)
+        assert Quantity(value="2.50", unit="mg").value == Decimal("2.50")
+        assert FHIRTime(hour="10").hour == 10
+        with pytest.raises(ValueError):
+            Quantity(value="abc", unit="mg")
+
+    def test_repr_and_to_dict(self) -> None:
+        """Test repr and dict conversion."""
+        d = FHIRDate(year=2024, month=3)
+        assert repr(d) == "FHIRDate(year=2024, month=3, day=None)"
+        assert d.to_dict() == {"year": 2024, "month": 3, "day": None}
+
+    def test_utc_comparison_key_is_cached(self) -> None:
+        """Test that timezone normalization is computed once per value."""
+        dt = FHIRDateTime(year=2024, month=1, day=1, hour=1, minute=0, tz_offset="+02:00")
+        assert dt._to_utc_tuple() is dt._to_utc_tuple()
+        assert dt < FHIRDateTime(year=2023, month=12, day=31, hour=23, minute=30, tz_offset="Z")
+
+
 class TestGetFHIRPathType:
     """Tests for get_fhirpath_type function."""
 
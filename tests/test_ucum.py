@@ -4,7 +4,7 @@ from decimal import Decimal
 
 import pytest
 
-from fhirkit.engine.units import UCUMConverter, convert_quantity, parse_unit
+from fhirkit.engine.units import UCUMConverter, canonicalize, convert_quantity, parse_unit
 from fhirkit.engine.units.definitions import (
     DIMENSIONLESS,
     LENGTH,
@@ -379,6 +379,33 @@ class TestEdgeCases:
         assert result == pytest.approx(1)
 
 
+class TestCanonicalization:
+    """Tests for canonical base-unit values."""
+
+    def test_compatible_units_share_canonical_value(self):
+        assert canonicalize(180, "mg/dL") == canonicalize("1.8", "g/L")
+        assert canonicalize(5, "mg").value == Decimal("0.005")
+
+    def test_inexact_factors_are_rounded(self):
+        assert canonicalize(60, "/min").value == canonicalize(1, "/s").value
+
+    def test_dimension(self):
+        assert canonicalize(1, "mmol/L").dimension != canonicalize(1, "mg/dL").dimension
+
+    def test_offset_units(self):
+        assert canonicalize(0, "Cel").value == Decimal("273.15")
+
+    def test_annotations_are_ignored(self):
+        assert canonicalize(72, "{beats}/min") == canonicalize(72, "/min")
+        assert canonicalize(3, "{score}").dimension == DIMENSIONLESS
+
+    def test_unknown_unit_is_memoized(self):
+        converter = UCUMConverter()
+        assert converter.canonicalize(1, "bogus") is None
+        assert "bogus" in converter._canonical
+        assert converter.canonicalize("abc", "mg") is None
+
+
 class TestCQLIntegration:
     """Tests for CQL ConvertQuantity function integration."""
 
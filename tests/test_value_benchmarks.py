@@ -0,0 +1,134 @@
+"""Benchmarks for runtime value types.
+
+Evaluates a date-heavy CQL expression (interval overlaps over Encounter
+periods) and compares the slots-based value types with an equivalent
+Pydantic model. The timing comparison only runs with ``FHIRKIT_BENCHMARKS=1``.
+The population is kept small by default so the suite stays fast; set
+``FHIRKIT_BENCH_ENCOUNTERS`` (e.g. to 100000) for a full-size run:
+
+    FHIRKIT_BENCHMARKS=1 FHIRKIT_BENCH_ENCOUNTERS=100000 pytest tests/test_value_benchmarks.py
+"""
+
+import gc
+import os
+import time
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+import pytest
+from pydantic import BaseModel, ConfigDict
+
+from fhirkit.engine.cql import CQLEvaluator, InMemoryDataSource
+from fhirkit.engine.types import FHIRDateTime
+
+ENCOUNTER_COUNT = int(os.environ.get("FHIRKIT_BENCH_ENCOUNTERS", "2000"))
+
+OVERLAP_LIBRARY = """
+library OverlapBenchmark version '1.0'
+
+using FHIR version '4.0.1'
+
+parameter "Measurement Period" Interval<DateTime>
+  default Interval[@2024-01-01T00:00:00.0Z, @2024-12-31T23:59:59.999Z]
+
+define "In Period":
+  [Encounter] E
+    where Interval[ToDateTime(E.period.start), ToDateTime(E.period.end)] overlaps "Measurement Period"
+
+define "Count": Count("In Period")
+"""
+
+
+def _encounters(count: int) -> InMemoryDataSource:
+    """Encounters in 2023; every third one ends in 2024 and overlaps the period."""
+    data_source = InMemoryDataSource()
+    for i in range(count):
+        month, day = 1 + i % 12, 1 + i % 28
+        end_year = 2024 if i % 3 == 0 else 2023
+        data_source.add_resource(
+            {
+                "resourceType": "Encounter",
+                "id": f"encounter-{i}",
+                "status": "finished",
+                "period": {
+                    "start": f"2023-{month:02d}-{day:02d}T08:00:00Z",
+                    "end": f"{end_year}-{month:02d}-{day:02d}T10:30:00Z",
+                },
+            }
+        )
+    return data_source
+
+
+class PydanticDateTime(BaseModel):
+    """The former Pydantic definition of FHIRDateTime, for comparison."""
+
+    model_config = ConfigDict(frozen=True)
+
+    year: int
+    month: int | None = None
+    day: int | None = None
+    hour: int | None = None
+    minute: int | None = None
+    second: int | None = None
+    millisecond: int | None = None
+    tz_offset: str | None = None
+
+
+def _slots_value(i: int) -> FHIRDateTime:
+    return FHIRDateTime(year=2024, month=1 + i % 12, day=1 + i % 28, hour=i % 24, minute=0, tz_offset="Z")
+
+
+def _model_value(i: int) -> PydanticDateTime:
+    return PydanticDateTime(year=2024, month=1 + i % 12, day=1 + i % 28, hour=i % 24, minute=0, tz_offset="Z")
+
+
+def _measure(build: Callable[[int], Any], count: int) -> tuple[float, int]:
+    """Time building ``count`` values, and the peak memory held by them."""
+    # Collections over whatever the rest of the test session left in memory
+    # would dominate the timing
+    gc.collect()
+    gc.disable()
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        values = [build(i) for i in range(count)]
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        gc.enable()
+    assert len(values) == count
+    return elapsed, peak
+
+
+class TestOverlapBenchmark:
+    """Interval overlaps over an Encounter population."""
+
+    def test_overlap_count(self) -> None:
+        evaluator = CQLEvaluator(data_source=_encounters(ENCOUNTER_COUNT))
+        evaluator.compile(OVERLAP_LIBRARY)
+        count = evaluator.evaluate_definition("Count")
+        assert count == (ENCOUNTER_COUNT + 2) // 3
+
+
+class TestValueTypeOverhead:
+    """Slots-based values against the equivalent Pydantic model."""
+
+    def test_memory(self) -> None:
+        count = 20000
+        value = _slots_value(0)
+        assert not hasattr(value, "__dict__")
+        _measure(_slots_value, 100)
+        _measure(_model_value, 100)
+        assert _measure(_slots_value, count)[1] < _measure(_model_value, count)[1]
+
+    @pytest.mark.benchmark
+    def test_construction(self) -> None:
+        count = 20000
+        # Warm up both paths before measuring
+        _measure(_slots_value, 100)
+        _measure(_model_value, 100)
+        slots_time, _ = _measure(_slots_value, count)
+        model_time, _ = _measure(_model_value, count)
+        assert slots_time < model_time * 1.5